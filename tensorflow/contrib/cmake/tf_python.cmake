@@ -337,6 +337,7 @@ add_python_module("tensorflow/contrib/data")
 add_python_module("tensorflow/contrib/data/python")
 add_python_module("tensorflow/contrib/data/python/kernel_tests")
 add_python_module("tensorflow/contrib/data/python/ops")
+add_python_module("tensorflow/contrib/data/python/tools")
 add_python_module("tensorflow/contrib/decision_trees")
 add_python_module("tensorflow/contrib/decision_trees/proto")
 add_python_module("tensorflow/contrib/deprecated")
@@ -19,15 +19,29 @@
 @@TFRecordDataset
 @@FixedLengthRecordDataset
 @@TextLineDataset
+@@Autotuner
+@@BucketingStats
+@@PipelineProfiler
+@@ColumnarDataset
+@@ColumnarWriter
+@@SparseColumn
 
 @@batch_and_drop_remainder
+@@bucket_by_sequence_length
+@@convert_tfrecord_to_columnar
 @@dense_to_sparse_batch
 @@enumerate_dataset
+@@estimate_bucket_boundaries
 @@group_by_window
 @@ignore_errors
+@@map_batched_py_func
+@@parse_examples_to_numpy
+@@persistent_cache
+@@parallel_from_generator
 @@read_batch_features
 @@unbatch
 @@rejection_resample
+@@sharded_shuffle
 @@sloppy_interleave
 
 """
@@ -37,6 +51,14 @@ from __future__ import division
 from __future__ import print_function
 
 # pylint: disable=unused-import
+from tensorflow.contrib.data.python.ops.autotune_ops import Autotuner
+from tensorflow.contrib.data.python.ops.bucketing_ops import bucket_by_sequence_length
+from tensorflow.contrib.data.python.ops.bucketing_ops import BucketingStats
+from tensorflow.contrib.data.python.ops.bucketing_ops import estimate_bucket_boundaries
+from tensorflow.contrib.data.python.ops.cache_ops import persistent_cache
+from tensorflow.contrib.data.python.ops.columnar_ops import ColumnarDataset
+from tensorflow.contrib.data.python.ops.columnar_ops import ColumnarWriter
+from tensorflow.contrib.data.python.ops.columnar_ops import convert_tfrecord_to_columnar
 from tensorflow.contrib.data.python.ops.dataset_ops import batch_and_drop_remainder
 from tensorflow.contrib.data.python.ops.dataset_ops import Dataset
 from tensorflow.contrib.data.python.ops.dataset_ops import dense_to_sparse_batch
@@ -50,6 +72,12 @@ from tensorflow.contrib.data.python.ops.dataset_ops import SqlDataset
 from tensorflow.contrib.data.python.ops.dataset_ops import TextLineDataset
 from tensorflow.contrib.data.python.ops.dataset_ops import TFRecordDataset
 from tensorflow.contrib.data.python.ops.dataset_ops import unbatch
+from tensorflow.contrib.data.python.ops.example_parsing_ops import parse_examples_to_numpy
+from tensorflow.contrib.data.python.ops.example_parsing_ops import SparseColumn
+from tensorflow.contrib.data.python.ops.generator_ops import parallel_from_generator
+from tensorflow.contrib.data.python.ops.profile_ops import PipelineProfiler
+from tensorflow.contrib.data.python.ops.py_func_ops import map_batched_py_func
+from tensorflow.contrib.data.python.ops.shuffle_ops import sharded_shuffle
 from tensorflow.contrib.data.python.ops.sloppy_ops import sloppy_interleave
 from tensorflow.python.data.ops.dataset_ops import Iterator
 # pylint: enable=unused-import
@@ -0,0 +1,220 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for the experimental input pipeline autotuner."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+import time
+
+from tensorflow.contrib.data.python.ops import autotune_ops
+from tensorflow.contrib.data.python.ops import dataset_ops
+from tensorflow.python.client import session
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import errors
+from tensorflow.python.framework import ops
+from tensorflow.python.ops import array_ops
+from tensorflow.python.ops import script_ops
+from tensorflow.python.platform import test
+
+
+# pylint: disable=protected-access
+_INPUT = autotune_ops._INPUT
+_OUTPUT = autotune_ops._OUTPUT
+# pylint: enable=protected-access
+
+
+def _record_window(stage, num_elements, elements_per_sec, num_bytes=8):
+  """Records `num_elements` outputs of `stage` at a fixed rate."""
+  for i in range(num_elements):
+    stage.record(_OUTPUT, num_bytes, i / elements_per_sec)
+
+
+class AutotunerTest(test.TestCase):
+
+  def _readAll(self, sess, init_op, get_next):
+    sess.run(init_op)
+    elements = []
+    while True:
+      try:
+        elements.append(sess.run(get_next))
+      except errors.OutOfRangeError:
+        return elements
+
+  def testTunedPipelineProducesSameElements(self):
+    tuner = autotune_ops.Autotuner(min_elements=10)
+    dataset = (dataset_ops.Dataset.range(100)
+               .apply(tuner.map(lambda x: x * x, "square"))
+               .apply(tuner.interleave(
+                   lambda x: dataset_ops.Dataset.from_tensors(x).repeat(2),
+                   "repeat"))
+               .apply(tuner.prefetch("prefetch")))
+    iterator = dataset.make_initializable_iterator()
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+
+    with self.test_session() as sess:
+      for _ in range(3):
+        elements = self._readAll(sess, init_op, get_next)
+        self.assertEqual(sorted([x * x for x in range(100)] * 2),
+                         sorted(elements))
+
+    stats = tuner.stats()
+    self.assertEqual(["prefetch", "repeat", "square"], sorted(stats))
+    self.assertEqual("map", stats["square"]["kind"])
+    self.assertEqual(100, stats["square"]["elements"])
+    self.assertEqual(8, stats["square"]["element_bytes"])
+    self.assertEqual(200, stats["prefetch"]["elements"])
+    self.assertIn("mean_buffer_occupancy", stats["prefetch"])
+    self.assertEqual(
+        {name: s["value"] for name, s in stats.items()}, tuner.values())
+
+  def testDuplicateName(self):
+    tuner = autotune_ops.Autotuner()
+    tuner.prefetch("prefetch")
+    with self.assertRaisesRegexp(ValueError, "already exists"):
+      tuner.map(lambda x: x, "prefetch")
+
+  def testParallelismHillClimbing(self):
+    tuner = autotune_ops.Autotuner(max_parallelism=16, min_elements=10)
+    tuner.map(lambda x: x, "map")
+    stage = tuner._stages["map"]  # pylint: disable=protected-access
+
+    # Throughput improves up to a parallelism of 4, and then stays flat.
+    for parallelism, expected_next in [(1, 2), (2, 4), (4, 8)]:
+      self.assertEqual(parallelism, tuner.values()["map"])
+      _record_window(stage, 100, 100.0 * min(parallelism, 4))
+      self.assertEqual({"map": expected_next}, tuner.update())
+      self.assertFalse(tuner.stats()["map"]["converged"])
+
+    _record_window(stage, 100, 400.0)
+    self.assertEqual({"map": 4}, tuner.update())
+    self.assertTrue(tuner.stats()["map"]["converged"])
+
+    # Once converged, the value no longer changes.
+    _record_window(stage, 100, 1000.0)
+    self.assertEqual({"map": 4}, tuner.update())
+
+  def testParallelismStopsAtMaximum(self):
+    tuner = autotune_ops.Autotuner(max_parallelism=2, min_elements=10)
+    tuner.map(lambda x: x, "map", initial_parallelism=2)
+    stage = tuner._stages["map"]  # pylint: disable=protected-access
+    _record_window(stage, 100, 100.0)
+    self.assertEqual({"map": 2}, tuner.update())
+    self.assertTrue(tuner.stats()["map"]["converged"])
+
+  def testTooFewElements(self):
+    tuner = autotune_ops.Autotuner(min_elements=100)
+    tuner.map(lambda x: x, "map")
+    stage = tuner._stages["map"]  # pylint: disable=protected-access
+    _record_window(stage, 10, 100.0)
+    self.assertEqual({"map": 1}, tuner.update())
+
+  def testBurstyProducerGrowsBuffer(self):
+    tuner = autotune_ops.Autotuner(min_elements=10)
+    tuner.prefetch("prefetch", initial_buffer_size=2)
+    stage = tuner._stages["prefetch"]  # pylint: disable=protected-access
+    # The producer fills the buffer, and then the consumer drains it.
+    for _ in range(10):
+      for _ in range(2):
+        stage.record(_INPUT, 8, 0.0)
+      for _ in range(2):
+        stage.record(_OUTPUT, 8, 0.0)
+    # The occupancy after each element is taken alternates between 1 and 0.
+    tuner.update()
+    stats = tuner.stats()["prefetch"]
+    self.assertEqual(0.5, stats["empty_fraction"])
+    self.assertEqual(0.0, stats["full_fraction"])
+    self.assertEqual(2, stats["value"])
+
+    for _ in range(10):
+      for _ in range(3):
+        stage.record(_INPUT, 8, 0.0)
+      for _ in range(3):
+        stage.record(_OUTPUT, 8, 0.0)
+    self.assertEqual({"prefetch": 4}, tuner.update())
+
+  def testMemoryBudget(self):
+    tuner = autotune_ops.Autotuner(memory_budget_bytes=500, min_elements=10)
+    tuner.prefetch("prefetch", initial_buffer_size=64)
+    tuner.map(lambda x: x, "map", initial_parallelism=4)
+    stages = tuner._stages  # pylint: disable=protected-access
+    _record_window(stages["prefetch"], 100, 100.0, num_bytes=100)
+    _record_window(stages["map"], 100, 100.0, num_bytes=100)
+    # The map stage doubles its parallelism to 8 (800 bytes). Then the buffer
+    # is shrunk to a single element (100 bytes), and finally the parallelism
+    # is halved back to 4 (400 bytes).
+    self.assertEqual({"prefetch": 1, "map": 4}, tuner.update())
+    self.assertTrue(tuner.stats()["map"]["converged"])
+
+  def testStateFile(self):
+    state_file = os.path.join(self.get_temp_dir(), "autotune_state.json")
+    tuner = autotune_ops.Autotuner(min_elements=10, state_file=state_file)
+    tuner.map(lambda x: x, "map")
+    stage = tuner._stages["map"]  # pylint: disable=protected-access
+    _record_window(stage, 100, 100.0)
+    tuner.update()
+    with open(state_file) as f:
+      self.assertEqual({"map": 2}, json.load(f))
+
+    tuner = autotune_ops.Autotuner(state_file=state_file)
+    tuner.map(lambda x: x, "map")
+    self.assertEqual({"map": 2}, tuner.values())
+
+
+class AutotunerBenchmark(test.Benchmark):
+  """Shows the convergence of a pipeline whose map function sleeps."""
+
+  def benchmarkConvergence(self):
+
+    def slow_square(x):
+      time.sleep(0.002)  # Releases the GIL, like I/O or a C++ decoder.
+      return x * x
+
+    tuner = autotune_ops.Autotuner(max_parallelism=32, min_elements=100)
+    with ops.Graph().as_default():
+      dataset = (dataset_ops.Dataset.range(1000)
+                 .apply(tuner.map(
+                     lambda x: array_ops.reshape(
+                         script_ops.py_func(slow_square, [x], dtypes.int64),
+                         []),
+                     "slow_square"))
+                 .apply(tuner.prefetch("prefetch")))
+      iterator = dataset.make_initializable_iterator()
+      get_next = iterator.get_next()
+      with session.Session() as sess:
+        for epoch in range(8):
+          sess.run(iterator.initializer)
+          start = time.time()
+          num_elements = 0
+          while True:
+            try:
+              sess.run(get_next)
+              num_elements += 1
+            except errors.OutOfRangeError:
+              break
+          wall_time = time.time() - start
+          print("epoch %d: %.2f elements/s, values: %s" % (
+              epoch, num_elements / wall_time, tuner.values()))
+          self.report_benchmark(
+              iters=num_elements, wall_time=wall_time / num_elements,
+              name="benchmark_autotune_epoch_%d" % epoch,
+              extras=tuner.values())
+
+
+if __name__ == "__main__":
+  test.main()
@@ -19,6 +19,7 @@ from __future__ import print_function
 
 import numpy as np
 
+from tensorflow.contrib.data.python.ops import bucketing_ops
 from tensorflow.contrib.data.python.ops import dataset_ops
 from tensorflow.python.framework import constant_op
 from tensorflow.python.framework import dtypes
@@ -343,5 +344,96 @@ class BucketTest(test.TestCase):
       self.assertEqual(batches, 15)
 
 
+class BucketBySequenceLengthTest(test.TestCase):
+
+  def _dataset(self, lengths):
+    """Returns a dataset of `(tokens, length)` with `tokens` filled with 1s."""
+    return dataset_ops.Dataset.from_tensor_slices(
+        np.array(lengths, dtype=np.int32)).map(
+            lambda n: (array_ops.ones([n], dtype=dtypes.int32), n))
+
+  def _readAll(self, dataset):
+    get_next = dataset.make_one_shot_iterator().get_next()
+    batches = []
+    with self.test_session() as sess:
+      with self.assertRaises(errors.OutOfRangeError):
+        while True:
+          batches.append(sess.run(get_next))
+    return batches
+
+  def testOptimalBoundaries(self):
+    # pylint: disable=protected-access
+    self.assertEqual([3, 11],
+                     bucketing_ops._optimal_boundaries([1, 10, 1, 2], 2))
+    self.assertEqual([6], bucketing_ops._optimal_boundaries([5, 5, 5], 4))
+    self.assertEqual([2, 3, 4],
+                     bucketing_ops._optimal_boundaries([3, 1, 2, 3], 3))
+    # pylint: enable=protected-access
+
+  def testFixedBatchSize(self):
+    lengths = [1, 9, 2, 5, 3, 10, 6, 4, 7, 8]
+    batches = self._readAll(self._dataset(lengths).apply(
+        bucketing_ops.bucket_by_sequence_length(
+            lambda tokens, length: length, bucket_boundaries=[4, 8],
+            batch_size=2)))
+
+    seen = []
+    for tokens, batch_lengths in batches:
+      self.assertLessEqual(len(batch_lengths), 2)
+      self.assertEqual(1, len(set(np.searchsorted([4, 8], batch_lengths,
+                                                  side="right"))))
+      # Each batch is padded to its longest element.
+      self.assertEqual(max(batch_lengths), tokens.shape[1])
+      self.assertAllEqual(batch_lengths, np.sum(tokens, axis=1))
+      seen.extend(batch_lengths)
+    self.assertEqual(sorted(lengths), sorted(seen))
+
+  def testTokenBudget(self):
+    lengths = list(range(1, 9)) * 4
+    batches = self._readAll(self._dataset(lengths).apply(
+        bucketing_ops.bucket_by_sequence_length(
+            lambda tokens, length: length, bucket_boundaries=[5, 9],
+            max_tokens=16)))
+    # The buckets hold lengths up to 4 and 8, in batches of 4 and 2.
+    for tokens, batch_lengths in batches:
+      self.assertLessEqual(tokens.size, 16)
+      self.assertEqual(4 if max(batch_lengths) < 5 else 2,
+                       len(batch_lengths))
+    self.assertEqual(len(lengths), sum(len(b[1]) for b in batches))
+
+  def testDerivedBoundariesAndStats(self):
+    lengths = [1, 1, 2, 10] * 5
+    stats = bucketing_ops.BucketingStats()
+    dataset = self._dataset(lengths).apply(
+        bucketing_ops.bucket_by_sequence_length(
+            lambda tokens, length: length, batch_size=5, num_buckets=2,
+            stats=stats))
+    self.assertEqual(["[0, 3)", "[3, 11)", "[11, inf)", "total"],
+                     list(stats.stats()))
+    self._readAll(dataset)
+
+    result = stats.stats()
+    self.assertEqual({"batches": 3, "elements": 15, "tokens": 20,
+                      "padded_tokens": 30, "padding_efficiency": 20. / 30},
+                     result["[0, 3)"])
+    self.assertEqual(1.0, result["[3, 11)"]["padding_efficiency"])
+    self.assertEqual(0, result["[11, inf)"]["elements"])
+    self.assertEqual(20, result["total"]["elements"])
+    self.assertEqual(sum(lengths), result["total"]["tokens"])
+
+  def testInvalidArguments(self):
+    with self.assertRaisesRegexp(ValueError, "batch_size or max_tokens"):
+      bucketing_ops.bucket_by_sequence_length(lambda x: x)
+    with self.assertRaisesRegexp(ValueError, "batch_size or max_tokens"):
+      bucketing_ops.bucket_by_sequence_length(lambda x: x, batch_size=2,
+                                              max_tokens=10)
+    with self.assertRaisesRegexp(ValueError, "sorted list"):
+      bucketing_ops.bucket_by_sequence_length(
+          lambda x: x, bucket_boundaries=[8, 4], batch_size=2)
+    with self.assertRaisesRegexp(ValueError, "empty dataset"):
+      self._dataset([]).apply(bucketing_ops.bucket_by_sequence_length(
+          lambda tokens, length: length, batch_size=2))
+
+
 if __name__ == "__main__":
   test.main()
@@ -0,0 +1,209 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for the experimental columnar file format."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import time
+
+import numpy as np
+
+from tensorflow.contrib.data.python.ops import columnar_ops
+from tensorflow.contrib.data.python.ops import dataset_ops
+from tensorflow.core.example import example_pb2
+from tensorflow.core.example import feature_pb2
+from tensorflow.python.client import session
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import errors
+from tensorflow.python.framework import ops
+from tensorflow.python.lib.io import tf_record
+from tensorflow.python.ops import parsing_ops
+from tensorflow.python.platform import test
+
+
+def _write_examples(filename, num_examples, num_features):
+  """Writes `tf.train.Example`s with features `f0`, `f1`, ... to `filename`."""
+  with tf_record.TFRecordWriter(filename) as writer:
+    for i in range(num_examples):
+      features = {
+          "f%d" % j: feature_pb2.Feature(int64_list=feature_pb2.Int64List(
+              value=[i * num_features + j]))
+          for j in range(num_features)}
+      features["name"] = feature_pb2.Feature(bytes_list=feature_pb2.BytesList(
+          value=[b"example %d" % i]))
+      example = example_pb2.Example(
+          features=feature_pb2.Features(feature=features))
+      writer.write(example.SerializeToString())
+
+
+class ColumnarDatasetTest(test.TestCase):
+
+  def setUp(self):
+    super(ColumnarDatasetTest, self).setUp()
+    self._filename = os.path.join(self.get_temp_dir(), "%s.tfcol" % self.id())
+    with columnar_ops.ColumnarWriter(self._filename) as writer:
+      # Three row groups, with ids [0, 10), [10, 20) and [20, 25).
+      for start, stop in [(0, 10), (10, 20), (20, 25)]:
+        ids = np.arange(start, stop, dtype=np.int64)
+        writer.write_row_group({
+            "id": ids,
+            "score": ids.astype(np.float32) / 2,
+            "vector": np.stack([ids, -ids], axis=1).astype(np.int32),
+            "name": np.array([b"row %d" % i for i in ids], dtype=object),
+        })
+
+  def _readAll(self, dataset):
+    get_next = dataset.make_one_shot_iterator().get_next()
+    batches = []
+    with self.test_session() as sess:
+      while True:
+        try:
+          batches.append(sess.run(get_next))
+        except errors.OutOfRangeError:
+          return batches
+
+  def testReadAllColumns(self):
+    dataset = columnar_ops.ColumnarDataset(self._filename, batch_size=8)
+    self.assertEqual(
+        {"id": dtypes.int64, "name": dtypes.string, "score": dtypes.float32,
+         "vector": dtypes.int32}, dataset.output_types)
+    self.assertEqual([None, 2], dataset.output_shapes["vector"].as_list())
+
+    batches = self._readAll(dataset)
+    # Batches span row groups, and only the last one is smaller.
+    self.assertEqual([8, 8, 8, 1], [len(b["id"]) for b in batches])
+    ids = np.concatenate([b["id"] for b in batches])
+    self.assertAllEqual(np.arange(25), ids)
+    self.assertAllEqual(np.arange(25, dtype=np.float32) / 2,
+                        np.concatenate([b["score"] for b in batches]))
+    self.assertAllEqual(np.stack([ids, -ids], axis=1),
+                        np.concatenate([b["vector"] for b in batches]))
+    self.assertEqual([b"row %d" % i for i in range(25)],
+                     list(np.concatenate([b["name"] for b in batches])))
+
+  def testColumnProjection(self):
+    dataset = columnar_ops.ColumnarDataset(
+        [self._filename, self._filename], columns=["name"], batch_size=100)
+    self.assertEqual({"name": dtypes.string}, dataset.output_types)
+    batches = self._readAll(dataset)
+    self.assertEqual(1, len(batches))
+    self.assertEqual([b"row %d" % i for i in range(25)] * 2,
+                     list(batches[0]["name"]))
+
+  def testFilters(self):
+    # pylint: disable=protected-access
+    columnar_file = columnar_ops._ColumnarFile(self._filename)
+    columnar_file.close()
+    self.assertEqual([False, True, True], [
+        columnar_ops._may_match(row_group, [("id", ">=", 12)])
+        for row_group in columnar_file.row_groups])
+    # pylint: enable=protected-access
+
+    dataset = columnar_ops.ColumnarDataset(
+        self._filename, columns=["score"],
+        filters=[("id", ">=", 12), ("id", "!=", 20)], batch_size=100)
+    batches = self._readAll(dataset)
+    self.assertAllEqual(
+        np.array([i for i in range(12, 25) if i != 20], dtype=np.float32) / 2,
+        batches[0]["score"])
+
+  def testInvalidFilters(self):
+    with self.assertRaisesRegexp(ValueError, "Invalid comparison"):
+      columnar_ops.ColumnarDataset(self._filename, filters=[("id", "~", 1)])
+    with self.assertRaisesRegexp(ValueError, "numeric columns of scalars"):
+      columnar_ops.ColumnarDataset(self._filename,
+                                   filters=[("vector", "==", 1)])
+    with self.assertRaisesRegexp(ValueError, "no column named"):
+      columnar_ops.ColumnarDataset(self._filename, columns=["missing"])
+
+  def testMismatchedRowGroup(self):
+    filename = os.path.join(self.get_temp_dir(), "mismatched.tfcol")
+    with columnar_ops.ColumnarWriter(filename) as writer:
+      writer.write_row_group({"a": np.arange(3)})
+      with self.assertRaisesRegexp(ValueError, "but the file has columns"):
+        writer.write_row_group({"b": np.arange(3)})
+      with self.assertRaisesRegexp(ValueError, "same number of rows"):
+        writer.write_row_group({"a": np.array(3)})
+
+  def testConvertTFRecord(self):
+    tfrecord_filename = os.path.join(self.get_temp_dir(), "examples.tfrecord")
+    _write_examples(tfrecord_filename, num_examples=30, num_features=4)
+    columnar_filename = os.path.join(self.get_temp_dir(), "examples.tfcol")
+    features = {"f1": parsing_ops.FixedLenFeature([], dtypes.int64),
+                "name": parsing_ops.FixedLenFeature([], dtypes.string)}
+    self.assertEqual(30, columnar_ops.convert_tfrecord_to_columnar(
+        tfrecord_filename, columnar_filename, features, rows_per_group=8))
+
+    batches = self._readAll(columnar_ops.ColumnarDataset(
+        columnar_filename, batch_size=30))
+    self.assertAllEqual([4 * i + 1 for i in range(30)], batches[0]["f1"])
+    self.assertEqual([b"example %d" % i for i in range(30)],
+                     list(batches[0]["name"]))
+
+    with self.assertRaisesRegexp(ValueError, "Only FixedLenFeature"):
+      columnar_ops.convert_tfrecord_to_columnar(
+          tfrecord_filename, columnar_filename,
+          {"f1": parsing_ops.VarLenFeature(dtypes.int64)})
+
+
+class ColumnarDatasetBenchmark(test.Benchmark):
+  """Compares reading 5 of 300 features from TFRecord and columnar files."""
+
+  def _benchmark(self, dataset, name):
+    with ops.Graph().as_default():
+      get_next = dataset().make_one_shot_iterator().get_next()
+      with session.Session() as sess:
+        sess.run(get_next)
+        start = time.time()
+        num_batches = 0
+        while True:
+          try:
+            sess.run(get_next)
+            num_batches += 1
+          except errors.OutOfRangeError:
+            break
+        wall_time = time.time() - start
+    print("%s: %.2f batches/s" % (name, num_batches / wall_time))
+    self.report_benchmark(iters=num_batches,
+                          wall_time=wall_time / num_batches, name=name)
+
+  def benchmarkProjection(self):
+    temp_dir = test.get_temp_dir()
+    tfrecord_filename = os.path.join(temp_dir, "wide.tfrecord")
+    columnar_filename = os.path.join(temp_dir, "wide.tfcol")
+    num_features = 300
+    _write_examples(tfrecord_filename, num_examples=20000,
+                    num_features=num_features)
+    columnar_ops.convert_tfrecord_to_columnar(
+        tfrecord_filename, columnar_filename,
+        {"f%d" % j: parsing_ops.FixedLenFeature([], dtypes.int64)
+         for j in range(num_features)})
+    selected = {"f%d" % j: parsing_ops.FixedLenFeature([], dtypes.int64)
+                for j in range(5)}
+
+    self._benchmark(
+        lambda: dataset_ops.TFRecordDataset(tfrecord_filename).batch(256).map(
+            lambda x: parsing_ops.parse_example(x, selected)),
+        "benchmark_tfrecord_parse_example_5_of_300")
+    self._benchmark(
+        lambda: columnar_ops.ColumnarDataset(
+            columnar_filename, columns=sorted(selected), batch_size=256),
+        "benchmark_columnar_5_of_300")
+
+
+if __name__ == "__main__":
+  test.main()
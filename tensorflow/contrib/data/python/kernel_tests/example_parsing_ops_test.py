@@ -0,0 +1,167 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for bulk parsing of examples into NumPy arrays."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+import numpy as np
+
+from tensorflow.contrib.data.python.ops import example_parsing_ops
+from tensorflow.core.example import example_pb2
+from tensorflow.core.example import feature_pb2
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import errors
+from tensorflow.python.ops import parsing_ops
+from tensorflow.python.platform import test
+
+
+def _example(label, tokens, sparse_index, sparse_value):
+  """Returns a serialized `tf.train.Example`."""
+  feature = {
+      "label": feature_pb2.Feature(
+          int64_list=feature_pb2.Int64List(value=[label])),
+      "tokens": feature_pb2.Feature(
+          bytes_list=feature_pb2.BytesList(value=tokens)),
+      "index": feature_pb2.Feature(
+          int64_list=feature_pb2.Int64List(value=sparse_index)),
+      "value": feature_pb2.Feature(
+          float_list=feature_pb2.FloatList(value=sparse_value)),
+  }
+  return example_pb2.Example(features=feature_pb2.Features(
+      feature=feature)).SerializeToString()
+
+
+_FEATURES = {
+    "label": parsing_ops.FixedLenFeature([], dtypes.int64),
+    "tokens": parsing_ops.VarLenFeature(dtypes.string),
+    "sparse": parsing_ops.SparseFeature("index", "value", dtypes.float32, 10),
+}
+
+
+class ParseExamplesToNumpyTest(test.TestCase):
+
+  def setUp(self):
+    super(ParseExamplesToNumpyTest, self).setUp()
+    self._records = [
+        _example(0, [b"a", b"b"], [1, 3], [0.5, 1.5]),
+        _example(1, [], [], []),
+        _example(2, [b"c", b"d", b"e"], [9], [2.5]),
+    ]
+
+  def _assertParsed(self, parsed):
+    self.assertAllEqual([0, 1, 2], parsed["label"])
+
+    tokens = parsed["tokens"]
+    self.assertIsInstance(tokens, example_parsing_ops.SparseColumn)
+    self.assertAllEqual([b"a", b"b", b"c", b"d", b"e"], tokens.values)
+    self.assertAllEqual([[0], [1], [0], [1], [2]], tokens.indices)
+    self.assertAllEqual([0, 2, 2, 5], tokens.row_splits)
+    self.assertAllEqual([3, 3], tokens.dense_shape)
+
+    sparse = parsed["sparse"]
+    self.assertAllEqual([0.5, 1.5, 2.5], sparse.values)
+    self.assertAllEqual([[1], [3], [9]], sparse.indices)
+    self.assertAllEqual([0, 2, 2, 3], sparse.row_splits)
+    self.assertAllEqual([3, 10], sparse.dense_shape)
+
+  def testParse(self):
+    self._assertParsed(example_parsing_ops.parse_examples_to_numpy(
+        self._records, _FEATURES))
+
+  def testParseIteratorInBatches(self):
+    # The batches of 2 and 1 records are concatenated.
+    self._assertParsed(example_parsing_ops.parse_examples_to_numpy(
+        iter(self._records), _FEATURES, batch_size=2))
+    self._assertParsed(example_parsing_ops.parse_examples_to_numpy(
+        iter(self._records), _FEATURES, batch_size=3))
+
+  def testParseSequenceFeatureInBatches(self):
+    # Each batch is only padded to its own longest sequence, so the batches
+    # must be padded to a common length when they are concatenated.
+    features = {
+        "index": parsing_ops.FixedLenSequenceFeature(
+            [], dtypes.int64, allow_missing=True, default_value=-1),
+        "value": parsing_ops.FixedLenSequenceFeature(
+            [], dtypes.float32, allow_missing=True),
+    }
+    for batch_size in [1, 2, 3]:
+      parsed = example_parsing_ops.parse_examples_to_numpy(
+          self._records, features, batch_size=batch_size)
+      self.assertAllEqual([[1, 3], [-1, -1], [9, -1]], parsed["index"])
+      self.assertAllEqual([[0.5, 1.5], [0.0, 0.0], [2.5, 0.0]],
+                          parsed["value"])
+
+  def testParseEmpty(self):
+    parsed = example_parsing_ops.parse_examples_to_numpy([], _FEATURES)
+    self.assertEqual((0,), parsed["label"].shape)
+    self.assertAllEqual([0], parsed["tokens"].row_splits)
+
+  def testParserIsCached(self):
+    # pylint: disable=protected-access
+    parser = example_parsing_ops._get_parser(_FEATURES)
+    self.assertIs(parser, example_parsing_ops._get_parser(dict(_FEATURES)))
+
+    # Large default values that numpy abbreviates in the same way are still
+    # told apart.
+    defaults = np.zeros([2000], dtype=np.float32)
+    other_defaults = defaults.copy()
+    other_defaults[1000] = 1.0
+    self.assertEqual(repr(defaults), repr(other_defaults))
+    parser = example_parsing_ops._get_parser(
+        {"x": parsing_ops.FixedLenFeature([2000], dtypes.float32, defaults)})
+    other_parser = example_parsing_ops._get_parser(
+        {"x": parsing_ops.FixedLenFeature([2000], dtypes.float32,
+                                          other_defaults)})
+    self.assertIsNot(parser, other_parser)
+    # pylint: enable=protected-access
+
+  def testInvalidRecord(self):
+    with self.assertRaises(errors.InvalidArgumentError):
+      example_parsing_ops.parse_examples_to_numpy([b"not an example"],
+                                                  _FEATURES)
+
+
+class ParseExamplesToNumpyBenchmark(test.Benchmark):
+  """Compares bulk parsing with parsing each record in Python."""
+
+  def benchmarkParse(self):
+    records = [_example(i, [b"token"] * (i % 10), [i % 10], [1.0])
+               for i in range(20000)]
+    example_parsing_ops.parse_examples_to_numpy(records[:10], _FEATURES)
+
+    start = time.time()
+    for record in records:
+      example = example_pb2.Example.FromString(record)
+      np.array(example.features.feature["label"].int64_list.value)
+      np.array(example.features.feature["tokens"].bytes_list.value)
+    from_string_time = time.time() - start
+
+    start = time.time()
+    example_parsing_ops.parse_examples_to_numpy(records, _FEATURES)
+    bulk_time = time.time() - start
+
+    for name, wall_time in [("from_string", from_string_time),
+                            ("parse_examples_to_numpy", bulk_time)]:
+      print("%s: %.0f records/s" % (name, len(records) / wall_time))
+      self.report_benchmark(iters=len(records),
+                            wall_time=wall_time / len(records),
+                            name="benchmark_%s" % name)
+
+
+if __name__ == "__main__":
+  test.main()
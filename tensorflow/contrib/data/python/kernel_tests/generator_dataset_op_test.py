@@ -0,0 +1,324 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for the experimental multi-process generator dataset."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import multiprocessing
+import time
+
+import numpy as np
+
+from tensorflow.contrib.data.python.ops import dataset_ops
+from tensorflow.contrib.data.python.ops import generator_ops
+from tensorflow.python.client import session
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import errors
+from tensorflow.python.framework import ops
+from tensorflow.python.framework import tensor_shape
+from tensorflow.python.platform import test
+
+
+# The generators are defined at module scope so that they can be pickled on
+# platforms that do not fork worker processes.
+
+
+def _range_shard(shard_index, num_shards):
+  for i in range(shard_index, 20, num_shards):
+    yield (i, np.array([i, i * 2, i * 3], dtype=np.int64))
+
+
+def _ragged_shard(shard_index, num_shards):
+  for i in range(shard_index, 10, num_shards):
+    yield [1] * (i + 1)
+
+
+def _string_shard(shard_index, num_shards):
+  for i in range(shard_index, 10, num_shards):
+    yield ("elem_%d" % i, i)
+
+
+def _slow_first_shard(shard_index, num_shards):
+  for i in range(shard_index, 20, num_shards):
+    if shard_index == 0:
+      time.sleep(0.05)
+    yield i
+
+
+def _wrong_type_shard(unused_shard_index, unused_num_shards):
+  yield 1.0
+
+
+def _wrong_shape_shard(unused_shard_index, unused_num_shards):
+  yield [1, 2]
+
+
+def _failing_shard(shard_index, unused_num_shards):
+  yield shard_index
+  raise ValueError("Generator failed.")
+
+
+def _decode_shard(shard_index, num_shards, num_elements=10000):
+  """A generator that spends its time in Python, like a decoder would."""
+  for i in range(shard_index, num_elements, num_shards):
+    value = 0
+    for j in range(200):
+      value += (i * j) % 7
+    yield np.full([16], value, dtype=np.float32)
+
+
+class ParallelFromGeneratorTest(test.TestCase):
+
+  def _fullyDefinedRangeDataset(self, **kwargs):
+    return generator_ops.parallel_from_generator(
+        _range_shard, (dtypes.int64, dtypes.int64),
+        (tensor_shape.scalar(), tensor_shape.vector(3)), **kwargs)
+
+  def testOrdered(self):
+    iterator = self._fullyDefinedRangeDataset(
+        num_workers=2, batch_size=3).make_initializable_iterator()
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+
+    # Shard 0 yields even values and shard 1 yields odd values, and batches of
+    # 3 elements are taken from each in turn.
+    expected = [0, 2, 4, 1, 3, 5, 6, 8, 10, 7, 9, 11, 12, 14, 16, 13, 15, 17,
+                18, 19]
+    with self.test_session() as sess:
+      for _ in range(2):  # Run twice to test reinitialization.
+        sess.run(init_op)
+        for i in expected:
+          index, values = sess.run(get_next)
+          self.assertEqual(i, index)
+          self.assertAllEqual([i, i * 2, i * 3], values)
+        with self.assertRaises(errors.OutOfRangeError):
+          sess.run(get_next)
+
+  def testSloppy(self):
+    iterator = self._fullyDefinedRangeDataset(
+        num_workers=3, batch_size=2, sloppy=True).make_initializable_iterator()
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+
+    with self.test_session() as sess:
+      sess.run(init_op)
+      actual = []
+      for _ in range(20):
+        index, values = sess.run(get_next)
+        self.assertAllEqual([index, index * 2, index * 3], values)
+        actual.append(index)
+      with self.assertRaises(errors.OutOfRangeError):
+        sess.run(get_next)
+    self.assertEqual(list(range(20)), sorted(actual))
+
+  def testWithoutSharedMemory(self):
+    # Batches that do not fit in shared memory are pickled instead.
+    iterator = self._fullyDefinedRangeDataset(
+        num_workers=2, batch_size=4,
+        shared_memory_bytes=8).make_initializable_iterator()
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+
+    with self.test_session() as sess:
+      sess.run(init_op)
+      actual = [sess.run(get_next)[0] for _ in range(20)]
+      with self.assertRaises(errors.OutOfRangeError):
+        sess.run(get_next)
+    self.assertEqual(list(range(20)), sorted(actual))
+
+  def testRaggedElements(self):
+    iterator = generator_ops.parallel_from_generator(
+        _ragged_shard, dtypes.int64, tensor_shape.vector(None), num_workers=1,
+        batch_size=4).make_initializable_iterator()
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+    self.assertEqual([None], get_next.shape.as_list())
+
+    with self.test_session() as sess:
+      sess.run(init_op)
+      for i in range(10):
+        self.assertAllEqual([1] * (i + 1), sess.run(get_next))
+      with self.assertRaises(errors.OutOfRangeError):
+        sess.run(get_next)
+
+  def testStrings(self):
+    iterator = generator_ops.parallel_from_generator(
+        _string_shard, (dtypes.string, dtypes.int64),
+        (tensor_shape.scalar(), tensor_shape.scalar()), num_workers=2,
+        batch_size=2).make_initializable_iterator()
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+
+    with self.test_session() as sess:
+      sess.run(init_op)
+      actual = {}
+      for _ in range(10):
+        name, index = sess.run(get_next)
+        actual[index] = name
+      with self.assertRaises(errors.OutOfRangeError):
+        sess.run(get_next)
+    self.assertEqual({i: b"elem_%d" % i for i in range(10)}, actual)
+
+  def testRepeated(self):
+    iterator = self._fullyDefinedRangeDataset(
+        num_workers=2, batch_size=5).repeat(3).make_initializable_iterator()
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+
+    with self.test_session() as sess:
+      sess.run(init_op)
+      actual = [sess.run(get_next)[0] for _ in range(60)]
+      with self.assertRaises(errors.OutOfRangeError):
+        sess.run(get_next)
+    self.assertEqual(sorted(list(range(20)) * 3), sorted(actual))
+
+  def testTakeAndReinitialize(self):
+    # Each initialization starts a traversal that is not run to exhaustion, so
+    # its workers are only stopped once `max_live_iterators` is exceeded.
+    iterator = self._fullyDefinedRangeDataset(
+        num_workers=2, batch_size=2,
+        max_live_iterators=2).take(3).make_initializable_iterator()
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+
+    num_processes_before = len(multiprocessing.active_children())
+    with self.test_session() as sess:
+      for _ in range(5):
+        sess.run(init_op)
+        self.assertEqual([0, 2, 1], [sess.run(get_next)[0] for _ in range(3)])
+        with self.assertRaises(errors.OutOfRangeError):
+          sess.run(get_next)
+        self.assertLessEqual(
+            len(multiprocessing.active_children()) - num_processes_before, 4)
+
+  def testPrefetchIsBoundedBehindSlowShard(self):
+    # In ordered mode, the consumer waits for the slow shard while batches of
+    # the fast shard arrive; they must not be buffered beyond
+    # `prefetch_batches`.
+    # pylint: disable=protected-access
+    iterator = generator_ops._ShardedGeneratorIterator(
+        _slow_first_shard, num_workers=2, batch_size=1, sloppy=False,
+        structure=None, expected_dtypes=[np.int64], expected_dims=[[]],
+        prefetch_batches=2, shared_memory_bytes=64)
+    receive = iterator._receive
+    max_pending = []
+
+    def checked_receive():
+      receive()
+      max_pending.append(max(len(pending) for pending in iterator._pending))
+
+    iterator._receive = checked_receive
+    try:
+      actual = []
+      while True:
+        try:
+          actual.append(int(iterator.next_batch()[0][0]))
+        except StopIteration:
+          break
+    finally:
+      iterator.close()
+    # pylint: enable=protected-access
+    self.assertEqual(list(range(20)), actual)
+    self.assertLessEqual(max(max_pending), 2)
+
+  def testWrongType(self):
+    iterator = generator_ops.parallel_from_generator(
+        _wrong_type_shard, dtypes.int64, num_workers=1,
+        batch_size=1).make_initializable_iterator()
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+
+    with self.test_session() as sess:
+      sess.run(init_op)
+      with self.assertRaisesOpError(r"element of type .*int64.* was expected"):
+        sess.run(get_next)
+
+  def testWrongShape(self):
+    iterator = generator_ops.parallel_from_generator(
+        _wrong_shape_shard, dtypes.int64, tensor_shape.vector(3),
+        num_workers=1, batch_size=1).make_initializable_iterator()
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+
+    with self.test_session() as sess:
+      sess.run(init_op)
+      with self.assertRaisesOpError(r"element of shape \(3,\) was expected"):
+        sess.run(get_next)
+
+  def testGeneratorError(self):
+    iterator = generator_ops.parallel_from_generator(
+        _failing_shard, dtypes.int64, tensor_shape.scalar(), num_workers=1,
+        batch_size=1).make_initializable_iterator()
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+
+    with self.test_session() as sess:
+      sess.run(init_op)
+      self.assertEqual(0, sess.run(get_next))
+      with self.assertRaisesOpError("Generator failed."):
+        sess.run(get_next)
+
+  def testInvalidArguments(self):
+    with self.assertRaises(TypeError):
+      generator_ops.parallel_from_generator(None, dtypes.int64)
+    with self.assertRaises(ValueError):
+      generator_ops.parallel_from_generator(
+          _range_shard, dtypes.int64, num_workers=0)
+    with self.assertRaises(ValueError):
+      generator_ops.parallel_from_generator(
+          _range_shard, dtypes.int64, batch_size=0)
+    with self.assertRaises(ValueError):
+      generator_ops.parallel_from_generator(
+          _range_shard, dtypes.int64, max_live_iterators=0)
+
+
+class ParallelFromGeneratorBenchmark(test.Benchmark):
+  """Compares `parallel_from_generator()` with `Dataset.from_generator()`."""
+
+  def _benchmarkDataset(self, name, dataset, num_elements=10000):
+    with ops.Graph().as_default():
+      get_next = dataset.make_one_shot_iterator().get_next()
+      with session.Session() as sess:
+        sess.run(get_next)  # Warm up.
+        start = time.time()
+        for _ in range(num_elements - 1):
+          sess.run(get_next.op)
+        wall_time = time.time() - start
+    print("%s: %.2f elements/s" % (name, (num_elements - 1) / wall_time))
+    self.report_benchmark(
+        iters=num_elements - 1, wall_time=wall_time / (num_elements - 1),
+        name=name)
+
+  def benchmarkFromGenerator(self):
+    self._benchmarkDataset(
+        "benchmark_from_generator",
+        dataset_ops.Dataset.from_generator(
+            lambda: _decode_shard(0, 1), dtypes.float32,
+            tensor_shape.vector(16)))
+
+  def benchmarkParallelFromGenerator(self):
+    for num_workers in [1, 2, 4, 8]:
+      for sloppy in [False, True]:
+        self._benchmarkDataset(
+            "benchmark_parallel_from_generator_%d_workers%s" % (
+                num_workers, "_sloppy" if sloppy else ""),
+            generator_ops.parallel_from_generator(
+                _decode_shard, dtypes.float32, tensor_shape.vector(16),
+                num_workers=num_workers, batch_size=64, sloppy=sloppy))
+
+
+if __name__ == "__main__":
+  test.main()
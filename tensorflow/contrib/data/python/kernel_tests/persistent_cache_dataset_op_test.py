@@ -0,0 +1,191 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for the experimental persistent cache transformation."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+
+from tensorflow.contrib.data.python.ops import cache_ops
+from tensorflow.contrib.data.python.ops import dataset_ops
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import errors
+from tensorflow.python.framework import ops
+from tensorflow.python.ops import array_ops
+from tensorflow.python.ops import math_ops
+from tensorflow.python.ops import script_ops
+from tensorflow.python.platform import test
+
+
+class PersistentCacheDatasetTest(test.TestCase):
+
+  def setUp(self):
+    self.filename = os.path.join(self.get_temp_dir(), "cache_%s" % self.id())
+    self.computed = []
+
+  def _countingDataset(self, num_elements=10):
+    """Returns a dataset of `(i, ["elem"] * i)` that records computed `i`s."""
+
+    def record(x):
+      self.computed.append(x)
+      return x
+
+    def make_element(x):
+      x = array_ops.reshape(script_ops.py_func(record, [x], dtypes.int64), [])
+      return x, array_ops.fill(
+          array_ops.reshape(math_ops.to_int32(x), [1]), "elem")
+
+    return dataset_ops.Dataset.range(num_elements).map(make_element)
+
+  def _readAll(self, sess, init_op, get_next):
+    sess.run(init_op)
+    elements = []
+    while True:
+      try:
+        elements.append(sess.run(get_next))
+      except errors.OutOfRangeError:
+        return elements
+
+  def _readMeta(self):
+    with open(self.filename + ".meta") as f:
+      return json.load(f)
+
+  def testWriteThenRead(self):
+    iterator = self._countingDataset().apply(
+        cache_ops.persistent_cache(self.filename)).make_initializable_iterator()
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+
+    with self.test_session() as sess:
+      for _ in range(3):
+        elements = self._readAll(sess, init_op, get_next)
+        self.assertEqual(list(range(10)), [x for x, _ in elements])
+        for x, strings in elements:
+          self.assertAllEqual([b"elem"] * x, strings)
+        # Only the first pass computes the elements.
+        self.assertEqual(list(range(10)), self.computed)
+    self.assertEqual({"complete": True, "num_elements": 10},
+                     {k: v for k, v in self._readMeta().items()
+                      if k != "fingerprint"})
+
+  def testReuseAcrossGraphs(self):
+    for _ in range(2):
+      with ops.Graph().as_default():
+        iterator = self._countingDataset().apply(
+            cache_ops.persistent_cache(
+                self.filename)).make_initializable_iterator()
+        with self.test_session() as sess:
+          elements = self._readAll(sess, iterator.initializer,
+                                   iterator.get_next())
+          self.assertEqual(list(range(10)), [x for x, _ in elements])
+    self.assertEqual(list(range(10)), self.computed)
+
+  def testResumeAfterInterruption(self):
+    iterator = self._countingDataset().apply(
+        cache_ops.persistent_cache(self.filename)).make_initializable_iterator()
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+
+    with self.test_session() as sess:
+      sess.run(init_op)
+      for i in range(4):
+        self.assertEqual(i, sess.run(get_next)[0])
+      self.assertFalse(self._readMeta()["complete"])
+
+      # The next pass reads the 4 cached elements and caches the rest.
+      elements = self._readAll(sess, init_op, get_next)
+      self.assertEqual(list(range(10)), [x for x, _ in elements])
+      self.assertTrue(self._readMeta()["complete"])
+
+      del self.computed[:]
+      elements = self._readAll(sess, init_op, get_next)
+      self.assertEqual(list(range(10)), [x for x, _ in elements])
+      self.assertEqual([], self.computed)
+
+  def testStaleCacheIsRewritten(self):
+    with ops.Graph().as_default():
+      iterator = self._countingDataset(num_elements=5).apply(
+          cache_ops.persistent_cache(
+              self.filename)).make_initializable_iterator()
+      with self.test_session() as sess:
+        self._readAll(sess, iterator.initializer, iterator.get_next())
+
+    with ops.Graph().as_default():
+      iterator = self._countingDataset(num_elements=7).apply(
+          cache_ops.persistent_cache(
+              self.filename)).make_initializable_iterator()
+      with self.test_session() as sess:
+        elements = self._readAll(sess, iterator.initializer,
+                                 iterator.get_next())
+    self.assertEqual(list(range(7)), [x for x, _ in elements])
+    self.assertEqual(list(range(5)) + list(range(7)), self.computed)
+    self.assertEqual(7, self._readMeta()["num_elements"])
+
+  def testShuffle(self):
+    iterator = self._countingDataset(num_elements=50).apply(
+        cache_ops.persistent_cache(
+            self.filename, shuffle=True, seed=37,
+            num_parallel_reads=4)).make_initializable_iterator()
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+
+    with self.test_session() as sess:
+      # The first pass computes the elements in order.
+      elements = self._readAll(sess, init_op, get_next)
+      self.assertEqual(list(range(50)), [x for x, _ in elements])
+
+      first = [x for x, _ in self._readAll(sess, init_op, get_next)]
+      second = [x for x, _ in self._readAll(sess, init_op, get_next)]
+    self.assertEqual(list(range(50)), sorted(first))
+    self.assertEqual(list(range(50)), sorted(second))
+    self.assertNotEqual(list(range(50)), first)
+    self.assertNotEqual(first, second)
+
+  def testLockedByAnotherProcess(self):
+    # The parent of this process is alive, so its lock is not stale.
+    with open(self.filename + ".lock", "w") as f:
+      f.write(str(os.getppid()))
+
+    iterator = self._countingDataset().apply(
+        cache_ops.persistent_cache(self.filename)).make_initializable_iterator()
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+
+    with self.test_session() as sess:
+      for _ in range(2):
+        elements = self._readAll(sess, init_op, get_next)
+        self.assertEqual(list(range(10)), [x for x, _ in elements])
+    self.assertEqual(list(range(10)) * 2, self.computed)
+    self.assertFalse(os.path.exists(self.filename + ".meta"))
+
+  def testStaleLockIsReplaced(self):
+    # This is larger than the largest process ID on Linux, so the lock is
+    # always stale.
+    with open(self.filename + ".lock", "w") as f:
+      f.write(str(2**22 + 1))
+
+    iterator = self._countingDataset().apply(
+        cache_ops.persistent_cache(self.filename)).make_initializable_iterator()
+
+    with self.test_session() as sess:
+      self._readAll(sess, iterator.initializer, iterator.get_next())
+    self.assertTrue(self._readMeta()["complete"])
+    self.assertFalse(os.path.exists(self.filename + ".lock"))
+
+
+if __name__ == "__main__":
+  test.main()
@@ -0,0 +1,127 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for the experimental input pipeline profiler."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import time
+
+from tensorflow.contrib.data.python.ops import dataset_ops
+from tensorflow.contrib.data.python.ops import profile_ops
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import errors
+from tensorflow.python.framework import ops
+from tensorflow.python.ops import array_ops
+from tensorflow.python.ops import script_ops
+from tensorflow.python.platform import test
+
+
+def _slow_identity(x):
+  time.sleep(0.01)
+  return x
+
+
+class PipelineProfilerTest(test.TestCase):
+
+  def _readAll(self, sess, get_next):
+    elements = []
+    while True:
+      try:
+        elements.append(sess.run(get_next))
+      except errors.OutOfRangeError:
+        return elements
+
+  def testStageStatistics(self):
+    profiler = profile_ops.PipelineProfiler()
+    dataset = profiler.instrument(
+        dataset_ops.Dataset.range(20)
+        .map(lambda x: x * 2)
+        .prefetch(4)
+        .batch(5))
+    get_next = dataset.make_one_shot_iterator().get_next()
+
+    with self.test_session() as sess:
+      elements = self._readAll(sess, get_next)
+    self.assertAllEqual([[2 * x for x in range(i, i + 5)]
+                         for i in range(0, 20, 5)], elements)
+
+    stats = profiler.stats()
+    self.assertEqual(["0_RangeDataset", "1_MapDataset", "2_PrefetchDataset",
+                      "3_BatchDataset"], list(stats))
+    self.assertEqual([20, 20, 20, 4], [s["elements"] for s in stats.values()])
+    self.assertEqual(8, stats["1_MapDataset"]["mean_element_bytes"])
+    self.assertEqual(40, stats["3_BatchDataset"]["mean_element_bytes"])
+    self.assertIn("mean_buffered_elements", stats["2_PrefetchDataset"])
+    self.assertLessEqual(stats["2_PrefetchDataset"]["max_buffered_elements"],
+                         5)
+    self.assertNotIn("mean_buffered_elements", stats["1_MapDataset"])
+    self.assertAlmostEqual(
+        1.0, sum(s["self_time_fraction"] for s in stats.values()))
+
+  def testBottleneck(self):
+    profiler = profile_ops.PipelineProfiler()
+    dataset = profiler.instrument(
+        dataset_ops.Dataset.range(10)
+        .map(lambda x: x + 1)
+        .map(lambda x: array_ops.reshape(
+            script_ops.py_func(_slow_identity, [x], dtypes.int64), []))
+        .map(lambda x: x - 1))
+    get_next = dataset.make_one_shot_iterator().get_next()
+
+    with self.test_session() as sess:
+      self.assertEqual(list(range(10)), self._readAll(sess, get_next))
+    self.assertEqual("2_MapDataset", profiler.bottleneck())
+    self.assertIn("Bottleneck: 2_MapDataset", profiler.report())
+
+  def testChromeTrace(self):
+    profiler = profile_ops.PipelineProfiler(max_trace_events=15)
+    dataset = profiler.instrument(
+        dataset_ops.Dataset.range(10).shuffle(4, seed=1))
+    get_next = dataset.make_one_shot_iterator().get_next()
+
+    with self.test_session() as sess:
+      self.assertEqual(list(range(10)),
+                       sorted(self._readAll(sess, get_next)))
+
+    trace = json.loads(profiler.chrome_trace())
+    events = trace["traceEvents"]
+    regions = [e for e in events if e["ph"] == "X"]
+    counters = [e for e in events if e["ph"] == "C"]
+    self.assertEqual(15, len(regions))
+    self.assertEqual(set(["0_RangeDataset", "1_ShuffleDataset"]),
+                     set(e["name"] for e in regions))
+    self.assertEqual(
+        len([e for e in regions if e["name"] == "1_ShuffleDataset"]),
+        len(counters))
+
+  def testProfilePipeline(self):
+    with ops.Graph().as_default():
+      profiler = profile_ops.profile_pipeline(
+          dataset_ops.Dataset.range(100).map(lambda x: x * x), 30,
+          warmup_elements=10)
+    self.assertEqual([30, 30], [s["elements"]
+                                for s in profiler.stats().values()])
+
+  def testInstrumentTwice(self):
+    profiler = profile_ops.PipelineProfiler()
+    profiler.instrument(dataset_ops.Dataset.range(10))
+    with self.assertRaisesRegexp(ValueError, "only instrument one"):
+      profiler.instrument(dataset_ops.Dataset.range(10))
+
+
+if __name__ == "__main__":
+  test.main()
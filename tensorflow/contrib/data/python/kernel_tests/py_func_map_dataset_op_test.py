@@ -0,0 +1,212 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for the experimental batched `py_func` map transformation."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+import numpy as np
+
+from tensorflow.contrib.data.python.ops import dataset_ops
+from tensorflow.contrib.data.python.ops import py_func_ops
+from tensorflow.python.client import session
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import errors
+from tensorflow.python.framework import ops
+from tensorflow.python.framework import tensor_shape
+from tensorflow.python.ops import array_ops
+from tensorflow.python.ops import script_ops
+from tensorflow.python.platform import test
+
+
+class MapBatchedPyFuncTest(test.TestCase):
+
+  def testFullyDefinedShapes(self):
+    batch_sizes = []
+
+    def square_and_add(x, y):
+      batch_sizes.append(len(x))
+      return x * x, x + y
+
+    iterator = (dataset_ops.Dataset.range(10)
+                .map(lambda x: (x, array_ops.fill([2], x)))
+                .apply(py_func_ops.map_batched_py_func(
+                    square_and_add, (dtypes.int64, dtypes.int64),
+                    (tensor_shape.scalar(), tensor_shape.vector(2)),
+                    batch_size=4))
+                .make_initializable_iterator())
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+    self.assertEqual([[], [2]], [t.shape.as_list() for t in get_next])
+
+    with self.test_session() as sess:
+      sess.run(init_op)
+      for i in range(10):
+        square, total = sess.run(get_next)
+        self.assertEqual(i * i, square)
+        self.assertAllEqual([2 * i, 2 * i], total)
+      with self.assertRaises(errors.OutOfRangeError):
+        sess.run(get_next)
+    self.assertEqual([4, 4, 2], batch_sizes)
+
+  def testRaggedInputs(self):
+
+    def lengths(x):
+      self.assertIsInstance(x, list)
+      return np.array([len(v) for v in x], dtype=np.int64)
+
+    iterator = (dataset_ops.Dataset.range(10)
+                .map(lambda x: array_ops.fill([x], x))
+                .apply(py_func_ops.map_batched_py_func(
+                    lengths, dtypes.int64, tensor_shape.scalar(),
+                    batch_size=3))
+                .make_initializable_iterator())
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+
+    with self.test_session() as sess:
+      sess.run(init_op)
+      for i in range(10):
+        self.assertEqual(i, sess.run(get_next))
+      with self.assertRaises(errors.OutOfRangeError):
+        sess.run(get_next)
+
+  def testRaggedOutputs(self):
+
+    def tokenize(lines):
+      return [np.array(line.split(), dtype=object) for line in lines]
+
+    lines = ["a", "b c", "", "d e f", "g h"]
+    iterator = (dataset_ops.Dataset.from_tensor_slices(lines)
+                .apply(py_func_ops.map_batched_py_func(
+                    tokenize, dtypes.string, tensor_shape.vector(None),
+                    batch_size=2))
+                .make_initializable_iterator())
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+    self.assertEqual([None], get_next.shape.as_list())
+
+    with self.test_session() as sess:
+      sess.run(init_op)
+      for line in lines:
+        self.assertAllEqual([w.encode() for w in line.split()],
+                            sess.run(get_next))
+      with self.assertRaises(errors.OutOfRangeError):
+        sess.run(get_next)
+
+  def testDictElements(self):
+
+    def add(element):
+      return {"sum": element["a"] + element["b"]}
+
+    iterator = (dataset_ops.Dataset.range(5)
+                .map(lambda x: {"a": x, "b": 2 * x})
+                .apply(py_func_ops.map_batched_py_func(
+                    add, {"sum": dtypes.int64}, {"sum": tensor_shape.scalar()},
+                    batch_size=2))
+                .make_initializable_iterator())
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+
+    with self.test_session() as sess:
+      sess.run(init_op)
+      for i in range(5):
+        self.assertEqual({"sum": 3 * i}, sess.run(get_next))
+      with self.assertRaises(errors.OutOfRangeError):
+        sess.run(get_next)
+
+  def testWrongBatchLength(self):
+    iterator = (dataset_ops.Dataset.range(10)
+                .apply(py_func_ops.map_batched_py_func(
+                    lambda x: x[:1], dtypes.int64, tensor_shape.scalar(),
+                    batch_size=4))
+                .make_initializable_iterator())
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+
+    with self.test_session() as sess:
+      sess.run(init_op)
+      with self.assertRaisesOpError(
+          "returned a batch of 1 elements for an input batch of 4 elements"):
+        sess.run(get_next)
+
+  def testWrongType(self):
+    iterator = (dataset_ops.Dataset.range(10)
+                .apply(py_func_ops.map_batched_py_func(
+                    lambda x: x.astype(np.float32), dtypes.int64,
+                    tensor_shape.scalar()))
+                .make_initializable_iterator())
+    init_op = iterator.initializer
+    get_next = iterator.get_next()
+
+    with self.test_session() as sess:
+      sess.run(init_op)
+      with self.assertRaisesOpError(r"batch of type .*int64.* was expected"):
+        sess.run(get_next)
+
+  def testUnknownOutputRank(self):
+    with self.assertRaisesRegexp(ValueError, "rank of each output component"):
+      py_func_ops.map_batched_py_func(
+          lambda x: x, dtypes.int64, tensor_shape.unknown_shape())
+
+
+class MapBatchedPyFuncBenchmark(test.Benchmark):
+  """Compares `map_batched_py_func()` with a per-element `py_func()`."""
+
+  def _benchmarkDataset(self, name, dataset, num_elements=10000):
+    with ops.Graph().as_default():
+      get_next = dataset.make_one_shot_iterator().get_next()
+      with session.Session() as sess:
+        sess.run(get_next)  # Warm up.
+        start = time.time()
+        for _ in range(num_elements - 1):
+          sess.run(get_next.op)
+        wall_time = time.time() - start
+    print("%s: %.2f elements/s" % (name, (num_elements - 1) / wall_time))
+    self.report_benchmark(
+        iters=num_elements - 1, wall_time=wall_time / (num_elements - 1),
+        name=name)
+
+  def _lines(self):
+    return dataset_ops.Dataset.from_tensors(
+        "the quick brown fox jumps over the lazy dog").repeat(None)
+
+  def benchmarkPerElementPyFunc(self):
+
+    def tokenize(line):
+      return np.array(line.split(), dtype=object)
+
+    self._benchmarkDataset(
+        "benchmark_per_element_py_func",
+        self._lines().map(
+            lambda x: script_ops.py_func(tokenize, [x], dtypes.string)))
+
+  def benchmarkBatchedPyFunc(self):
+
+    def tokenize(lines):
+      return [np.array(line.split(), dtype=object) for line in lines]
+
+    for batch_size in [16, 128, 1024]:
+      self._benchmarkDataset(
+          "benchmark_batched_py_func_%d" % batch_size,
+          self._lines().apply(py_func_ops.map_batched_py_func(
+              tokenize, dtypes.string, tensor_shape.vector(None),
+              batch_size=batch_size)))
+
+
+if __name__ == "__main__":
+  test.main()
@@ -0,0 +1,108 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for the experimental sharded shuffle."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+from tensorflow.contrib.data.python.ops import dataset_ops
+from tensorflow.contrib.data.python.ops import shuffle_ops
+from tensorflow.python.framework import errors
+from tensorflow.python.framework import ops
+from tensorflow.python.lib.io import tf_record
+from tensorflow.python.platform import test
+from tensorflow.python.util import compat
+
+
+class ShardedShuffleTest(test.TestCase):
+
+  def setUp(self):
+    super(ShardedShuffleTest, self).setUp()
+    self._num_files = 8
+    self._num_records = 50
+    self._filenames = []
+    for i in range(self._num_files):
+      filename = os.path.join(self.get_temp_dir(), "shuffle.%d.tfrecord" % i)
+      self._filenames.append(filename)
+      with tf_record.TFRecordWriter(filename) as writer:
+        for j in range(self._num_records):
+          writer.write(self._record(i, j))
+    self._spill_dir = os.path.join(self.get_temp_dir(), "spill_%s" % self.id())
+
+  def _record(self, f, r):
+    return compat.as_bytes("Record %d of file %d" % (r, f))
+
+  def _allRecords(self):
+    return sorted(self._record(f, r) for f in range(self._num_files)
+                  for r in range(self._num_records))
+
+  def _readAll(self, dataset, num_epochs=1):
+    iterator = dataset.make_initializable_iterator()
+    get_next = iterator.get_next()
+    epochs = []
+    with self.test_session() as sess:
+      for _ in range(num_epochs):
+        sess.run(iterator.initializer)
+        records = []
+        while True:
+          try:
+            records.append(sess.run(get_next))
+          except errors.OutOfRangeError:
+            break
+        epochs.append(records)
+    return epochs
+
+  def _shuffledOnce(self, **kwargs):
+    with ops.Graph().as_default():
+      return self._readAll(shuffle_ops.sharded_shuffle(
+          self._filenames, buffer_size=20, cycle_length=3, block_length=4,
+          **kwargs))[0]
+
+  def testShufflesAllRecords(self):
+    records = self._shuffledOnce(seed=7)
+    self.assertEqual(self._allRecords(), sorted(records))
+    self.assertNotEqual(sorted(records), records)
+
+  def testDeterministicGivenSeed(self):
+    self.assertEqual(self._shuffledOnce(seed=7), self._shuffledOnce(seed=7))
+    self.assertNotEqual(self._shuffledOnce(seed=7),
+                        self._shuffledOnce(seed=8))
+
+  def testSpill(self):
+    first, second = self._readAll(shuffle_ops.sharded_shuffle(
+        self._filenames, buffer_size=20, cycle_length=3, block_length=4,
+        seed=7, spill_dir=self._spill_dir, spill_run_size=30), num_epochs=2)
+    self.assertEqual(self._allRecords(), sorted(first))
+    self.assertEqual(self._allRecords(), sorted(second))
+    self.assertNotEqual(first, second)
+    # The runs of each pass are removed once it is complete.
+    self.assertEqual([], os.listdir(self._spill_dir))
+
+  def testSpillDeterministicGivenSeed(self):
+    kwargs = {"seed": 7, "spill_dir": self._spill_dir, "spill_run_size": 30}
+    self.assertEqual(self._shuffledOnce(**kwargs),
+                     self._shuffledOnce(**kwargs))
+
+  def testSpillRequiresStringRecords(self):
+    with self.assertRaisesRegexp(ValueError, "scalar tf.string records"):
+      shuffle_ops.sharded_shuffle(
+          self._filenames, buffer_size=20, spill_dir=self._spill_dir,
+          dataset_fn=lambda f: dataset_ops.Dataset.range(10))
+
+
+if __name__ == "__main__":
+  test.main()
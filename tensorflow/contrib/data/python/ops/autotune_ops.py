@@ -0,0 +1,437 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Automatic tuning of parallelism and buffer sizes in input pipelines."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+import numpy as np
+
+from tensorflow.python.data.util import nest
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import ops
+from tensorflow.python.ops import array_ops
+from tensorflow.python.ops import math_ops
+from tensorflow.python.ops import script_ops
+
+
+# The kinds of tuned stages.
+_MAP = "map"
+_INTERLEAVE = "interleave"
+_PREFETCH = "prefetch"
+
+# The points at which a stage records its elements.
+_INPUT = 0
+_OUTPUT = 1
+
+
+def _element_bytes(flat_values):
+  """Returns an int64 tensor estimating the size of an element in bytes.
+
+  Each string counts as the size of a pointer, since the length of a string
+  cannot be computed in the graph.
+  """
+  sizes = [math_ops.to_int64(array_ops.size(v)) * v.dtype.size
+           for v in flat_values]
+  if not sizes:
+    return ops.convert_to_tensor(0, dtype=dtypes.int64)
+  return math_ops.add_n(sizes)
+
+
+class _Stage(object):
+  """The tuned value and runtime statistics of a single pipeline stage."""
+
+  def __init__(self, name, kind, value, max_value):
+    self.name = name
+    self.kind = kind
+    self.value = value
+    self.max_value = max_value
+    # Hill-climbing state for parallelism stages.
+    self.best_value = None
+    self.best_throughput = None
+    self.converged = False
+    # The statistics reported by `Autotuner.stats()`, as of the last update.
+    self.last_stats = {}
+    self.reset_window()
+    self.reset_counts()
+
+  def reset_counts(self):
+    """Resets the counts used for buffer occupancy, for a new iterator."""
+    self.num_produced = 0
+    self.num_consumed = 0
+
+  def reset_window(self):
+    """Resets the statistics that are collected between updates."""
+    self.num_elements = 0
+    self.first_time = None
+    self.last_time = None
+    self.total_bytes = 0
+    self.occupancy_sum = 0
+    self.num_empty = 0
+    self.num_full = 0
+
+  def record(self, point, num_bytes, now):
+    if point == _INPUT:
+      self.num_produced += 1
+      return
+    self.num_consumed += 1
+    self.num_elements += 1
+    if self.first_time is None:
+      self.first_time = now
+    self.last_time = now
+    self.total_bytes += num_bytes
+    if self.kind == _PREFETCH:
+      # The number of elements left in the buffer after this one was taken.
+      occupancy = max(0, self.num_produced - self.num_consumed)
+      self.occupancy_sum += occupancy
+      if occupancy == 0:
+        self.num_empty += 1
+      if occupancy >= self.value:
+        self.num_full += 1
+
+  def window_stats(self):
+    stats = {"elements": self.num_elements,
+             "element_bytes": (self.total_bytes / self.num_elements
+                               if self.num_elements else 0.0)}
+    if self.num_elements > 1 and self.last_time > self.first_time:
+      stats["throughput"] = ((self.num_elements - 1) /
+                             (self.last_time - self.first_time))
+    else:
+      stats["throughput"] = 0.0
+    if self.kind == _PREFETCH:
+      samples = max(self.num_elements, 1)
+      stats["mean_buffer_occupancy"] = self.occupancy_sum / samples
+      stats["empty_fraction"] = self.num_empty / samples
+      stats["full_fraction"] = self.num_full / samples
+    return stats
+
+
+class Autotuner(object):
+  """Tunes the parallelism and buffer sizes of input pipeline stages.
+
+  An `Autotuner` provides transformations that replace `Dataset.map()`,
+  `Dataset.interleave()` and `Dataset.prefetch()`. Each of them records
+  the throughput of its stage (and, for `prefetch()`, the occupancy of its
+  buffer) as elements flow through the pipeline, and takes its parallelism or
+  buffer size from the autotuner when the iterator is initialized.
+
+  The values are updated from the statistics collected since the previous
+  update each time an iterator is initialized (e.g. at the start of each
+  epoch), or when `update()` is called, and take effect at the next
+  initialization:
+
+  * The parallelism of a `map()` or `interleave()` stage is doubled as long as
+    this increases its throughput by at least `tolerance`, up to
+    `max_parallelism`. When it does not, the best value is kept.
+  * The buffer size of a `prefetch()` stage is doubled when the buffer is
+    often both empty and full, which means that the producer is bursty and
+    the consumer waits for it.
+  * If `memory_budget_bytes` is set, the largest buffers (and then the
+    largest parallelism values) are halved until the estimated memory use,
+    based on the observed element sizes, fits in the budget.
+
+  For example:
+
+  ```python
+  tuner = tf.contrib.data.Autotuner(memory_budget_bytes=2 * 1024**3)
+  dataset = (tf.contrib.data.TFRecordDataset(filenames)
+             .apply(tuner.map(parse_fn, "parse"))
+             .batch(32)
+             .apply(tuner.prefetch("prefetch")))
+  iterator = dataset.make_initializable_iterator()
+  for _ in range(num_epochs):
+    sess.run(iterator.initializer)
+    ...
+    print(tuner.values(), tuner.stats())
+  ```
+
+  Recording statistics calls into Python once or twice per element of each
+  tuned stage, so the tuned stages should operate on reasonably large
+  elements (e.g. after `batch()` for cheap per-example work).
+  """
+
+  def __init__(self,
+               memory_budget_bytes=None,
+               max_parallelism=None,
+               max_buffer_size=1024,
+               min_elements=100,
+               tolerance=0.05,
+               state_file=None):
+    """Creates a new `Autotuner`.
+
+    Args:
+      memory_budget_bytes: (Optional.) The maximum number of bytes that the
+        buffered and in-flight elements of the tuned stages may use.
+      max_parallelism: (Optional.) The maximum parallelism of a `map()` or
+        `interleave()` stage. Defaults to the number of CPUs.
+      max_buffer_size: (Optional.) The maximum buffer size of a `prefetch()`
+        stage.
+      min_elements: (Optional.) The minimum number of elements that a stage
+        must produce between updates for its value to change.
+      tolerance: (Optional.) The minimum relative increase in throughput for
+        an increase in parallelism to be kept.
+      state_file: (Optional.) The path of a JSON file from which the initial
+        values are read, and to which the values are written after each
+        update, so that they are reused across runs.
+    """
+    self._memory_budget_bytes = memory_budget_bytes
+    self._max_parallelism = max_parallelism or multiprocessing.cpu_count()
+    self._max_buffer_size = max_buffer_size
+    self._min_elements = min_elements
+    self._tolerance = tolerance
+    self._state_file = state_file
+    self._saved_values = {}
+    if state_file is not None and os.path.exists(state_file):
+      with open(state_file) as f:
+        self._saved_values = json.load(f)
+    self._lock = threading.Lock()
+    self._stages = collections.OrderedDict()  # GUARDED_BY(self._lock)
+    # True if elements have been recorded since the last update.
+    self._dirty = False  # GUARDED_BY(self._lock)
+
+  def _add_stage(self, name, kind, initial_value, max_value):
+    with self._lock:
+      if name in self._stages:
+        raise ValueError("An autotuned stage named %r already exists." % name)
+      value = self._saved_values.get(name, initial_value)
+      stage = _Stage(name, kind, min(value, max_value), max_value)
+      self._stages[name] = stage
+    return stage
+
+  def _record(self, name, point, num_bytes):
+    now = time.time()
+    with self._lock:
+      self._stages[name].record(point, num_bytes, now)
+      self._dirty = True
+    return True
+
+  def _value_tensor(self, stage, dtype):
+    """Returns a tensor that reads the value of `stage` when evaluated."""
+
+    def read_value():
+      with self._lock:
+        if self._dirty:
+          self._update_locked()
+        # The tensor is evaluated when a new iterator is initialized, which
+        # discards any buffered elements.
+        stage.reset_counts()
+        return np.array(stage.value, dtype=dtype.as_numpy_dtype)
+
+    value = script_ops.py_func(read_value, [], dtype, stateful=True)
+    return array_ops.reshape(value, [])
+
+  def _probe(self, dataset, stage, point):
+    """Returns `dataset`, with each element recorded at `point` of `stage`."""
+    output_types = dataset.output_types
+
+    def probe_fn(*args):
+      flat_values = nest.flatten(args)
+      recorded = script_ops.py_func(
+          lambda num_bytes: self._record(stage.name, point, num_bytes),
+          [_element_bytes(flat_values)], dtypes.bool, stateful=True)
+      with ops.control_dependencies([recorded]):
+        flat_values = [array_ops.identity(v) for v in flat_values]
+      return nest.pack_sequence_as(output_types, flat_values)
+
+    return dataset.map(probe_fn)
+
+  def map(self, map_func, name, initial_parallelism=1):
+    """A tuned version of `Dataset.map()` with `num_parallel_calls`.
+
+    Args:
+      map_func: A function mapping a nested structure of tensors to another
+        nested structure of tensors, as for `Dataset.map()`.
+      name: A unique name for the stage.
+      initial_parallelism: (Optional.) The parallelism to use until the stage
+        has been tuned.
+
+    Returns:
+      A `Dataset` transformation function, which can be passed to
+      @{tf.contrib.data.Dataset.apply}.
+    """
+    stage = self._add_stage(name, _MAP, initial_parallelism,
+                            self._max_parallelism)
+
+    def _apply_fn(dataset):
+      dataset = dataset.map(
+          map_func,
+          num_parallel_calls=self._value_tensor(stage, dtypes.int32))
+      return self._probe(dataset, stage, _OUTPUT)
+
+    return _apply_fn
+
+  def interleave(self, map_func, name, block_length=1,
+                 initial_cycle_length=1):
+    """A tuned version of `Dataset.interleave()`.
+
+    Args:
+      map_func: A function mapping a nested structure of tensors to a
+        `Dataset`, as for `Dataset.interleave()`.
+      name: A unique name for the stage.
+      block_length: (Optional.) The number of consecutive elements to take
+        from each input element before cycling to another input element.
+      initial_cycle_length: (Optional.) The cycle length to use until the
+        stage has been tuned.
+
+    Returns:
+      A `Dataset` transformation function, which can be passed to
+      @{tf.contrib.data.Dataset.apply}.
+    """
+    stage = self._add_stage(name, _INTERLEAVE, initial_cycle_length,
+                            self._max_parallelism)
+
+    def _apply_fn(dataset):
+      dataset = dataset.interleave(
+          map_func, cycle_length=self._value_tensor(stage, dtypes.int64),
+          block_length=block_length)
+      return self._probe(dataset, stage, _OUTPUT)
+
+    return _apply_fn
+
+  def prefetch(self, name, initial_buffer_size=1):
+    """A tuned version of `Dataset.prefetch()`.
+
+    Args:
+      name: A unique name for the stage.
+      initial_buffer_size: (Optional.) The buffer size to use until the stage
+        has been tuned.
+
+    Returns:
+      A `Dataset` transformation function, which can be passed to
+      @{tf.contrib.data.Dataset.apply}.
+    """
+    stage = self._add_stage(name, _PREFETCH, initial_buffer_size,
+                            self._max_buffer_size)
+
+    def _apply_fn(dataset):
+      dataset = self._probe(dataset, stage, _INPUT)
+      dataset = dataset.prefetch(self._value_tensor(stage, dtypes.int64))
+      return self._probe(dataset, stage, _OUTPUT)
+
+    return _apply_fn
+
+  def _tune_parallelism(self, stage, stats):
+    if stage.converged:
+      return
+    throughput = stats["throughput"]
+    if (stage.best_throughput is None or
+        throughput > stage.best_throughput * (1 + self._tolerance)):
+      stage.best_value = stage.value
+      stage.best_throughput = throughput
+      if stage.value >= stage.max_value:
+        stage.converged = True
+      else:
+        stage.value = min(stage.value * 2, stage.max_value)
+    else:
+      stage.value = stage.best_value
+      stage.converged = True
+
+  def _tune_buffer_size(self, stage, stats):
+    if (stats["empty_fraction"] > 0.1 and stats["full_fraction"] > 0.1 and
+        stage.value < stage.max_value):
+      stage.value = min(stage.value * 2, stage.max_value)
+
+  def _fit_memory_budget(self):
+    """Halves the largest values until the estimated memory use fits."""
+
+    def memory(stage):
+      return stage.value * stage.last_stats.get("element_bytes", 0.0)
+
+    while True:
+      stages = list(self._stages.values())
+      if sum(memory(s) for s in stages) <= self._memory_budget_bytes:
+        return
+      # Shrink buffers before reducing parallelism.
+      candidates = ([s for s in stages if s.kind == _PREFETCH and s.value > 1]
+                    or [s for s in stages if s.value > 1])
+      if not candidates:
+        return
+      stage = max(candidates, key=memory)
+      stage.value //= 2
+      if stage.kind != _PREFETCH:
+        # Do not increase the parallelism again.
+        stage.best_value = stage.value
+        stage.converged = True
+
+  def _update_locked(self):
+    for stage in self._stages.values():
+      if stage.num_elements < self._min_elements:
+        continue
+      stats = stage.window_stats()
+      if stage.kind == _PREFETCH:
+        self._tune_buffer_size(stage, stats)
+      else:
+        self._tune_parallelism(stage, stats)
+      stage.last_stats = stats
+      stage.reset_window()
+    if self._memory_budget_bytes is not None:
+      self._fit_memory_budget()
+    self._dirty = False
+    if self._state_file is not None:
+      temp = self._state_file + ".tmp"
+      with open(temp, "w") as f:
+        json.dump({name: s.value for name, s in self._stages.items()}, f)
+      os.rename(temp, self._state_file)
+
+  def update(self):
+    """Updates the tuned values from the statistics collected so far.
+
+    The new values take effect the next time that an iterator is initialized.
+
+    Returns:
+      A dictionary mapping the name of each stage to its new value.
+    """
+    with self._lock:
+      self._update_locked()
+    return self.values()
+
+  def values(self):
+    """Returns a dictionary mapping the name of each stage to its value."""
+    with self._lock:
+      return {name: stage.value for name, stage in self._stages.items()}
+
+  def stats(self):
+    """Returns a dictionary of statistics for each stage.
+
+    The statistics of each stage are a dictionary with the following keys:
+
+    * `"kind"`: `"map"`, `"interleave"` or `"prefetch"`.
+    * `"value"`: The current parallelism or buffer size.
+    * `"converged"`: Whether the parallelism of a `map` or `interleave` stage
+      is final.
+    * `"elements"`, `"throughput"` (in elements per second) and
+      `"element_bytes"`: The number of elements produced by the stage, its
+      throughput and the mean size of its elements, measured between the
+      last two updates.
+    * `"mean_buffer_occupancy"`, `"empty_fraction"` and `"full_fraction"`:
+      For `prefetch` stages, the mean number of elements in the buffer when
+      an element is taken, and the fractions of elements after which the
+      buffer was empty or full, measured between the last two updates.
+    """
+    with self._lock:
+      result = {}
+      for name, stage in self._stages.items():
+        stats = dict(stage.last_stats)
+        stats.update({"kind": stage.kind, "value": stage.value,
+                      "converged": stage.converged})
+        result[name] = stats
+      return result
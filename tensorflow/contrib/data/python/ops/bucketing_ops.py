@@ -0,0 +1,343 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Batching of variable-length sequences into buckets of similar length."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import threading
+
+import numpy as np
+
+from tensorflow.contrib.data.python.ops import dataset_ops
+from tensorflow.python.client import session
+from tensorflow.python.data.util import nest
+from tensorflow.python.framework import constant_op
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import errors
+from tensorflow.python.framework import ops
+from tensorflow.python.framework import tensor_shape
+from tensorflow.python.ops import array_ops
+from tensorflow.python.ops import math_ops
+from tensorflow.python.ops import script_ops
+
+
+def _length_fn(element_length_func, output_types):
+  """Wraps `element_length_func` to return the element and its length.
+
+  The returned function unpacks its arguments like `Dataset.map()`, and
+  returns a `(length, element)` tuple, where `length` is a `tf.int64` scalar.
+  """
+
+  def length_fn(*args):
+    length = math_ops.to_int64(element_length_func(*args))
+    length.get_shape().assert_has_rank(0)
+    element = nest.pack_sequence_as(output_types, nest.flatten(args))
+    return length, element
+
+  return length_fn
+
+
+def _optimal_boundaries(lengths, num_buckets):
+  """Returns the bucket boundaries that minimize padding for `lengths`.
+
+  The distinct lengths are split into at most `num_buckets` contiguous
+  ranges, by dynamic programming over the length histogram, so that the
+  total number of tokens added when padding each element to the longest
+  length of its range is minimal.
+
+  Args:
+    lengths: A 1-D array of sampled sequence lengths.
+    num_buckets: The maximum number of buckets.
+
+  Returns:
+    A sorted list of boundaries, in the format of the `bucket_boundaries`
+    argument of `bucket_by_sequence_length()`. The last boundary is one more
+    than the longest sampled length.
+  """
+  values, counts = np.unique(np.asarray(lengths, dtype=np.int64),
+                             return_counts=True)
+  if not values.size:
+    raise ValueError("Cannot derive bucket boundaries without any lengths.")
+  num_values = values.size
+  num_buckets = min(num_buckets, num_values)
+  count_sums = np.concatenate([[0], np.cumsum(counts)])
+  length_sums = np.concatenate([[0], np.cumsum(values * counts)])
+
+  # `cost[j]` is the padding of the best split of `values[:j + 1]`, and
+  # `splits[b, j]` the start of the last range in that split into `b + 1`
+  # ranges.
+  cost = values * count_sums[1:] - length_sums[1:]
+  splits = np.zeros([num_buckets, num_values], dtype=np.int64)
+  for b in range(1, num_buckets):
+    new_cost = cost.copy()
+    for j in range(b, num_values):
+      # The last range is `values[i:j + 1]`, for each `i` in `[b, j]`.
+      starts = np.arange(b, j + 1)
+      candidates = (cost[starts - 1] +
+                    values[j] * (count_sums[j + 1] - count_sums[starts]) -
+                    (length_sums[j + 1] - length_sums[starts]))
+      best = np.argmin(candidates)
+      new_cost[j] = candidates[best]
+      splits[b, j] = starts[best]
+    cost = new_cost
+
+  boundaries = []
+  end = num_values - 1
+  for b in range(num_buckets - 1, -1, -1):
+    boundaries.append(int(values[end]) + 1)
+    end = splits[b, end] - 1
+  return sorted(boundaries)
+
+
+def estimate_bucket_boundaries(dataset, element_length_func, num_buckets=8,
+                               num_samples=10000):
+  """Derives bucket boundaries from a sample of sequence lengths.
+
+  The lengths of the first `num_samples` elements of `dataset` are computed
+  in a session on the default graph, and the boundaries are chosen to
+  minimize the padding needed to batch the sampled elements. Shuffle
+  `dataset` first if its leading elements are not representative.
+
+  Args:
+    dataset: A `Dataset` whose elements can be produced by a one-shot
+      iterator in the default graph.
+    element_length_func: A function mapping an element of `dataset` to a
+      scalar integer tensor, its sequence length.
+    num_buckets: (Optional.) The maximum number of buckets.
+    num_samples: (Optional.) The number of elements whose lengths are
+      sampled.
+
+  Returns:
+    A sorted list of boundaries, which can be passed as the
+    `bucket_boundaries` argument of `bucket_by_sequence_length()`.
+
+  Raises:
+    ValueError: If `dataset` is empty, or `num_buckets` is not positive.
+  """
+  if num_buckets < 1:
+    raise ValueError("num_buckets must be positive, got %d." % num_buckets)
+  lengths = dataset.take(num_samples).map(
+      _length_fn(element_length_func, dataset.output_types)).map(
+          lambda length, unused_element: length).batch(num_samples)
+  get_next = lengths.make_one_shot_iterator().get_next()
+  with session.Session() as sess:
+    try:
+      sampled = sess.run(get_next)
+    except errors.OutOfRangeError:
+      raise ValueError("Cannot derive bucket boundaries from an empty "
+                       "dataset.")
+  return _optimal_boundaries(sampled, num_buckets)
+
+
+class BucketingStats(object):
+  """Records the padding efficiency of `bucket_by_sequence_length()`.
+
+  Pass an instance as the `stats` argument of `bucket_by_sequence_length()`
+  and call `stats()` while or after iterating over the bucketed dataset:
+
+  ```python
+  stats = tf.contrib.data.BucketingStats()
+  dataset = dataset.apply(tf.contrib.data.bucket_by_sequence_length(
+      lambda tokens: tf.size(tokens), max_tokens=4096, stats=stats))
+  ...
+  print(stats.stats()["total"]["padding_efficiency"])
+  ```
+  """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._boundaries = None
+    self._buckets = None  # GUARDED_BY(self._lock)
+
+  def _set_boundaries(self, boundaries):
+    with self._lock:
+      if self._boundaries is not None:
+        raise ValueError("A BucketingStats can only record one dataset.")
+      self._boundaries = list(boundaries)
+      # The batches, elements, tokens and padded tokens of each bucket.
+      self._buckets = np.zeros([len(boundaries) + 1, 4], dtype=np.int64)
+
+  def _record(self, bucket, lengths):
+    with self._lock:
+      self._buckets[bucket] += [1, lengths.size, np.sum(lengths),
+                                lengths.size * np.max(lengths)]
+    return True
+
+  def _label(self, bucket):
+    lower = self._boundaries[bucket - 1] if bucket else 0
+    if bucket == len(self._boundaries):
+      return "[%d, inf)" % lower
+    return "[%d, %d)" % (lower, self._boundaries[bucket])
+
+  def stats(self):
+    """Returns the padding statistics of each bucket.
+
+    Returns:
+      An `OrderedDict` that maps the range of lengths of each bucket, such as
+      `"[16, 32)"`, and `"total"` to a dictionary with the keys `"batches"`,
+      `"elements"`, `"tokens"`, `"padded_tokens"` and `"padding_efficiency"`,
+      the fraction of the padded tokens that are not padding.
+    """
+    result = collections.OrderedDict()
+    with self._lock:
+      if self._buckets is None:
+        return result
+      buckets = self._buckets.copy()
+    rows = [(self._label(b), buckets[b]) for b in range(len(buckets))]
+    rows.append(("total", np.sum(buckets, axis=0)))
+    for label, (batches, elements, tokens, padded_tokens) in rows:
+      result[label] = {
+          "batches": int(batches),
+          "elements": int(elements),
+          "tokens": int(tokens),
+          "padded_tokens": int(padded_tokens),
+          "padding_efficiency": (float(tokens) / padded_tokens
+                                 if padded_tokens else 1.0),
+      }
+    return result
+
+
+def bucket_by_sequence_length(element_length_func,
+                              bucket_boundaries=None,
+                              batch_size=None,
+                              max_tokens=None,
+                              padded_shapes=None,
+                              padding_values=None,
+                              num_buckets=8,
+                              num_samples=10000,
+                              stats=None):
+  """A transformation that batches elements of similar sequence length.
+
+  Each element is assigned to a bucket by its length, and the elements of
+  each bucket are batched and padded together, so a batch only contains
+  padding up to its longest element. Bucket `i` holds the elements whose
+  length is in `[bucket_boundaries[i - 1], bucket_boundaries[i])`, and the
+  last bucket those whose length is at least `bucket_boundaries[-1]`.
+
+  If `bucket_boundaries` is not given, the lengths of the first
+  `num_samples` elements are sampled when the transformation is applied, and
+  the boundaries that minimize padding for the sample are used (see
+  `tf.contrib.data.estimate_bucket_boundaries()`).
+
+  Batches either hold a fixed `batch_size` elements, or as many elements as
+  fit in a budget of `max_tokens` tokens, padding included, which keeps the
+  cost of a batch constant across buckets:
+
+  ```python
+  dataset = dataset.apply(tf.contrib.data.bucket_by_sequence_length(
+      lambda tokens, label: tf.shape(tokens)[0], max_tokens=4096))
+  ```
+
+  Args:
+    element_length_func: A function mapping an element (unpacked like the
+      arguments of `Dataset.map()`) to a scalar integer tensor, its sequence
+      length.
+    bucket_boundaries: (Optional.) A sorted list of positive integers.
+    batch_size: (Optional.) The number of elements in each batch. Mutually
+      exclusive with `max_tokens`.
+    max_tokens: (Optional.) The maximum number of tokens in each batch. The
+      batch size of a bucket is `max_tokens` divided by its longest length,
+      and at least 1. The last bucket uses `bucket_boundaries[-1]`, so its
+      batches may exceed the budget; derived boundaries end just past the
+      longest sampled length, so it is normally empty.
+    padded_shapes: (Optional.) The `padded_shapes` argument of
+      `Dataset.padded_batch()`. Defaults to the shapes of the elements, with
+      unknown dimensions padded to the longest element of each batch.
+    padding_values: (Optional.) The `padding_values` argument of
+      `Dataset.padded_batch()`.
+    num_buckets: (Optional.) The maximum number of buckets, if
+      `bucket_boundaries` is derived.
+    num_samples: (Optional.) The number of elements sampled, if
+      `bucket_boundaries` is derived.
+    stats: (Optional.) A `tf.contrib.data.BucketingStats` that records the
+      padding of each batch.
+
+  Returns:
+    A `Dataset` transformation function, which can be passed to
+    @{tf.contrib.data.Dataset.apply}.
+
+  Raises:
+    ValueError: If neither or both of `batch_size` and `max_tokens` are
+      passed, or `bucket_boundaries` is not a sorted list of positive
+      integers.
+  """
+  if (batch_size is None) == (max_tokens is None):
+    raise ValueError("Must pass either batch_size or max_tokens.")
+  if bucket_boundaries is not None:
+    bucket_boundaries = list(bucket_boundaries)
+    if (not bucket_boundaries or bucket_boundaries[0] < 1 or
+        bucket_boundaries != sorted(set(bucket_boundaries))):
+      raise ValueError("bucket_boundaries must be a sorted list of distinct "
+                       "positive integers, got %s." % bucket_boundaries)
+
+  def _apply_fn(dataset):
+    """Function from `Dataset` to `Dataset` that applies the transformation."""
+    boundaries = bucket_boundaries
+    if boundaries is None:
+      boundaries = estimate_bucket_boundaries(
+          dataset, element_length_func, num_buckets, num_samples)
+    if stats is not None:
+      stats._set_boundaries(boundaries)  # pylint: disable=protected-access
+
+    if max_tokens is not None:
+      # The longest length of bucket `i` is `boundaries[i] - 1`.
+      max_lengths = [b - 1 for b in boundaries] + [boundaries[-1]]
+      window_sizes = [max(1, max_tokens // max(1, l)) for l in max_lengths]
+    else:
+      window_sizes = [batch_size] * (len(boundaries) + 1)
+
+    def bucket_fn(length):
+      return math_ops.reduce_sum(math_ops.to_int64(
+          math_ops.greater_equal(
+              length, constant_op.constant(boundaries, dtypes.int64))))
+
+    def key_fn(length, unused_element):
+      return bucket_fn(length)
+
+    def window_size_fn(key):
+      return array_ops.gather(
+          constant_op.constant(window_sizes, dtypes.int64), key)
+
+    element_shapes = (padded_shapes if padded_shapes is not None
+                      else dataset.output_shapes)
+    if padding_values is None:
+      batch_padding_values = None
+    else:
+      batch_padding_values = (constant_op.constant(0, dtypes.int64),
+                              padding_values)
+
+    def reduce_fn(key, window):
+      return window.padded_batch(
+          window_size_fn(key), (tensor_shape.scalar(), element_shapes),
+          batch_padding_values)
+
+    def record_fn(lengths, element):
+      if stats is None:
+        return element
+      recorded = script_ops.py_func(
+          stats._record,  # pylint: disable=protected-access
+          [bucket_fn(lengths[0]), lengths], dtypes.bool, stateful=True)
+      with ops.control_dependencies([recorded]):
+        flat_values = [array_ops.identity(v) for v in nest.flatten(element)]
+      return nest.pack_sequence_as(element, flat_values)
+
+    return (dataset.map(_length_fn(element_length_func, dataset.output_types))
+            .apply(dataset_ops.group_by_window(
+                key_fn, reduce_fn, window_size_func=window_size_fn))
+            .map(record_fn))
+
+  return _apply_fn
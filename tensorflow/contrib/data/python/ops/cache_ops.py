@@ -0,0 +1,557 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""A persistent, indexed on-disk cache for datasets."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import atexit
+import errno
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+
+import numpy as np
+
+from tensorflow.core.framework import function_pb2
+from tensorflow.core.framework import tensor_pb2
+from tensorflow.python.data.ops import dataset_ops
+from tensorflow.python.data.util import nest
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import ops
+from tensorflow.python.framework import tensor_util
+from tensorflow.python.ops import array_ops
+from tensorflow.python.ops import script_ops
+from tensorflow.python.util import compat
+
+
+# Each index entry is the (offset, length) of an element in the data file.
+_INDEX_ENTRY_FORMAT = "<qq"
+_INDEX_ENTRY_SIZE = struct.calcsize(_INDEX_ENTRY_FORMAT)
+# Each serialized component is preceded by its length.
+_LENGTH_FORMAT = "<q"
+_LENGTH_SIZE = struct.calcsize(_LENGTH_FORMAT)
+
+# The lock files held by this process, which are removed when it exits.
+_held_locks = set()
+_held_locks_lock = threading.Lock()
+
+
+def _release_held_locks():
+  with _held_locks_lock:
+    for path in _held_locks:
+      try:
+        os.remove(path)
+      except OSError:
+        pass
+    _held_locks.clear()
+
+
+atexit.register(_release_held_locks)
+
+
+def _pid_is_alive(pid):
+  try:
+    os.kill(pid, 0)
+  except OSError as e:
+    return e.errno == errno.EPERM
+  return True
+
+
+def _try_lock(path):
+  """Tries to create the lock file at `path` for this process.
+
+  A lock file that names a process that no longer exists on this host is
+  considered stale, and is replaced.
+
+  Args:
+    path: The path of the lock file.
+
+  Returns:
+    `True` if the lock was acquired, and `False` if it is held by another
+    process.
+  """
+  for _ in range(2):
+    try:
+      fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except OSError as e:
+      if e.errno != errno.EEXIST:
+        raise
+      try:
+        with open(path) as f:
+          pid = int(f.read())
+      except (IOError, OSError, ValueError):
+        # The lock file was removed, or is still being written.
+        return False
+      if pid == os.getpid() or _pid_is_alive(pid):
+        return False
+      try:
+        os.remove(path)
+      except OSError:
+        return False
+      continue
+    os.write(fd, compat.as_bytes(str(os.getpid())))
+    os.close(fd)
+    with _held_locks_lock:
+      _held_locks.add(path)
+    return True
+  return False
+
+
+def _unlock(path):
+  with _held_locks_lock:
+    _held_locks.discard(path)
+  os.remove(path)
+
+
+# Ops whose "token" attr identifies a registered Python function. The token
+# depends on the order in which functions were registered in this process,
+# so it is not part of the fingerprint.
+_PY_FUNC_OPS = frozenset(["PyFunc", "PyFuncStateless"])
+
+
+class _Fingerprinter(object):
+  """Computes fingerprints of graph nodes that ignore names and py_func tokens.
+
+  Functions are identified by a fingerprint of their definition rather than
+  by name, because the name of a `Defun` includes a hash of its definition,
+  which includes the tokens of any `py_func` ops in its body.
+  """
+
+  def __init__(self, library):
+    self._functions = {f.signature.name: f for f in library.function}
+    self._function_fingerprints = {}
+
+  def _update_with_op(self, fingerprint, op):
+    if op in self._functions:
+      fingerprint.update(compat.as_bytes(self.function_fingerprint(op)))
+    else:
+      fingerprint.update(compat.as_bytes(op))
+
+  def _update_with_attrs(self, fingerprint, node):
+    for key in sorted(node.attr):
+      if key == "token" and node.op in _PY_FUNC_OPS:
+        continue
+      value = node.attr[key]
+      fingerprint.update(compat.as_bytes(key))
+      if value.HasField("func") and value.func.name in self._functions:
+        fingerprint.update(
+            compat.as_bytes(self.function_fingerprint(value.func.name)))
+      else:
+        fingerprint.update(value.SerializeToString())
+
+  def function_fingerprint(self, name):
+    """Returns a fingerprint of the definition of the function `name`."""
+    if name not in self._function_fingerprints:
+      function_def = self._functions[name]
+      fingerprint = hashlib.sha1()
+      for arg in (list(function_def.signature.input_arg) +
+                  list(function_def.signature.output_arg)):
+        fingerprint.update(arg.SerializeToString())
+      # Node names within a function body are local to the function, and are
+      # the same for each program that defines the same function.
+      for node in function_def.node_def:
+        self._update_with_op(fingerprint, node.op)
+        fingerprint.update(compat.as_bytes(node.name))
+        for input_name in node.input:
+          fingerprint.update(compat.as_bytes(input_name))
+        self._update_with_attrs(fingerprint, node)
+      for key in sorted(function_def.ret):
+        fingerprint.update(compat.as_bytes(key + function_def.ret[key]))
+      self._function_fingerprints[name] = fingerprint.hexdigest()
+    return self._function_fingerprints[name]
+
+  def graph_fingerprint(self, nodes):
+    """Returns a fingerprint of `nodes`, ignoring their names."""
+    node_ids = {node.name: i for i, node in enumerate(nodes)}
+    fingerprint = hashlib.sha1()
+    for node in nodes:
+      self._update_with_op(fingerprint, node.op)
+      for input_name in node.input:
+        control = input_name.startswith("^")
+        name, _, output_index = input_name.lstrip("^").partition(":")
+        fingerprint.update(compat.as_bytes(
+            "%s%d:%s" % ("^" if control else "", node_ids[name],
+                         output_index)))
+      self._update_with_attrs(fingerprint, node)
+    return fingerprint.hexdigest()
+
+
+def _dataset_fingerprint(dataset):
+  """Returns a fingerprint of the graph that defines `dataset`.
+
+  The fingerprint covers the types and attributes of the ops that define the
+  dataset, the structure of their inputs, and the definitions of the
+  functions that they use. It does not cover the names of the ops, the values
+  of any tensors (e.g. placeholders) that are fed at runtime, or the code of
+  Python functions that are called with `tf.py_func()`.
+
+  NOTE: The ops that define the dataset can only be created in the graph that
+  holds its input tensors, so this adds an unused copy of them to the default
+  graph, under the "persistent_cache_fingerprint" name scope.
+
+  Args:
+    dataset: A `Dataset`.
+
+  Returns:
+    A hex string.
+  """
+  graph = ops.get_default_graph()
+  with ops.name_scope("persistent_cache_fingerprint"):
+    resource = dataset.make_dataset_resource()
+
+  # Only the ops that `resource` depends on are visited, rather than
+  # serializing the whole graph.
+  sub_graph_ops = set()
+  to_visit = [resource.op]
+  while to_visit:
+    op = to_visit.pop()
+    if op in sub_graph_ops:
+      continue
+    sub_graph_ops.add(op)
+    to_visit.extend(t.op for t in op.inputs)
+    to_visit.extend(op.control_inputs)
+  # pylint: disable=protected-access
+  nodes = [op.node_def for op in sorted(sub_graph_ops, key=lambda op: op._id)]
+  library = function_pb2.FunctionDefLibrary(
+      function=[f.definition for f in graph._functions.values()])
+  # pylint: enable=protected-access
+  return _Fingerprinter(library).graph_fingerprint(nodes)
+
+
+def _encode(flat_values):
+  """Serializes the components of an element into a single string."""
+  parts = []
+  for value in flat_values:
+    serialized = tensor_util.make_tensor_proto(value).SerializeToString()
+    parts.append(struct.pack(_LENGTH_FORMAT, len(serialized)))
+    parts.append(serialized)
+  return b"".join(parts)
+
+
+def _decode(serialized):
+  """Inverse of `_encode()`."""
+  flat_values = []
+  position = 0
+  while position < len(serialized):
+    length, = struct.unpack_from(_LENGTH_FORMAT, serialized, position)
+    position += _LENGTH_SIZE
+    proto = tensor_pb2.TensorProto.FromString(
+        serialized[position:position + length])
+    flat_values.append(tensor_util.MakeNdarray(proto))
+    position += length
+  return flat_values
+
+
+class _CacheFiles(object):
+  """The paths of the files that make up a cache."""
+
+  def __init__(self, filename):
+    self.data = filename + ".data"
+    self.index = filename + ".index"
+    self.meta = filename + ".meta"
+    self.lock = filename + ".lock"
+
+  def read_meta(self):
+    try:
+      with open(self.meta) as f:
+        return json.load(f)
+    except (IOError, OSError, ValueError):
+      return None
+
+  def write_meta(self, fingerprint, complete, num_elements):
+    temp = self.meta + ".tmp"
+    with open(temp, "w") as f:
+      json.dump({"fingerprint": fingerprint, "complete": complete,
+                 "num_elements": num_elements}, f)
+    os.rename(temp, self.meta)
+
+  def num_committed(self):
+    """Returns the number of elements with an entry in the index file."""
+    try:
+      return os.path.getsize(self.index) // _INDEX_ENTRY_SIZE
+    except OSError:
+      return 0
+
+
+class _CacheReader(object):
+  """Reads the first `num_elements` elements of a cache by index."""
+
+  def __init__(self, files, num_elements):
+    self.num_elements = num_elements
+    self._data = None
+    self._index = np.zeros([0, 2], dtype=np.int64)
+    if num_elements:
+      self._index = np.fromfile(
+          files.index, dtype="<i8", count=2 * num_elements).reshape([-1, 2])
+      with open(files.data, "rb") as f:
+        self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+  def read(self, index):
+    offset, length = self._index[index]
+    return _decode(self._data[offset:offset + length])
+
+
+class _CacheWriter(object):
+  """Appends elements to a cache whose first `num_elements` are valid."""
+
+  def __init__(self, files, num_elements):
+    self.num_elements = num_elements
+    end = 0
+    if num_elements:
+      offset, length = np.fromfile(
+          files.index, dtype="<i8", count=2 * num_elements)[-2:]
+      end = int(offset + length)
+    # Discard any partially written element or index entry.
+    self._data = open(files.data, "ab")
+    self._data.truncate(end)
+    self._index = open(files.index, "ab")
+    self._index.truncate(num_elements * _INDEX_ENTRY_SIZE)
+    self._offset = end
+
+  def append(self, flat_values):
+    serialized = _encode(flat_values)
+    self._data.write(serialized)
+    self._data.flush()
+    # The index entry is written after the data, so that every element with
+    # an index entry can be read.
+    self._index.write(struct.pack(_INDEX_ENTRY_FORMAT, self._offset,
+                                  len(serialized)))
+    self._index.flush()
+    self._offset += len(serialized)
+    self.num_elements += 1
+
+  def close(self):
+    self._data.close()
+    self._index.close()
+
+
+class _PersistentCacheState(object):
+  """Coordinates the passes over a persistent cache in this process.
+
+  At most one pass at a time writes to the cache. If a new pass starts while
+  an earlier pass in this process is still writing, the earlier pass is
+  assumed to have been abandoned, and the new pass takes over.
+  """
+
+  def __init__(self, filename, fingerprint, seed):
+    self._files = _CacheFiles(filename)
+    self._fingerprint = fingerprint
+    self._random = np.random.RandomState(seed)
+    self._lock = threading.Lock()
+    self._next_pass_id = 0  # GUARDED_BY(self._lock)
+    self._reader = None  # GUARDED_BY(self._lock)
+    self._writer = None  # GUARDED_BY(self._lock)
+    self._writer_pass_id = None  # GUARDED_BY(self._lock)
+
+  def _refresh_reader(self, num_elements):
+    if self._reader is None or self._reader.num_elements != num_elements:
+      self._reader = _CacheReader(self._files, num_elements)
+
+  def begin(self):
+    """Starts a new pass over the cache.
+
+    Returns:
+      A list of four int64 scalars: the ID of the pass, the number of elements
+      to read from the cache, the number of elements to skip in the input
+      dataset, and the number of elements to take from the input dataset
+      after skipping (or -1 for all of them).
+    """
+    with self._lock:
+      pass_id = self._next_pass_id
+      self._next_pass_id += 1
+      meta = self._files.read_meta()
+      is_current = (meta is not None and
+                    meta["fingerprint"] == self._fingerprint)
+
+      if is_current and meta["complete"]:
+        self._refresh_reader(meta["num_elements"])
+        return [np.int64(x) for x in (pass_id, meta["num_elements"], 0, 0)]
+
+      if self._writer is not None:
+        # Take over the lock from an abandoned pass in this process.
+        self._writer.close()
+        self._writer = None
+        has_lock = True
+      else:
+        has_lock = _try_lock(self._files.lock)
+
+      if not has_lock:
+        # Another process is writing the cache, so read the elements that
+        # it has committed so far, and compute the rest without caching.
+        num_cached = self._files.num_committed() if is_current else 0
+        self._refresh_reader(num_cached)
+        return [np.int64(x) for x in (pass_id, num_cached, num_cached, -1)]
+
+      if not is_current:
+        # The cache is missing, or was written by a different pipeline.
+        for path in (self._files.data, self._files.index):
+          if os.path.exists(path):
+            os.remove(path)
+        self._files.write_meta(self._fingerprint, False, 0)
+      num_cached = self._files.num_committed()
+      self._writer = _CacheWriter(self._files, num_cached)
+      self._writer_pass_id = pass_id
+      self._refresh_reader(num_cached)
+      return [np.int64(x) for x in (pass_id, num_cached, num_cached, -1)]
+
+  def permutation(self, num_elements):
+    with self._lock:
+      return self._random.permutation(num_elements).astype(np.int64)
+
+  def read(self, index):
+    return self._reader.read(index)
+
+  def append(self, pass_id, *flat_values):
+    with self._lock:
+      if pass_id == self._writer_pass_id and self._writer is not None:
+        self._writer.append(flat_values)
+    return True
+
+  def end(self, pass_id):
+    """Marks the cache as complete if `pass_id` wrote all of its elements."""
+    with self._lock:
+      if pass_id == self._writer_pass_id and self._writer is not None:
+        self._writer.close()
+        self._files.write_meta(self._fingerprint, True,
+                               self._writer.num_elements)
+        self._writer = None
+        self._writer_pass_id = None
+        _unlock(self._files.lock)
+
+
+def persistent_cache(filename,
+                     shuffle=False,
+                     seed=None,
+                     num_parallel_reads=None,
+                     fingerprint=None):
+  """A transformation that caches the elements of a dataset on local disk.
+
+  Unlike `Dataset.cache()`, the cache persists across runs and processes:
+
+  * Each element is written as soon as it is produced, along with an index
+    entry, so an interrupted pass resumes from the last complete element.
+    Resuming requires the input dataset to produce its elements in the same
+    order on every pass; the elements that were already cached are skipped
+    in the input (which still computes them).
+  * The cache is keyed by a fingerprint of the graph that defines the input
+    dataset, and a cache that was written by a different pipeline is
+    discarded and rewritten. Values fed to placeholders are not part of the
+    fingerprint, so pass an explicit `fingerprint` if they change the
+    elements.
+  * Only one process writes the cache at a time. Other processes read the
+    elements that have been written so far, and compute the rest without
+    caching them.
+  * Cached elements are read by index from a memory-mapped file, so they can
+    be returned in a random order (with `shuffle=True`) without a shuffle
+    buffer, and read in parallel.
+
+  The cache consists of the files `filename + ".data"`, `".index"`, `".meta"`
+  and `".lock"`, which must be on a local filesystem.
+
+  Args:
+    filename: The path prefix of the cache files.
+    shuffle: (Optional.) If `True`, the elements read from the cache are
+      returned in a different random order on each pass. Elements that are
+      computed by the input dataset are returned in their original order.
+    seed: (Optional.) The seed for the random order of the elements.
+    num_parallel_reads: (Optional.) The number of elements to read from the
+      cache in parallel. If not specified, elements are read sequentially.
+    fingerprint: (Optional.) A string that identifies the contents of the
+      input dataset. Defaults to a fingerprint of its graph, which adds an
+      unused copy of the ops that define the input dataset to the default
+      graph.
+
+  Returns:
+    A `Dataset` transformation function, which can be passed to
+    @{tf.contrib.data.Dataset.apply}.
+  """
+
+  def _apply_fn(dataset):
+    """Function from `Dataset` to `Dataset` that applies the transformation."""
+    output_types = dataset.output_types
+    flat_types = nest.flatten(output_types)
+    flat_shapes = nest.flatten(dataset.output_shapes)
+    state = _PersistentCacheState(
+        filename, fingerprint or _dataset_fingerprint(dataset), seed)
+
+    def begin_map_fn(unused_dummy):
+      return tuple(script_ops.py_func(
+          state.begin, [], [dtypes.int64] * 4, stateful=True))
+
+    def restore_shapes(flat_values):
+      # The `py_func()` op drops the inferred shapes, so we add them back in
+      # here.
+      for value, shape in zip(flat_values, flat_shapes):
+        value.set_shape(shape)
+      return nest.pack_sequence_as(output_types, flat_values)
+
+    def read_map_fn(index):
+      # `state.read()` depends on the reader that `begin()` and `end()`
+      # replace, so it must not be constant-folded or deduplicated.
+      return restore_shapes(script_ops.py_func(
+          state.read, [index], flat_types, stateful=True))
+
+    def append_map_fn(pass_id, element):
+      flat_values = nest.flatten(element)
+      appended = script_ops.py_func(
+          state.append, [pass_id] + flat_values, dtypes.bool, stateful=True)
+      with ops.control_dependencies([appended]):
+        flat_values = [array_ops.identity(v) for v in flat_values]
+      return nest.pack_sequence_as(output_types, flat_values)
+
+    def end_map_fn(pass_id):
+      """Finishes the pass, and produces no elements."""
+
+      def end_py_func(pass_id):
+        state.end(pass_id)
+        raise StopIteration("Pass finished.")
+
+      return restore_shapes(script_ops.py_func(
+          end_py_func, [pass_id], flat_types, stateful=True))
+
+    def pass_fn(pass_id, num_cached, num_to_skip, num_to_take):
+      """Returns the elements of a single pass over the cache."""
+      if shuffle:
+        indices = dataset_ops.Dataset.from_tensors(num_cached).map(
+            lambda n: script_ops.py_func(
+                state.permutation, [n], dtypes.int64, stateful=True)).flat_map(
+                    lambda p: dataset_ops.Dataset.from_tensor_slices(
+                        array_ops.reshape(p, [-1])))
+      else:
+        indices = dataset_ops.Dataset.range(num_cached)
+      cached = indices.map(read_map_fn, num_parallel_calls=num_parallel_reads)
+
+      computed = dataset_ops.Dataset.zip((
+          dataset_ops.Dataset.from_tensors(pass_id).repeat(None),
+          dataset.skip(num_to_skip).take(num_to_take))).map(append_map_fn)
+
+      # `end_map_fn()` is only called once the input is exhausted. As in
+      # `Dataset.from_generator()`, raising `StopIteration` in the `py_func()`
+      # ends the dataset without producing an element.
+      end = dataset_ops.Dataset.from_tensors(pass_id).map(end_map_fn)
+
+      return cached.concatenate(computed).concatenate(end)
+
+    # As in `Dataset.from_generator()`, `begin_map_fn()` runs once for each
+    # pass over the returned dataset.
+    dummy = 0
+    return dataset_ops.Dataset.from_tensors(dummy).map(begin_map_fn).flat_map(
+        pass_fn)
+
+  return _apply_fn
@@ -0,0 +1,393 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""A columnar file format, and a `Dataset` that reads it."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import operator
+import struct
+
+import numpy as np
+
+from tensorflow.contrib.data.python.ops import dataset_ops
+from tensorflow.python.client import session
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import errors
+from tensorflow.python.framework import ops
+from tensorflow.python.framework import tensor_shape
+from tensorflow.python.ops import parsing_ops
+from tensorflow.python.util import compat
+
+
+# A columnar file starts and ends with `_MAGIC`. The data of each column of
+# each row group is stored contiguously, aligned to `_ALIGNMENT` bytes. The
+# schema, the offsets of the column chunks and their statistics are stored in
+# a JSON-encoded footer, followed by its length and `_MAGIC`.
+_MAGIC = b"TFCOLv1\x00"
+_ALIGNMENT = 64
+_LENGTH_FORMAT = "<q"
+_LENGTH_SIZE = struct.calcsize(_LENGTH_FORMAT)
+
+# The comparisons that may be used in the `filters` of a `ColumnarDataset`.
+_COMPARISONS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def _column_dtype(array):
+  """Returns the name of the `tf.DType` of a column."""
+  if array.dtype.kind in "OSU":
+    return dtypes.string.name
+  return dtypes.as_dtype(array.dtype).name
+
+
+def _column_statistics(array):
+  """Returns the `(min, max)` of a numeric column, or `(None, None)`."""
+  if not array.size or array.dtype.kind not in "biuf":
+    return None, None
+  if array.dtype.kind == "f" and not np.isfinite(array).all():
+    return None, None
+  return array.min().item(), array.max().item()
+
+
+class ColumnarWriter(object):
+  """Writes a columnar file, one group of rows at a time.
+
+  Each column has a fixed dtype and a fixed shape for each of its values.
+  The columns of each row group are stored separately, so that a
+  `ColumnarDataset` only reads the columns that it needs, and the minimum and
+  maximum of each numeric column in each row group are recorded, so that it
+  can skip row groups that do not match its `filters`.
+
+  For example:
+
+  ```python
+  with tf.contrib.data.ColumnarWriter("/tmp/data.tfcol") as writer:
+    writer.write_row_group({"age": np.array([31, 42]),
+                            "name": np.array([b"alice", b"bob"], dtype=object),
+                            "embedding": np.zeros([2, 8], dtype=np.float32)})
+  ```
+  """
+
+  def __init__(self, filename):
+    """Creates a `ColumnarWriter`.
+
+    Args:
+      filename: The name of the local file to write.
+    """
+    self._file = open(filename, "wb")
+    self._file.write(_MAGIC)
+    self._offset = len(_MAGIC)
+    self._columns = None
+    self._row_groups = []
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, unused_type, unused_value, unused_traceback):
+    self.close()
+
+  def _write(self, data):
+    padding = -self._offset % _ALIGNMENT
+    self._file.write(b"\x00" * padding)
+    self._offset += padding
+    offset = self._offset
+    self._file.write(data)
+    self._offset += len(data)
+    return offset
+
+  def write_row_group(self, columns):
+    """Writes a group of rows.
+
+    Args:
+      columns: A dictionary mapping the name of each column to an array-like
+        object, whose first dimension is the row. Every row group must have
+        the same columns, with the same dtypes and shapes.
+
+    Raises:
+      ValueError: If the columns do not have the same number of rows, or do
+        not match the columns of earlier row groups.
+    """
+    arrays = {name: np.asarray(value) for name, value in columns.items()}
+    schema = [{"name": name,
+               "dtype": _column_dtype(arrays[name]),
+               "shape": list(arrays[name].shape[1:])}
+              for name in sorted(arrays)]
+    if self._columns is None:
+      self._columns = schema
+    elif schema != self._columns:
+      raise ValueError("Row group has columns %s, but the file has columns "
+                       "%s." % (schema, self._columns))
+    num_rows = set(array.shape[0] if array.ndim else None
+                   for array in arrays.values())
+    if len(num_rows) != 1 or None in num_rows:
+      raise ValueError("All columns must have the same number of rows, but "
+                       "got %s." % {name: array.shape
+                                    for name, array in arrays.items()})
+    num_rows = num_rows.pop()
+
+    chunks = {}
+    for column in schema:
+      array = arrays[column["name"]]
+      if column["dtype"] == dtypes.string.name:
+        values = [compat.as_bytes(value) for value in array.reshape([-1])]
+        lengths = np.array([len(value) for value in values], dtype=np.int64)
+        data = lengths.tobytes() + b"".join(values)
+      else:
+        data = np.ascontiguousarray(array).tobytes()
+      minimum, maximum = _column_statistics(array)
+      chunks[column["name"]] = {"offset": self._write(data),
+                                "length": len(data),
+                                "min": minimum,
+                                "max": maximum}
+    self._row_groups.append({"num_rows": num_rows, "columns": chunks})
+
+  def close(self):
+    """Writes the footer of the file, and closes it."""
+    if self._file is None:
+      return
+    footer = compat.as_bytes(json.dumps({"columns": self._columns or [],
+                                         "row_groups": self._row_groups}))
+    self._write(footer)
+    self._file.write(struct.pack(_LENGTH_FORMAT, len(footer)))
+    self._file.write(_MAGIC)
+    self._file.close()
+    self._file = None
+
+
+class _ColumnarFile(object):
+  """Reads the row groups of a columnar file."""
+
+  def __init__(self, filename):
+    self._filename = filename
+    self._file = open(filename, "rb")
+    self._file.seek(-(_LENGTH_SIZE + len(_MAGIC)), 2)
+    footer_length, = struct.unpack(_LENGTH_FORMAT,
+                                   self._file.read(_LENGTH_SIZE))
+    if self._file.read(len(_MAGIC)) != _MAGIC:
+      raise ValueError("%s is not a columnar file." % filename)
+    self._file.seek(-(footer_length + _LENGTH_SIZE + len(_MAGIC)), 2)
+    footer = json.loads(compat.as_text(self._file.read(footer_length)))
+    self.columns = {column["name"]: column for column in footer["columns"]}
+    self.row_groups = footer["row_groups"]
+
+  def close(self):
+    self._file.close()
+
+  def read_column(self, row_group, name):
+    """Returns the values of column `name` in `row_group`."""
+    column = self.columns[name]
+    chunk = row_group["columns"][name]
+    shape = [row_group["num_rows"]] + column["shape"]
+    self._file.seek(chunk["offset"])
+    data = self._file.read(chunk["length"])
+    if column["dtype"] == dtypes.string.name:
+      num_values = int(np.prod(shape))
+      lengths = np.frombuffer(data, np.int64, num_values)
+      ends = np.cumsum(lengths) + num_values * lengths.itemsize
+      values = np.empty([num_values], dtype=object)
+      values[:] = [data[end - length:end]
+                   for end, length in zip(ends, lengths)]
+    else:
+      values = np.frombuffer(
+          data, dtypes.as_dtype(column["dtype"]).as_numpy_dtype)
+    return values.reshape(shape)
+
+
+def _may_match(row_group, filters):
+  """Returns False if the statistics of `row_group` rule out `filters`."""
+  for name, comparison, value in filters:
+    chunk = row_group["columns"][name]
+    minimum, maximum = chunk["min"], chunk["max"]
+    if minimum is None:
+      continue
+    if comparison == "==" and not minimum <= value <= maximum:
+      return False
+    if comparison == "!=" and minimum == maximum == value:
+      return False
+    if comparison in ("<", "<=") and not _COMPARISONS[comparison](minimum,
+                                                                  value):
+      return False
+    if comparison in (">", ">=") and not _COMPARISONS[comparison](maximum,
+                                                                  value):
+      return False
+  return True
+
+
+def _read_batches(filenames, columns, filters, batch_size):
+  """Yields dictionaries of `batch_size` rows of `columns` from `filenames`."""
+  read_columns = sorted(set(columns) | set(name for name, _, _ in filters))
+  buffered = None
+  for filename in filenames:
+    columnar_file = _ColumnarFile(filename)
+    try:
+      for name in read_columns:
+        if name not in columnar_file.columns:
+          raise ValueError("%s has no column named %r." % (filename, name))
+      for row_group in columnar_file.row_groups:
+        if not _may_match(row_group, filters):
+          continue
+        arrays = {name: columnar_file.read_column(row_group, name)
+                  for name in read_columns}
+        if filters:
+          mask = np.logical_and.reduce([
+              _COMPARISONS[comparison](arrays[name], value)
+              for name, comparison, value in filters])
+          arrays = {name: arrays[name][mask] for name in columns}
+        if buffered is not None:
+          arrays = {name: np.concatenate([buffered[name], arrays[name]])
+                    for name in columns}
+        num_rows = len(arrays[columns[0]])
+        start = 0
+        while num_rows - start >= batch_size:
+          yield {name: arrays[name][start:start + batch_size]
+                 for name in columns}
+          start += batch_size
+        buffered = {name: arrays[name][start:] for name in columns}
+    finally:
+      columnar_file.close()
+  if buffered is not None and len(buffered[columns[0]]):
+    yield buffered
+
+
+class ColumnarDataset(dataset_ops.Dataset):
+  """A `Dataset` of batches of rows from one or more columnar files.
+
+  Each element is a dictionary that maps the name of each selected column to
+  a dense tensor of `batch_size` rows (except for the last element, which may
+  be smaller). Only the selected columns and the columns used in `filters`
+  are read from disk, and row groups whose statistics show that none of
+  their rows match `filters` are skipped without being read.
+
+  For example, to read two columns of the adult rows:
+
+  ```python
+  dataset = tf.contrib.data.ColumnarDataset(
+      ["/data/train-0.tfcol", "/data/train-1.tfcol"],
+      columns=["age", "label"], filters=[("age", ">=", 18)],
+      batch_size=256)
+  ```
+
+  Columnar files are written by @{tf.contrib.data.ColumnarWriter}, or
+  converted from `tf.train.Example` records by
+  @{tf.contrib.data.convert_tfrecord_to_columnar}.
+  """
+
+  def __init__(self, filenames, columns=None, filters=None, batch_size=1024):
+    """Creates a `ColumnarDataset`.
+
+    Args:
+      filenames: A filename or a list of filenames of local columnar files.
+        All files must contain the selected columns. The schema is read from
+        the first file when the dataset is created.
+      columns: (Optional.) A list of the names of the columns to read.
+        Defaults to all columns of the first file.
+      filters: (Optional.) A list of `(column, comparison, value)` tuples,
+        where `column` is the name of a numeric column of scalars,
+        `comparison` is one of `"=="`, `"!="`, `"<"`, `"<="`, `">"` or
+        `">="`, and `value` is a Python number. Only the rows that match all
+        filters are produced.
+      batch_size: (Optional.) The number of rows in each element.
+
+    Raises:
+      ValueError: If a column does not exist, or a filter is invalid.
+    """
+    if isinstance(filenames, compat.bytes_or_text_types):
+      filenames = [filenames]
+    filenames = list(filenames)
+    if not filenames:
+      raise ValueError("`filenames` must not be empty.")
+    columnar_file = _ColumnarFile(filenames[0])
+    columnar_file.close()
+    schema = columnar_file.columns
+    if columns is None:
+      columns = sorted(schema)
+    columns = list(columns)
+    if not columns:
+      raise ValueError("At least one column must be selected.")
+    filters = [tuple(f) for f in filters or []]
+    for name in columns:
+      if name not in schema:
+        raise ValueError("%s has no column named %r." % (filenames[0], name))
+    for name, comparison, unused_value in filters:
+      if comparison not in _COMPARISONS:
+        raise ValueError("Invalid comparison %r in filter on %r." %
+                         (comparison, name))
+      if (name not in schema or schema[name]["shape"] or
+          schema[name]["dtype"] == dtypes.string.name):
+        raise ValueError("Filters must use numeric columns of scalars, but "
+                         "got %r." % name)
+
+    output_types = {name: dtypes.as_dtype(schema[name]["dtype"])
+                    for name in columns}
+    output_shapes = {name: tensor_shape.TensorShape([None] +
+                                                    schema[name]["shape"])
+                     for name in columns}
+    dataset = dataset_ops.Dataset.from_generator(
+        lambda: _read_batches(filenames, columns, filters, batch_size),
+        output_types, output_shapes)
+    super(ColumnarDataset, self).__init__(dataset)
+
+
+def convert_tfrecord_to_columnar(tfrecord_filenames, columnar_filename,
+                                 features, rows_per_group=65536,
+                                 compression_type=None):
+  """Converts files of `tf.train.Example` records to a columnar file.
+
+  The records are parsed with `tf.parse_example()`, so each feature becomes a
+  column with the dtype and shape of its `FixedLenFeature`.
+
+  Args:
+    tfrecord_filenames: A filename or a list of filenames of TFRecord files
+      of serialized `tf.train.Example` protos.
+    columnar_filename: The name of the local columnar file to write.
+    features: A dictionary mapping feature keys to `FixedLenFeature` values.
+    rows_per_group: (Optional.) The number of rows in each row group.
+    compression_type: (Optional.) The compression type of the TFRecord files.
+
+  Returns:
+    The number of rows written.
+
+  Raises:
+    ValueError: If a feature is not a `FixedLenFeature`.
+  """
+  for key, feature in features.items():
+    if not isinstance(feature, parsing_ops.FixedLenFeature):
+      raise ValueError("Only FixedLenFeature can be converted to a column, "
+                       "but feature %r is a %s." % (key, type(feature)))
+  num_rows = 0
+  with ops.Graph().as_default():
+    dataset = dataset_ops.TFRecordDataset(
+        tfrecord_filenames, compression_type=compression_type).batch(
+            rows_per_group).map(
+                lambda serialized: parsing_ops.parse_example(serialized,
+                                                             features))
+    get_next = dataset.make_one_shot_iterator().get_next()
+    with session.Session() as sess, ColumnarWriter(columnar_filename) as writer:
+      while True:
+        try:
+          columns = sess.run(get_next)
+        except errors.OutOfRangeError:
+          break
+        writer.write_row_group(columns)
+        num_rows += len(columns[next(iter(columns))])
+  return num_rows
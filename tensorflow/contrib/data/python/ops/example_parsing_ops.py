@@ -0,0 +1,236 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Bulk parsing of serialized `tf.train.Example` protos into NumPy arrays."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import itertools
+import threading
+
+import numpy as np
+
+from tensorflow.python.client import session
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import ops
+from tensorflow.python.framework import sparse_tensor
+from tensorflow.python.framework import tensor_shape
+from tensorflow.python.ops import array_ops
+from tensorflow.python.ops import parsing_ops
+
+
+class SparseColumn(collections.namedtuple(
+    "SparseColumn", ["values", "indices", "row_splits", "dense_shape"])):
+  """A sparse or variable-length feature, in compressed sparse row format.
+
+  The values of row `i` are `values[row_splits[i]:row_splits[i + 1]]`, and
+  their indices within the row are the corresponding rows of `indices`. For a
+  `VarLenFeature`, `indices` has a single column, holding the position of
+  each value in its row. For a `SparseFeature`, it holds the index of each
+  value in the dense tensor of its row.
+
+  Fields:
+    values: A 1-D array of the values of all rows.
+    indices: A 2-D `int64` array, with a row for each value.
+    row_splits: A 1-D `int64` array of length `num_rows + 1`.
+    dense_shape: A 1-D `int64` array, the shape of the equivalent dense
+      array, whose first dimension is `num_rows`.
+  """
+  pass
+
+
+# The number of `_ExampleParser`s that are kept for reuse.
+_MAX_CACHED_PARSERS = 8
+
+
+class _ExampleParser(object):
+  """Parses batches of serialized examples with the native parser.
+
+  The parsing graph and its session are created once for each feature spec
+  and reused by later calls, so parsing a batch only costs a `Session.run()`.
+  """
+
+  def __init__(self, features):
+    self._graph = ops.Graph()
+    with self._graph.as_default():
+      self._serialized = array_ops.placeholder(dtypes.string, shape=[None])
+      self._parsed = parsing_ops.parse_example(self._serialized, features)
+    self._graph.finalize()
+    self._session = session.Session(graph=self._graph)
+
+  def parse(self, serialized):
+    return self._session.run(self._parsed,
+                             feed_dict={self._serialized: serialized})
+
+
+_parsers = collections.OrderedDict()
+_parsers_lock = threading.Lock()
+
+
+def _hashable_field(value):
+  """Returns a hashable value that identifies a field of a feature config.
+
+  Arrays (e.g. a `default_value`) are identified by their dtype, shape and
+  contents rather than by their `repr()`, which numpy abbreviates for large
+  arrays.
+
+  Raises:
+    TypeError: If `value` cannot be converted to a hashable value.
+  """
+  if value is None or isinstance(value, dtypes.DType):
+    return value
+  if isinstance(value, tensor_shape.TensorShape):
+    return tuple(value.as_list()) if value.ndims is not None else None
+  array = np.asarray(value)
+  if array.dtype.kind == "O":
+    raise TypeError("Cannot hash a feature field of type %s." % type(value))
+  return (array.dtype.str, array.shape, array.tobytes())
+
+
+def _features_key(features):
+  """Returns a hashable key that identifies the feature spec `features`."""
+  return tuple((key, type(feature).__name__,
+                tuple(_hashable_field(field) for field in feature))
+               for key, feature in sorted(features.items()))
+
+
+def _get_parser(features):
+  """Returns a cached `_ExampleParser` for `features`."""
+  try:
+    key = _features_key(features)
+  except TypeError:
+    # The spec contains a value that cannot be compared reliably.
+    return _ExampleParser(features)
+  with _parsers_lock:
+    parser = _parsers.pop(key, None)
+    if parser is None:
+      parser = _ExampleParser(features)
+    _parsers[key] = parser
+    while len(_parsers) > _MAX_CACHED_PARSERS:
+      _parsers.popitem(last=False)
+  return parser
+
+
+def _to_sparse_column(value):
+  """Converts a `SparseTensorValue` to a `SparseColumn`."""
+  num_rows = value.dense_shape[0]
+  row_lengths = np.bincount(value.indices[:, 0], minlength=num_rows)
+  row_splits = np.zeros([num_rows + 1], dtype=np.int64)
+  np.cumsum(row_lengths, out=row_splits[1:])
+  return SparseColumn(values=value.values, indices=value.indices[:, 1:],
+                      row_splits=row_splits, dense_shape=value.dense_shape)
+
+
+def _padding_value(feature, dtype):
+  """Returns the value used to pad a `FixedLenSequenceFeature` column."""
+  if getattr(feature, "default_value", None) is not None:
+    return feature.default_value
+  return b"" if dtype.kind in "OSU" else 0
+
+
+def _concatenate_dense(columns, feature):
+  """Concatenates dense columns, padding them to a common shape.
+
+  `tf.parse_example()` pads a `FixedLenSequenceFeature` only to the longest
+  sequence in its batch, so columns from different batches may differ in
+  their non-batch dimensions.
+  """
+  inner_shape = np.max([column.shape[1:] for column in columns], axis=0)
+  if all(np.array_equal(column.shape[1:], inner_shape) for column in columns):
+    return np.concatenate(columns)
+  num_rows = sum(column.shape[0] for column in columns)
+  result = np.full([num_rows] + list(inner_shape),
+                   _padding_value(feature, columns[0].dtype),
+                   dtype=columns[0].dtype)
+  start = 0
+  for column in columns:
+    index = (slice(start, start + column.shape[0]),) + tuple(
+        slice(0, dim) for dim in column.shape[1:])
+    result[index] = column
+    start += column.shape[0]
+  return result
+
+
+def _concatenate(columns, feature):
+  """Concatenates the columns parsed from consecutive batches."""
+  if len(columns) == 1:
+    return columns[0]
+  if not isinstance(columns[0], SparseColumn):
+    return _concatenate_dense(columns, feature)
+  row_splits = [columns[0].row_splits]
+  for column in columns[1:]:
+    row_splits.append(column.row_splits[1:] + row_splits[-1][-1])
+  dense_shape = np.max([column.dense_shape for column in columns], axis=0)
+  dense_shape[0] = sum(column.dense_shape[0] for column in columns)
+  return SparseColumn(
+      values=np.concatenate([column.values for column in columns]),
+      indices=np.concatenate([column.indices for column in columns]),
+      row_splits=np.concatenate(row_splits),
+      dense_shape=dense_shape)
+
+
+def parse_examples_to_numpy(serialized, features, batch_size=4096):
+  """Parses serialized `tf.train.Example` protos into NumPy arrays.
+
+  This uses the same native parser as `tf.parse_example()`, which is much
+  faster than parsing each record with `tf.train.Example.FromString()`, but
+  it does not require the caller to build a graph or run a session. It is
+  intended for offline tools. For example:
+
+  ```python
+  records = tf.python_io.tf_record_iterator("/data/train.tfrecord")
+  columns = tf.contrib.data.parse_examples_to_numpy(
+      records, {"label": tf.FixedLenFeature([], tf.int64),
+                "tokens": tf.VarLenFeature(tf.string)})
+  labels = columns["label"]  # An array of shape `[num_records]`.
+  tokens = columns["tokens"]  # A `tf.contrib.data.SparseColumn`.
+  ```
+
+  Args:
+    serialized: A list or an iterable of serialized `tf.train.Example`
+      protos.
+    features: A dictionary mapping feature keys to `FixedLenFeature`,
+      `FixedLenSequenceFeature`, `VarLenFeature` or `SparseFeature` values,
+      as for `tf.parse_example()`.
+    batch_size: (Optional.) The number of records parsed at a time. Records
+      are read lazily from `serialized`, so this bounds the memory used by
+      the serialized records.
+
+  Returns:
+    A dictionary mapping each feature key to a NumPy array for dense
+    features, or a `tf.contrib.data.SparseColumn` for `VarLenFeature` and
+    `SparseFeature` values. The first dimension is the record. Values of a
+    `FixedLenSequenceFeature` are padded to the longest sequence across all
+    records with its `default_value`.
+
+  Raises:
+    InvalidArgumentError: If a record cannot be parsed with `features`.
+  """
+  parser = _get_parser(features)
+  serialized = iter(serialized)
+  batches = collections.defaultdict(list)
+  while True:
+    batch = list(itertools.islice(serialized, batch_size))
+    if not batch and batches:
+      break
+    for key, value in parser.parse(batch).items():
+      if isinstance(value, sparse_tensor.SparseTensorValue):
+        value = _to_sparse_column(value)
+      batches[key].append(value)
+    if len(batch) < batch_size:
+      break
+  return {key: _concatenate(columns, features[key])
+          for key, columns in batches.items()}
@@ -0,0 +1,609 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Multi-process dataset constructors for Python generators."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import atexit
+import collections
+import multiprocessing
+import pickle
+import threading
+import traceback
+import weakref
+
+import numpy as np
+from six.moves import queue
+
+from tensorflow.contrib.data.python.ops import dataset_ops
+from tensorflow.python.data.util import nest
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import tensor_shape
+from tensorflow.python.ops import script_ops
+
+
+# Message kinds sent from a worker process to the consuming process.
+_BATCH = 0
+_DONE = 1
+_ERROR = 2
+
+# How long (in seconds) the consumer waits on the results queue before it
+# checks whether the worker processes are still alive.
+_POLL_INTERVAL_SECS = 1.0
+
+
+def _is_compatible_shape(shape, expected_dims):
+  """Returns true if `shape` is compatible with `expected_dims`.
+
+  Args:
+    shape: A tuple of Python integers.
+    expected_dims: A list of Python integers or `None` (for an unknown
+      dimension), or `None` for an unknown rank.
+  """
+  if expected_dims is None:
+    return True
+  if len(shape) != len(expected_dims):
+    return False
+  return all(e is None or e == s for s, e in zip(shape, expected_dims))
+
+
+def _check_dtype(dtype, expected_dtype):
+  if dtype != expected_dtype:
+    raise TypeError(
+        "`generator` yielded an element of type %s where an element "
+        "of type %s was expected." % (dtype, expected_dtype))
+
+
+def _check_shape(shape, expected_dims):
+  if not _is_compatible_shape(shape, expected_dims):
+    raise ValueError(
+        "`generator` yielded an element of shape %s where an element "
+        "of shape %s was expected." % (
+            tensor_shape.TensorShape(shape),
+            tensor_shape.TensorShape(expected_dims)))
+
+
+def _make_batch(elements, expected_dtypes, expected_dims):
+  """Converts a list of flattened elements to per-component batches.
+
+  Each component is stacked into a single array when all of its values have
+  the same shape, so that the dtype and shape only have to be checked once for
+  the whole batch. Components with varying shapes are kept as a list of
+  arrays, and each array is checked individually.
+
+  Args:
+    elements: A list of flattened elements, each of which is a list with one
+      entry per component.
+    expected_dtypes: A list of numpy dtypes, one per component.
+    expected_dims: A list with one entry per component, as accepted by
+      `_is_compatible_shape()`.
+
+  Returns:
+    A list with one entry per component, which is either a numpy array whose
+    leading dimension is `len(elements)`, or a list of `len(elements)` numpy
+    arrays.
+
+  Raises:
+    TypeError: If a component does not have the expected dtype.
+    ValueError: If a component does not have the expected shape.
+  """
+  # pylint: disable=protected-access
+  convert = script_ops.FuncRegistry._convert
+  # pylint: enable=protected-access
+  components = []
+  for i, (expected_dtype, dims) in enumerate(zip(expected_dtypes,
+                                                 expected_dims)):
+    arrays = [convert(element[i]) for element in elements]
+    first_shape = arrays[0].shape
+    if all(array.shape == first_shape for array in arrays):
+      _check_shape(first_shape, dims)
+      stacked = np.stack(arrays)
+      _check_dtype(stacked.dtype, expected_dtype)
+      components.append(stacked)
+    else:
+      for array in arrays:
+        _check_dtype(array.dtype, expected_dtype)
+        _check_shape(array.shape, dims)
+      components.append(arrays)
+  return components
+
+
+def _is_shareable(component):
+  """Returns true if `component` can be copied into a shared memory slot."""
+  return isinstance(component, np.ndarray) and component.dtype.kind not in "OSU"
+
+
+def _write_to_slot(components, slot):
+  """Copies `components` into `slot` and returns the metadata to read them.
+
+  Args:
+    components: A list of numpy arrays with fixed-width dtypes.
+    slot: A `multiprocessing.RawArray` of bytes.
+
+  Returns:
+    A list of `(dtype string, shape, offset)` tuples, one per component, or
+    `None` if the components do not fit in `slot`.
+  """
+  if sum(c.nbytes for c in components) > len(slot):
+    return None
+  buf = np.frombuffer(slot, dtype=np.uint8)
+  metadata = []
+  offset = 0
+  for component in components:
+    nbytes = component.nbytes
+    buf[offset:offset + nbytes] = np.ascontiguousarray(component).view(
+        np.uint8).reshape([-1])
+    metadata.append((component.dtype.str, component.shape, offset))
+    offset += nbytes
+  return metadata
+
+
+def _read_from_slot(metadata, slot):
+  """Copies the components described by `metadata` out of `slot`."""
+  components = []
+  for dtype_str, shape, offset in metadata:
+    dtype = np.dtype(dtype_str)
+    count = int(np.prod(shape))
+    components.append(
+        np.frombuffer(slot, dtype=dtype, count=count,
+                      offset=offset).reshape(shape).copy())
+  return components
+
+
+def _picklable_exception(e):
+  """Returns `e` if it can be pickled, and a `RuntimeError` otherwise."""
+  try:
+    pickle.dumps(e)
+    return e
+  except Exception:  # pylint: disable=broad-except
+    return RuntimeError(traceback.format_exc())
+
+
+def _run_generator_shard(generator, shard_index, num_shards, structure,
+                         expected_dtypes, expected_dims, batch_size, slots,
+                         free_slots, results):
+  """The main function of a worker process.
+
+  Runs `generator(shard_index, num_shards)` to completion, and sends its
+  elements to the consumer in batches of `batch_size`. The worker may only
+  send a batch after it takes a slot index from `free_slots`, which bounds the
+  number of batches that are buffered for each worker. Batches of fixed-width
+  arrays that fit are written to the corresponding shared memory slot, and
+  all other batches are pickled through the `results` queue.
+
+  Args:
+    generator: The user-provided generator function.
+    shard_index: The index of this worker.
+    num_shards: The total number of workers.
+    structure: A nested structure with the same shape as the elements.
+    expected_dtypes: A list of numpy dtypes, one per component.
+    expected_dims: A list with one entry per component, as accepted by
+      `_is_compatible_shape()`.
+    batch_size: The maximum number of elements to send in a single batch.
+    slots: A list of `multiprocessing.RawArray` objects owned by this worker.
+    free_slots: A `multiprocessing.Queue` of indices into `slots` that may be
+      written.
+    results: A `multiprocessing.Queue` shared by all workers, on which to send
+      `(kind, shard_index, payload)` messages.
+  """
+
+  def send(elements):
+    components = _make_batch(elements, expected_dtypes, expected_dims)
+    slot_index = free_slots.get()
+    metadata = None
+    if all(_is_shareable(c) for c in components):
+      metadata = _write_to_slot(components, slots[slot_index])
+    if metadata is not None:
+      results.put((_BATCH, shard_index, (slot_index, metadata, None)))
+    else:
+      results.put((_BATCH, shard_index, (slot_index, None, components)))
+
+  try:
+    elements = []
+    for values in generator(shard_index, num_shards):
+      elements.append(nest.flatten_up_to(structure, values))
+      if len(elements) == batch_size:
+        send(elements)
+        elements = []
+    if elements:
+      send(elements)
+    results.put((_DONE, shard_index, None))
+  except Exception as e:  # pylint: disable=broad-except
+    results.put((_ERROR, shard_index, _picklable_exception(e)))
+
+
+class _ShardedGeneratorIterator(object):
+  """Consumes batches produced by a set of worker processes.
+
+  In ordered mode, batches are consumed from the shards in round-robin order,
+  skipping shards that have been exhausted. In sloppy mode, batches are
+  consumed in the order in which they arrive.
+  """
+
+  def __init__(self, generator, num_workers, batch_size, sloppy, structure,
+               expected_dtypes, expected_dims, prefetch_batches,
+               shared_memory_bytes):
+    self._num_workers = num_workers
+    self._sloppy = sloppy
+    self._results = multiprocessing.Queue()
+    self._slots = []
+    self._free_slots = []
+    self._processes = []
+    for shard_index in range(num_workers):
+      slots = [multiprocessing.RawArray("b", shared_memory_bytes)
+               for _ in range(prefetch_batches)]
+      free_slots = multiprocessing.Queue()
+      for slot_index in range(prefetch_batches):
+        free_slots.put(slot_index)
+      process = multiprocessing.Process(
+          target=_run_generator_shard,
+          args=(generator, shard_index, num_workers, structure,
+                expected_dtypes, expected_dims, batch_size, slots, free_slots,
+                self._results))
+      process.daemon = True
+      self._slots.append(slots)
+      self._free_slots.append(free_slots)
+      self._processes.append(process)
+    for process in self._processes:
+      process.start()
+
+    # The batches received from each shard, as `(slot_index, metadata,
+    # components)` payloads. A batch keeps its slot until it is popped, so
+    # that at most `prefetch_batches` batches are buffered per shard, however
+    # far the other shards are behind.
+    self._pending = [collections.deque() for _ in range(num_workers)]
+    self._finished = set()
+    # The shards that may still produce a batch, in round-robin order.
+    self._order = collections.deque(range(num_workers))
+    # The batch that `next_element()` is currently consuming, and its position.
+    self._batch = None
+    self._batch_size = 0
+    self._batch_position = 0
+
+  def _receive(self):
+    """Blocks until a message from a worker has been handled."""
+    while True:
+      try:
+        kind, shard_index, payload = self._results.get(
+            timeout=_POLL_INTERVAL_SECS)
+        break
+      except queue.Empty:
+        if not self._processes:
+          raise RuntimeError("The generator workers have been stopped.")
+        for shard_index, process in enumerate(self._processes):
+          if shard_index not in self._finished and not process.is_alive():
+            self.close()
+            raise RuntimeError(
+                "Generator worker %d exited unexpectedly with exit code %s." %
+                (shard_index, process.exitcode))
+
+    if kind == _BATCH:
+      self._pending[shard_index].append(payload)
+    elif kind == _DONE:
+      self._finished.add(shard_index)
+    else:
+      self.close()
+      raise payload
+
+  def _pop_pending(self, shard_index):
+    """Pops the oldest pending batch of a shard, and frees its slot."""
+    slot_index, metadata, components = self._pending[shard_index].popleft()
+    if metadata is not None:
+      components = _read_from_slot(metadata,
+                                   self._slots[shard_index][slot_index])
+    self._free_slots[shard_index].put(slot_index)
+    return components
+
+  def next_batch(self):
+    """Returns the next batch as a list with one entry per component.
+
+    Raises:
+      StopIteration: If every shard has been exhausted.
+    """
+    if self._sloppy:
+      while True:
+        for shard_index, pending in enumerate(self._pending):
+          if pending:
+            return self._pop_pending(shard_index)
+        if len(self._finished) == self._num_workers:
+          raise StopIteration
+        self._receive()
+
+    while self._order:
+      shard_index = self._order[0]
+      if self._pending[shard_index]:
+        self._order.rotate(-1)
+        return self._pop_pending(shard_index)
+      elif shard_index in self._finished:
+        self._order.popleft()
+      else:
+        self._receive()
+    raise StopIteration
+
+  def next_element(self):
+    """Returns the next element as a list with one entry per component.
+
+    Raises:
+      StopIteration: If every shard has been exhausted.
+    """
+    if self._batch_position == self._batch_size:
+      self._batch = self.next_batch()
+      self._batch_size = len(self._batch[0])
+      self._batch_position = 0
+    position = self._batch_position
+    self._batch_position += 1
+    return [component[position] for component in self._batch]
+
+  def close(self):
+    """Stops the worker processes and releases the shared memory slots.
+
+    It is safe to call this method more than once.
+    """
+    for process in self._processes:
+      if process.is_alive():
+        process.terminate()
+    for process in self._processes:
+      process.join()
+    self._processes = []
+    self._slots = []
+    self._free_slots = []
+
+
+class _ParallelGeneratorState(object):
+  """Stores outstanding iterators created from a sharded Python generator.
+
+  Each iterator starts its own set of worker processes the first time that it
+  is used, and stops them when it is exhausted. Iterators that are not run to
+  exhaustion (e.g. because of a `take()` later in the pipeline, or because an
+  initializable iterator was re-initialized) are closed when more than
+  `max_live_iterators` iterators have started, oldest first, and any iterators
+  that are still live when the interpreter exits are closed then.
+  """
+
+  def __init__(self, generator, max_live_iterators, **iterator_kwargs):
+    self._generator = generator
+    self._max_live_iterators = max_live_iterators
+    self._iterator_kwargs = iterator_kwargs
+    self._lock = threading.Lock()
+    self._next_id = 0  # GUARDED_BY(self._lock)
+    # Maps the ID of each live iterator to the iterator, in the order in which
+    # they were started.
+    self._iterators = collections.OrderedDict()  # GUARDED_BY(self._lock)
+    # The IDs of iterators that were closed before they were exhausted.
+    self._evicted_ids = set()  # GUARDED_BY(self._lock)
+    atexit.register(_close_all_iterators, weakref.ref(self))
+
+  def get_next_id(self):
+    with self._lock:
+      ret = self._next_id
+      self._next_id += 1
+    return ret
+
+  def get_iterator(self, iterator_id):
+    """Returns the iterator for `iterator_id`, starting it if necessary.
+
+    Raises:
+      RuntimeError: If the iterator was closed because too many iterators
+        were live.
+    """
+    evicted = []
+    with self._lock:
+      if iterator_id in self._evicted_ids:
+        raise RuntimeError(
+            "The generator workers for this iterator were stopped because "
+            "more than %d iterators over the same dataset were live. Increase "
+            "`max_live_iterators` to use more iterators concurrently." %
+            self._max_live_iterators)
+      iterator = self._iterators.get(iterator_id)
+      if iterator is None:
+        while len(self._iterators) >= self._max_live_iterators:
+          evicted_id, evicted_iterator = self._iterators.popitem(last=False)
+          self._evicted_ids.add(evicted_id)
+          evicted.append(evicted_iterator)
+        iterator = _ShardedGeneratorIterator(self._generator,
+                                             **self._iterator_kwargs)
+        self._iterators[iterator_id] = iterator
+    for evicted_iterator in evicted:
+      evicted_iterator.close()
+    return iterator
+
+  def iterator_completed(self, iterator_id):
+    with self._lock:
+      iterator = self._iterators.pop(iterator_id)
+    iterator.close()
+
+  def close_all(self):
+    """Closes every live iterator."""
+    with self._lock:
+      iterators = list(self._iterators.values())
+      self._evicted_ids.update(self._iterators.keys())
+      self._iterators.clear()
+    for iterator in iterators:
+      iterator.close()
+
+
+def _close_all_iterators(state_ref):
+  """An `atexit` handler that stops any workers left running by a state."""
+  state = state_ref()
+  if state is not None:
+    state.close_all()
+
+
+def parallel_from_generator(generator,
+                            output_types,
+                            output_shapes=None,
+                            num_workers=2,
+                            batch_size=64,
+                            sloppy=False,
+                            prefetch_batches=2,
+                            shared_memory_bytes=16 * 1024 * 1024,
+                            max_live_iterators=4):
+  """Creates a `Dataset` whose elements are generated by parallel generators.
+
+  This is a multi-process version of `Dataset.from_generator()`. The
+  `generator` is invoked as `generator(shard_index, num_workers)` in each of
+  `num_workers` worker processes, and should yield the elements of the
+  `shard_index`-th shard of the data. Each worker converts its elements to
+  numpy arrays, checks their types and shapes once per batch of
+  `batch_size` elements, and sends each batch to the consuming process,
+  through shared memory when the batch contains only fixed-width (i.e. non
+  string) arrays that fit in `shared_memory_bytes`.
+
+  For example:
+
+  ```python
+  def gen(shard_index, num_shards):
+    for i in range(shard_index, 1000, num_shards):
+      yield (i, decode_image(filenames[i]))
+
+  ds = tf.contrib.data.parallel_from_generator(
+      gen, (tf.int64, tf.uint8),
+      (tf.TensorShape([]), tf.TensorShape([224, 224, 3])), num_workers=8)
+  ```
+
+  If `sloppy` is `False`, the elements are produced by taking `batch_size`
+  consecutive elements from each shard in round-robin order, so the output
+  is deterministic if each shard is. If `sloppy` is `True`, batches are
+  produced in the order in which they become available.
+
+  Each traversal of the returned dataset starts its own worker processes,
+  which are stopped when the traversal is exhausted. Traversals that end early
+  (e.g. because of a `take()` or an error later in the pipeline, or because an
+  initializable iterator is re-initialized) keep their workers until more than
+  `max_live_iterators` traversals have started, at which point the workers of
+  the oldest traversal are stopped; continuing that traversal raises an error.
+
+  When every component of `output_shapes` is fully defined, each batch is
+  passed to TensorFlow with a single `py_func` call; otherwise, the elements
+  of a batch are passed one at a time.
+
+  NOTE: `generator` runs in a separate process, so it must not use
+  TensorFlow, and any state that it modifies is not visible to the caller.
+  If the platform does not fork new processes, `generator` must be picklable.
+
+  Args:
+    generator: A callable object that takes two arguments, `shard_index` and
+      `num_shards`, and returns an object that supports the `iter()` protocol.
+    output_types: A nested structure of `tf.DType` objects corresponding to
+      each component of an element yielded by `generator`.
+    output_shapes: (Optional.) A nested structure of `tf.TensorShape`
+      objects corresponding to each component of an element yielded by
+      `generator`.
+    num_workers: The number of worker processes (and shards) to use.
+    batch_size: The number of consecutive elements that each worker sends to
+      the consumer at a time.
+    sloppy: (Optional.) If `True`, the order of the elements is not
+      deterministic.
+    prefetch_batches: The maximum number of batches that each worker may have
+      buffered at a time.
+    shared_memory_bytes: The size of each of the `prefetch_batches` shared
+      memory buffers allocated per worker.
+    max_live_iterators: The maximum number of traversals of the returned
+      dataset whose worker processes may run at the same time.
+
+  Returns:
+    A `Dataset`.
+
+  Raises:
+    TypeError: If `generator` is not callable.
+    ValueError: If `num_workers`, `batch_size`, `prefetch_batches` or
+      `max_live_iterators` is not positive, or if `shared_memory_bytes` is
+      negative.
+  """
+  if not callable(generator):
+    raise TypeError("`generator` must be callable.")
+  if num_workers <= 0:
+    raise ValueError("`num_workers` must be positive, got %d." % num_workers)
+  if batch_size <= 0:
+    raise ValueError("`batch_size` must be positive, got %d." % batch_size)
+  if prefetch_batches <= 0:
+    raise ValueError(
+        "`prefetch_batches` must be positive, got %d." % prefetch_batches)
+  if max_live_iterators <= 0:
+    raise ValueError("`max_live_iterators` must be positive, got %d." %
+                     max_live_iterators)
+  if shared_memory_bytes < 0:
+    raise ValueError("`shared_memory_bytes` must not be negative, got %d." %
+                     shared_memory_bytes)
+  if output_shapes is None:
+    output_shapes = nest.map_structure(
+        lambda _: tensor_shape.TensorShape(None), output_types)
+  else:
+    output_shapes = nest.map_structure_up_to(
+        output_types, tensor_shape.as_shape, output_shapes)
+
+  flattened_types = nest.flatten(output_types)
+  flattened_shapes = nest.flatten(output_shapes)
+  is_batched = all(shape.is_fully_defined() for shape in flattened_shapes)
+
+  generator_state = _ParallelGeneratorState(
+      generator,
+      max_live_iterators=max_live_iterators,
+      num_workers=num_workers,
+      batch_size=batch_size,
+      sloppy=sloppy,
+      # The workers only need the structure, dtypes and shapes in a form that
+      # can be sent to another process.
+      structure=nest.map_structure(lambda _: None, output_types),
+      expected_dtypes=[t.as_numpy_dtype for t in flattened_types],
+      expected_dims=[
+          None if s.ndims is None else s.as_list() for s in flattened_shapes],
+      prefetch_batches=prefetch_batches,
+      shared_memory_bytes=shared_memory_bytes)
+
+  def get_iterator_id_map_fn(unused_dummy):
+    return script_ops.py_func(
+        generator_state.get_next_id, [], dtypes.int64, stateful=True)
+
+  def generator_map_fn(iterator_id_t):
+    """Generates the next batch or element from the iterator."""
+
+    def generator_py_func(iterator_id):
+      """A `py_func` that will be called to invoke the iterator."""
+      iterator = generator_state.get_iterator(iterator_id)
+      try:
+        if is_batched:
+          return iterator.next_batch()
+        return iterator.next_element()
+      except StopIteration:
+        generator_state.iterator_completed(iterator_id)
+        raise StopIteration("Iteration finished.")
+
+    flat_values = script_ops.py_func(
+        generator_py_func, [iterator_id_t], flattened_types, stateful=True)
+
+    # The `py_func()` op drops the inferred shapes, so we add them back in
+    # here.
+    for ret_t, shape in zip(flat_values, flattened_shapes):
+      if is_batched:
+        shape = tensor_shape.vector(None).concatenate(shape)
+      ret_t.set_shape(shape)
+
+    return nest.pack_sequence_as(output_types, flat_values)
+
+  def flat_map_fn(iterator_id_t):
+    repeated_id = dataset_ops.Dataset.from_tensors(iterator_id_t).repeat(None)
+    dataset = repeated_id.map(generator_map_fn)
+    if is_batched:
+      dataset = dataset.apply(dataset_ops.unbatch())
+    return dataset
+
+  # As in `Dataset.from_generator()`, each traversal of the returned dataset
+  # gets a fresh iterator ID, and therefore a fresh set of worker processes.
+  dummy = 0
+  id_dataset = dataset_ops.Dataset.from_tensors(dummy).map(
+      get_iterator_id_map_fn)
+  return id_dataset.flat_map(flat_map_fn)
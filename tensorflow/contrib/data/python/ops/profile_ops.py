@@ -0,0 +1,345 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Per-stage profiling of input pipelines."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import copy
+import threading
+import time
+
+from tensorflow.contrib.data.python.ops import autotune_ops
+from tensorflow.python.client import session
+from tensorflow.python.client import timeline
+from tensorflow.python.data.ops import dataset_ops
+from tensorflow.python.data.util import nest
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import errors
+from tensorflow.python.framework import ops
+from tensorflow.python.ops import array_ops
+from tensorflow.python.ops import script_ops
+
+
+# Stages that hold elements between their input and output, for which the
+# number of buffered elements is reported.
+_BUFFERING_STAGES = frozenset(
+    ["ParallelMapDataset", "PrefetchDataset", "ShuffleDataset"])
+
+
+def _unwrap(dataset):
+  """Returns the core `Dataset` wrapped by a `tf.contrib.data.Dataset`."""
+  while not hasattr(dataset, "_input_dataset") and hasattr(dataset, "_dataset"):
+    dataset = dataset._dataset  # pylint: disable=protected-access
+  return dataset
+
+
+def _pipeline_stages(dataset):
+  """Returns the stages of the main chain of `dataset`, from its source.
+
+  The main chain follows the `_input_dataset` of each stage. Other inputs,
+  such as the datasets passed to `Dataset.zip()` or `Dataset.concatenate()`,
+  or created by the function of `Dataset.flat_map()`, are treated as part of
+  the stage that consumes them.
+  """
+  stages = []
+  dataset = _unwrap(dataset)
+  while True:
+    stages.append(dataset)
+    input_dataset = getattr(dataset, "_input_dataset", None)
+    if input_dataset is None:
+      break
+    dataset = _unwrap(input_dataset)
+  stages.reverse()
+  return stages
+
+
+class _StageProfile(object):
+  """The runtime statistics of a single stage."""
+
+  def __init__(self, name, buffering):
+    self.name = name
+    self.buffering = buffering
+    self.reset()
+
+  def reset(self):
+    self.num_elements = 0
+    self.first_time = None
+    self.last_time = None
+    self.self_time = 0.0
+    self.total_bytes = 0
+    self.buffered_sum = 0
+    self.max_buffered = 0
+
+
+class PipelineProfiler(object):
+  """Records per-stage statistics of an input pipeline.
+
+  `instrument()` returns a copy of a pipeline in which the output of each
+  stage on its main chain (see below) is recorded as it is produced. From
+  these records, the profiler computes for each stage:
+
+  * The number of elements that it produced, and its throughput.
+  * Its "self time": the sum, over its outputs, of the time since the stage
+    received its latest input (or, for the source, since the last element was
+    recorded anywhere in the pipeline). For a stage that computes its outputs
+    synchronously, this is the time spent in the stage itself, excluding its
+    inputs. For a stage that prefetches, it is the time that its consumer
+    waited for it. The stage with the largest self time is reported as the
+    bottleneck.
+  * The mean size of its elements.
+  * For stages that buffer elements (`prefetch()`, `shuffle()` and `map()`
+    with `num_parallel_calls`), the mean and maximum number of elements
+    between their input and output.
+
+  The main chain of a pipeline follows the input of each transformation back
+  to the source. Datasets that are combined into the pipeline (e.g. with
+  `Dataset.zip()`, or in the function of `Dataset.interleave()`) are
+  profiled as part of the stage that consumes them.
+
+  For example:
+
+  ```python
+  profiler = tf.contrib.data.PipelineProfiler()
+  dataset = profiler.instrument(make_dataset())
+  next_element = dataset.make_one_shot_iterator().get_next()
+  for _ in range(1000):
+    sess.run(next_element)
+  print(profiler.report())
+  with open("/tmp/pipeline_trace.json", "w") as f:
+    f.write(profiler.chrome_trace())
+  ```
+
+  Recording an element calls into Python once per stage, so the profile is
+  most accurate for stages that take longer than a few tens of microseconds
+  per element.
+  """
+
+  def __init__(self, max_trace_events=100000):
+    """Creates a new `PipelineProfiler`.
+
+    Args:
+      max_trace_events: (Optional.) The maximum number of events to keep for
+        `chrome_trace()`.
+    """
+    self._max_trace_events = max_trace_events
+    self._lock = threading.Lock()
+    self._stages = []  # GUARDED_BY(self._lock)
+    self._last_time = None  # GUARDED_BY(self._lock)
+    # A list of `(stage index, start time, end time, buffered elements)`.
+    self._trace_events = []  # GUARDED_BY(self._lock)
+
+  def _reset(self):
+    """Discards all statistics recorded so far."""
+    with self._lock:
+      for stage in self._stages:
+        stage.reset()
+      self._last_time = None
+      self._trace_events = []
+
+  def _record(self, index, num_bytes):
+    now = time.time()
+    with self._lock:
+      stage = self._stages[index]
+      if index == 0:
+        start = self._last_time
+      else:
+        start = self._stages[index - 1].last_time
+      if start is None or start > now:
+        start = now
+      if stage.last_time is not None and stage.last_time > start:
+        start = stage.last_time
+      stage.self_time += now - start
+      stage.num_elements += 1
+      if stage.first_time is None:
+        stage.first_time = now
+      stage.last_time = now
+      stage.total_bytes += num_bytes
+      buffered = None
+      if stage.buffering:
+        buffered = max(0, self._stages[index - 1].num_elements -
+                       stage.num_elements)
+        stage.buffered_sum += buffered
+        stage.max_buffered = max(stage.max_buffered, buffered)
+      self._last_time = now
+      if len(self._trace_events) < self._max_trace_events:
+        self._trace_events.append((index, start, now, buffered))
+    return True
+
+  def _probe(self, dataset, index):
+    """Returns `dataset`, with each element recorded as stage `index`."""
+    output_types = dataset.output_types
+
+    def probe_fn(*args):
+      flat_values = nest.flatten(args)
+      # pylint: disable=protected-access
+      num_bytes = autotune_ops._element_bytes(flat_values)
+      # pylint: enable=protected-access
+      recorded = script_ops.py_func(
+          lambda num_bytes: self._record(index, num_bytes), [num_bytes],
+          dtypes.bool, stateful=True)
+      with ops.control_dependencies([recorded]):
+        flat_values = [array_ops.identity(v) for v in flat_values]
+      return nest.pack_sequence_as(output_types, flat_values)
+
+    return dataset_ops.MapDataset(dataset, probe_fn)
+
+  def instrument(self, dataset):
+    """Returns a copy of `dataset` that records the output of each stage.
+
+    Args:
+      dataset: A `Dataset`.
+
+    Returns:
+      A `Dataset` with the same elements as `dataset`.
+
+    Raises:
+      ValueError: If this profiler has already instrumented a pipeline.
+    """
+    with self._lock:
+      if self._stages:
+        raise ValueError("A PipelineProfiler can only instrument one "
+                         "pipeline.")
+      stages = _pipeline_stages(dataset)
+      for index, stage in enumerate(stages):
+        class_name = type(stage).__name__
+        self._stages.append(_StageProfile(
+            "%d_%s" % (index, class_name),
+            index > 0 and class_name in _BUFFERING_STAGES))
+
+    probed = None
+    for index, stage in enumerate(stages):
+      if probed is not None:
+        stage = copy.copy(stage)
+        stage._input_dataset = probed  # pylint: disable=protected-access
+      probed = self._probe(stage, index)
+    return probed
+
+  def stats(self):
+    """Returns the statistics of each stage.
+
+    Returns:
+      An `OrderedDict` that maps the name of each stage, in pipeline order
+      from the source, to a dictionary with the keys `"elements"`,
+      `"elements_per_sec"`, `"self_time_sec"`, `"self_time_fraction"` and
+      `"mean_element_bytes"`, and for buffering stages,
+      `"mean_buffered_elements"` and `"max_buffered_elements"`.
+    """
+    with self._lock:
+      total_self_time = sum(s.self_time for s in self._stages)
+      result = collections.OrderedDict()
+      for stage in self._stages:
+        stats = {
+            "elements": stage.num_elements,
+            "self_time_sec": stage.self_time,
+            "self_time_fraction": (stage.self_time / total_self_time
+                                   if total_self_time else 0.0),
+            "mean_element_bytes": (stage.total_bytes / stage.num_elements
+                                   if stage.num_elements else 0.0),
+        }
+        if stage.num_elements > 1 and stage.last_time > stage.first_time:
+          stats["elements_per_sec"] = ((stage.num_elements - 1) /
+                                       (stage.last_time - stage.first_time))
+        else:
+          stats["elements_per_sec"] = 0.0
+        if stage.buffering:
+          stats["mean_buffered_elements"] = (
+              stage.buffered_sum / stage.num_elements
+              if stage.num_elements else 0.0)
+          stats["max_buffered_elements"] = stage.max_buffered
+        result[stage.name] = stats
+      return result
+
+  def bottleneck(self):
+    """Returns the name of the stage with the largest self time, or `None`."""
+    with self._lock:
+      if not any(s.num_elements for s in self._stages):
+        return None
+      return max(self._stages, key=lambda s: s.self_time).name
+
+  def report(self):
+    """Returns a human-readable table of the statistics of each stage."""
+    lines = ["%-32s %10s %12s %10s %8s %10s" % (
+        "stage", "elements", "elements/s", "self (s)", "self %",
+        "buffered")]
+    for name, stats in self.stats().items():
+      buffered = stats.get("mean_buffered_elements")
+      lines.append("%-32s %10d %12.1f %10.3f %7.1f%% %10s" % (
+          name, stats["elements"], stats["elements_per_sec"],
+          stats["self_time_sec"], 100.0 * stats["self_time_fraction"],
+          "-" if buffered is None else "%.1f" % buffered))
+    lines.append("Bottleneck: %s" % self.bottleneck())
+    return "\n".join(lines)
+
+  def chrome_trace(self):
+    """Returns the recorded events in Chrome Trace Format.
+
+    Each stage is shown as a separate thread, with a region for each element
+    spanning its self time, and the number of buffered elements in buffering
+    stages is shown as a counter. The result can be loaded in
+    `chrome://tracing`.
+
+    Returns:
+      A JSON-formatted string.
+    """
+    # pylint: disable=protected-access
+    formatter = timeline._ChromeTraceFormatter()
+    # pylint: enable=protected-access
+    pid = 0
+    formatter.emit_pid("Input pipeline", pid)
+    with self._lock:
+      for index, stage in enumerate(self._stages):
+        formatter.emit_tid(stage.name, pid, index)
+      for index, start, end, buffered in self._trace_events:
+        name = self._stages[index].name
+        formatter.emit_region(int(start * 1e6), int((end - start) * 1e6), pid,
+                              index, "Dataset", name, {})
+        if buffered is not None:
+          formatter.emit_counter("Dataset", name, pid, int(end * 1e6),
+                                 "buffered_elements", buffered)
+    return formatter.format_to_string()
+
+
+def profile_pipeline(dataset, num_elements, warmup_elements=0,
+                     session_config=None):
+  """Runs `dataset` standalone, and returns a profile of its stages.
+
+  This function must be called in the graph in which `dataset` was created.
+
+  Args:
+    dataset: A `Dataset`.
+    num_elements: The number of elements to profile.
+    warmup_elements: (Optional.) The number of elements to produce before
+      profiling starts. Their statistics are discarded.
+    session_config: (Optional.) A `tf.ConfigProto` for the session that runs
+      the pipeline.
+
+  Returns:
+    A `PipelineProfiler` whose statistics cover up to `num_elements` elements
+    of `dataset`.
+  """
+  profiler = PipelineProfiler()
+  get_next = profiler.instrument(dataset).make_one_shot_iterator().get_next()
+  with session.Session(config=session_config) as sess:
+    try:
+      for _ in range(warmup_elements):
+        sess.run(nest.flatten(get_next))
+      profiler._reset()  # pylint: disable=protected-access
+      for _ in range(num_elements):
+        sess.run(nest.flatten(get_next))
+    except errors.OutOfRangeError:
+      pass
+  return profiler
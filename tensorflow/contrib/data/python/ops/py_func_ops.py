@@ -0,0 +1,248 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Dataset transformations that call Python functions on batches."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+
+from tensorflow.contrib.data.python.ops import dataset_ops as contrib_dataset_ops
+from tensorflow.python.data.ops import dataset_ops
+from tensorflow.python.data.util import nest
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import tensor_shape
+from tensorflow.python.ops import array_ops
+from tensorflow.python.ops import script_ops
+
+
+def _check_ranks_known(shapes, what):
+  for shape in shapes:
+    if shape.ndims is None:
+      raise ValueError(
+          "`map_batched_py_func()` requires the rank of each %s to be known, "
+          "but got shape %s." % (what, shape))
+
+
+def _check_batch_length(batch_length, input_size):
+  if batch_length != input_size:
+    raise ValueError(
+        "`func` returned a batch of %s elements for an input batch of %d "
+        "elements." % (batch_length, input_size))
+
+
+def _unpad(padded, shapes):
+  """Returns a list of the unpadded elements of a padded batch.
+
+  Args:
+    padded: A numpy array whose leading dimension is the batch size.
+    shapes: A numpy array of shape `[batch_size, rank]`, containing the actual
+      shape of each element of `padded`.
+  """
+  return [element[tuple(slice(0, d) for d in shape)]
+          for element, shape in zip(padded, shapes)]
+
+
+def _pad(arrays, dtype):
+  """Pads a list of arrays with the same rank into a single array.
+
+  Args:
+    arrays: A non-empty list of numpy arrays with the same, non-zero rank.
+    dtype: The numpy dtype of the result.
+
+  Returns:
+    A tuple of the padded array, with leading dimension `len(arrays)`, and an
+    int64 array of shape `[len(arrays), rank]` that contains the shape of each
+    of `arrays`.
+  """
+  shapes = np.array([array.shape for array in arrays], dtype=np.int64)
+  shapes = shapes.reshape([len(arrays), -1])
+  padded_shape = [len(arrays)] + list(np.max(shapes, axis=0))
+  padding_value = b"" if dtype == np.object_ else 0
+  padded = np.full(padded_shape, padding_value, dtype=dtype)
+  for i, array in enumerate(arrays):
+    padded[(i,) + tuple(slice(0, d) for d in array.shape)] = array
+  return padded, shapes
+
+
+def map_batched_py_func(func, output_types, output_shapes, batch_size=128):
+  """Maps a Python function across batches of the elements of a dataset.
+
+  `Dataset.map()` with a `tf.py_func()` pays the cost of calling into Python
+  and converting the arguments and return values once per element. This
+  transformation instead groups up to `batch_size` consecutive input elements,
+  calls `func` once per group, and splits the results back into individual
+  elements, so the resulting dataset has the same elements as
+  `dataset.map(lambda *args: tf.py_func(f, args, ...))`, where `f` is the
+  per-element version of `func`.
+
+  `func` receives one argument per component of the input elements (in the
+  same way as `Dataset.map()`). Each argument is a numpy array whose leading
+  dimension is the batch size if the component has a fully defined shape,
+  and a list with one numpy array per element otherwise. `func` must return
+  a nested structure matching `output_types`, in which each component is
+  either a numpy array (or a value convertible to one) whose leading dimension
+  is the batch size, or a list with one array-like value per element. The
+  latter form is required for components whose shapes differ between
+  elements.
+
+  For example:
+
+  ```python
+  def tokenize(lines):
+    # `lines` is an array of strings with shape `[batch_size]`.
+    return [np.array(line.split(), dtype=object) for line in lines]
+
+  dataset = dataset.apply(tf.contrib.data.map_batched_py_func(
+      tokenize, tf.string, tf.TensorShape([None]), batch_size=256))
+  ```
+
+  Args:
+    func: A Python function that maps a batch of input elements to a batch of
+      output elements, as described above.
+    output_types: A nested structure of `tf.DType` objects corresponding to
+      each component of an output element.
+    output_shapes: A nested structure of `tf.TensorShape` objects
+      corresponding to each component of an output element. The rank of each
+      component must be known.
+    batch_size: The maximum number of elements to pass to `func` in a single
+      call.
+
+  Returns:
+    A `Dataset` transformation function, which can be passed to
+    @{tf.contrib.data.Dataset.apply}.
+
+  Raises:
+    ValueError: If the rank of a component of `output_shapes` is unknown.
+  """
+  output_shapes = nest.map_structure_up_to(
+      output_types, tensor_shape.as_shape, output_shapes)
+  flat_output_types = nest.flatten(output_types)
+  flat_output_shapes = nest.flatten(output_shapes)
+  _check_ranks_known(flat_output_shapes, "output component")
+  ragged_outputs = [i for i, shape in enumerate(flat_output_shapes)
+                    if not shape.is_fully_defined()]
+
+  def _apply_fn(dataset):
+    """Function from `Dataset` to `Dataset` that applies the transformation."""
+    input_types = dataset.output_types
+    flat_input_types = nest.flatten(input_types)
+    flat_input_shapes = nest.flatten(dataset.output_shapes)
+    _check_ranks_known(flat_input_shapes, "input component")
+    ragged_inputs = [i for i, shape in enumerate(flat_input_shapes)
+                     if not shape.is_fully_defined()]
+    num_inputs = len(flat_input_types)
+    num_outputs = len(flat_output_types)
+
+    def batch_py_func(*args):
+      """A `py_func` that calls `func` on a whole batch."""
+      flat_args = list(args[:num_inputs])
+      for i, shapes in zip(ragged_inputs, args[num_inputs:]):
+        flat_args[i] = _unpad(flat_args[i], shapes)
+      input_size = len(flat_args[0])
+      nested_args = nest.pack_sequence_as(input_types, flat_args)
+      # pylint: disable=protected-access
+      if dataset_ops._should_unpack_args(nested_args):
+        ret = func(*nested_args)
+      else:
+        ret = func(nested_args)
+      convert = script_ops.FuncRegistry._convert
+      # pylint: enable=protected-access
+      if isinstance(ret, list):
+        ret = tuple(ret)
+      flat_ret = nest.flatten_up_to(output_types, ret)
+
+      outputs = []
+      output_shapes_for_ragged = []
+      for i, (value, expected_dtype, expected_shape) in enumerate(
+          zip(flat_ret, flat_output_types, flat_output_shapes)):
+        expected_np_dtype = expected_dtype.as_numpy_dtype
+        if i in ragged_outputs:
+          arrays = [convert(v) for v in value]
+          _check_batch_length(len(arrays), input_size)
+          for array in arrays:
+            if array.dtype != expected_np_dtype:
+              raise TypeError(
+                  "`func` returned an element of type %s where an element of "
+                  "type %s was expected." % (array.dtype, expected_np_dtype))
+            if not expected_shape.is_compatible_with(array.shape):
+              raise ValueError(
+                  "`func` returned an element of shape %s where an element of "
+                  "shape %s was expected." % (array.shape, expected_shape))
+          padded, shapes = _pad(arrays, expected_np_dtype)
+          outputs.append(padded)
+          output_shapes_for_ragged.append(shapes)
+        else:
+          if isinstance(value, list):
+            value = [convert(v) for v in value]
+          array = convert(value)
+          _check_batch_length(array.shape[0] if array.ndim else None,
+                              input_size)
+          if array.dtype != expected_np_dtype:
+            raise TypeError(
+                "`func` returned a batch of type %s where a batch of type %s "
+                "was expected." % (array.dtype, expected_np_dtype))
+          if not expected_shape.is_compatible_with(array.shape[1:]):
+            raise ValueError(
+                "`func` returned a batch of elements of shape %s where "
+                "elements of shape %s were expected." % (array.shape[1:],
+                                                         expected_shape))
+          outputs.append(array)
+      return outputs + output_shapes_for_ragged
+
+    def flatten_fn(*args):
+      """Flattens an element, and appends the shape of each ragged input."""
+      flat_args = nest.flatten(args)
+      return tuple(flat_args) + tuple(
+          array_ops.shape(flat_args[i], out_type=dtypes.int64)
+          for i in ragged_inputs)
+
+    def map_fn(*args):
+      """Calls `batch_py_func` on a batch of flattened input elements."""
+      values = script_ops.py_func(
+          batch_py_func, list(args),
+          flat_output_types + [dtypes.int64] * len(ragged_outputs),
+          stateful=True)
+      # The `py_func()` op drops the inferred shapes, so we add them back in
+      # here.
+      for i, (value, shape) in enumerate(zip(values, flat_output_shapes)):
+        if i in ragged_outputs:
+          shape = tensor_shape.unknown_shape(ndims=shape.ndims)
+        value.set_shape(tensor_shape.vector(None).concatenate(shape))
+      for i, value in zip(ragged_outputs, values[num_outputs:]):
+        value.set_shape([None, flat_output_shapes[i].ndims])
+      return tuple(values)
+
+    def unpad_fn(*args):
+      """Slices the ragged outputs to their shapes, and packs the element."""
+      values = list(args[:num_outputs])
+      for i, shape in zip(ragged_outputs, args[num_outputs:]):
+        values[i] = array_ops.slice(
+            values[i], array_ops.zeros_like(shape), shape)
+        values[i].set_shape(flat_output_shapes[i])
+      return nest.pack_sequence_as(output_types, values)
+
+    flat_dataset = dataset.map(flatten_fn)
+    if ragged_inputs:
+      padded_shapes = tuple(flat_input_shapes) + tuple(
+          tensor_shape.vector(flat_input_shapes[i].ndims)
+          for i in ragged_inputs)
+      batched = flat_dataset.padded_batch(batch_size, padded_shapes)
+    else:
+      batched = flat_dataset.batch(batch_size)
+    return batched.map(map_fn).apply(contrib_dataset_ops.unbatch()).map(
+        unpad_fn)
+
+  return _apply_fn
@@ -0,0 +1,303 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Shuffling of datasets that are much larger than memory."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+from tensorflow.contrib.data.python.ops import dataset_ops
+from tensorflow.python.data.util import nest
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import ops
+from tensorflow.python.framework import tensor_shape
+from tensorflow.python.lib.io import tf_record
+from tensorflow.python.ops import array_ops
+from tensorflow.python.ops import math_ops
+from tensorflow.python.ops import script_ops
+
+
+# The maximum number of records returned by each call to
+# `_SpillShuffleState.read()`.
+_READ_BATCH_SIZE = 1024
+
+
+def _derived_seed(seed, offset):
+  """Returns a distinct seed for each level of the shuffle, or `None`."""
+  return None if seed is None else seed + offset
+
+
+class _SpillShuffleState(object):
+  """Writes shuffled runs of records to disk, and merges them at random.
+
+  Each pass over the dataset writes its records to a new temporary directory
+  under `spill_dir`, in runs of at most `run_size` records that are each
+  shuffled in memory. Once the input is exhausted, the runs are merged by
+  drawing the next record from each run with probability proportional to the
+  number of records that remain in it, which makes the order of the records
+  a uniformly random permutation of the input.
+  """
+
+  def __init__(self, spill_dir, seed):
+    self._spill_dir = spill_dir
+    self._seed = seed
+    self._lock = threading.Lock()
+    self._next_pass_id = 0  # GUARDED_BY(self._lock)
+    # Maps each pass ID to a `_SpillPass`.
+    self._passes = {}  # GUARDED_BY(self._lock)
+    atexit.register(self._remove_all)
+
+  def begin(self):
+    with self._lock:
+      pass_id = self._next_pass_id
+      self._next_pass_id += 1
+      if self._seed is None:
+        rng = np.random.RandomState()
+      else:
+        rng = np.random.RandomState([self._seed, pass_id])
+      if not os.path.isdir(self._spill_dir):
+        os.makedirs(self._spill_dir)
+      self._passes[pass_id] = _SpillPass(
+          tempfile.mkdtemp(prefix="shuffle_", dir=self._spill_dir), rng)
+    return np.int64(pass_id)
+
+  def _get_pass(self, pass_id):
+    with self._lock:
+      return self._passes[int(pass_id)]
+
+  def write_run(self, pass_id, records):
+    self._get_pass(pass_id).write_run(records)
+    return np.array([], dtype=object)
+
+  def read(self, pass_id):
+    spill_pass = self._get_pass(pass_id)
+    records = spill_pass.read(_READ_BATCH_SIZE)
+    if not records:
+      spill_pass.remove()
+      with self._lock:
+        del self._passes[int(pass_id)]
+      raise StopIteration("Iteration finished.")
+    return np.array(records, dtype=object)
+
+  def _remove_all(self):
+    with self._lock:
+      for spill_pass in self._passes.values():
+        spill_pass.remove()
+      self._passes.clear()
+
+
+class _SpillPass(object):
+  """The shuffled runs written by a single pass over the input."""
+
+  def __init__(self, directory, rng):
+    self._directory = directory
+    self._rng = rng
+    self._run_sizes = []
+    self._readers = None
+    # The number of records that have not been read from each run.
+    self._remaining = None
+
+  def write_run(self, records):
+    records = list(records)
+    self._rng.shuffle(records)
+    path = os.path.join(self._directory, "run_%d" % len(self._run_sizes))
+    with tf_record.TFRecordWriter(path) as writer:
+      for record in records:
+        writer.write(record)
+    self._run_sizes.append(len(records))
+
+  def read(self, max_records):
+    """Returns the next (up to) `max_records` records of the merged runs."""
+    if self._readers is None:
+      self._readers = [
+          tf_record.tf_record_iterator(
+              os.path.join(self._directory, "run_%d" % i))
+          for i in range(len(self._run_sizes))]
+      self._remaining = np.array(self._run_sizes, dtype=np.int64)
+    total = int(self._remaining.sum())
+    num_records = min(max_records, total)
+    if not num_records:
+      return []
+    # The numbers of the next `num_records` records that come from each run
+    # follow a multivariate hypergeometric distribution, which is sampled one
+    # run at a time. Their order is then a uniformly random permutation.
+    counts = np.zeros_like(self._remaining)
+    left_to_draw = num_records
+    left_in_other_runs = total
+    for i, remaining in enumerate(self._remaining):
+      left_in_other_runs -= remaining
+      if not left_to_draw:
+        break
+      if not left_in_other_runs:
+        counts[i] = left_to_draw
+      elif remaining:
+        counts[i] = self._rng.hypergeometric(remaining, left_in_other_runs,
+                                             left_to_draw)
+      left_to_draw -= counts[i]
+    self._remaining -= counts
+    runs = np.repeat(np.arange(len(counts)), counts)
+    self._rng.shuffle(runs)
+    return [next(self._readers[run]) for run in runs]
+
+  def remove(self):
+    self._readers = None
+    shutil.rmtree(self._directory, ignore_errors=True)
+
+
+def sharded_shuffle(filenames,
+                    buffer_size,
+                    seed=None,
+                    cycle_length=16,
+                    block_length=32,
+                    dataset_fn=None,
+                    spill_dir=None,
+                    spill_run_size=None):
+  """Creates a `Dataset` that shuffles the records of many files.
+
+  The shuffle has two levels:
+
+  1. The order of the files is shuffled, and `cycle_length` files are read
+     concurrently, in blocks of `block_length` consecutive records. The order
+     in which blocks are taken from the open files is randomized.
+  2. The resulting stream of records is shuffled with a buffer of
+     `buffer_size` records, as in `Dataset.shuffle()`.
+
+  The first level mixes records from distant parts of the input at the cost
+  of only `cycle_length * block_length` buffered records, so `buffer_size`
+  can be much smaller than for `Dataset.shuffle()` alone. For example:
+
+  ```python
+  filenames = tf.gfile.Glob("/data/train-*.tfrecord")
+  dataset = tf.contrib.data.sharded_shuffle(filenames, buffer_size=10000,
+                                            seed=42)
+  dataset = dataset.map(parse_fn).batch(32)
+  ```
+
+  If `spill_dir` is set, the second level is instead an external-memory
+  shuffle: each pass writes the records to shuffled runs of
+  `spill_run_size` records in a temporary directory under `spill_dir`, and
+  then reads them back in a uniformly random order. This produces a full
+  shuffle of each pass, at the cost of writing it to local disk before the
+  first record is produced. The runs are removed at the end of each pass.
+
+  The number of records held in memory is at most about
+  `2 * cycle_length * block_length + buffer_size`, or
+  `2 * cycle_length * block_length + spill_run_size` with `spill_dir`. The
+  fill of the buffers can be measured with
+  @{tf.contrib.data.PipelineProfiler}.
+
+  The records should be shuffled before they are parsed, so `dataset_fn`
+  must produce elements whose shapes are fully defined, such as the
+  serialized records of `TFRecordDataset`. Given a `seed`, the order of the
+  records is deterministic.
+
+  Args:
+    filenames: A `tf.string` tensor or list of filenames.
+    buffer_size: A `tf.int64` scalar, the number of records in the in-memory
+      shuffle buffer.
+    seed: (Optional.) A Python integer, used to seed every level of the
+      shuffle.
+    cycle_length: (Optional.) The number of files that are read concurrently.
+    block_length: (Optional.) The number of consecutive records that are read
+      from a file at a time.
+    dataset_fn: (Optional.) A function that takes a `tf.string` scalar
+      filename and returns a `Dataset` of its records. Defaults to
+      `TFRecordDataset`.
+    spill_dir: (Optional.) A local directory in which to write shuffled runs
+      of records. Requires `dataset_fn` to produce scalar `tf.string`
+      records.
+    spill_run_size: (Optional.) The number of records in each run written to
+      `spill_dir`. Defaults to `buffer_size`.
+
+  Returns:
+    A `Dataset` of records.
+
+  Raises:
+    ValueError: If the shapes of the elements of `dataset_fn` are not fully
+      defined, or if `spill_dir` is set and they are not scalar strings.
+  """
+  if dataset_fn is None:
+    dataset_fn = dataset_ops.TFRecordDataset
+  filenames = ops.convert_to_tensor(filenames, dtype=dtypes.string,
+                                    name="filenames")
+  filenames = array_ops.reshape(filenames, [-1])
+  num_files = math_ops.to_int64(array_ops.size(filenames))
+
+  def read_blocks(filename):
+    records = dataset_fn(filename)
+    for shape in nest.flatten(records.output_shapes):
+      if not shape.is_fully_defined():
+        raise ValueError("The elements of `dataset_fn` must have fully "
+                         "defined shapes, but got %s." % shape)
+    if spill_dir is not None and (
+        records.output_types != dtypes.string or
+        not tensor_shape.scalar().is_compatible_with(records.output_shapes)):
+      raise ValueError("`spill_dir` requires `dataset_fn` to produce scalar "
+                       "tf.string records.")
+    return records.batch(block_length)
+
+  blocks = dataset_ops.Dataset.from_tensor_slices(filenames).shuffle(
+      num_files, seed=_derived_seed(seed, 0)).interleave(
+          read_blocks, cycle_length=cycle_length)
+  records = blocks.shuffle(
+      cycle_length, seed=_derived_seed(seed, 1)).apply(dataset_ops.unbatch())
+
+  if spill_dir is None:
+    return records.shuffle(buffer_size, seed=_derived_seed(seed, 2))
+
+  if spill_run_size is None:
+    spill_run_size = buffer_size
+  state = _SpillShuffleState(spill_dir, _derived_seed(seed, 2))
+
+  def begin_map_fn(unused_dummy):
+    pass_id = script_ops.py_func(state.begin, [], dtypes.int64, stateful=True)
+    pass_id.set_shape([])
+    return pass_id
+
+  def write_map_fn(pass_id, run):
+    written = script_ops.py_func(state.write_run, [pass_id, run],
+                                 dtypes.string, stateful=True)
+    written.set_shape([0])
+    return written
+
+  def read_map_fn(pass_id):
+    read = script_ops.py_func(state.read, [pass_id], dtypes.string,
+                              stateful=True)
+    read.set_shape([None])
+    return read
+
+  def pass_fn(pass_id):
+    """Returns batches of the records of a single pass over the input."""
+    # Each run produces an empty batch, so that all runs are written before
+    # the first record is read.
+    written = dataset_ops.Dataset.zip((
+        dataset_ops.Dataset.from_tensors(pass_id).repeat(None),
+        records.batch(spill_run_size))).map(write_map_fn)
+    read = dataset_ops.Dataset.from_tensors(pass_id).repeat(None).map(
+        read_map_fn)
+    return written.concatenate(read)
+
+  # As in `Dataset.from_generator()`, `begin_map_fn()` runs once for each
+  # pass over the returned dataset.
+  dummy = 0
+  return dataset_ops.Dataset.from_tensors(dummy).map(begin_map_fn).flat_map(
+      pass_fn).apply(dataset_ops.unbatch())
@@ -0,0 +1,103 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+r"""Runs an input pipeline standalone and reports its bottleneck stage.
+
+The pipeline is built by a Python function that takes no arguments and
+returns a `Dataset`, given as `module:function`. For example:
+
+  python profile_pipeline.py --pipeline=my_project.input:make_dataset \
+      --num_elements=1000 --trace_file=/tmp/pipeline_trace.json
+
+prints the statistics of each stage of the pipeline over its first 1000
+elements, and writes a trace that can be loaded in `chrome://tracing`.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import importlib
+import json
+import sys
+
+from tensorflow.contrib.data.python.ops import profile_ops
+from tensorflow.python.framework import ops
+from tensorflow.python.platform import app
+
+FLAGS = None
+
+
+def _load_pipeline_fn(pipeline):
+  """Returns the function named by a `module:function` string."""
+  module_name, sep, fn_name = pipeline.partition(":")
+  if not sep or not module_name or not fn_name:
+    raise ValueError("--pipeline must have the form module:function, got %r."
+                     % pipeline)
+  return getattr(importlib.import_module(module_name), fn_name)
+
+
+def main(unused_argv):
+  if not FLAGS.pipeline:
+    print("Usage: profile_pipeline --pipeline=module:function "
+          "[--num_elements=N] [--warmup_elements=N] [--trace_file=FILE] "
+          "[--json]")
+    sys.exit(1)
+  make_dataset = _load_pipeline_fn(FLAGS.pipeline)
+  with ops.Graph().as_default():
+    profiler = profile_ops.profile_pipeline(
+        make_dataset(), FLAGS.num_elements,
+        warmup_elements=FLAGS.warmup_elements)
+  if FLAGS.json:
+    print(json.dumps({"stages": profiler.stats(),
+                      "bottleneck": profiler.bottleneck()}, indent=2))
+  else:
+    print(profiler.report())
+  if FLAGS.trace_file:
+    with open(FLAGS.trace_file, "w") as f:
+      f.write(profiler.chrome_trace())
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+  parser.register("type", "bool", lambda v: v.lower() == "true")
+  parser.add_argument(
+      "--pipeline",
+      type=str,
+      default="",
+      help="The function that builds the pipeline, as module:function.")
+  parser.add_argument(
+      "--num_elements",
+      type=int,
+      default=1000,
+      help="The number of elements to profile.")
+  parser.add_argument(
+      "--warmup_elements",
+      type=int,
+      default=0,
+      help="The number of elements to produce before profiling starts.")
+  parser.add_argument(
+      "--trace_file",
+      type=str,
+      default="",
+      help="If set, a Chrome trace of the pipeline is written to this file.")
+  parser.add_argument(
+      "--json",
+      nargs="?",
+      const=True,
+      type="bool",
+      default=False,
+      help="If True, print the statistics as JSON instead of a table.")
+  FLAGS, unparsed = parser.parse_known_args()
+  app.run(main=main, argv=[sys.argv[0]] + unparsed)
@@ -25,6 +25,7 @@ projective transforms (including rotation) are supported.
 @@adjust_yiq_hsv
 @@random_yiq_hsv
 @@rotate
+@@random_transform
 @@transform
 @@bipartite_match
 @@single_image_random_dot_stereograms
@@ -39,6 +40,7 @@ from tensorflow.contrib.image.python.ops.distort_image_ops import random_hsv_in_
 
 from tensorflow.contrib.image.python.ops.image_ops import angles_to_projective_transforms
 from tensorflow.contrib.image.python.ops.image_ops import compose_transforms
+from tensorflow.contrib.image.python.ops.image_ops import random_transform
 from tensorflow.contrib.image.python.ops.image_ops import rotate
 from tensorflow.contrib.image.python.ops.image_ops import transform
 from tensorflow.contrib.image.python.ops.single_image_random_dot_stereograms import single_image_random_dot_stereograms
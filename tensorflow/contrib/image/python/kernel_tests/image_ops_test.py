@@ -111,6 +111,38 @@ class ImageOpsTest(test_util.TensorFlowTestCase):
                              [0, 1, 0, 1],
                              [0, 1, 1, 1]])
 
+  def test_random_transform_identity(self):
+    with self.test_session():
+      for dtype in _DTYPES:
+        image = constant_op.constant(
+            np.arange(2 * 5 * 6 * 3).reshape((2, 5, 6, 3)), dtype=dtype)
+        image_transformed = image_ops.random_transform(image, seed=1)
+        self.assertAllEqual(image_transformed.eval(), image.eval())
+
+  def test_random_transform_flips(self):
+    with self.test_session():
+      image = np.random.randint(0, 255, (16, 5, 6, 3)).astype(np.float32)
+      image_transformed = image_ops.random_transform(
+          image, horizontal_flip=True, vertical_flip=True, seed=1).eval()
+      self.assertEqual(image.shape, image_transformed.shape)
+      for original, transformed in zip(image, image_transformed):
+        self.assertTrue(
+            any(np.array_equal(transformed, flipped)
+                for flipped in [original, original[:, ::-1],
+                                original[::-1], original[::-1, ::-1]]))
+
+  def test_random_transform_seed(self):
+    with self.test_session():
+      image = np.random.random((4, 10, 10, 1)).astype(np.float32)
+      kwargs = dict(rotation_range=30., width_shift_range=0.1,
+                    height_shift_range=0.1, shear_range=0.2, zoom_range=0.2,
+                    interpolation="BILINEAR", seed=3)
+      first = image_ops.random_transform(image, **kwargs).eval()
+      second = image_ops.random_transform(image, **kwargs).eval()
+      self.assertEqual(image.shape, first.shape)
+      self.assertAllClose(first, second)
+      self.assertFalse(np.allclose(first, image))
+
   def test_bilinear(self):
     with self.test_session():
       image = constant_op.constant(
@@ -17,6 +17,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import math
+
 from tensorflow.contrib.image.ops import gen_image_ops
 from tensorflow.contrib.util import loader
 from tensorflow.python.framework import common_shapes
@@ -26,6 +28,7 @@ from tensorflow.python.framework import ops
 from tensorflow.python.ops import array_ops
 from tensorflow.python.ops import linalg_ops
 from tensorflow.python.ops import math_ops
+from tensorflow.python.ops import random_ops
 from tensorflow.python.platform import resource_loader
 
 _image_ops_so = loader.load_op_library(
@@ -198,6 +201,113 @@ def compose_transforms(*transforms):
   return _transform_matrices_to_flat(composed)
 
 
+def random_transform(images,
+                     rotation_range=0.,
+                     width_shift_range=0.,
+                     height_shift_range=0.,
+                     shear_range=0.,
+                     zoom_range=0.,
+                     horizontal_flip=False,
+                     vertical_flip=False,
+                     interpolation="NEAREST",
+                     seed=None):
+  """Applies a random affine transform to each image.
+
+  The ranges mirror the arguments of
+  `tf.keras.preprocessing.image.ImageDataGenerator`, but the whole batch is
+  augmented by a single op in the graph, which avoids resampling each image in
+  Python. All the transformations are about the center of the images, and are
+  folded into a single projective transform per image.
+
+  Args:
+    images: A tensor of shape (num_images, num_rows, num_columns, num_channels)
+       (NHWC), (num_rows, num_columns, num_channels) (HWC), or
+       (num_rows, num_columns) (HW).
+    rotation_range: Degree range for random rotations.
+    width_shift_range: Range for random horizontal shifts, as a fraction of
+       the width of the images.
+    height_shift_range: Range for random vertical shifts, as a fraction of the
+       height of the images.
+    shear_range: Shear intensity (shear angle in radians).
+    zoom_range: Range for random zoom, from `1 - zoom_range` to
+       `1 + zoom_range`.
+    horizontal_flip: Whether to randomly flip half of the images horizontally.
+    vertical_flip: Whether to randomly flip half of the images vertically.
+    interpolation: Interpolation mode. Supported values: "NEAREST", "BILINEAR".
+    seed: A Python integer. Used to create the random transforms.
+
+  Returns:
+    Image(s) with the same type and shape as `images`, randomly transformed.
+    Transformed coordinates outside of the input image will be filled with
+    zeros.
+
+  Raises:
+    TypeError: If `image` is an invalid type.
+  """
+  images = ops.convert_to_tensor(images, name="images")
+  shape = array_ops.shape(images)
+  if len(images.get_shape()) == 4:
+    num_images, image_height, image_width = shape[0], shape[1], shape[2]
+  else:
+    num_images, image_height, image_width = 1, shape[0], shape[1]
+  image_height = math_ops.cast(image_height, dtypes.float32)
+  image_width = math_ops.cast(image_width, dtypes.float32)
+
+  # Draw all the random parameters of an image at once, in [-1, 1).
+  params = random_ops.random_uniform(
+      [num_images, 8], minval=-1., maxval=1., seed=seed)
+  zeros = array_ops.zeros([num_images])
+  ones = array_ops.ones([num_images])
+
+  def matrices(a0, a1, a2, b0, b1, b2):
+    return _flat_transforms_to_matrices(
+        array_ops.stack([a0, a1, a2, b0, b1, b2, zeros, zeros], axis=1))
+
+  # The transforms map the *output* points to the *input* points, centered on
+  # the middle of the images.
+  center_x = (image_width - 1) / 2
+  center_y = (image_height - 1) / 2
+  composed = matrices(ones, zeros, center_x * ones,
+                      zeros, ones, center_y * ones)
+  if rotation_range:
+    theta = math.pi / 180 * rotation_range * params[:, 0]
+    composed = math_ops.matmul(
+        composed,
+        matrices(math_ops.cos(theta), -math_ops.sin(theta), zeros,
+                 math_ops.sin(theta), math_ops.cos(theta), zeros))
+  if width_shift_range or height_shift_range:
+    composed = math_ops.matmul(
+        composed,
+        matrices(ones, zeros, width_shift_range * image_width * params[:, 1],
+                 zeros, ones, height_shift_range * image_height * params[:, 2]))
+  if shear_range:
+    shear = shear_range * params[:, 3]
+    composed = math_ops.matmul(
+        composed,
+        matrices(ones, -math_ops.sin(shear), zeros,
+                 zeros, math_ops.cos(shear), zeros))
+  if zoom_range:
+    composed = math_ops.matmul(
+        composed,
+        matrices(1. + zoom_range * params[:, 4], zeros, zeros,
+                 zeros, 1. + zoom_range * params[:, 5], zeros))
+  if horizontal_flip or vertical_flip:
+    flip_x = (array_ops.where(params[:, 6] < 0, -ones, ones)
+              if horizontal_flip else ones)
+    flip_y = (array_ops.where(params[:, 7] < 0, -ones, ones)
+              if vertical_flip else ones)
+    composed = math_ops.matmul(
+        composed, matrices(flip_x, zeros, zeros, zeros, flip_y, zeros))
+  composed = math_ops.matmul(
+      composed,
+      matrices(ones, zeros, -center_x * ones, zeros, ones, -center_y * ones))
+
+  return transform(
+      images,
+      _transform_matrices_to_flat(composed),
+      interpolation=interpolation)
+
+
 def _flat_transforms_to_matrices(transforms):
   # Make the transform(s) 2D in case the input is a single transform.
   transforms = array_ops.reshape(transforms, constant_op.constant([-1, 8]))
@@ -19,11 +19,14 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
 import functools
 import re
 import threading
+import time
 
 import numpy as np
+from six.moves import queue
 
 from tensorflow.core.protobuf import config_pb2
 from tensorflow.python import pywrap_tensorflow as tf_session
@@ -369,7 +372,7 @@ class _DictFetchMapper(_FetchMapper):
       fetches: Dict of fetches.
     """
     self._fetch_type = type(fetches)
-    self._keys = fetches.keys()
+    self._keys = list(fetches.keys())
     self._mappers = [_FetchMapper.for_fetch(fetch)
                      for fetch in fetches.values()]
     self._unique_fetches, self._value_indices = _uniquify_fetches(self._mappers)
@@ -455,7 +458,7 @@ class _FetchHandler(object):
     """
     return self._targets
 
-  def build_results(self, session, tensor_values):
+  def build_results(self, session, tensor_values, feeds=None):
     """Build results matching the original fetch shape.
 
     `tensor_values` must be a list of the same length as
@@ -470,11 +473,16 @@ class _FetchHandler(object):
       session: The enclosing session.  Used for tensor handles.
       tensor_values: List of values matching the list returned
         by fetches().
+      feeds: (Optional.) A feed dict to use instead of the one passed to the
+        constructor.  Its keys must be the same as those of the original feed
+        dict; this allows a handler to be reused for several steps.
 
     Returns:
       A structure of the same shape as the original `fetches` argument but
         containing tensors or None (for fetched ops).
     """
+    if feeds is None:
+      feeds = self._feeds
     full_values = []
     assert len(self._final_fetches) == len(tensor_values)
     i = 0
@@ -490,7 +498,7 @@ class _FetchHandler(object):
           # to obtain the Tensor value from the TensorHandle.
           value = self._feed_handles[self._fetches[i]].eval()
         else:
-          value = self._feeds.get(self._fetches[i])
+          value = feeds.get(self._fetches[i])
         if value is None:
           value = tensor_values[j]
           j += 1
@@ -504,6 +512,65 @@ class _FetchHandler(object):
     return self._fetch_mapper.build_results(full_values)
 
 
+def _fetch_structure_key(fetches):
+  """Returns a hashable key describing the structure and leaves of `fetches`.
+
+  Two fetch arguments with equal keys produce identical `_FetchHandler`s (for
+  the same graph and feed keys), so the key can be used to cache handlers.
+
+  Args:
+    fetches: An arbitrary fetch structure: singleton, list, tuple,
+      namedtuple, or dict.
+
+  Returns:
+    A hashable object.
+
+  Raises:
+    TypeError: If a leaf of `fetches` is not hashable.
+  """
+  if isinstance(fetches, (list, tuple)):
+    return (type(fetches),) + tuple(
+        _fetch_structure_key(fetch) for fetch in fetches)
+  elif isinstance(fetches, dict):
+    return (type(fetches),) + tuple(
+        (k, _fetch_structure_key(v)) for k, v in fetches.items())
+  else:
+    hash(fetches)
+    return fetches
+
+
+class _LRUCache(object):
+  """A small thread-safe least-recently-used cache."""
+
+  def __init__(self, capacity):
+    self._capacity = capacity
+    self._entries = collections.OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, key):
+    with self._lock:
+      value = self._entries.pop(key, None)
+      if value is not None:
+        self._entries[key] = value
+      return value
+
+  def put(self, key, value):
+    if self._capacity <= 0:
+      return
+    with self._lock:
+      self._entries.pop(key, None)
+      self._entries[key] = value
+      while len(self._entries) > self._capacity:
+        self._entries.popitem(last=False)
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+
+  def __len__(self):
+    return len(self._entries)
+
+
 def _name_list(tensor_list):
   """Utility function for transitioning to the new session API.
 
@@ -516,6 +583,217 @@ def _name_list(tensor_list):
   return [compat.as_bytes(t.name) for t in tensor_list]
 
 
+# The alignment of the arrays returned by `aligned_feed_array()`, which is
+# enough for any alignment the runtime may be built to require.
+_FEED_ALIGNMENT_BYTES = 64
+
+# The alignment that the runtime requires to borrow a fed buffer without
+# copying it (`EIGEN_MAX_ALIGN_BYTES`, 16 or 32 on common builds), or 0 if it
+# borrows buffers with any alignment.
+_FEED_MIN_ALIGNMENT_BYTES = tf_session.MaxAlignBytes()
+
+_FEED_COPY_POLICIES = ('allow', 'warn', 'error')
+
+
+def aligned_feed_array(shape, dtype):
+  """Returns an uninitialized numpy array that can be fed without a copy.
+
+  The buffer of the returned array is C-contiguous and aligned so that
+  `Session.run()` can borrow it for the duration of the step instead of
+  copying it. See `BaseSession.set_feed_copy_policy()`.
+
+  Args:
+    shape: The shape of the array.
+    dtype: A numpy dtype. Must not be a string or object dtype.
+
+  Returns:
+    A numpy ndarray.
+  """
+  dtype = np.dtype(dtype)
+  nbytes = int(np.prod(shape)) * dtype.itemsize
+  buf = np.empty(nbytes + _FEED_ALIGNMENT_BYTES, dtype=np.uint8)
+  offset = -buf.ctypes.data % _FEED_ALIGNMENT_BYTES
+  return buf[offset:offset + nbytes].view(dtype).reshape(shape)
+
+
+def _feed_copy_reason(feed_val, np_dtype):
+  """Returns why feeding `feed_val` as `np_dtype` copies it, or None.
+
+  A fed numpy array is borrowed by the runtime for the duration of the step
+  if it already has the dtype of the fed tensor, is C-contiguous and its
+  buffer is aligned as the runtime requires. Otherwise its contents are
+  copied.
+
+  Args:
+    feed_val: A feed value, as passed in `feed_dict`.
+    np_dtype: The numpy dtype of the fed tensor.
+
+  Returns:
+    None if the value can be fed without a copy, otherwise one of
+    `'not_ndarray'`, `'string'`, `'dtype'`, `'non_contiguous'` or
+    `'misaligned'`.
+  """
+  if not isinstance(feed_val, np.ndarray):
+    return 'not_ndarray'
+  if np_dtype == np.object:
+    # String tensors are always encoded into a new buffer.
+    return 'string'
+  if feed_val.dtype != np_dtype:
+    return 'dtype'
+  if not feed_val.flags.c_contiguous:
+    return 'non_contiguous'
+  if (feed_val.size and _FEED_MIN_ALIGNMENT_BYTES and
+      feed_val.ctypes.data % _FEED_MIN_ALIGNMENT_BYTES):
+    return 'misaligned'
+  return None
+
+
+def _feed_batch_size(feed_vals, batch_axis):
+  """Returns the size of the batch dimension shared by `feed_vals`.
+
+  Args:
+    feed_vals: A non-empty list of numpy ndarrays.
+    batch_axis: The index of the batch dimension.
+
+  Returns:
+    An integer.
+
+  Raises:
+    ValueError: If the values do not have a common batch dimension.
+  """
+  sizes = set()
+  for feed_val in feed_vals:
+    if feed_val.ndim <= batch_axis:
+      raise ValueError('Cannot batch feed value of shape %r along axis %d.'
+                       % (feed_val.shape, batch_axis))
+    sizes.add(feed_val.shape[batch_axis])
+  if len(sizes) != 1:
+    raise ValueError('All feed values of a batched request must have the '
+                     'same size along axis %d, got sizes %s.'
+                     % (batch_axis, sorted(sizes)))
+  return sizes.pop()
+
+
+class _BatchedRequest(object):
+  """A single request waiting to be run by a `_BatchedCallable`."""
+
+  def __init__(self, feed_vals, batch_size):
+    self.feed_vals = feed_vals
+    self.batch_size = batch_size
+    self.result = None
+    self.error = None
+    self.done = threading.Event()
+
+
+class _BatchedCallable(object):
+  """Coalesces concurrent single-request calls into batched `run()` steps.
+
+  Instances are created by `BaseSession.make_batched_callable()`. Calling an
+  instance blocks until the step containing its request has completed.
+  """
+
+  def __init__(self, session, fetches, feed_list, batch_axis, max_batch_size,
+               batch_timeout_secs):
+    self._session = session
+    self._fetches = fetches
+    self._feed_list = list(feed_list)
+    self._batch_axis = batch_axis
+    self._max_batch_size = max_batch_size
+    self._batch_timeout_secs = batch_timeout_secs
+    self._queue = queue.Queue()
+    self._closed = False
+    self._close_lock = threading.Lock()
+    self._thread = threading.Thread(target=self._dispatch_loop)
+    self._thread.daemon = True
+    self._thread.start()
+
+  def __call__(self, *feed_args):
+    """Runs `fetches` for one request, batched with concurrent requests.
+
+    Args:
+      *feed_args: One feed value for each element of `feed_list`.
+
+    Returns:
+      The fetched values for this request, with the same structure as
+      `fetches`.
+
+    Raises:
+      RuntimeError: If this callable has been closed.
+      ValueError: If the number of arguments does not match `feed_list`, or
+        the arguments have inconsistent batch sizes.
+    """
+    if len(feed_args) != len(self._feed_list):
+      raise ValueError('Expected %d feed values, got %d.'
+                       % (len(self._feed_list), len(feed_args)))
+    feed_vals = [np.asarray(feed_val) for feed_val in feed_args]
+    request = _BatchedRequest(
+        feed_vals, _feed_batch_size(feed_vals, self._batch_axis))
+    with self._close_lock:
+      if self._closed:
+        raise RuntimeError('Attempted to use a closed batched callable.')
+      self._queue.put(request)
+    request.done.wait()
+    if request.error is not None:
+      raise request.error  # pylint: disable=raising-bad-type
+    return request.result
+
+  def close(self):
+    """Runs any pending requests, then stops the dispatch thread."""
+    with self._close_lock:
+      if self._closed:
+        return
+      self._closed = True
+      self._queue.put(None)
+    self._thread.join()
+
+  def _dispatch_loop(self):
+    next_request = None
+    while True:
+      request = next_request or self._queue.get()
+      next_request = None
+      if request is None:
+        return
+      batch = [request]
+      batch_size = request.batch_size
+      deadline = time.time() + self._batch_timeout_secs
+      stop = False
+      while batch_size < self._max_batch_size:
+        try:
+          remaining = deadline - time.time()
+          if remaining > 0:
+            request = self._queue.get(timeout=remaining)
+          else:
+            request = self._queue.get_nowait()
+        except queue.Empty:
+          break
+        if request is None:
+          stop = True
+          break
+        if batch_size + request.batch_size > self._max_batch_size:
+          next_request = request
+          break
+        batch.append(request)
+        batch_size += request.batch_size
+      self._run_batch(batch)
+      if stop:
+        return
+
+  def _run_batch(self, batch):
+    feed_dicts = [dict(zip(self._feed_list, request.feed_vals))
+                  for request in batch]
+    try:
+      results = self._session.run_batched(
+          self._fetches, feed_dicts, batch_axis=self._batch_axis)
+    except Exception as e:  # pylint: disable=broad-except
+      for request in batch:
+        request.error = e
+        request.done.set()
+      return
+    for request, result in zip(batch, results):
+      request.result = result
+      request.done.set()
+
+
 class _DeviceAttributes(object):
   """Struct-like object describing a device's attributes.
 
@@ -556,6 +834,13 @@ class BaseSession(SessionInterface):
   execution of Operations and evaluation of Tensors.
   """
 
+  # The maximum number of fetch handlers cached by `run()`. A value of 0
+  # disables caching.
+  _FETCH_HANDLER_CACHE_SIZE = 64
+
+  # The maximum number of resolved feed keys cached by `run()`.
+  _FEED_ELEMENT_CACHE_SIZE = 1024
+
   def __init__(self, target='', graph=None, config=None):
     """Constructs a new TensorFlow session.
 
@@ -593,6 +878,17 @@ class BaseSession(SessionInterface):
     self._delete_lock = threading.Lock()
     self._dead_handles = []
 
+    # Caches the `_FetchHandler`s built by `run()`, and the graph elements
+    # that feed keys resolve to, so that repeated steps with the same fetch
+    # structure and feed keys skip re-resolving them.
+    self._fetch_handler_cache = _LRUCache(BaseSession._FETCH_HANDLER_CACHE_SIZE)
+    self._feed_element_cache = _LRUCache(BaseSession._FEED_ELEMENT_CACHE_SIZE)
+
+    self._feed_copy_policy = 'allow'
+    self._feed_copy_lock = threading.Lock()
+    self._feed_copy_counts = collections.defaultdict(int)
+    self._feed_copy_warned = set()
+
     if config is not None:
       if not isinstance(config, config_pb2.ConfigProto):
         raise TypeError('config must be a tf.ConfigProto, but got %s'
@@ -850,6 +1146,10 @@ class BaseSession(SessionInterface):
     Each value in `feed_dict` must be convertible to a numpy array of the dtype
     of the corresponding key.
 
+    Numpy ndarrays with the dtype of the corresponding key, C-contiguous and
+    suitably aligned are fed without copying their contents; see
+    `set_feed_copy_policy()`.
+
     The optional `options` argument expects a [`RunOptions`] proto. The options
     allow controlling the behavior of this particular step (e.g. turning tracing
     on).
@@ -1059,12 +1359,7 @@ class BaseSession(SessionInterface):
       feed_dict = nest.flatten_dict_items(feed_dict)
       for feed, feed_val in feed_dict.items():
         for subfeed, subfeed_val in _feed_fn(feed, feed_val):
-          try:
-            subfeed_t = self.graph.as_graph_element(subfeed, allow_tensor=True,
-                                                    allow_operation=False)
-          except Exception as e:
-            raise TypeError('Cannot interpret feed_dict key as Tensor: '
-                            + e.args[0])
+          subfeed_t = self._as_feed_element(subfeed)
 
           if isinstance(subfeed_val, ops.Tensor):
             raise TypeError('The value of a feed cannot be a tf.Tensor object. '
@@ -1086,6 +1381,9 @@ class BaseSession(SessionInterface):
             np_val = subfeed_val.to_numpy_array()
             feed_handles[subfeed_t] = subfeed_val
           else:
+            copy_reason = _feed_copy_reason(subfeed_val, subfeed_dtype)
+            if copy_reason is not None:
+              self._record_feed_copy(subfeed_t, copy_reason)
             np_val = np.asarray(subfeed_val, dtype=subfeed_dtype)
 
           if (not is_tensor_handle_feed and
@@ -1101,8 +1399,8 @@ class BaseSession(SessionInterface):
           feed_map[compat.as_bytes(subfeed_t.name)] = (subfeed_t, subfeed_val)
 
     # Create a fetch handler to take care of the structure of fetches.
-    fetch_handler = _FetchHandler(
-        self._graph, fetches, feed_dict_tensor, feed_handles=feed_handles)
+    fetch_handler = self._get_fetch_handler(fetches, feed_dict_tensor,
+                                            feed_handles)
 
     # Run request and get response.
     # We need to keep the returned movers alive for the following _do_run().
@@ -1120,7 +1418,156 @@ class BaseSession(SessionInterface):
                              feed_dict_tensor, options, run_metadata)
     else:
       results = []
-    return fetch_handler.build_results(self, results)
+    return fetch_handler.build_results(self, results, feeds=feed_dict_tensor)
+
+  def set_feed_copy_policy(self, policy):
+    """Sets what happens when a value in `feed_dict` must be copied.
+
+    A numpy ndarray fed to `run()` is borrowed by the runtime for the
+    duration of the step, without copying its contents, if all of the
+    following hold:
+
+    * its dtype is the dtype of the fed tensor (and is not a string type),
+    * it is C-contiguous,
+    * its buffer has the alignment that the runtime was built to require
+      (typically 16 or 32 bytes). Arrays allocated by numpy usually do, and
+      arrays created with `aligned_feed_array()` always do.
+
+    Other feed values are copied. Every copy is counted in
+    `feed_copy_stats()`, and `policy` selects what else happens:
+
+    * `'allow'` (the default): nothing.
+    * `'warn'`: a warning is logged the first time a tensor is fed with a
+      copy for a given reason.
+    * `'error'`: `run()` raises a `ValueError` instead of copying. This is
+      the zero-copy feed mode: it guarantees that fed arrays are borrowed.
+
+    Args:
+      policy: One of `'allow'`, `'warn'` or `'error'`.
+
+    Raises:
+      ValueError: If `policy` is not a valid policy.
+    """
+    if policy not in _FEED_COPY_POLICIES:
+      raise ValueError('Invalid feed copy policy %r, expected one of %s.'
+                       % (policy, ', '.join(_FEED_COPY_POLICIES)))
+    self._feed_copy_policy = policy
+
+  def feed_copy_stats(self):
+    """Returns the number of feed values that were copied, by reason.
+
+    The possible reasons are:
+
+    * `'not_ndarray'`: the value was not a numpy ndarray.
+    * `'string'`: the fed tensor is a string tensor, whose values are always
+      encoded into a new buffer.
+    * `'dtype'`: the dtype of the value differed from that of the tensor.
+    * `'non_contiguous'`: the value was not C-contiguous.
+    * `'misaligned'`: the buffer of the value did not have the alignment
+      that the runtime requires.
+
+    See `set_feed_copy_policy()`.
+
+    Returns:
+      A dict mapping reasons to counts. Reasons for which no copy was made
+      are omitted.
+    """
+    with self._feed_copy_lock:
+      return dict(self._feed_copy_counts)
+
+  def _record_feed_copy(self, subfeed_t, reason):
+    """Counts a copied feed value and applies the feed copy policy."""
+    if self._feed_copy_policy == 'error':
+      raise ValueError('Feeding Tensor %r requires a copy (reason: %s), but '
+                       'the feed copy policy is \'error\'.'
+                       % (subfeed_t.name, reason))
+    with self._feed_copy_lock:
+      self._feed_copy_counts[reason] += 1
+      warn = (self._feed_copy_policy == 'warn' and
+              (subfeed_t, reason) not in self._feed_copy_warned)
+      if warn:
+        self._feed_copy_warned.add((subfeed_t, reason))
+    if warn:
+      logging.warning('Feeding Tensor %r requires a copy (reason: %s).',
+                      subfeed_t.name, reason)
+
+  def _as_feed_element(self, subfeed):
+    """Resolves a feed key to a `Tensor` in the session graph.
+
+    Graph elements never disappear from a graph once added, so successful
+    resolutions are cached.
+
+    Args:
+      subfeed: A feed key, as returned by a feed_fn defined in
+        _REGISTERED_EXPANSIONS.
+
+    Returns:
+      The `Tensor` corresponding to `subfeed`.
+
+    Raises:
+      TypeError: If `subfeed` cannot be interpreted as a `Tensor`.
+    """
+    try:
+      subfeed_t = self._feed_element_cache.get(subfeed)
+    except TypeError:
+      # Unhashable feed keys are not cached.
+      subfeed_t = None
+      cacheable = False
+    else:
+      cacheable = True
+    if subfeed_t is not None:
+      return subfeed_t
+    try:
+      subfeed_t = self.graph.as_graph_element(subfeed, allow_tensor=True,
+                                              allow_operation=False)
+    except Exception as e:
+      raise TypeError('Cannot interpret feed_dict key as Tensor: '
+                      + e.args[0])
+    if cacheable:
+      self._feed_element_cache.put(subfeed, subfeed_t)
+    return subfeed_t
+
+  def _get_fetch_handler(self, fetches, feed_dict_tensor, feed_handles):
+    """Returns a `_FetchHandler` for `fetches`, reusing a cached one if any.
+
+    Handlers are cached by the structure of `fetches`, the set of fed tensors,
+    the graph version and the number of ops marked unfetchable, with
+    least-recently-used eviction.  A cached handler must be passed the current
+    feeds in `build_results()`.
+
+    Args:
+      fetches: An arbitrary fetch structure: singleton, list, tuple,
+        namedtuple, or dict.
+      feed_dict_tensor: A dict from fed `Tensor`s to numpy ndarrays.
+      feed_handles: A dict from fed `Tensor`s to `TensorHandle` objects.
+
+    Returns:
+      A `_FetchHandler`.
+    """
+    if feed_handles:
+      # Fetches that are also fed by a TensorHandle are evaluated from the
+      # handle, so the handler is specific to this step.
+      return _FetchHandler(
+          self._graph, fetches, feed_dict_tensor, feed_handles=feed_handles)
+    try:
+      # `Graph.prevent_fetching()` does not change the graph version, but only
+      # ever adds ops, so the number of unfetchable ops tells whether the
+      # handler's fetchability checks are still valid.
+      # pylint: disable=protected-access
+      key = (_fetch_structure_key(fetches), frozenset(feed_dict_tensor),
+             self._graph.version, len(self._graph._unfetchable_ops))
+      # pylint: enable=protected-access
+    except TypeError:
+      key = None
+    if key is not None:
+      fetch_handler = self._fetch_handler_cache.get(key)
+      if fetch_handler is not None:
+        return fetch_handler
+    fetch_handler = _FetchHandler(
+        self._graph, fetches, dict.fromkeys(feed_dict_tensor))
+    if key is not None:
+      self._fetch_handler_cache.put(key, fetch_handler)
+    return fetch_handler
 
   def make_callable(self,
                     fetches,
@@ -1252,6 +1699,160 @@ class BaseSession(SessionInterface):
         return fetch_handler.build_results(self, results)
       return _fetch_handler_run
 
+  def run_batched(self, fetches, feed_dicts, batch_axis=0,
+                  max_batch_size=None, options=None, run_metadata=None):
+    """Runs several independent requests as a single batched step.
+
+    Each element of `feed_dicts` is the feed dict of one request. All of them
+    must have the same keys, and every fed value must have a batch dimension
+    at `batch_axis`. The values are concatenated along that dimension, `run()`
+    is called once per batch, and each fetched `Tensor` value is split back
+    along `batch_axis` into one value per request. Fetched `Tensor`s must
+    therefore have the same batch dimension as the feeds.
+
+    ```python
+    x = tf.placeholder(tf.float32, shape=[None, 4])
+    y = tf.reduce_sum(x, axis=1)
+    results = sess.run_batched(y, [{x: np.ones([1, 4])},
+                                   {x: np.ones([3, 4])}])
+    # results[0] has shape [1], results[1] has shape [3].
+    ```
+
+    Args:
+      fetches: A single graph element, or a (nested) list, tuple, namedtuple
+        or dict of graph elements. Only `Tensor`s and `Operation`s are
+        supported as leaves. See @{tf.Session.run}.
+      feed_dicts: A list of feed dicts, one per request.
+      batch_axis: (Optional.) The index of the batch dimension of the feeds
+        and the fetched tensors. Defaults to 0.
+      max_batch_size: (Optional.) The maximum number of rows to run in a
+        single step. If set, the requests are split into several steps; a
+        single request larger than `max_batch_size` is run on its own.
+      options: (Optional.) A [`RunOptions`] protocol buffer, used for every
+        step.
+      run_metadata: (Optional.) A [`RunMetadata`] protocol buffer. If
+        several steps are run, it holds the metadata of the last one.
+
+    Returns:
+      A list with one element per feed dict, each with the same structure
+      as `fetches`. Fetched `Operation`s are `None`.
+
+    Raises:
+      TypeError: If `fetches` contains a leaf that is not a `Tensor`, an
+        `Operation` or the name of one.
+      ValueError: If the feed dicts do not have the same keys, their values do
+        not have consistent batch sizes, or a fetched value does not have the
+        batch size of the feeds.
+    """
+    if not feed_dicts:
+      return []
+    feed_keys = list(feed_dicts[0].keys())
+    requests = []
+    for feed_dict in feed_dicts:
+      if set(feed_dict.keys()) != set(feed_keys):
+        raise ValueError('All feed dicts of a batched run must have the same '
+                         'keys.')
+      feed_vals = [np.asarray(feed_dict[k]) for k in feed_keys]
+      requests.append((feed_vals, _feed_batch_size(feed_vals, batch_axis)))
+
+    fetch_elements = []
+    for fetch in nest.flatten(fetches):
+      fetch = self._graph.as_graph_element(fetch, allow_tensor=True,
+                                           allow_operation=True)
+      if not isinstance(fetch, (ops.Tensor, ops.Operation)):
+        raise TypeError('Fetch argument %r cannot be split into batched '
+                        'results.' % fetch)
+      fetch_elements.append(fetch)
+
+    # Group consecutive requests into steps of at most `max_batch_size` rows.
+    steps = []
+    step_requests = []
+    step_size = 0
+    for feed_vals, batch_size in requests:
+      if (step_requests and max_batch_size is not None and
+          step_size + batch_size > max_batch_size):
+        steps.append(step_requests)
+        step_requests = []
+        step_size = 0
+      step_requests.append((feed_vals, batch_size))
+      step_size += batch_size
+    steps.append(step_requests)
+
+    results = []
+    for step_requests in steps:
+      feed_dict = {}
+      for i, k in enumerate(feed_keys):
+        feed_dict[k] = np.concatenate(
+            [feed_vals[i] for feed_vals, _ in step_requests], axis=batch_axis)
+      step_results = nest.flatten_up_to(
+          fetches, self.run(fetches, feed_dict=feed_dict, options=options,
+                            run_metadata=run_metadata))
+      step_size = sum(batch_size for _, batch_size in step_requests)
+      for fetch, value in zip(fetch_elements, step_results):
+        if value is not None and (
+            np.ndim(value) <= batch_axis or
+            np.shape(value)[batch_axis] != step_size):
+          raise ValueError(
+              'Fetched tensor %s has shape %s, which does not have the batch '
+              'size %d of the feeds in dimension %d, so it cannot be split '
+              'into batched results.' % (fetch.name, np.shape(value),
+                                         step_size, batch_axis))
+      split_indices = np.cumsum(
+          [batch_size for _, batch_size in step_requests])[:-1]
+      split_results = [
+          None if value is None else
+          np.split(value, split_indices, axis=batch_axis)
+          for value in step_results]
+      for i in range(len(step_requests)):
+        results.append(nest.pack_sequence_as(
+            fetches, [None if values is None else values[i]
+                      for values in split_results]))
+    return results
+
+  def make_batched_callable(self, fetches, feed_list, max_batch_size,
+                            batch_timeout_secs, batch_axis=0):
+    """Returns a callable that batches concurrent requests into single steps.
+
+    The returned callable takes `len(feed_list)` arguments, the feed values
+    of one request, and returns the fetched values for that request. Calls
+    made concurrently from several threads are queued and merged by a
+    background thread: it waits up to `batch_timeout_secs` after the first
+    queued request for more requests, until `max_batch_size` rows are
+    gathered, then runs them with `run_batched()` and hands every caller
+    its own slice of the results.
+
+    The callable must be closed with its `close()` method when no longer
+    needed; this runs any pending requests and stops the background thread.
+
+    Args:
+      fetches: A single graph element, or a (nested) list, tuple, namedtuple
+        or dict of graph elements. See `run_batched()`.
+      feed_list: A list of `feed_dict` keys.
+      max_batch_size: The maximum number of rows to run in a single step.
+      batch_timeout_secs: The maximum time, in seconds, to wait for more
+        requests after the first request of a batch is queued.
+      batch_axis: (Optional.) The index of the batch dimension of the feeds
+        and the fetched tensors. Defaults to 0.
+
+    Returns:
+      A callable object with a `close()` method.
+
+    Raises:
+      TypeError: If `feed_list` is not a list or tuple.
+      ValueError: If `max_batch_size` is not positive or
+        `batch_timeout_secs` is negative.
+    """
+    if not isinstance(feed_list, (list, tuple)):
+      raise TypeError('`feed_list` must be a list or tuple.')
+    if max_batch_size <= 0:
+      raise ValueError('`max_batch_size` must be positive, got %r.'
+                       % max_batch_size)
+    if batch_timeout_secs < 0:
+      raise ValueError('`batch_timeout_secs` must be non-negative, got %r.'
+                       % batch_timeout_secs)
+    return _BatchedCallable(self, fetches, feed_list, batch_axis,
+                            max_batch_size, batch_timeout_secs)
+
   # Captures the name of a node in an error status.
   _NODEDEF_NAME_RE = re.compile(r'\[\[Node: ([^ ]*?) =')
 
@@ -174,6 +174,36 @@ class SessionBenchmark(test.Benchmark):
     print("%s %f" % (name, np.median(times)))
     self.report_benchmark(iters=1, wall_time=np.median(times), name=name)
 
+  def _benchmarkFetchStructure(self, name, target, iters, cache_fetches):
+    """Runs a microbenchmark to measure the per-call overhead of `run()`.
+
+    Reports the median cost of a step that feeds a scalar and fetches a
+    nested structure of small tensors, with or without the session's cache
+    of fetch handlers.
+
+    Args:
+      name: A human-readable name for logging the output.
+      target: The session target to use for the benchmark.
+      iters: The number of iterations to perform.
+      cache_fetches: If False, disable the session's fetch handler cache.
+    """
+    times = []
+    with ops.Graph().as_default():
+      p = array_ops.placeholder(dtypes.float32, shape=[])
+      outputs = [array_ops.identity(p) for _ in range(8)]
+      with session.Session(target) as sess:
+        if not cache_fetches:
+          sess._fetch_handler_cache = session._LRUCache(0)  # pylint: disable=protected-access
+        fetches = {"outputs": outputs, "pair": (outputs[0], outputs[1])}
+        sess.run(fetches, feed_dict={p: 1.0})  # Warm-up run.
+        for _ in xrange(iters):
+          start_time = time.time()
+          sess.run(fetches, feed_dict={p: 1.0})
+          end_time = time.time()
+          times.append(end_time - start_time)
+    print("%s %f" % (name, np.median(times)))
+    self.report_benchmark(iters=1, wall_time=np.median(times), name=name)
+
   def benchmarkGrpcSession(self):
     server = server_lib.Server.create_local_server()
     self._benchmarkFeed("benchmark_session_feed_grpc_4B", server.target, 1,
@@ -213,6 +243,10 @@ class SessionBenchmark(test.Benchmark):
     self._benchmarkRunOp("benchmark_session_runop_direct", "", 200000)
     self._benchmarkRunOpPrebuilt("benchmark_session_runopprebuilt_direct", "",
                                  200000)
+    self._benchmarkFetchStructure(
+        "benchmark_session_fetchstructure_uncached_direct", "", 100000, False)
+    self._benchmarkFetchStructure(
+        "benchmark_session_fetchstructure_cached_direct", "", 100000, True)
 
 
 if __name__ == "__main__":
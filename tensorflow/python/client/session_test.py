@@ -1223,6 +1223,224 @@ class SessionTest(test_util.TensorFlowTestCase):
           self.assertAllEqual(np_array, out_v)
           self.assertAllEqual(np_array, feed_v)
 
+  def testFetchHandlerCacheReuse(self):
+    with session.Session() as sess:
+      a = array_ops.placeholder(dtypes.float32, shape=[])
+      b = a * 2.0
+      c = a + 1.0
+      for i in range(3):
+        # A new list with the same structure and leaves hits the cache.
+        b_v, c_v = sess.run([b, c], feed_dict={a: float(i)})
+        self.assertEqual(2.0 * i, b_v)
+        self.assertEqual(i + 1.0, c_v)
+      self.assertEqual(1, len(sess._fetch_handler_cache))
+      # A different structure gets its own entry.
+      res = sess.run({'b': b, 'c': (c, a)}, feed_dict={a: 5.0})
+      self.assertEqual(10.0, res['b'])
+      self.assertEqual((6.0, 5.0), res['c'])
+      self.assertEqual(2, len(sess._fetch_handler_cache))
+
+  def testFetchHandlerCacheUsesCurrentFeeds(self):
+    with session.Session() as sess:
+      a = array_ops.placeholder(dtypes.float32, shape=[])
+      b = a * 2.0
+      for value in [1.0, 2.0, 3.0]:
+        # Fetching a fed tensor must return the value fed in this step.
+        a_v, b_v = sess.run([a, b], feed_dict={a: value})
+        self.assertEqual(value, a_v)
+        self.assertEqual(2.0 * value, b_v)
+
+  def testFetchHandlerCacheFeedKeys(self):
+    with session.Session() as sess:
+      a = constant_op.constant(1.0)
+      b = a * 2.0
+      self.assertEqual(2.0, sess.run(b))
+      # Feeding `a` changes the set of feed keys, so a new handler is built.
+      self.assertEqual(8.0, sess.run(b, feed_dict={a: 4.0}))
+      self.assertEqual(4.0, sess.run(a, feed_dict={a: 4.0}))
+      self.assertEqual(1.0, sess.run(a))
+
+  def testFetchHandlerCacheGraphVersion(self):
+    with session.Session() as sess:
+      a = constant_op.constant(1.0, name='a')
+      self.assertEqual(1.0, sess.run('a:0'))
+      self.assertEqual(1, len(sess._fetch_handler_cache))
+      constant_op.constant(2.0, name='b')
+      self.assertEqual(2.0, sess.run('b:0'))
+      self.assertEqual(1.0, sess.run(a))
+      self.assertEqual(3, len(sess._fetch_handler_cache))
+
+  def testFetchHandlerCachePreventFetching(self):
+    with session.Session() as sess:
+      a = constant_op.constant(1.0)
+      b = a * 2.0
+      self.assertEqual([1.0, 2.0], sess.run([a, b]))
+      # Marking an op unfetchable does not change the graph version, but it
+      # must not be fetched through the handler cached by the first run.
+      sess.graph.prevent_fetching(a.op)
+      with self.assertRaisesRegexp(ValueError, 'not fetchable'):
+        sess.run([a, b])
+      self.assertEqual(2.0, sess.run(b))
+
+  def testFetchHandlerCacheEviction(self):
+    with session.Session() as sess:
+      sess._fetch_handler_cache = session._LRUCache(2)
+      a = constant_op.constant(1.0)
+      b = constant_op.constant(2.0)
+      c = constant_op.constant(3.0)
+      self.assertEqual(1.0, sess.run(a))
+      self.assertEqual(2.0, sess.run(b))
+      self.assertEqual(3.0, sess.run(c))
+      self.assertEqual(2, len(sess._fetch_handler_cache))
+      self.assertEqual([1.0, 2.0, 3.0], sess.run([a, b, c]))
+      self.assertEqual(2, len(sess._fetch_handler_cache))
+
+  def testRunBatched(self):
+    with session.Session() as sess:
+      x = array_ops.placeholder(dtypes.float32, shape=[None, 2])
+      y = math_ops.reduce_sum(x, axis=1)
+      z = x * 2.0
+      feed_dicts = [{x: [[1.0, 2.0]]},
+                    {x: [[3.0, 4.0], [5.0, 6.0]]},
+                    {x: np.zeros([0, 2], dtype=np.float32)}]
+      results = sess.run_batched({'y': y, 'z': z, 'op': z.op}, feed_dicts)
+      self.assertEqual(3, len(results))
+      self.assertAllEqual([3.0], results[0]['y'])
+      self.assertAllEqual([[2.0, 4.0]], results[0]['z'])
+      self.assertAllEqual([7.0, 11.0], results[1]['y'])
+      self.assertAllEqual([[6.0, 8.0], [10.0, 12.0]], results[1]['z'])
+      self.assertEqual((0,), results[2]['y'].shape)
+      self.assertIsNone(results[0]['op'])
+      self.assertEqual([], sess.run_batched(y, []))
+
+  def testRunBatchedMaxBatchSize(self):
+    with session.Session() as sess:
+      x = array_ops.placeholder(dtypes.int32, shape=[None])
+      y = x + 1
+      feed_dicts = [{x: np.arange(i, i + 3)} for i in range(5)]
+      results = sess.run_batched(y, feed_dicts, max_batch_size=4)
+      for i, result in enumerate(results):
+        self.assertAllEqual(np.arange(i, i + 3) + 1, result)
+
+  def testRunBatchedBatchAxis(self):
+    with session.Session() as sess:
+      x = array_ops.placeholder(dtypes.float32, shape=[2, None])
+      y = x * 3.0
+      results = sess.run_batched(
+          y, [{x: np.ones([2, 1])}, {x: np.ones([2, 3])}], batch_axis=1)
+      self.assertAllEqual(3.0 * np.ones([2, 1]), results[0])
+      self.assertAllEqual(3.0 * np.ones([2, 3]), results[1])
+
+  def testRunBatchedErrors(self):
+    with session.Session() as sess:
+      x = array_ops.placeholder(dtypes.float32, shape=[None])
+      w = array_ops.placeholder(dtypes.float32, shape=[None])
+      y = x + w
+      with self.assertRaisesRegexp(ValueError, 'same keys'):
+        sess.run_batched(y, [{x: [1.0], w: [1.0]}, {x: [1.0]}])
+      with self.assertRaisesRegexp(ValueError, 'same size'):
+        sess.run_batched(y, [{x: [1.0], w: [1.0, 2.0]}])
+      # Fetches without the batch dimension of the feeds cannot be split.
+      loss = math_ops.reduce_sum(y, name='loss')
+      with self.assertRaisesRegexp(ValueError, 'loss:0'):
+        sess.run_batched(loss, [{x: [1.0], w: [1.0]}, {x: [2.0], w: [2.0]}])
+      with self.assertRaisesRegexp(ValueError, 'batch size 2'):
+        sess.run_batched(array_ops.concat([y, y], 0),
+                         [{x: [1.0], w: [1.0]}, {x: [2.0], w: [2.0]}])
+
+  def testMakeBatchedCallable(self):
+    with session.Session() as sess:
+      x = array_ops.placeholder(dtypes.float32, shape=[None])
+      y = x * 2.0
+      runner = sess.make_batched_callable(
+          [y], [x], max_batch_size=8, batch_timeout_secs=0.01)
+      results = [None] * 20
+
+      def run_request(i):
+        results[i] = runner([float(i)])
+
+      threads = [self.checkedThread(target=run_request, args=(i,))
+                 for i in range(20)]
+      for t in threads:
+        t.start()
+      for t in threads:
+        t.join()
+      runner.close()
+      for i, result in enumerate(results):
+        self.assertAllEqual([[2.0 * i]], result)
+      with self.assertRaisesRegexp(RuntimeError, 'closed'):
+        runner([1.0])
+
+  def testMakeBatchedCallableError(self):
+    with session.Session() as sess:
+      x = array_ops.placeholder(dtypes.float32, shape=[None])
+      y = array_ops.reshape(x, [2])
+      runner = sess.make_batched_callable(
+          y, [x], max_batch_size=1, batch_timeout_secs=0.0)
+      with self.assertRaises(errors.InvalidArgumentError):
+        runner([1.0])
+      runner.close()
+      with self.assertRaisesRegexp(ValueError, 'positive'):
+        sess.make_batched_callable(y, [x], max_batch_size=0,
+                                   batch_timeout_secs=0.0)
+
+  def testAlignedFeedArray(self):
+    for shape in [(), (0,), (3,), (5, 7)]:
+      for dtype in [np.float32, np.float64, np.int8]:
+        array = session.aligned_feed_array(shape, dtype)
+        self.assertEqual(shape, array.shape)
+        self.assertEqual(dtype, array.dtype)
+        self.assertTrue(array.flags.c_contiguous)
+        self.assertEqual(0, array.ctypes.data % session._FEED_ALIGNMENT_BYTES)
+
+  def testFeedCopyStats(self):
+    with session.Session() as sess:
+      x = array_ops.placeholder(dtypes.float32, shape=[None, None])
+      y = array_ops.identity(x)
+      self.assertEqual({}, sess.feed_copy_stats())
+
+      aligned = session.aligned_feed_array([4, 4], np.float32)
+      aligned[:] = np.arange(16).reshape(4, 4)
+      self.assertAllEqual(aligned, sess.run(y, feed_dict={x: aligned}))
+      # Read-only arrays are borrowed as well.
+      aligned.flags.writeable = False
+      self.assertAllEqual(aligned, sess.run(y, feed_dict={x: aligned}))
+      self.assertEqual({}, sess.feed_copy_stats())
+
+      sess.run(y, feed_dict={x: [[1.0]]})
+      sess.run(y, feed_dict={x: aligned.astype(np.float64)})
+      sess.run(y, feed_dict={x: aligned.T})
+      # A buffer that is 16-byte aligned is borrowed unless the runtime
+      # requires a larger alignment.
+      offset_16 = session.aligned_feed_array([5, 4], np.float32)[1:]
+      sess.run(y, feed_dict={x: offset_16})
+      expected = {'not_ndarray': 1, 'dtype': 1, 'non_contiguous': 1}
+      if session._FEED_MIN_ALIGNMENT_BYTES > 16:
+        expected['misaligned'] = 1
+      self.assertEqual(expected, sess.feed_copy_stats())
+      if session._FEED_MIN_ALIGNMENT_BYTES > 4:
+        raw = session.aligned_feed_array([4 * 16 + 4], np.uint8)
+        misaligned = raw[4:].view(np.float32).reshape([4, 4])
+        sess.run(y, feed_dict={x: misaligned})
+        expected['misaligned'] = expected.get('misaligned', 0) + 1
+        self.assertEqual(expected, sess.feed_copy_stats())
+
+  def testFeedCopyPolicy(self):
+    with session.Session() as sess:
+      x = array_ops.placeholder(dtypes.float32, shape=[2])
+      y = array_ops.identity(x)
+      sess.set_feed_copy_policy('error')
+      aligned = session.aligned_feed_array([2], np.float32)
+      aligned[:] = [1.0, 2.0]
+      self.assertAllEqual([1.0, 2.0], sess.run(y, feed_dict={x: aligned}))
+      with self.assertRaisesRegexp(ValueError, 'reason: dtype'):
+        sess.run(y, feed_dict={x: np.array([1.0, 2.0], dtype=np.float64)})
+      sess.set_feed_copy_policy('warn')
+      self.assertAllEqual([1.0, 2.0], sess.run(y, feed_dict={x: [1.0, 2.0]}))
+      self.assertEqual({'not_ndarray': 1}, sess.feed_copy_stats())
+      with self.assertRaisesRegexp(ValueError, 'Invalid feed copy policy'):
+        sess.set_feed_copy_policy('never')
+
   @test_util.disable_c_api  # session.make_callable() doesn't work with C API
   def testMakeCallableOnTensorWithRunOptions(self):
     with session.Session() as sess:
@@ -345,6 +345,7 @@ bool PyTensorListToVector(PyObject* py_tensor_list,
 %unignore tensorflow;
 %unignore TF_Run;
 %unignore EqualGraphDefWrapper;
+%unignore MaxAlignBytes;
 
 // Include the wrapper for TF_PRunSetup from tf_session_helper.h.
 
@@ -28,6 +28,7 @@ limitations under the License.
 #include "tensorflow/python/lib/core/ndarray_tensor.h"
 #include "tensorflow/python/lib/core/ndarray_tensor_bridge.h"
 #include "tensorflow/python/lib/core/safe_ptr.h"
+#include "third_party/eigen3/Eigen/Core"
 
 namespace tensorflow {
 
@@ -286,6 +287,8 @@ void TF_SessionRun_wrapper(TF_Session* session, const TF_Buffer* run_options,
   ClearDecrefCache();
 }
 
+int MaxAlignBytes() { return EIGEN_MAX_ALIGN_BYTES; }
+
 string EqualGraphDefWrapper(const string& actual, const string& expected) {
   GraphDef actual_def;
   if (!actual_def.ParseFromString(actual)) {
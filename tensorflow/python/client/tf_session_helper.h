@@ -92,6 +92,11 @@ void TF_PRun_wrapper(TF_DeprecatedSession* session, const char* handle,
 void TF_Reset_wrapper(const TF_SessionOptions* opt,
                       const NameVector& containers, TF_Status* out_status);
 
+// Returns the alignment in bytes (EIGEN_MAX_ALIGN_BYTES) that the buffer of a
+// fed numpy array must have for TF_NewTensor to use it without a copy, or 0 if
+// any alignment is accepted.
+int MaxAlignBytes();
+
 // Convenience wrapper around EqualGraphDef to make it easier to wrap.
 // Returns an explanation if a difference is found, or the empty string
 // for no difference.
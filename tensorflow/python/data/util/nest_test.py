@@ -144,6 +144,24 @@ class NestTest(test.TestCase):
     self.assertFalse(nest.is_sequence(np.ones((4, 5))))
     self.assertTrue(nest.is_sequence({"foo": 1, "bar": 2}))
 
+  def testPackSequenceAsWrongLengths(self):
+    with self.assertRaisesRegexp(
+        ValueError,
+        "Structure had 3 elements, but flat_sequence had 2 elements."):
+      nest.pack_sequence_as(("a", ("b", {"c": "d"})), [1, 2])
+    with self.assertRaisesRegexp(
+        ValueError,
+        "Structure had 2 elements, but flat_sequence had 3 elements."):
+      nest.pack_sequence_as(("a", ["b", "c"]), [1, 2, 3])
+
+  def testListsAreLeavesWithCachedNodeKinds(self):
+    structure = ([1, 2], {"a": [3]}, ([4],))
+    self.assertEqual([[1, 2], [3], [4]], nest.flatten(structure))
+    self.assertEqual([[1, 2], [3], [4]], nest.flatten(structure))
+    self.assertEqual(structure,
+                     nest.pack_sequence_as(structure, [[1, 2], [3], [4]]))
+    self.assertEqual(nest._LEAF, nest._NODE_KIND_CACHE[list])
+
   def testAssertSameStructure(self):
     structure1 = (((1, 2), 3), 4, (5, 6))
     structure2 = ((("foo1", "foo2"), "foo3"), "foo4", ("foo5", "foo6"))
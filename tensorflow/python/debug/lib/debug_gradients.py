@@ -281,10 +281,10 @@ class GradientsDebugger(object):
 
               for slot in input_slots:
                 consumer._inputs[slot] = debug_op
-                debug_op._consumers.append(consumer)
+                debug_op.consumers().append(consumer)
 
-            del output._consumers[:]
-            output._consumers.append(debug_op.op)
+            del output.consumers()[:]
+            output.consumers().append(debug_op.op)
     # pylint: enable=protected-access
 
     return self
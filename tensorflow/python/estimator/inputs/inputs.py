@@ -19,14 +19,18 @@ from __future__ import division
 from __future__ import print_function
 
 # pylint: disable=unused-import,line-too-long
+from tensorflow.python.estimator.inputs.numpy_io import numpy_dataset_input_fn
 from tensorflow.python.estimator.inputs.numpy_io import numpy_input_fn
+from tensorflow.python.estimator.inputs.pandas_io import pandas_dataset_input_fn
 from tensorflow.python.estimator.inputs.pandas_io import pandas_input_fn
 
 from tensorflow.python.util.all_util import remove_undocumented
 # pylint: enable=unused-import,line-too-long
 
 _allowed_symbols = [
+    'numpy_dataset_input_fn',
     'numpy_input_fn',
+    'pandas_dataset_input_fn',
     'pandas_input_fn'
 ]
 
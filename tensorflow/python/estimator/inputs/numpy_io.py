@@ -18,8 +18,21 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import atexit
 import collections
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from tensorflow.python.data.ops import dataset_ops
 from tensorflow.python.estimator.inputs.queues import feeding_functions
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import ops
+from tensorflow.python.ops import array_ops
+from tensorflow.python.ops import math_ops
+from tensorflow.python.ops import parsing_ops
 
 # Key name to pack the target into dict of `features`. See
 # `_get_unique_target_key` for details.
@@ -42,6 +55,35 @@ def _get_unique_target_key(features):
   return target_key
 
 
+def _pack_inputs(x, y):
+  """Returns an `OrderedDict` of the arrays in `x` and `y`, and the key of `y`.
+
+  Raises:
+    ValueError: if the arrays in `x` and `y` do not have the same length.
+    TypeError: `x` is not a dict.
+  """
+  if not isinstance(x, dict):
+    raise TypeError('x must be dict; got {}'.format(type(x).__name__))
+
+  # Make a shadow copy and also ensure the order of iteration is consistent.
+  ordered_dict_x = collections.OrderedDict(
+      sorted(x.items(), key=lambda t: t[0]))
+
+  unique_target_key = _get_unique_target_key(ordered_dict_x)
+  if y is not None:
+    ordered_dict_x[unique_target_key] = y
+
+  if len(set(v.shape[0] for v in ordered_dict_x.values())) != 1:
+    shape_dict_of_x = {k: ordered_dict_x[k].shape
+                       for k in ordered_dict_x.keys()}
+    shape_of_y = None if y is None else y.shape
+    raise ValueError('Length of tensors in x and y is mismatched. All '
+                     'elements in x and y must have the same length.\n'
+                     'Shapes in x: {}\n'
+                     'Shape for y: {}\n'.format(shape_dict_of_x, shape_of_y))
+  return ordered_dict_x, unique_target_key
+
+
 def numpy_input_fn(x,
                    y=None,
                    batch_size=128,
@@ -95,25 +137,7 @@ def numpy_input_fn(x,
 
   def input_fn():
     """Numpy input function."""
-    if not isinstance(x, dict):
-      raise TypeError('x must be dict; got {}'.format(type(x).__name__))
-
-    # Make a shadow copy and also ensure the order of iteration is consistent.
-    ordered_dict_x = collections.OrderedDict(
-        sorted(x.items(), key=lambda t: t[0]))
-
-    unique_target_key = _get_unique_target_key(ordered_dict_x)
-    if y is not None:
-      ordered_dict_x[unique_target_key] = y
-
-    if len(set(v.shape[0] for v in ordered_dict_x.values())) != 1:
-      shape_dict_of_x = {k: ordered_dict_x[k].shape
-                         for k in ordered_dict_x.keys()}
-      shape_of_y = None if y is None else y.shape
-      raise ValueError('Length of tensors in x and y is mismatched. All '
-                       'elements in x and y must have the same length.\n'
-                       'Shapes in x: {}\n'
-                       'Shape for y: {}\n'.format(shape_dict_of_x, shape_of_y))
+    ordered_dict_x, unique_target_key = _pack_inputs(x, y)
 
     queue = feeding_functions._enqueue_data(  # pylint: disable=protected-access
         ordered_dict_x,
@@ -137,3 +161,188 @@ def numpy_input_fn(x,
     return features
 
   return input_fn
+
+
+# Arrays larger than this, in total, are read from `.npy` files rather than
+# embedded in the graph as constants, since a `GraphDef` is limited to 2GB.
+_MAX_EMBEDDED_BYTES = 1 << 28
+
+# The dtypes that `tf.decode_raw()` can read from an `.npy` file.
+_DECODE_RAW_DTYPES = frozenset([
+    dtypes.float16, dtypes.float32, dtypes.float64, dtypes.int8, dtypes.int16,
+    dtypes.int32, dtypes.int64, dtypes.uint8, dtypes.uint16, dtypes.bool])
+
+
+def _can_decode_raw(array):
+  try:
+    return dtypes.as_dtype(array.dtype) in _DECODE_RAW_DTYPES
+  except TypeError:
+    return False
+
+
+def _npy_file(array):
+  """Returns `(filename, header_bytes)` if `array` maps a whole `.npy` file.
+
+  This is the case for the arrays returned by `np.load(filename,
+  mmap_mode='r')`. Returns `None` for any other array, including views of
+  part of a memory-mapped file.
+  """
+  if (not isinstance(array, np.memmap) or not getattr(array, 'filename', None)
+      or not array.flags.c_contiguous or not array.ndim or not array.size or
+      not _can_decode_raw(array)):
+    return None
+  header_bytes = getattr(array, 'offset', 0)
+  if header_bytes + array.nbytes != os.path.getsize(array.filename):
+    return None
+  return array.filename, header_bytes
+
+
+def _to_npy_files(arrays):
+  """Returns `arrays`, with the larger ones saved to memory-mapped files.
+
+  Arrays are saved, from the largest, until the remaining arrays can be
+  embedded in the graph. The files are deleted when the process exits.
+  """
+  arrays = collections.OrderedDict(arrays)
+  savable = [k for k, v in arrays.items()
+             if _npy_file(v) is None and _can_decode_raw(v) and v.size]
+  embedded_bytes = sum(arrays[k].nbytes for k in savable)
+  if embedded_bytes <= _MAX_EMBEDDED_BYTES:
+    return arrays
+  directory = tempfile.mkdtemp(prefix='numpy_input_fn')
+  atexit.register(shutil.rmtree, directory, ignore_errors=True)
+  for i, key in enumerate(sorted(savable, key=lambda k: -arrays[k].nbytes)):
+    if embedded_bytes <= _MAX_EMBEDDED_BYTES:
+      break
+    filename = os.path.join(directory, '%d.npy' % i)
+    np.save(filename, np.ascontiguousarray(arrays[key]))
+    embedded_bytes -= arrays[key].nbytes
+    arrays[key] = np.load(filename, mmap_mode='r')
+  return arrays
+
+
+def _decode_rows(raw_rows, array):
+  """Decodes a batch of rows of `array` read by `FixedLengthRecordDataset`."""
+  dtype = dtypes.as_dtype(array.dtype)
+  decoded = parsing_ops.decode_raw(
+      raw_rows, dtypes.uint8 if dtype == dtypes.bool else dtype,
+      little_endian=array.dtype.newbyteorder('<') == array.dtype)
+  if dtype == dtypes.bool:
+    decoded = math_ops.cast(decoded, dtypes.bool)
+  return array_ops.reshape(decoded, [-1] + list(array.shape[1:]))
+
+
+def _dataset_from_arrays(arrays, batch_size, num_epochs, shuffle,
+                         queue_capacity, num_threads):
+  """Returns a `Dataset` of batches of the rows of the dict `arrays`.
+
+  If all the arrays are embedded in the graph, a dataset of row indices is
+  shuffled and batched, and each batch is gathered from the arrays. Otherwise
+  the rows of memory-mapped `.npy` files are read with
+  `FixedLengthRecordDataset` and zipped with the rows of the other arrays, so
+  shuffling uses a buffer of `queue_capacity` rows.
+  """
+  num_rows = next(iter(arrays.values())).shape[0]
+  files = {k: _npy_file(v) for k, v in arrays.items()}
+  num_parallel_calls = num_threads if num_threads > 1 else None
+
+  if not any(files.values()):
+    tensors = {k: ops.convert_to_tensor(v) for k, v in arrays.items()}
+    dataset = dataset_ops.Dataset.range(num_rows)
+    if shuffle:
+      # Unlike a shuffling queue, this shuffles each epoch uniformly.
+      dataset = dataset.shuffle(max(num_rows, 1))
+    dataset = dataset.repeat(num_epochs).batch(batch_size).map(
+        lambda indices: {k: array_ops.gather(t, indices)
+                         for k, t in tensors.items()},
+        num_parallel_calls=num_parallel_calls)
+  else:
+    rows = {}
+    for key, array in arrays.items():
+      if files[key]:
+        filename, header_bytes = files[key]
+        rows[key] = dataset_ops.FixedLengthRecordDataset(
+            filename, array.nbytes // num_rows, header_bytes=header_bytes)
+      else:
+        rows[key] = dataset_ops.Dataset.from_tensor_slices(array)
+    dataset = dataset_ops.Dataset.zip(rows)
+    if shuffle:
+      dataset = dataset.shuffle(max(queue_capacity, 1))
+    dataset = dataset.repeat(num_epochs).batch(batch_size).map(
+        lambda batch: {k: _decode_rows(v, arrays[k]) if files[k] else v
+                       for k, v in batch.items()},
+        num_parallel_calls=num_parallel_calls)
+  return dataset.prefetch(max(queue_capacity // batch_size, 1))
+
+
+def _dataset_input_fn(arrays, batch_size, num_epochs, shuffle, queue_capacity,
+                      num_threads):
+  """Returns the next batch of a `_dataset_from_arrays()` dataset."""
+  dataset = _dataset_from_arrays(arrays, batch_size, num_epochs, shuffle,
+                                 queue_capacity, num_threads)
+  batch = dataset.make_one_shot_iterator().get_next()
+  return collections.OrderedDict((k, batch[k]) for k in arrays)
+
+
+def numpy_dataset_input_fn(x,
+                           y=None,
+                           batch_size=128,
+                           num_epochs=1,
+                           shuffle=None,
+                           queue_capacity=1000,
+                           num_threads=1):
+  """Returns input function that reads dict of numpy arrays with `tf.data`.
+
+  This is a drop-in replacement for `numpy_input_fn`, with the same arguments
+  and outputs, which does not start queue runners: the arrays are sliced by a
+  `tf.data` pipeline, so no batch is gathered or fed from Python.
+
+  Arrays are embedded in the graph as constants, unless they are too large.
+  Arrays loaded with `np.load(filename, mmap_mode='r')` are read from their
+  `.npy` files, and other large arrays are first saved to temporary `.npy`
+  files. Prefer memory-mapped arrays for datasets that do not fit in memory.
+
+  Args:
+    x: dict of numpy array object.
+    y: numpy array object. `None` if absent.
+    batch_size: Integer, size of batches to return.
+    num_epochs: Integer, number of epochs to iterate over data. If `None` will
+      run forever.
+    shuffle: Boolean, if True shuffles the data. Embedded arrays are shuffled
+      uniformly in each epoch; when reading `.npy` files, rows are shuffled
+      within a buffer of `queue_capacity` rows. Avoid shuffle at prediction
+      time.
+    queue_capacity: Integer, number of rows to prefetch, and the size of the
+      shuffle buffer when reading `.npy` files.
+    num_threads: Integer, number of threads used to gather or decode batches.
+
+  Returns:
+    Function, that has signature of ()->(dict of `features`, `target`)
+
+  Raises:
+    ValueError: if the shape of `y` mismatches the shape of values in `x` (i.e.,
+      values in `x` have same shape).
+    TypeError: `x` is not a dict or `shuffle` is not bool.
+  """
+
+  if not isinstance(shuffle, bool):
+    raise TypeError('shuffle must be explicitly set as boolean; '
+                    'got {}'.format(shuffle))
+  # The arrays saved to `.npy` files by the first call to `input_fn`.
+  saved_arrays = []
+
+  def input_fn():
+    """Numpy input function."""
+    if not saved_arrays:
+      ordered_dict_x, unique_target_key = _pack_inputs(x, y)
+      saved_arrays.append((_to_npy_files(ordered_dict_x), unique_target_key))
+    arrays, unique_target_key = saved_arrays[0]
+
+    features = _dataset_input_fn(arrays, batch_size, num_epochs, shuffle,
+                                 queue_capacity, num_threads)
+    if y is not None:
+      target = features.pop(unique_target_key)
+      return dict(features), target
+    return dict(features)
+
+  return input_fn
@@ -18,10 +18,15 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import os
+import time
+
 import numpy as np
 
+from tensorflow.python.client import session as session_lib
 from tensorflow.python.estimator.inputs import numpy_io
 from tensorflow.python.framework import errors
+from tensorflow.python.framework import ops
 from tensorflow.python.platform import test
 from tensorflow.python.training import coordinator
 from tensorflow.python.training import queue_runner_impl
@@ -286,5 +291,112 @@ class NumpyIoTest(test.TestCase):
         failing_input_fn()
 
 
+class NumpyDatasetIoTest(test.TestCase):
+
+  def _readAll(self, input_fn):
+    features, target = input_fn()
+    batches = []
+    with self.test_session() as session:
+      with self.assertRaises(errors.OutOfRangeError):
+        while True:
+          batches.append(session.run([features, target]))
+    return batches
+
+  def testNumpyDatasetInputFn(self):
+    x = {'a': np.arange(3) * 1.0, 'b': np.arange(32, 35)}
+    y = np.arange(-32, -29)
+    batches = self._readAll(numpy_io.numpy_dataset_input_fn(
+        x, y, batch_size=2, shuffle=False, num_epochs=3))
+
+    # As with `numpy_input_fn`, batches span epochs.
+    self.assertEqual(5, len(batches))
+    self.assertAllEqual([2, 0], batches[1][0]['a'])
+    self.assertAllEqual([34, 32], batches[1][0]['b'])
+    self.assertAllEqual([-30, -32], batches[1][1])
+    self.assertAllEqual([2], batches[4][0]['a'])
+
+  def testNumpyDatasetInputFnWithShuffle(self):
+    x = {'a': np.arange(100), 'b': np.arange(100) * 2}
+    y = np.arange(100) * 3
+    batches = self._readAll(numpy_io.numpy_dataset_input_fn(
+        x, y, batch_size=16, shuffle=True, num_epochs=2, num_threads=2))
+    a = np.concatenate([features['a'] for features, _ in batches])
+    self.assertAllEqual(np.concatenate([features['b'] for features, _ in
+                                        batches]), a * 2)
+    self.assertAllEqual(np.concatenate([target for _, target in batches]),
+                        a * 3)
+    self.assertAllEqual(np.arange(100), np.sort(a[:100]))
+    self.assertAllEqual(np.arange(100), np.sort(a[100:]))
+
+  def testNumpyDatasetInputFnWithZeroEpochs(self):
+    x = {'a': np.arange(4) * 1.0}
+    y = np.arange(-32, -28)
+    self.assertEqual([], self._readAll(numpy_io.numpy_dataset_input_fn(
+        x, y, batch_size=2, shuffle=False, num_epochs=0)))
+
+  def testNumpyDatasetInputFnFromNpyFiles(self):
+    filename = os.path.join(self.get_temp_dir(), 'a.npy')
+    np.save(filename, np.arange(10 * 3, dtype=np.float32).reshape([10, 3]))
+    a = np.load(filename, mmap_mode='r')
+    b = np.array([True, False] * 5)
+    # pylint: disable=protected-access
+    self.assertIsNotNone(numpy_io._npy_file(a))
+    self.assertIsNone(numpy_io._npy_file(a[1:]))
+    # pylint: enable=protected-access
+    # `b` and `y` are saved to temporary files, as if they were too large.
+    with test.mock.patch.object(numpy_io, '_MAX_EMBEDDED_BYTES', 0):
+      batches = self._readAll(numpy_io.numpy_dataset_input_fn(
+          {'a': a, 'b': b}, np.arange(10), batch_size=4, shuffle=False,
+          num_epochs=1))
+
+    self.assertAllEqual([4, 4, 2], [len(target) for _, target in batches])
+    self.assertAllEqual(
+        a, np.concatenate([features['a'] for features, _ in batches]))
+    self.assertAllEqual(
+        b, np.concatenate([features['b'] for features, _ in batches]))
+    self.assertAllEqual(np.arange(10),
+                        np.concatenate([target for _, target in batches]))
+
+  def testNumpyDatasetInputFnWithMismatchLengthOfInputs(self):
+    x = {'a': np.arange(4) * 1.0, 'b': np.arange(32, 36)}
+    input_fn = numpy_io.numpy_dataset_input_fn(
+        x, np.arange(-32, -30), batch_size=2, shuffle=False)
+    with self.assertRaisesRegexp(ValueError,
+                                 'Length of tensors in x and y is mismatched.'):
+      input_fn()
+
+
+class NumpyInputFnBenchmark(test.Benchmark):
+  """Compares the queue-based and `tf.data` numpy input functions."""
+
+  def _benchmark(self, make_input_fn, name):
+    x = {'a': np.random.rand(100000, 32).astype(np.float32),
+         'b': np.arange(100000)}
+    y = np.arange(100000)
+    with ops.Graph().as_default():
+      features, target = make_input_fn(
+          x, y, batch_size=128, shuffle=True, num_epochs=None)()
+      with session_lib.Session() as session:
+        coord = coordinator.Coordinator()
+        threads = queue_runner_impl.start_queue_runners(session, coord=coord)
+        session.run([features, target])
+        num_batches = 500
+        start = time.time()
+        for _ in range(num_batches):
+          session.run([features, target])
+        wall_time = (time.time() - start) / num_batches
+        coord.request_stop()
+        coord.join(threads)
+    print('%s: %.0f examples/s' % (name, 128 / wall_time))
+    self.report_benchmark(iters=num_batches, wall_time=wall_time, name=name)
+
+  def benchmarkNumpyInputFn(self):
+    self._benchmark(numpy_io.numpy_input_fn, 'benchmark_numpy_input_fn')
+
+  def benchmarkNumpyDatasetInputFn(self):
+    self._benchmark(numpy_io.numpy_dataset_input_fn,
+                    'benchmark_numpy_dataset_input_fn')
+
+
 if __name__ == '__main__':
   test.main()
@@ -19,7 +19,10 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
+
 import numpy as np
+from tensorflow.python.estimator.inputs import numpy_io
 from tensorflow.python.estimator.inputs.queues import feeding_functions
 
 try:
@@ -34,6 +37,35 @@ except ImportError:
   HAS_PANDAS = False
 
 
+def _pack_inputs(fn_name, x, y, shuffle, target_column):
+  """Returns a copy of `x` with `y` added as `target_column`.
+
+  Raises:
+    ValueError: if `x` already contains a column with the same name as `y`, or
+      if the indexes of `x` and `y` don't match.
+    TypeError: `shuffle` is not bool, or pandas is not installed.
+  """
+  if not HAS_PANDAS:
+    raise TypeError(
+        '%s should not be called without pandas installed' % fn_name)
+
+  if not isinstance(shuffle, bool):
+    raise TypeError('shuffle must be explicitly set as boolean; '
+                    'got {}'.format(shuffle))
+
+  x = x.copy()
+  if y is not None:
+    if target_column in x:
+      raise ValueError(
+          'Cannot use name %s for target column: DataFrame already has a '
+          'column with that name: %s' % (target_column, x.columns))
+    if not np.array_equal(x.index, y.index):
+      raise ValueError('Index for x and y are mismatched.\nIndex for x: %s\n'
+                       'Index for y: %s\n' % (x.index, y.index))
+    x[target_column] = y
+  return x
+
+
 def pandas_input_fn(x,
                     y=None,
                     batch_size=128,
@@ -68,24 +100,7 @@ def pandas_input_fn(x,
       if the indexes of `x` and `y` don't match.
     TypeError: `shuffle` is not bool.
   """
-  if not HAS_PANDAS:
-    raise TypeError(
-        'pandas_input_fn should not be called without pandas installed')
-
-  if not isinstance(shuffle, bool):
-    raise TypeError('shuffle must be explicitly set as boolean; '
-                    'got {}'.format(shuffle))
-
-  x = x.copy()
-  if y is not None:
-    if target_column in x:
-      raise ValueError(
-          'Cannot use name %s for target column: DataFrame already has a '
-          'column with that name: %s' % (target_column, x.columns))
-    if not np.array_equal(x.index, y.index):
-      raise ValueError('Index for x and y are mismatched.\nIndex for x: %s\n'
-                       'Index for y: %s\n' % (x.index, y.index))
-    x[target_column] = y
+  x = _pack_inputs('pandas_input_fn', x, y, shuffle, target_column)
 
   # TODO(mdan): These are memory copies. We probably don't need 4x slack space.
   # The sizes below are consistent with what I've seen elsewhere.
@@ -119,3 +134,63 @@ def pandas_input_fn(x,
       return features, target
     return features
   return input_fn
+
+
+def pandas_dataset_input_fn(x,
+                            y=None,
+                            batch_size=128,
+                            num_epochs=1,
+                            shuffle=None,
+                            queue_capacity=1000,
+                            num_threads=1,
+                            target_column='target'):
+  """Returns input function that reads Pandas DataFrame with `tf.data`.
+
+  This is a drop-in replacement for `pandas_input_fn`, with the same arguments
+  and outputs, which does not start queue runners. The columns of `x` are
+  read as by `numpy_dataset_input_fn`.
+
+  Note: `y`'s index must match `x`'s index.
+
+  Args:
+    x: pandas `DataFrame` object.
+    y: pandas `Series` object. `None` if absent.
+    batch_size: int, size of batches to return.
+    num_epochs: int, number of epochs to iterate over data. If not `None`,
+      read attempts that would exceed this value will raise `OutOfRangeError`.
+    shuffle: bool, whether to read the records in random order.
+    queue_capacity: int, number of rows to prefetch. If `None`, it will be set
+      to the size of `x`.
+    num_threads: Integer, number of threads used to gather batches.
+    target_column: str, name to give the target column `y`.
+
+  Returns:
+    Function, that has signature of ()->(dict of `features`, `target`)
+
+  Raises:
+    ValueError: if `x` already contains a column with the same name as `y`, or
+      if the indexes of `x` and `y` don't match.
+    TypeError: `shuffle` is not bool.
+  """
+  x = _pack_inputs('pandas_dataset_input_fn', x, y, shuffle, target_column)
+  if queue_capacity is None:
+    queue_capacity = len(x)
+  # The columns saved to `.npy` files by the first call to `input_fn`.
+  saved_arrays = []
+
+  def input_fn():
+    """Pandas input function."""
+    if not saved_arrays:
+      # pylint: disable=protected-access
+      saved_arrays.append(numpy_io._to_npy_files(collections.OrderedDict(
+          (column, x[column].values) for column in x.columns)))
+    features = numpy_io._dataset_input_fn(
+        saved_arrays[0], batch_size, num_epochs, shuffle, queue_capacity,
+        num_threads)
+    # pylint: enable=protected-access
+    features = dict(features)
+    if y is not None:
+      target = features.pop(target_column)
+      return features, target
+    return features
+  return input_fn
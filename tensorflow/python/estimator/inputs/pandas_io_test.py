@@ -244,6 +244,36 @@ class PandasIoTest(test.TestCase):
       pandas_io.pandas_input_fn(
           x, y, batch_size=2, shuffle=True, num_epochs=1)()
 
+  def testPandasDatasetInputFn(self):
+    if not HAS_PANDAS:
+      return
+    x, y = self.makeTestDataFrame()
+    with self.test_session() as session:
+      features, target = pandas_io.pandas_dataset_input_fn(
+          x, y, batch_size=3, shuffle=False, num_epochs=2)()
+      self.assertNotIn('target', features)
+
+      res = session.run([features, target])
+      self.assertAllEqual(res[0]['a'], [0, 1, 2])
+      self.assertAllEqual(res[0]['b'], [32, 33, 34])
+      self.assertAllEqual(res[1], [-32, -31, -30])
+      res = session.run([features, target])
+      self.assertAllEqual(res[0]['a'], [3, 0, 1])
+      res = session.run([features, target])
+      self.assertAllEqual(res[0]['a'], [2, 3])
+      self.assertAllEqual(res[1], [-30, -29])
+      with self.assertRaises(errors.OutOfRangeError):
+        session.run([features, target])
+
+  def testPandasDatasetInputFn_IndexMismatch(self):
+    if not HAS_PANDAS:
+      return
+    x, _ = self.makeTestDataFrame()
+    y_noindex = pd.Series(np.arange(-32, -28))
+    with self.assertRaises(ValueError):
+      pandas_io.pandas_dataset_input_fn(
+          x, y_noindex, batch_size=2, shuffle=False, num_epochs=1)
+
 
 if __name__ == '__main__':
   test.main()
@@ -618,11 +618,23 @@ def call_cpp_shape_fn(op, require_shape_fn=True):
         "handle_data": [None]
     }
 
+  input_shapes = [_tensor_to_inference_result(i) for i in op.inputs]
+
+  # pylint: disable=protected-access
+  cache = op.graph._shape_inference_cache
+  # pylint: enable=protected-access
+  if cache is not None:
+    cache_key = _shape_inference_cache_key(op, input_shapes)
+    res = cache.get(cache_key)
+    if res is not None:
+      return dict(res, shapes=list(res["shapes"]),
+                  handle_data=list(res["handle_data"]))
+
   input_tensors_needed = []
   input_tensors_as_shapes_needed = []
 
   while True:
-    res = _call_cpp_shape_fn_impl(op, input_tensors_needed,
+    res = _call_cpp_shape_fn_impl(op, input_shapes, input_tensors_needed,
                                   input_tensors_as_shapes_needed,
                                   require_shape_fn)
     if not isinstance(res, dict):
@@ -631,6 +643,13 @@ def call_cpp_shape_fn(op, require_shape_fn=True):
 
     # See if we need to evaluate some inputs.
     if not res["inputs_needed"]:
+      # Results that depend on input values or carry resource handle data are
+      # not worth the risk of sharing between ops.
+      if (cache is not None and not input_tensors_needed and
+          not input_tensors_as_shapes_needed and
+          all(h is None for h in res["handle_data"])):
+        cache.put(cache_key, dict(res, shapes=list(res["shapes"]),
+                                  handle_data=list(res["handle_data"])))
       return res
     p = cpp_shape_inference_pb2.CppShapeInferenceInputsNeeded()
     p = p.FromString(res["inputs_needed"])
@@ -647,22 +666,41 @@ def call_cpp_shape_fn(op, require_shape_fn=True):
       return res
 
 
+def _tensor_to_inference_result(t):
+  """Returns the serialized `CppShapeInferenceResult` describing `t`."""
+  r = cpp_shape_inference_pb2.CppShapeInferenceResult()
+  r.shape.CopyFrom(t.get_shape().as_proto())
+  # pylint: disable=protected-access
+  if t._handle_data is not None:
+    r.handle_data.CopyFrom(t._handle_data)
+  # pylint: enable=protected-access
+  return r.SerializeToString()
+
+
+def _shape_inference_cache_key(op, input_shapes):
+  """Returns the key of `op` in the graph's shape inference cache.
+
+  Args:
+    op: The op whose output shapes are being inferred.
+    input_shapes: The serialized `CppShapeInferenceResult`s of its inputs.
+
+  Returns:
+    A hashable key made of the op type, its attributes and `input_shapes`.
+  """
+  attrs = op.node_def.attr
+  attr_fingerprint = tuple(
+      (name, attrs[name].SerializeToString()) for name in sorted(attrs))
+  return (op.type, op.graph.graph_def_versions.producer, attr_fingerprint,
+          tuple(input_shapes))
+
+
 def _call_cpp_shape_fn_impl(
-    op, input_tensors_needed, input_tensors_as_shapes_needed, require_shape_fn):
+    op, input_shapes, input_tensors_needed, input_tensors_as_shapes_needed,
+    require_shape_fn):
   """Core implementation of call_cpp_shape_fn."""
   graph_def_version = op.graph.graph_def_versions.producer
   node_def_str = op.node_def.SerializeToString()
 
-  def tensor_to_inference_result(t):
-    r = cpp_shape_inference_pb2.CppShapeInferenceResult()
-    r.shape.CopyFrom(t.get_shape().as_proto())
-    # pylint: disable=protected-access
-    if t._handle_data is not None:
-      r.handle_data.CopyFrom(t._handle_data)
-    # pylint: enable=protected-access
-    return r.SerializeToString()
-  input_shapes = [tensor_to_inference_result(i) for i in op.inputs]
-
   input_tensors = [None for i in input_shapes]
   for idx in input_tensors_needed:
     v = tensor_util.constant_value(op.inputs[idx])
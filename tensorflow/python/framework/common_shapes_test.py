@@ -21,8 +21,12 @@ from __future__ import print_function
 import numpy as np
 
 from tensorflow.python.framework import common_shapes
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import ops
 from tensorflow.python.framework import tensor_shape
 from tensorflow.python.framework import test_util
+from tensorflow.python.ops import array_ops
+from tensorflow.python.ops import math_ops
 from tensorflow.python.platform import googletest
 
 
@@ -205,5 +209,72 @@ class CommonShapesTest(test_util.TensorFlowTestCase):
         expected=shape_4x4, shape1=shape_4xU, shape2=shape_Ux4)
 
 
+
+class ShapeInferenceCacheTest(test_util.TensorFlowTestCase):
+
+  def _statsDelta(self, graph, before):
+    after = graph.shape_inference_cache_stats()
+    return after["hits"] - before["hits"], after["misses"] - before["misses"]
+
+  def testDisabledByDefault(self):
+    with ops.Graph().as_default() as g:
+      x = array_ops.placeholder(dtypes.float32, [2, 3])
+      math_ops.matmul(x, x, transpose_b=True)
+    self.assertEqual({"hits": 0, "misses": 0, "entries": 0, "max_entries": 0},
+                     g.shape_inference_cache_stats())
+
+  def testIdenticalOpsHitCache(self):
+    with ops.Graph().as_default() as g:
+      g.set_shape_inference_cache_size(16)
+      x = array_ops.placeholder(dtypes.float32, [2, 3])
+      y = array_ops.placeholder(dtypes.float32, [3, 4])
+      before = g.shape_inference_cache_stats()
+      products = [math_ops.matmul(x, y) for _ in range(3)]
+      self.assertEqual((2, 1), self._statsDelta(g, before))
+      for product in products:
+        self.assertEqual([2, 4], product.get_shape().as_list())
+
+      # Different attrs or input shapes are different entries.
+      before = g.shape_inference_cache_stats()
+      product = math_ops.matmul(x, x, transpose_b=True)
+      self.assertEqual([2, 2], product.get_shape().as_list())
+      product = math_ops.matmul(
+          array_ops.placeholder(dtypes.float32, [5, 3]), y)
+      self.assertEqual([5, 4], product.get_shape().as_list())
+      self.assertEqual(0, self._statsDelta(g, before)[0])
+
+  def testValueDependentShapesAreNotCached(self):
+    with ops.Graph().as_default() as g:
+      g.set_shape_inference_cache_size(16)
+      x = array_ops.placeholder(dtypes.float32, [2, 3])
+      first = array_ops.reshape(x, [3, 2])
+      entries = g.shape_inference_cache_stats()["entries"]
+      second = array_ops.reshape(x, [6, 1])
+      self.assertEqual([3, 2], first.get_shape().as_list())
+      self.assertEqual([6, 1], second.get_shape().as_list())
+      self.assertEqual(entries, g.shape_inference_cache_stats()["entries"])
+
+  def testEvictsLeastRecentlyUsed(self):
+    with ops.Graph().as_default() as g:
+      x = array_ops.placeholder(dtypes.float32, [2, 3])
+      g.set_shape_inference_cache_size(1)
+      math_ops.matmul(x, x, transpose_b=True)
+      math_ops.matmul(x, x, transpose_a=True)
+      before = g.shape_inference_cache_stats()
+      self.assertEqual(1, before["entries"])
+      self.assertEqual(1, before["max_entries"])
+      math_ops.matmul(x, x, transpose_b=True)
+      self.assertEqual((0, 1), self._statsDelta(g, before))
+
+  def testResizeAndDisable(self):
+    g = ops.Graph()
+    with self.assertRaisesRegexp(ValueError, "non-negative"):
+      g.set_shape_inference_cache_size(-1)
+    g.set_shape_inference_cache_size(4)
+    self.assertEqual(4, g.shape_inference_cache_stats()["max_entries"])
+    g.set_shape_inference_cache_size(0)
+    self.assertEqual(0, g.shape_inference_cache_stats()["max_entries"])
+
+
 if __name__ == "__main__":
   googletest.main()
@@ -0,0 +1,96 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmarks for the Python memory used to build large graphs."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import gc
+import time
+
+from six.moves import xrange  # pylint: disable=redefined-builtin
+
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import ops
+from tensorflow.python.ops import array_ops
+from tensorflow.python.platform import test
+
+try:
+  import tracemalloc  # pylint: disable=g-import-not-at-top
+except ImportError:
+  tracemalloc = None
+
+
+class GraphMemoryBenchmark(test.Benchmark):
+  """Benchmarks for the Python memory used to build large graphs."""
+
+  def _benchmarkBuildGraph(self, name, num_ops, traceback_mode="full"):
+    """Builds a chain of `num_ops` ops and reports the bytes used per op.
+
+    Each op of the chain has one input and one output `Tensor`, so this
+    measures the cost of an `Operation`, its output `Tensor`, their protos and
+    their tracebacks.
+
+    Args:
+      name: A human-readable name for logging the output.
+      num_ops: The number of ops to create.
+      traceback_mode: The traceback mode of the graph. See
+        `tf.Graph.set_op_traceback_mode`.
+    """
+    if tracemalloc is None:
+      print("%s skipped: tracemalloc is not available." % name)
+      return
+    gc.collect()
+    tracemalloc.start()
+    start_bytes = tracemalloc.get_traced_memory()[0]
+    start_time = time.time()
+    with ops.Graph().as_default() as g:
+      if traceback_mode == "limited":
+        g.set_op_traceback_mode(traceback_mode, max_frames=4)
+      else:
+        g.set_op_traceback_mode(traceback_mode)
+      t = array_ops.placeholder(dtypes.float32, shape=[])
+      for _ in xrange(num_ops):
+        t = array_ops.identity(t)
+      gc.collect()
+      wall_time = time.time() - start_time
+      bytes_per_op = (
+          (tracemalloc.get_traced_memory()[0] - start_bytes) / num_ops)
+    tracemalloc.stop()
+    print("%s %d ops: %.1f bytes/op, %.2f us/op" %
+          (name, num_ops, bytes_per_op, 1e6 * wall_time / num_ops))
+    self.report_benchmark(
+        iters=num_ops,
+        wall_time=wall_time / num_ops,
+        name=name,
+        extras={"bytes_per_op": bytes_per_op})
+
+  def benchmarkBuildGraph1MOps(self):
+    self._benchmarkBuildGraph("benchmark_build_graph_1m_ops", 1000000)
+
+  def benchmarkBuildGraph1MOpsLimitedTraceback(self):
+    self._benchmarkBuildGraph(
+        "benchmark_build_graph_1m_ops_limited_traceback", 1000000,
+        traceback_mode="limited")
+
+  def benchmarkBuildGraph1MOpsNoTraceback(self):
+    self._benchmarkBuildGraph(
+        "benchmark_build_graph_1m_ops_no_traceback", 1000000,
+        traceback_mode="off")
+
+
+if __name__ == "__main__":
+  test.main()
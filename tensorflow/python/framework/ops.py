@@ -18,9 +18,13 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import array
+import bisect
 import collections
 import copy
+import itertools
 import linecache
+import os
 import re
 import sys
 import threading
@@ -266,6 +270,13 @@ class Tensor(_TensorLike):
       "__rmatmul__"
   }
 
+  # Graph-building code creates very many tensors, so their fixed attributes
+  # are stored in slots rather than in a per-instance __dict__. Other
+  # attributes can still be set; the __dict__ inherited from _TensorLike is
+  # only allocated when one is.
+  __slots__ = ("_op", "_value_index", "_dtype", "_shape", "_consumers",
+               "_handle_data", "_id")
+
   def __init__(self, op, value_index, dtype):
     """Creates a new `Tensor`.
 
@@ -285,8 +296,9 @@ class Tensor(_TensorLike):
     self._dtype = dtypes.as_dtype(dtype)
     self._shape = tensor_shape.unknown_shape()
     # List of operations that use this Tensor as input.  We maintain this list
-    # to easily navigate a computation graph.
-    self._consumers = []
+    # to easily navigate a computation graph. Many tensors have no consumers,
+    # so the list is only allocated when needed; see consumers().
+    self._consumers = None
 
     # Attributes used for C++ shape inference. Not inspected, only forwarded.
     # If set, will be a HandleData object from cpp_shape_inference.proto.
@@ -426,6 +438,8 @@ class Tensor(_TensorLike):
     Returns:
       A list of `Operation`s.
     """
+    if self._consumers is None:
+      self._consumers = []
     return self._consumers
 
   def _add_consumer(self, consumer):
@@ -439,7 +453,7 @@ class Tensor(_TensorLike):
     """
     if not isinstance(consumer, Operation):
       raise TypeError("Consumer must be an Operation: %s" % consumer)
-    self._consumers.append(consumer)
+    self.consumers().append(consumer)
 
   def _as_node_def_input(self):
     """Return a value to use for the NodeDef "input" attribute.
@@ -1532,6 +1546,15 @@ class Operation(object):
   `op.run()` is a shortcut for calling `tf.get_default_session().run(op)`.
   """
 
+  # Graph-building code creates very many operations, so their fixed
+  # attributes are stored in slots rather than in a per-instance __dict__.
+  # Other attributes can still be set; __dict__ is only allocated when one is.
+  __slots__ = ("_node_def", "_graph", "_inputs", "_output_types_val",
+               "_outputs", "_input_types_val", "_control_inputs",
+               "_original_op", "_op_def", "_traceback",
+               "_control_flow_context", "_id_value", "_c_op", "__dict__",
+               "__weakref__")
+
   def __init__(self,
                node_def,
                g,
@@ -1635,7 +1658,7 @@ class Operation(object):
 
     self._original_op = original_op
     self._op_def = op_def
-    self._traceback = self._graph._extract_stack()  # pylint: disable=protected-access
+    self._traceback = self._graph._capture_traceback()  # pylint: disable=protected-access
     # Add this op to the current control flow context:
     self._control_flow_context = g._get_control_flow_context()  # pylint: disable=protected-access
     if self._control_flow_context is not None:
@@ -2001,6 +2024,8 @@ class Operation(object):
   class _InputList(object):
     """Immutable input list wrapper."""
 
+    __slots__ = ("_op",)
+
     def __init__(self, op):
       self._op = op
 
@@ -2120,8 +2145,12 @@ class Operation(object):
 
   @property
   def traceback(self):
-    """Returns the call stack from when this operation was constructed."""
-    return self._graph._convert_stack(self._traceback)  # pylint: disable=protected-access
+    """Returns the call stack from when this operation was constructed.
+
+    The stack may be truncated or empty, depending on the traceback mode of
+    the graph; see `tf.Graph.set_op_traceback_mode`.
+    """
+    return self._graph._convert_stack(self._traceback_frames())  # pylint: disable=protected-access
 
   @property
   def traceback_with_start_lines(self):
@@ -2131,9 +2160,13 @@ class Operation(object):
       A list of 5-tuples (filename, lineno, name, code, func_start_lineno).
     """
     return self._graph._convert_stack(  # pylint: disable=protected-access
-        self._traceback,
+        self._traceback_frames(),
         include_func_start_lineno=True)
 
+  def _traceback_frames(self):
+    """Returns the stack frames of this op, as accepted by _convert_stack()."""
+    return self._graph._traceback_table.decode(self._traceback)  # pylint: disable=protected-access
+
   def get_attr(self, name):
     """Returns the value of the attr of this op with the given `name`.
 
@@ -2525,6 +2558,297 @@ def _name_from_scope_name(name):
   return name[:-1] if (name and name[-1] == "/") else name
 
 
+# Characters with a special meaning in `re` patterns. A collection scope that
+# contains none of them filters by plain prefix.
+_REGEX_SPECIAL_CHARS = frozenset(".^$*+?{}[]\\|()")
+
+# Marks a `_CollectionList` whose items cannot all be indexed by name.
+_UNINDEXABLE = object()
+
+
+def _is_prefix_scope(scope):
+  """Returns True if `re.match(scope, name)` is equivalent to a prefix test."""
+  return (isinstance(scope, six.string_types) and
+          not _REGEX_SPECIAL_CHARS.intersection(scope))
+
+
+class _CollectionList(list):
+  """The list of values of a graph collection.
+
+  Maintains a sorted index of the `name` attributes of its items, so that
+  `Graph.get_collection()` can filter by a prefix scope in O(log n + k)
+  instead of matching every item. `append()` updates the index in place; any
+  other mutation (for example through the list returned by
+  `Graph.get_collection_ref()`) discards it, and it is rebuilt on the next
+  prefix query.
+  """
+
+  def __init__(self, *args):
+    super(_CollectionList, self).__init__(*args)
+    # A sorted list of (name, position) pairs, None if it must be rebuilt,
+    # or _UNINDEXABLE if an item has a name that is not a string.
+    self._name_index = None
+
+  def _build_name_index(self):
+    index = []
+    for position, item in enumerate(self):
+      if hasattr(item, "name"):
+        name = item.name
+        if not isinstance(name, six.string_types):
+          return _UNINDEXABLE
+        index.append((name, position))
+    index.sort()
+    return index
+
+  def filter_by_prefix(self, prefix):
+    """Returns the items whose name starts with `prefix`, in list order.
+
+    Args:
+      prefix: A string.
+
+    Returns:
+      A list of items, or None if the items cannot be indexed by name.
+    """
+    if self._name_index is None:
+      self._name_index = self._build_name_index()
+    index = self._name_index
+    if index is _UNINDEXABLE:
+      return None
+    positions = []
+    i = bisect.bisect_left(index, (prefix,))
+    while i < len(index) and index[i][0].startswith(prefix):
+      positions.append(index[i][1])
+      i += 1
+    positions.sort()
+    return [self[position] for position in positions]
+
+  def append(self, value):
+    super(_CollectionList, self).append(value)
+    index = self._name_index
+    if index is not None and index is not _UNINDEXABLE and hasattr(
+        value, "name"):
+      name = value.name
+      if isinstance(name, six.string_types):
+        bisect.insort(index, (name, len(self) - 1))
+      else:
+        self._name_index = _UNINDEXABLE
+
+  def _invalidate_name_index(self):
+    self._name_index = None
+
+  def __setitem__(self, *args):
+    self._invalidate_name_index()
+    return super(_CollectionList, self).__setitem__(*args)
+
+  def __delitem__(self, *args):
+    self._invalidate_name_index()
+    return super(_CollectionList, self).__delitem__(*args)
+
+  def __iadd__(self, other):
+    self._invalidate_name_index()
+    return super(_CollectionList, self).__iadd__(other)
+
+  def __imul__(self, n):
+    self._invalidate_name_index()
+    return super(_CollectionList, self).__imul__(n)
+
+  def extend(self, values):
+    self._invalidate_name_index()
+    return super(_CollectionList, self).extend(values)
+
+  def insert(self, position, value):
+    self._invalidate_name_index()
+    return super(_CollectionList, self).insert(position, value)
+
+  def remove(self, value):
+    self._invalidate_name_index()
+    return super(_CollectionList, self).remove(value)
+
+  def pop(self, *args):
+    self._invalidate_name_index()
+    return super(_CollectionList, self).pop(*args)
+
+  def sort(self, *args, **kwargs):
+    self._invalidate_name_index()
+    return super(_CollectionList, self).sort(*args, **kwargs)
+
+  def reverse(self):
+    self._invalidate_name_index()
+    return super(_CollectionList, self).reverse()
+
+  def clear(self):
+    # Python 3 only; Python 2 lists are cleared with `del l[:]`.
+    self._invalidate_name_index()
+    del self[:]
+
+  # Python 2 calls these for simple slices instead of __setitem__ and
+  # __delitem__.
+  def __setslice__(self, i, j, values):
+    self._invalidate_name_index()
+    return list.__setslice__(self, i, j, values)  # pylint: disable=no-member
+
+  def __delslice__(self, i, j):
+    self._invalidate_name_index()
+    return list.__delslice__(self, i, j)  # pylint: disable=no-member
+
+
+class _TracebackTable(object):
+  """Interned storage for the tracebacks of the ops of a graph.
+
+  Each distinct stack frame (filename, line number, function name, function
+  start line and custom frame info) is stored once, in parallel arrays of
+  integers indexing into a table of interned strings. A traceback is a tuple
+  of frame ids, outermost frame first, and identical tracebacks share a
+  single tuple.
+
+  Frame globals are not retained; only the entries that `linecache` needs to
+  find the source of a module are kept, once per filename.
+  """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._strings = []
+    self._string_ids = {}
+    self._frame_ids = {}
+    self._filename_ids = array.array("i")
+    self._linenos = array.array("i")
+    self._name_ids = array.array("i")
+    self._func_start_linenos = array.array("i")
+    self._frame_infos = []
+    self._module_globals = {}
+    self._tracebacks = {}
+
+  def _intern_string(self, string):
+    string_id = self._string_ids.get(string)
+    if string_id is None:
+      string_id = len(self._strings)
+      self._strings.append(string)
+      self._string_ids[string] = string_id
+    return string_id
+
+  def intern(self, frames):
+    """Interns a traceback.
+
+    Args:
+      frames: A list of 6-tuples (filename, lineno, name, frame_globals,
+        func_start_lineno, frame_info), outermost frame first. `frame_info`
+        must be hashable.
+
+    Returns:
+      A tuple of frame ids.
+    """
+    with self._lock:
+      frame_ids = []
+      for (filename, lineno, name, frame_globals, func_start_lineno,
+           frame_info) in frames:
+        key = (filename, lineno, name, func_start_lineno, frame_info)
+        frame_id = self._frame_ids.get(key)
+        if frame_id is None:
+          frame_id = len(self._linenos)
+          filename_id = self._intern_string(filename)
+          if filename_id not in self._module_globals:
+            self._module_globals[filename_id] = {
+                k: frame_globals[k] for k in ("__name__", "__loader__", "__spec__")
+                if k in frame_globals}
+          self._filename_ids.append(filename_id)
+          self._linenos.append(lineno)
+          self._name_ids.append(self._intern_string(name))
+          self._func_start_linenos.append(func_start_lineno)
+          self._frame_infos.append(frame_info)
+          self._frame_ids[key] = frame_id
+        frame_ids.append(frame_id)
+      frame_ids = tuple(frame_ids)
+      return self._tracebacks.setdefault(frame_ids, frame_ids)
+
+  def decode(self, traceback):
+    """Expands an interned traceback.
+
+    Args:
+      traceback: A tuple of frame ids, as returned by `intern()`.
+
+    Returns:
+      A list of 6-tuples (filename, lineno, name, module_globals,
+      func_start_lineno, frame_info), as accepted by
+      `Graph._convert_stack()`.
+    """
+    ret = []
+    for frame_id in traceback:
+      filename_id = self._filename_ids[frame_id]
+      ret.append((self._strings[filename_id], self._linenos[frame_id],
+                  self._strings[self._name_ids[frame_id]],
+                  self._module_globals[filename_id],
+                  self._func_start_linenos[frame_id],
+                  self._frame_infos[frame_id]))
+    return ret
+
+  def __len__(self):
+    """Returns the number of distinct frames stored in the table."""
+    return len(self._linenos)
+
+
+_TRACEBACK_MODES = ("full", "limited", "sampled", "off")
+
+# The directory of the TensorFlow package. Frames of modules under it (other
+# than tests) are skipped by the "limited" traceback mode.
+_TENSORFLOW_DIR = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))) + os.sep
+
+# Memoized results of `_is_internal_filename()`.
+_internal_filenames = {}
+
+
+def _is_internal_filename(filename):
+  """Returns true if `filename` is a (non-test) TensorFlow library module."""
+  internal = _internal_filenames.get(filename)
+  if internal is None:
+    internal = (filename.startswith(_TENSORFLOW_DIR) and
+                not filename.endswith("_test.py"))
+    _internal_filenames[filename] = internal
+  return internal
+
+
+class _ShapeInferenceCache(object):
+  """A bounded LRU cache of shape inference results, with hit/miss counters.
+
+  See `Graph.set_shape_inference_cache_size()`. Keys and values are opaque to
+  this class; `common_shapes.call_cpp_shape_fn` defines them.
+  """
+
+  def __init__(self, max_entries):
+    self._max_entries = max_entries
+    self._entries = collections.OrderedDict()
+    self._lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+
+  @property
+  def max_entries(self):
+    return self._max_entries
+
+  def get(self, key):
+    """Returns the value cached for `key` or None, and counts a hit or miss."""
+    with self._lock:
+      value = self._entries.pop(key, None)
+      if value is None:
+        self.misses += 1
+        return None
+      # Re-insert the entry to mark it as the most recently used.
+      self._entries[key] = value
+      self.hits += 1
+      return value
+
+  def put(self, key, value):
+    """Caches `value` for `key`, evicting the least recently used entry."""
+    with self._lock:
+      self._entries.pop(key, None)
+      self._entries[key] = value
+      if len(self._entries) > self._max_entries:
+        self._entries.popitem(last=False)
+
+  def __len__(self):
+    return len(self._entries)
+
+
 class Graph(object):
   """A TensorFlow computation, represented as a dataflow graph.
 
@@ -2637,6 +2961,15 @@ class Graph(object):
     # Resource container.
     self._container = ""
     self._registered_ops = op_def_registry.get_registered_ops()
+    # Tracebacks of the ops in this graph. See `set_op_traceback_mode()`.
+    self._traceback_table = _TracebackTable()
+    self._traceback_mode = "full"
+    self._traceback_max_frames = None
+    self._traceback_sample_every = None
+    self._traceback_counter = itertools.count()
+    # Memoized shape inference results, or None when disabled. See
+    # `set_shape_inference_cache_size()`.
+    self._shape_inference_cache = None
 
     # TODO(skyewm): fold as much of the above as possible into the C
     # implementation
@@ -2646,11 +2979,12 @@ class Graph(object):
       self._scoped_c_graph = None
 
   def _convert_stack(self, stack, include_func_start_lineno=False):
-    """Converts a stack extracted using _extract_stack() to a traceback stack.
+    """Converts a stack captured by _capture_traceback() to a traceback stack.
 
     Args:
-      stack: A list of n 5-tuples,
-        (filename, lineno, name, frame_globals, func_start_lineno).
+      stack: A list of n 6-tuples, (filename, lineno, name, frame_globals,
+        func_start_lineno, frame_info), as returned by
+        `_TracebackTable.decode()`.
       include_func_start_lineno: True if function start line number should be
         included as the 5th entry in return tuples.
 
@@ -2675,8 +3009,12 @@ class Graph(object):
         ret.append((filename, lineno, name, line))
     return ret
 
-  def _extract_stack(self):
-    """A lightweight, extensible re-implementation of traceback.extract_stack.
+  def _capture_traceback(self):
+    """Captures the traceback of an op being created, as an interned tuple.
+
+    This must be called directly from `Operation.__init__()`, whose frame is
+    the innermost one recorded. What is captured depends on the mode set with
+    `set_op_traceback_mode()`.
 
     NOTE(mrry): traceback.extract_stack eagerly retrieves the line of code for
       each stack frame using linecache, which results in an abundance of stat()
@@ -2688,28 +3026,128 @@ class Graph(object):
     to the traceback.
 
     Returns:
-      A list of 6-tuples
-      (filename, lineno, name, frame_globals, func_start_lineno, custom_info)
-      corresponding to the call stack of the current thread.
+      A tuple of frame ids in `self._traceback_table`.
     """
+    mode = self._traceback_mode
+    if mode == "off":
+      return ()
+    if mode == "sampled":
+      if next(self._traceback_counter) % self._traceback_sample_every:
+        return ()
+    max_frames = self._traceback_max_frames if mode == "limited" else None
     try:
       raise ZeroDivisionError
     except ZeroDivisionError:
       f = sys.exc_info()[2].tb_frame.f_back
-    ret = []
-    while f is not None:
-      lineno = f.f_lineno
+    if max_frames is not None:
+      # Skip the innermost TensorFlow frames (`Operation.__init__()`,
+      # `create_op()`, op wrappers...), so that the frames that are kept start
+      # at the caller's code. If every frame is internal, keep the innermost.
+      user_frame = f
+      while user_frame is not None and _is_internal_filename(
+          user_frame.f_code.co_filename):
+        user_frame = user_frame.f_back
+      if user_frame is not None:
+        f = user_frame
+    frames = []
+    while f is not None and (max_frames is None or len(frames) < max_frames):
       co = f.f_code
-      filename = co.co_filename
-      name = co.co_name
-      frame_globals = f.f_globals
-      func_start_lineno = co.co_firstlineno
-      frame_info = self._extract_frame_info(f)
-      ret.append((filename, lineno, name, frame_globals, func_start_lineno,
-                  frame_info))
+      frames.append((co.co_filename, f.f_lineno, co.co_name, f.f_globals,
+                     co.co_firstlineno, self._extract_frame_info(f)))
       f = f.f_back
-    ret.reverse()
-    return ret
+    frames.reverse()
+    return self._traceback_table.intern(frames)
+
+  def set_op_traceback_mode(self, mode, max_frames=None, sample_every=None):
+    """Selects how the tracebacks of ops created in this graph are captured.
+
+    Every `tf.Operation` records the Python call stack from which it was
+    created (see `tf.Operation.traceback`). For very large graphs, capturing
+    it for every op can be costly; this method trades traceback information
+    for graph construction time and memory. It only affects ops created after
+    it is called. The available modes are:
+
+    * `"full"` (the default): the whole call stack is captured.
+    * `"limited"`: only `max_frames` frames are captured, starting with the
+      innermost frame outside the TensorFlow library (i.e. the code that
+      called a TensorFlow API to create the op) and continuing with its
+      callers. The TensorFlow frames inside that call are skipped.
+    * `"sampled"`: the whole call stack is captured for one op in every
+      `sample_every` ops, starting with the first; other ops have an empty
+      traceback.
+    * `"off"`: no traceback is captured.
+
+    Args:
+      mode: One of `"full"`, `"limited"`, `"sampled"` or `"off"`.
+      max_frames: The number of frames to capture in `"limited"` mode.
+      sample_every: The sampling period in `"sampled"` mode.
+
+    Raises:
+      ValueError: If `mode` is invalid, or the argument it requires is missing
+        or not positive.
+    """
+    if mode not in _TRACEBACK_MODES:
+      raise ValueError("Invalid traceback mode %r, expected one of %s." %
+                       (mode, ", ".join(_TRACEBACK_MODES)))
+    if mode == "limited" and (max_frames is None or max_frames <= 0):
+      raise ValueError("max_frames must be a positive integer in 'limited' "
+                       "mode, got %r." % max_frames)
+    if mode == "sampled" and (sample_every is None or sample_every <= 0):
+      raise ValueError("sample_every must be a positive integer in 'sampled' "
+                       "mode, got %r." % sample_every)
+    with self._lock:
+      self._traceback_mode = mode
+      self._traceback_max_frames = max_frames
+      self._traceback_sample_every = sample_every
+      self._traceback_counter = itertools.count()
+
+  def set_shape_inference_cache_size(self, max_entries):
+    """Enables memoizing the results of C++ shape functions in this graph.
+
+    Computing the output shapes of a new op with its C++ shape function
+    serializes the op and the shapes of its inputs across the SWIG boundary.
+    Generated models often contain many ops with the same type, attributes and
+    input shapes, for which the results are identical. With a cache enabled,
+    results are reused for such ops, keyed by the op type, its attributes and
+    the shapes (and resource handle data) of its inputs.
+
+    Results that depend on the values of constant inputs, or that produce
+    resource handle data, are never cached. The cache only applies to ops whose
+    shapes are computed with `common_shapes.call_cpp_shape_fn`, which includes
+    all ops without a Python shape function.
+
+    Args:
+      max_entries: The maximum number of results to keep, evicting the least
+        recently used ones. `0` disables the cache and discards its contents.
+
+    Raises:
+      ValueError: If `max_entries` is negative.
+    """
+    if max_entries < 0:
+      raise ValueError("max_entries must be non-negative, got %d." %
+                       max_entries)
+    with self._lock:
+      if max_entries == 0:
+        self._shape_inference_cache = None
+      else:
+        self._shape_inference_cache = _ShapeInferenceCache(max_entries)
+
+  def shape_inference_cache_stats(self):
+    """Returns statistics about the shape inference cache of this graph.
+
+    See `set_shape_inference_cache_size()`. The counters are reset when the
+    cache is resized.
+
+    Returns:
+      A dict with the number of cache `"hits"` and `"misses"`, the number of
+      cached `"entries"` and the `"max_entries"` of the cache. All values are
+      `0` when the cache is disabled.
+    """
+    cache = self._shape_inference_cache
+    if cache is None:
+      return {"hits": 0, "misses": 0, "entries": 0, "max_entries": 0}
+    return {"hits": cache.hits, "misses": cache.misses, "entries": len(cache),
+            "max_entries": cache.max_entries}
 
   def _extract_frame_info(self, frame):  # pylint: disable=unused-argument
     """Extracts custom information from a frame in an op traceback."""
@@ -3406,7 +3844,7 @@ class Graph(object):
     self._check_not_finalized()
     with self._lock:
       if name not in self._collections:
-        self._collections[name] = [value]
+        self._collections[name] = _CollectionList([value])
       else:
         self._collections[name].append(value)
 
@@ -3453,7 +3891,7 @@ class Graph(object):
     with self._lock:
       coll_list = self._collections.get(name, None)
       if coll_list is None:
-        coll_list = []
+        coll_list = _CollectionList()
         self._collections[name] = coll_list
       return coll_list
 
@@ -3471,7 +3909,8 @@ class Graph(object):
         to include only items whose `name` attribute matches `scope` using
         `re.match`. Items without a `name` attribute are never returned if a
         scope is supplied. The choice of `re.match` means that a `scope` without
-        special tokens filters by prefix.
+        special tokens filters by prefix; such scopes are answered from an
+        index of the collection instead of matching every item.
 
     Returns:
       The list of values in the collection with the given `name`, or
@@ -3487,6 +3926,10 @@ class Graph(object):
       if scope is None:
         return list(collection)
       else:
+        if _is_prefix_scope(scope):
+          c = collection.filter_by_prefix(scope)
+          if c is not None:
+            return c
         c = []
         regex = re.compile(scope)
         for item in collection:
@@ -165,6 +165,23 @@ def _apply_op(g, *args, **kwargs):
 
 class OperationTest(test_util.TensorFlowTestCase):
 
+  def testCompactRepresentation(self):
+    g = ops.Graph()
+    op = ops.Operation(ops._NodeDef("noop", "myop"), g, [], [dtypes.float32])
+    t = op.outputs[0]
+    # Fixed attributes are stored in slots, and the consumers list is only
+    # allocated when requested.
+    self.assertIn("_node_def", ops.Operation.__slots__)
+    self.assertIn("_op", ops.Tensor.__slots__)
+    self.assertIsNone(t._consumers)
+    self.assertEqual([], t.consumers())
+    self.assertIs(t.consumers(), t._consumers)
+    # Arbitrary attributes can still be set.
+    t._custom_attribute = 1
+    op._custom_attribute = 2
+    self.assertEqual(1, t._custom_attribute)
+    self.assertEqual(2, op._custom_attribute)
+
   def testNoInputs(self):
     op = ops.Operation(
         ops._NodeDef("noop", "myop"),
@@ -177,13 +194,13 @@ class OperationTest(test_util.TensorFlowTestCase):
     self.assertEqual(dtypes.float32, float_t.dtype)
     self.assertEqual(op, float_t.op)
     self.assertEqual(0, float_t._value_index)
-    self.assertEqual(0, len(float_t._consumers))
+    self.assertEqual(0, len(float_t.consumers()))
     self.assertEqual("myop", float_t._as_node_def_input())
 
     self.assertEqual(dtypes.string, label_str_t.dtype)
     self.assertEqual(op, label_str_t.op)
     self.assertEqual(1, label_str_t._value_index)
-    self.assertEqual(0, len(label_str_t._consumers))
+    self.assertEqual(0, len(label_str_t.consumers()))
     self.assertEqual("myop:1", label_str_t._as_node_def_input())
 
     self.assertProtoEquals("op:'noop' name:'myop'", op.node_def)
@@ -197,8 +214,8 @@ class OperationTest(test_util.TensorFlowTestCase):
     self.assertEqual(1, len(op2.inputs))
     self.assertIs(float_t, op2.inputs[0])
 
-    self.assertEqual(1, len(float_t._consumers))
-    self.assertEqual(op2, float_t._consumers[0])
+    self.assertEqual(1, len(float_t.consumers()))
+    self.assertEqual(op2, float_t.consumers()[0])
 
     self.assertProtoEquals("op:'noop' name:'myop1'", op1.node_def)
     self.assertProtoEquals("op:'reop' name:'myop2' input:'myop1'", op2.node_def)
@@ -220,14 +237,14 @@ class OperationTest(test_util.TensorFlowTestCase):
         [dtypes.float32, dtypes.int32])
     self.assertEqual(2, len(op3.values()))
 
-    self.assertEqual(1, len(float1_t._consumers))
-    self.assertEqual(op3, float1_t._consumers[0])
+    self.assertEqual(1, len(float1_t.consumers()))
+    self.assertEqual(op3, float1_t.consumers()[0])
 
-    self.assertEqual(0, len(float2_t._consumers))
+    self.assertEqual(0, len(float2_t.consumers()))
 
-    self.assertEqual(2, len(label2_str_t._consumers))
-    self.assertEqual(op3, label2_str_t._consumers[0])
-    self.assertEqual(op3, label2_str_t._consumers[1])
+    self.assertEqual(2, len(label2_str_t.consumers()))
+    self.assertEqual(op3, label2_str_t.consumers()[0])
+    self.assertEqual(op3, label2_str_t.consumers()[1])
 
     self.assertProtoEquals("""
     op:'add' name:'myop3'
@@ -991,6 +1008,59 @@ class CollectionTest(test_util.TensorFlowTestCase):
     empty_coll_ref3 = g.get_collection_ref("empty")
     self.assertTrue(empty_coll_ref3 is empty_coll_ref)
 
+  def test_get_collection_prefix_scope(self):
+    g = ops.Graph()
+    items = [ObjectWithName(name) for name in
+             ["b/x", "a/y", "ab/z", "a/x", "a.b/w", "b/a/v"]]
+    for item in items:
+      g.add_to_collection("key", item)
+    g.add_to_collection("key", 12)
+    g.add_to_collection("key", items[1])
+    self.assertEqual([items[1], items[3], items[1]],
+                     g.get_collection("key", "a/"))
+    self.assertEqual([items[1], items[2], items[3], items[4], items[1]],
+                     g.get_collection("key", "a"))
+    self.assertEqual([], g.get_collection("key", "c"))
+    self.assertEqual([items[5]], g.get_collection("key", "b/a"))
+    self.assertEqual(items + [items[1]], g.get_collection("key", ""))
+    # Scopes with special characters are still interpreted as regexes.
+    self.assertEqual([items[4]], g.get_collection("key", "a\\.b"))
+    self.assertEqual([items[3]], g.get_collection("key", "a.x"))
+    self.assertEqual([items[0], items[5]], g.get_collection("key", "b|c"))
+
+  def test_get_collection_prefix_scope_after_mutation(self):
+    g = ops.Graph()
+    a = ObjectWithName("scope/a")
+    b = ObjectWithName("scope/b")
+    c = ObjectWithName("other/c")
+    g.add_to_collection("key", a)
+    g.add_to_collection("key", c)
+    self.assertEqual([a], g.get_collection("key", "scope"))
+    coll = g.get_collection_ref("key")
+    coll.append(b)
+    self.assertEqual([a, b], g.get_collection("key", "scope"))
+    coll.insert(0, b)
+    self.assertEqual([b, a, b], g.get_collection("key", "scope"))
+    coll[0] = c
+    self.assertEqual([a, b], g.get_collection("key", "scope"))
+    coll.remove(a)
+    self.assertEqual([b], g.get_collection("key", "scope"))
+    del coll[:]
+    self.assertEqual([], g.get_collection("key", "scope"))
+    coll.extend([b, a])
+    self.assertEqual([b, a], g.get_collection("key", "scope"))
+    coll.reverse()
+    self.assertEqual([a, b], g.get_collection("key", "scope"))
+
+  def test_get_collection_prefix_scope_non_string_names(self):
+    g = ops.Graph()
+    a = ObjectWithName("scope/a")
+    g.add_to_collection("key", a)
+    self.assertEqual([a], g.get_collection("key", "scope"))
+    g.add_to_collection("key", ObjectWithName(None))
+    with self.assertRaises(TypeError):
+      g.get_collection("key", "scope")
+
   def test_add_to_collections_uniquify(self):
     g = ops.Graph()
     g.add_to_collections([1, 2, 1], "key")
@@ -1837,6 +1907,67 @@ class TracebackTest(test_util.TensorFlowTestCase):
           self.assertEquals(frame, frame_with_start_line[:-1])
 
 
+  def _createOp(self, g, name):
+    with g.as_default():
+      return constant_op.constant(1.0, name=name).op
+
+  def testTracebackFull(self):
+    g = ops.Graph()
+    op = self._createOp(g, "a")
+    self.assertTrue(op.traceback)
+    # The innermost recorded frame is the op constructor, and this test is on
+    # the stack.
+    self.assertEqual("__init__", op.traceback[-1][2])
+    self.assertIn("_createOp", [frame[2] for frame in op.traceback])
+    self.assertTrue(all(len(frame) == 4 for frame in op.traceback))
+
+  def testTracebackInterned(self):
+    g = ops.Graph()
+    ops_list = [self._createOp(g, "a%d" % i) for i in range(10)]
+    # All ops are created from the same line, so they share one traceback.
+    self.assertTrue(all(op._traceback is ops_list[0]._traceback
+                        for op in ops_list))
+    self.assertEqual(len(ops_list[0].traceback), len(g._traceback_table))
+
+  def testTracebackLimited(self):
+    g = ops.Graph()
+    full = self._createOp(g, "full").traceback
+    g.set_op_traceback_mode("limited", max_frames=2)
+    limited = self._createOp(g, "limited").traceback
+    # The TensorFlow frames are skipped, so the innermost recorded frame is
+    # the caller of `constant_op.constant()`, followed by its caller.
+    self.assertEqual(2, len(limited))
+    self.assertEqual("_createOp", limited[-1][2])
+    self.assertEqual("testTracebackLimited", limited[0][2])
+    user_index = [frame[2] for frame in full].index("_createOp")
+    self.assertEqual(full[user_index], limited[-1])
+
+  def testTracebackSampled(self):
+    g = ops.Graph()
+    g.set_op_traceback_mode("sampled", sample_every=3)
+    tracebacks = [self._createOp(g, "a%d" % i).traceback for i in range(7)]
+    self.assertEqual([True, False, False, True, False, False, True],
+                     [bool(tb) for tb in tracebacks])
+
+  def testTracebackOff(self):
+    g = ops.Graph()
+    g.set_op_traceback_mode("off")
+    op = self._createOp(g, "a")
+    self.assertEqual([], op.traceback)
+    self.assertEqual([], op.traceback_with_start_lines)
+    g.set_op_traceback_mode("full")
+    self.assertTrue(self._createOp(g, "b").traceback)
+
+  def testTracebackModeErrors(self):
+    g = ops.Graph()
+    with self.assertRaisesRegexp(ValueError, "Invalid traceback mode"):
+      g.set_op_traceback_mode("none")
+    with self.assertRaisesRegexp(ValueError, "max_frames"):
+      g.set_op_traceback_mode("limited")
+    with self.assertRaisesRegexp(ValueError, "sample_every"):
+      g.set_op_traceback_mode("sampled", sample_every=0)
+
+
 class OutputTypesTest(test_util.TensorFlowTestCase):
   """Tests Operation._output_types property.
 
@@ -49,12 +49,25 @@ def SlowAppendFloat16ArrayToTensorProto(tensor_proto, proto_values):
   tensor_proto.half_val.extend([
       ExtractBitsFromFloat16(x) for x in proto_values])
 
+
+def FastAppendFloat16ArrayToTensorProto(tensor_proto, proto_values):
+  # half_val holds the binary representation of each fp16 value, which numpy
+  # can produce for the whole array at once by reinterpreting it as uint16.
+  tensor_proto.half_val.extend(
+      np.asarray(proto_values, dtype=np.float16).view(np.uint16).tolist())
+
+
+def AppendNumpyStringArrayToTensorProto(tensor_proto, proto_values):
+  # Fixed-width numpy string arrays convert to a list of Python strings in a
+  # single call; unicode arrays are encoded to UTF-8 in bulk first.
+  if proto_values.dtype.type == np.unicode_:
+    proto_values = np.char.encode(proto_values, "utf-8")
+  tensor_proto.string_val.extend(proto_values.tolist())
+
+
 if _FAST_TENSOR_UTIL_AVAILABLE:
   _NP_TO_APPEND_FN = {
-      # TODO(sesse): We should have a
-      # fast_tensor_util.AppendFloat16ArrayToTensorProto,
-      # but it seems np.float16_t doesn't exist?
-      np.float16: SlowAppendFloat16ArrayToTensorProto,
+      np.float16: FastAppendFloat16ArrayToTensorProto,
       np.float32: fast_tensor_util.AppendFloat32ArrayToTensorProto,
       np.float64: fast_tensor_util.AppendFloat64ArrayToTensorProto,
       np.int32: fast_tensor_util.AppendInt32ArrayToTensorProto,
@@ -81,39 +94,45 @@ if _FAST_TENSOR_UTIL_AVAILABLE:
   }
 else:
 
+  # These convert the whole array with `ndarray.tolist()`, which produces the
+  # same Python scalars as calling `np.asscalar` on every element.
+
   def SlowAppendFloat32ArrayToTensorProto(tensor_proto, proto_values):
-    tensor_proto.float_val.extend([np.asscalar(x) for x in proto_values])
+    tensor_proto.float_val.extend(proto_values.tolist())
 
   def SlowAppendFloat64ArrayToTensorProto(tensor_proto, proto_values):
-    tensor_proto.double_val.extend([np.asscalar(x) for x in proto_values])
+    tensor_proto.double_val.extend(proto_values.tolist())
 
   def SlowAppendIntArrayToTensorProto(tensor_proto, proto_values):
-    tensor_proto.int_val.extend([np.asscalar(x) for x in proto_values])
+    tensor_proto.int_val.extend(proto_values.tolist())
 
   def SlowAppendQIntArrayToTensorProto(tensor_proto, proto_values):
-    tensor_proto.int_val.extend([np.asscalar(x[0]) for x in proto_values])
+    # Quantized numpy types are records with a single integer field.
+    tensor_proto.int_val.extend(
+        proto_values[proto_values.dtype.names[0]].tolist())
 
   def SlowAppendInt64ArrayToTensorProto(tensor_proto, proto_values):
-    tensor_proto.int64_val.extend([np.asscalar(x) for x in proto_values])
+    tensor_proto.int64_val.extend(proto_values.tolist())
 
   def SlowAppendComplex64ArrayToTensorProto(tensor_proto, proto_values):
-    tensor_proto.scomplex_val.extend([np.asscalar(v)
-                                      for x in proto_values
-                                      for v in [x.real, x.imag]])
+    # Viewing a complex array as floats interleaves real and imaginary parts.
+    tensor_proto.scomplex_val.extend(
+        np.ascontiguousarray(proto_values).view(np.float32).tolist())
 
   def SlowAppendComplex128ArrayToTensorProto(tensor_proto, proto_values):
-    tensor_proto.dcomplex_val.extend([np.asscalar(v)
-                                      for x in proto_values
-                                      for v in [x.real, x.imag]])
+    tensor_proto.dcomplex_val.extend(
+        np.ascontiguousarray(proto_values).view(np.float64).tolist())
 
   def SlowAppendObjectArrayToTensorProto(tensor_proto, proto_values):
-    tensor_proto.string_val.extend([compat.as_bytes(x) for x in proto_values])
+    tensor_proto.string_val.extend(
+        [x if isinstance(x, bytes) else compat.as_bytes(x)
+         for x in proto_values.tolist()])
 
   def SlowAppendBoolArrayToTensorProto(tensor_proto, proto_values):
-    tensor_proto.bool_val.extend([np.asscalar(x) for x in proto_values])
+    tensor_proto.bool_val.extend(proto_values.tolist())
 
   _NP_TO_APPEND_FN = {
-      np.float16: SlowAppendFloat16ArrayToTensorProto,
+      np.float16: FastAppendFloat16ArrayToTensorProto,
       np.float32: SlowAppendFloat32ArrayToTensorProto,
       np.float64: SlowAppendFloat64ArrayToTensorProto,
       np.int32: SlowAppendIntArrayToTensorProto,
@@ -149,10 +168,7 @@ def GetNumpyAppendFn(dtype):
   # dtype is a "string" type. We need to compare the dtype.type to be
   # sure it's a string type.
   if dtype.type == np.string_ or dtype.type == np.unicode_:
-    if _FAST_TENSOR_UTIL_AVAILABLE:
-      return fast_tensor_util.AppendObjectArrayToTensorProto
-    else:
-      return SlowAppendObjectArrayToTensorProto
+    return AppendNumpyStringArrayToTensorProto
   return GetFromNumpyDTypeDict(_NP_TO_APPEND_FN, dtype)
 
 
@@ -179,18 +195,30 @@ def _GetDenseDimensions(list_of_lists):
 
 
 def _FlattenToStrings(nested_strings):
-  if isinstance(nested_strings, (list, tuple)):
-    for inner in nested_strings:
-      for flattened_string in _FlattenToStrings(inner):
-        yield flattened_string
-  else:
-    yield nested_strings
+  """Returns the leaves of nested lists and tuples, in depth-first order."""
+  if not isinstance(nested_strings, (list, tuple)):
+    return [nested_strings]
+  flattened = []
+  stack = [iter(nested_strings)]
+  while stack:
+    for inner in stack[-1]:
+      if isinstance(inner, (list, tuple)):
+        stack.append(iter(inner))
+        break
+      flattened.append(inner)
+    else:
+      stack.pop()
+  return flattened
 
 
+# Types whose values can be written as raw bytes in `tensor_content`. This is
+# every fixed-width type TensorFlow can feed from numpy; `Tensor::FromProto`
+# decodes `tensor_content` with a plain copy for all of them.
 _TENSOR_CONTENT_TYPES = frozenset([
-    dtypes.float32, dtypes.float64, dtypes.int32, dtypes.uint8, dtypes.int16,
-    dtypes.int8, dtypes.int64, dtypes.qint8, dtypes.quint8, dtypes.qint16,
-    dtypes.quint16, dtypes.qint32,
+    dtypes.float16, dtypes.float32, dtypes.float64, dtypes.int32,
+    dtypes.uint8, dtypes.uint16, dtypes.int16, dtypes.int8, dtypes.int64,
+    dtypes.complex64, dtypes.complex128, dtypes.bool, dtypes.qint8,
+    dtypes.quint8, dtypes.qint16, dtypes.quint16, dtypes.qint32,
 ])
 
 
@@ -232,38 +260,55 @@ def _FilterTuple(v):
   return _FirstNotNone([_FilterTuple(x) for x in v])
 
 
+def _FilterByType(v, types):
+  """Returns the first leaf of `v` that is not an instance of `types`.
+
+  `v` may be arbitrarily nested lists and tuples. They are walked in a single
+  pass that stops at the first mismatch, instead of recursively building a
+  list of per-element results at every level.
+
+  Args:
+    v: A value, or nested lists and tuples of values.
+    types: A type or tuple of types that the leaves of `v` must be.
+
+  Returns:
+    None if every leaf is an instance of `types`. Otherwise the first
+    mismatching leaf, with `None` and `Tensor` leaves replaced by a
+    description, as `_FirstNotNone` and `_NotNone` would.
+  """
+  if not isinstance(v, (list, tuple)):
+    return None if isinstance(v, types) else _NotNone(v)
+  stack = [iter(v)]
+  while stack:
+    for x in stack[-1]:
+      if isinstance(x, (list, tuple)):
+        stack.append(iter(x))
+        break
+      if not isinstance(x, types):
+        return _FirstNotNone([_NotNone(x)])
+    else:
+      stack.pop()
+  return None
+
+
 def _FilterInt(v):
-  if isinstance(v, (list, tuple)):
-    return _FirstNotNone([_FilterInt(x) for x in v])
-  return None if isinstance(v, (compat.integral_types,
-                                tensor_shape.Dimension)) else _NotNone(v)
+  return _FilterByType(v, (compat.integral_types, tensor_shape.Dimension))
 
 
 def _FilterFloat(v):
-  if isinstance(v, (list, tuple)):
-    return _FirstNotNone([_FilterFloat(x) for x in v])
-  return None if isinstance(v, compat.real_types) else _NotNone(v)
+  return _FilterByType(v, compat.real_types)
 
 
 def _FilterComplex(v):
-  if isinstance(v, (list, tuple)):
-    return _FirstNotNone([_FilterComplex(x) for x in v])
-  return None if isinstance(v, compat.complex_types) else _NotNone(v)
+  return _FilterByType(v, compat.complex_types)
 
 
 def _FilterStr(v):
-  if isinstance(v, (list, tuple)):
-    return _FirstNotNone([_FilterStr(x) for x in v])
-  if isinstance(v, compat.bytes_or_text_types):
-    return None
-  else:
-    return _NotNone(v)
+  return _FilterByType(v, compat.bytes_or_text_types)
 
 
 def _FilterBool(v):
-  if isinstance(v, (list, tuple)):
-    return _FirstNotNone([_FilterBool(x) for x in v])
-  return None if isinstance(v, bool) else _NotNone(v)
+  return _FilterByType(v, bool)
 
 
 def _FilterNotTensor(v):
@@ -359,7 +404,12 @@ def make_tensor_proto(values, dtype=None, shape=None, verify_shape=False):
 
   # We first convert value to a numpy array or scalar.
   if isinstance(values, (np.ndarray, np.generic)):
-    if dtype:
+    if dtype == dtypes.string and values.dtype.type in (np.string_,
+                                                        np.unicode_):
+      # Keep fixed-width string arrays as they are, so that they can be
+      # converted in bulk instead of as an array of Python objects.
+      nparray = values
+    elif dtype:
       nparray = values.astype(dtype.as_numpy_dtype)
     else:
       nparray = values
@@ -466,7 +516,8 @@ def make_tensor_proto(values, dtype=None, shape=None, verify_shape=False):
     # common type, but this type inference requires some thinking and
     # so we defer it for now.
     try:
-      str_values = [compat.as_bytes(x) for x in proto_values]
+      str_values = [x if isinstance(x, bytes) else compat.as_bytes(x)
+                    for x in proto_values]
     except TypeError:
       raise TypeError("Failed to convert object of type %s to Tensor. "
                       "Contents: %s. Consider casting elements to a "
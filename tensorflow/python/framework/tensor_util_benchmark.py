@@ -0,0 +1,97 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmarks for converting numpy arrays and lists to TensorProtos."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+import numpy as np
+
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import tensor_util
+from tensorflow.python.platform import test
+from tensorflow.python.util import compat
+
+
+# The fixed-width dtypes written through `tensor_content`.
+_NUMERIC_DTYPES = [
+    dtypes.float16, dtypes.float32, dtypes.float64, dtypes.int8, dtypes.int16,
+    dtypes.int32, dtypes.int64, dtypes.uint8, dtypes.uint16, dtypes.complex64,
+    dtypes.complex128, dtypes.bool,
+]
+
+_SIZES = [10**3, 10**6, 10**8]
+
+
+class MakeTensorProtoBenchmark(test.Benchmark):
+  """Benchmarks `make_tensor_proto` for each dtype at several sizes.
+
+  The largest size needs several GB of memory for the string benchmarks, since
+  every element becomes a separate Python object.
+  """
+
+  def _benchmarkMakeTensorProto(self, name, values, dtype, iters):
+    """Reports the average time to build a `TensorProto` from `values`.
+
+    Args:
+      name: A human-readable name for logging the output.
+      values: The value passed to `make_tensor_proto`.
+      dtype: The `DType` passed to `make_tensor_proto`.
+      iters: The number of conversions to average over.
+    """
+    tensor_util.make_tensor_proto(values, dtype=dtype)  # Warm up.
+    start_time = time.time()
+    for _ in range(iters):
+      tensor_util.make_tensor_proto(values, dtype=dtype)
+    wall_time = (time.time() - start_time) / iters
+    print("%s: %.6f s" % (name, wall_time))
+    self.report_benchmark(iters=iters, wall_time=wall_time, name=name)
+
+  def _iters(self, size):
+    return max(1, 10**6 // size)
+
+  def benchmarkNumpyArrays(self):
+    for dtype in _NUMERIC_DTYPES:
+      for size in _SIZES:
+        values = np.ones([size], dtype=dtype.as_numpy_dtype)
+        self._benchmarkMakeTensorProto(
+            "benchmark_make_tensor_proto_%s_%d" % (dtype.name, size), values,
+            dtype, self._iters(size))
+        del values
+
+  def benchmarkStringNumpyArrays(self):
+    for size in _SIZES:
+      values = np.array(["token%d" % i for i in range(min(size, 10**6))])
+      values = np.resize(values, [size])
+      self._benchmarkMakeTensorProto(
+          "benchmark_make_tensor_proto_string_array_%d" % size, values,
+          dtypes.string, self._iters(size))
+      del values
+
+  def benchmarkStringLists(self):
+    for size in _SIZES:
+      values = [compat.as_bytes("token%d" % (i % 10**6))
+                for i in range(size)]
+      self._benchmarkMakeTensorProto(
+          "benchmark_make_tensor_proto_string_list_%d" % size, values,
+          dtypes.string, self._iters(size))
+      del values
+
+
+if __name__ == "__main__":
+  test.main()
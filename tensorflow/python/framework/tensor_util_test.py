@@ -200,20 +200,40 @@ class TensorUtilTest(test.TestCase):
 
   def testHalf(self):
     t = tensor_util.make_tensor_proto(np.array([10.0, 20.0], dtype=np.float16))
+    self.assertEquals(dtypes.float16, t.dtype)
+    self.assertProtoEquals("dim { size: 2 }", t.tensor_shape)
+    self.assertEquals(
+        np.array([10.0, 20.0], dtype=np.float16).tostring(), t.tensor_content)
+    self.assertFalse(t.half_val)
+
+    a = tensor_util.MakeNdarray(t)
+    self.assertEquals(np.float16, a.dtype)
+    self.assertAllClose(np.array([10.0, 20.0], dtype=np.float16), a)
+
+  def testHalfScalar(self):
+    t = tensor_util.make_tensor_proto(np.float16(10.0))
     self.assertProtoEquals("""
       dtype: DT_HALF
-      tensor_shape {
-        dim {
-          size: 2
-        }
-      }
+      tensor_shape {}
       half_val: 18688
-      half_val: 19712
       """, t)
-
     a = tensor_util.MakeNdarray(t)
     self.assertEquals(np.float16, a.dtype)
-    self.assertAllClose(np.array([10.0, 20.0], dtype=np.float16), a)
+    self.assertAllClose(np.array(10.0, dtype=np.float16), a)
+
+  def testHalfWithImplicitRepeat(self):
+    t = tensor_util.make_tensor_proto(10.0, shape=[2, 2], dtype=dtypes.float16)
+    self.assertEquals([18688], list(t.half_val))
+    a = tensor_util.MakeNdarray(t)
+    self.assertAllClose(np.full([2, 2], 10.0, dtype=np.float16), a)
+
+  def testBoolN(self):
+    t = tensor_util.make_tensor_proto([True, False, True])
+    self.assertEquals(dtypes.bool, t.dtype)
+    self.assertEquals(b"\001\000\001", t.tensor_content)
+    a = tensor_util.MakeNdarray(t)
+    self.assertEquals(np.bool, a.dtype)
+    self.assertAllEqual(np.array([True, False, True]), a)
 
   def testInt(self):
     t = tensor_util.make_tensor_proto(10)
@@ -520,6 +540,26 @@ class TensorUtilTest(test.TestCase):
     self.assertEquals(np.object, a.dtype)
     self.assertAllEqual(np.array(((b"a", b"ab"), (b"abc", b"abcd"))), a)
 
+  def testStringUnicodeNpArray(self):
+    t = tensor_util.make_tensor_proto(
+        np.array([[u"a", u"\u00e9"], [u"abc", u""]]))
+    self.assertEquals(dtypes.string, t.dtype)
+    self.assertEquals([b"a", u"\u00e9".encode("utf-8"), b"abc", b""],
+                      list(t.string_val))
+
+  def testStringDeeplyNestedList(self):
+    t = tensor_util.make_tensor_proto([[[b"a"], [u"b"]], [[b"c"], [b"d"]]])
+    self.assertProtoEquals("dim { size: 2 } dim { size: 2 } dim { size: 1 }",
+                           t.tensor_shape)
+    self.assertEquals([b"a", b"b", b"c", b"d"], list(t.string_val))
+
+  def testIncompatibleNestedListError(self):
+    with self.assertRaisesRegexp(TypeError, "Expected int32, got None"):
+      tensor_util.make_tensor_proto([[1, 2], [3, None]], dtype=dtypes.int32)
+    with self.assertRaisesRegexp(TypeError, "list containing Tensors"):
+      tensor_util.make_tensor_proto(
+          [1.0, [constant_op.constant(2.0)]], dtype=dtypes.float32)
+
   def testComplex64(self):
     t = tensor_util.make_tensor_proto((1 + 2j), dtype=dtypes.complex64)
     self.assertProtoEquals("""
@@ -560,16 +600,12 @@ class TensorUtilTest(test.TestCase):
   def testComplex64N(self):
     t = tensor_util.make_tensor_proto(
         [(1 + 2j), (3 + 4j), (5 + 6j)], shape=[1, 3], dtype=dtypes.complex64)
-    self.assertProtoEquals("""
-      dtype: DT_COMPLEX64
-      tensor_shape { dim { size: 1 } dim { size: 3 } }
-      scomplex_val: 1
-      scomplex_val: 2
-      scomplex_val: 3
-      scomplex_val: 4
-      scomplex_val: 5
-      scomplex_val: 6
-      """, t)
+    self.assertEquals(dtypes.complex64, t.dtype)
+    self.assertProtoEquals("dim { size: 1 } dim { size: 3 }", t.tensor_shape)
+    self.assertEquals(
+        np.array([(1 + 2j), (3 + 4j), (5 + 6j)],
+                 dtype=np.complex64).tostring(),
+        t.tensor_content)
     a = tensor_util.MakeNdarray(t)
     self.assertEquals(np.complex64, a.dtype)
     self.assertAllEqual(np.array([[(1 + 2j), (3 + 4j), (5 + 6j)]]), a)
@@ -577,16 +613,12 @@ class TensorUtilTest(test.TestCase):
   def testComplex128N(self):
     t = tensor_util.make_tensor_proto(
         [(1 + 2j), (3 + 4j), (5 + 6j)], shape=[1, 3], dtype=dtypes.complex128)
-    self.assertProtoEquals("""
-      dtype: DT_COMPLEX128
-      tensor_shape { dim { size: 1 } dim { size: 3 } }
-      dcomplex_val: 1
-      dcomplex_val: 2
-      dcomplex_val: 3
-      dcomplex_val: 4
-      dcomplex_val: 5
-      dcomplex_val: 6
-      """, t)
+    self.assertEquals(dtypes.complex128, t.dtype)
+    self.assertProtoEquals("dim { size: 1 } dim { size: 3 }", t.tensor_shape)
+    self.assertEquals(
+        np.array([(1 + 2j), (3 + 4j), (5 + 6j)],
+                 dtype=np.complex128).tostring(),
+        t.tensor_content)
     a = tensor_util.MakeNdarray(t)
     self.assertEquals(np.complex128, a.dtype)
     self.assertAllEqual(np.array([[(1 + 2j), (3 + 4j), (5 + 6j)]]), a)
@@ -595,19 +627,12 @@ class TensorUtilTest(test.TestCase):
     t = tensor_util.make_tensor_proto(
         np.array([[(1 + 2j), (3 + 4j)], [(5 + 6j), (7 + 8j)]]),
         dtype=dtypes.complex64)
-    # scomplex_val are real_0, imag_0, real_1, imag_1, ...
-    self.assertProtoEquals("""
-      dtype: DT_COMPLEX64
-      tensor_shape { dim { size: 2 } dim { size: 2 } }
-      scomplex_val: 1
-      scomplex_val: 2
-      scomplex_val: 3
-      scomplex_val: 4
-      scomplex_val: 5
-      scomplex_val: 6
-      scomplex_val: 7
-      scomplex_val: 8
-      """, t)
+    self.assertEquals(dtypes.complex64, t.dtype)
+    self.assertProtoEquals("dim { size: 2 } dim { size: 2 }", t.tensor_shape)
+    self.assertEquals(
+        np.array([[(1 + 2j), (3 + 4j)], [(5 + 6j), (7 + 8j)]],
+                 dtype=np.complex64).tostring(),
+        t.tensor_content)
     a = tensor_util.MakeNdarray(t)
     self.assertEquals(np.complex64, a.dtype)
     self.assertAllEqual(
@@ -617,19 +642,12 @@ class TensorUtilTest(test.TestCase):
     t = tensor_util.make_tensor_proto(
         np.array([[(1 + 2j), (3 + 4j)], [(5 + 6j), (7 + 8j)]]),
         dtype=dtypes.complex128)
-    # scomplex_val are real_0, imag_0, real_1, imag_1, ...
-    self.assertProtoEquals("""
-      dtype: DT_COMPLEX128
-      tensor_shape { dim { size: 2 } dim { size: 2 } }
-      dcomplex_val: 1
-      dcomplex_val: 2
-      dcomplex_val: 3
-      dcomplex_val: 4
-      dcomplex_val: 5
-      dcomplex_val: 6
-      dcomplex_val: 7
-      dcomplex_val: 8
-      """, t)
+    self.assertEquals(dtypes.complex128, t.dtype)
+    self.assertProtoEquals("dim { size: 2 } dim { size: 2 }", t.tensor_shape)
+    self.assertEquals(
+        np.array([[(1 + 2j), (3 + 4j)], [(5 + 6j), (7 + 8j)]],
+                 dtype=np.complex128).tostring(),
+        t.tensor_content)
     a = tensor_util.MakeNdarray(t)
     self.assertEquals(np.complex128, a.dtype)
     self.assertAllEqual(
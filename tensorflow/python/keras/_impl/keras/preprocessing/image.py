@@ -21,11 +21,15 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
 from functools import partial
+import json
+import multiprocessing
 import multiprocessing.pool
 import os
 import re
 import threading
+import time
 
 import numpy as np
 from six.moves import range  # pylint: disable=redefined-builtin
@@ -253,6 +257,67 @@ def apply_transform(x,
   return x
 
 
+def _apply_transform_batch(x,
+                           transform_matrices,
+                           channel_axis,
+                           fill_mode='nearest',
+                           cval=0.):
+  """Applies a transformation to each image of a batch at once.
+
+  This resamples the batch with nearest-neighbour interpolation, like
+  `apply_transform`, but with a single gather for all images and channels.
+  The results are identical to `apply_transform` for the `'nearest'` fill
+  mode; other modes may differ for points near the boundaries.
+
+  Arguments:
+      x: 4D numpy array, batch of images.
+      transform_matrices: Numpy array of shape `(batch_size, 3, 3)`, mapping
+          the (row, column) coordinates of each output image to the
+          coordinates of the input image.
+      channel_axis: Index of axis for channels in the batch.
+      fill_mode: Points outside the boundaries of the input
+          are filled according to the given mode
+          (one of `{'constant', 'nearest', 'reflect', 'wrap'}`).
+      cval: Value used for points outside the boundaries
+          of the input if `mode='constant'`.
+
+  Returns:
+      The transformed batch.
+  """
+  x = np.rollaxis(x, channel_axis, 4)
+  batch_size, h, w = x.shape[:3]
+  rows, cols = np.meshgrid(np.arange(h), np.arange(w), indexing='ij')
+  m = transform_matrices[:, :2, :, None, None]
+  coords = m[:, :, 0] * rows + m[:, :, 1] * cols + m[:, :, 2]
+  # Round to the nearest pixel, like `scipy.ndimage` with `order=0`.
+  indices = np.floor(coords + 0.5).astype(np.intp)
+  row_indices, col_indices = indices[:, 0], indices[:, 1]
+
+  outside = None
+  if fill_mode == 'constant':
+    outside = ((row_indices < 0) | (row_indices >= h) | (col_indices < 0) |
+               (col_indices >= w))
+  if fill_mode == 'reflect':
+    row_indices %= 2 * h
+    row_indices = np.where(row_indices >= h, 2 * h - 1 - row_indices,
+                           row_indices)
+    col_indices %= 2 * w
+    col_indices = np.where(col_indices >= w, 2 * w - 1 - col_indices,
+                           col_indices)
+  elif fill_mode == 'wrap':
+    row_indices %= h
+    col_indices %= w
+  else:
+    row_indices = np.clip(row_indices, 0, h - 1)
+    col_indices = np.clip(col_indices, 0, w - 1)
+
+  batch_indices = np.arange(batch_size)[:, None, None]
+  x = x[batch_indices, row_indices, col_indices]
+  if outside is not None:
+    x[outside] = cval
+  return np.rollaxis(x, 3, channel_axis)
+
+
 def flip_axis(x, axis):
   x = np.asarray(x).swapaxes(axis, 0)
   x = x[::-1, ...]
@@ -424,6 +489,12 @@ class ImageDataGenerator(object):
           It defaults to the `image_data_format` value found in your
           Keras config file at `~/.keras/keras.json`.
           If you never set it, then it will be "channels_last".
+      batch_augmentation: whether the iterators augment each batch at once
+          with `random_transform_batch()`, rather than each image with
+          `random_transform()`. This is much faster, but draws different
+          random transformations for a given seed, and bypasses subclasses
+          that override `random_transform()`. To augment batches inside the
+          TensorFlow graph instead, see `tf.contrib.image.random_transform`.
   """
 
   def __init__(self,
@@ -445,9 +516,11 @@ class ImageDataGenerator(object):
                vertical_flip=False,
                rescale=None,
                preprocessing_function=None,
-               data_format=None):
+               data_format=None,
+               batch_augmentation=False):
     if data_format is None:
       data_format = K.image_data_format()
+    self.batch_augmentation = batch_augmentation
     self.featurewise_center = featurewise_center
     self.samplewise_center = samplewise_center
     self.featurewise_std_normalization = featurewise_std_normalization
@@ -528,7 +601,11 @@ class ImageDataGenerator(object):
                           save_to_dir=None,
                           save_prefix='',
                           save_format='png',
-                          follow_links=False):
+                          follow_links=False,
+                          index_cache=None,
+                          workers=1,
+                          use_multiprocessing=False,
+                          max_queue_size=0):
     return DirectoryIterator(
         directory,
         self,
@@ -543,7 +620,11 @@ class ImageDataGenerator(object):
         save_to_dir=save_to_dir,
         save_prefix=save_prefix,
         save_format=save_format,
-        follow_links=follow_links)
+        follow_links=follow_links,
+        index_cache=index_cache,
+        workers=workers,
+        use_multiprocessing=use_multiprocessing,
+        max_queue_size=max_queue_size)
 
   def standardize(self, x):
     """Apply the normalization configuration to a batch of inputs.
@@ -692,6 +773,116 @@ class ImageDataGenerator(object):
 
     return x
 
+  def _random_transform_matrices(self, batch_size, h, w):
+    """Samples the geometric transformations of a batch of images.
+
+    Arguments:
+        batch_size: number of images.
+        h: height of the images.
+        w: width of the images.
+
+    Returns:
+        A `(batch_size, 3, 3)` array of the transform matrices of the images,
+        centered like `transform_matrix_offset_center`, or `None` if the
+        generator applies no geometric transformation.
+    """
+    zeros = np.zeros(batch_size)
+    ones = np.ones(batch_size)
+    matrices = []
+
+    if self.rotation_range:
+      theta = np.pi / 180 * np.random.uniform(
+          -self.rotation_range, self.rotation_range, batch_size)
+      matrices.append([[np.cos(theta), -np.sin(theta), zeros],
+                       [np.sin(theta), np.cos(theta), zeros],
+                       [zeros, zeros, ones]])
+
+    if self.height_shift_range or self.width_shift_range:
+      tx = np.random.uniform(-self.height_shift_range, self.height_shift_range,
+                             batch_size) * h
+      ty = np.random.uniform(-self.width_shift_range, self.width_shift_range,
+                             batch_size) * w
+      matrices.append([[ones, zeros, tx],
+                       [zeros, ones, ty],
+                       [zeros, zeros, ones]])
+
+    if self.shear_range:
+      shear = np.random.uniform(-self.shear_range, self.shear_range,
+                                batch_size)
+      matrices.append([[ones, -np.sin(shear), zeros],
+                       [zeros, np.cos(shear), zeros],
+                       [zeros, zeros, ones]])
+
+    if self.zoom_range[0] != 1 or self.zoom_range[1] != 1:
+      zx, zy = np.random.uniform(self.zoom_range[0], self.zoom_range[1],
+                                 (2, batch_size))
+      matrices.append([[zx, zeros, zeros],
+                       [zeros, zy, zeros],
+                       [zeros, zeros, ones]])
+
+    if not matrices:
+      return None
+    # Each matrix is built as `[3, 3, batch_size]`.
+    transform_matrices = np.transpose(matrices[0], (2, 0, 1))
+    for matrix in matrices[1:]:
+      transform_matrices = np.matmul(transform_matrices,
+                                     np.transpose(matrix, (2, 0, 1)))
+    o_x = float(h) / 2 + 0.5
+    o_y = float(w) / 2 + 0.5
+    offset_matrix = np.array([[1, 0, o_x], [0, 1, o_y], [0, 0, 1]])
+    reset_matrix = np.array([[1, 0, -o_x], [0, 1, -o_y], [0, 0, 1]])
+    return np.matmul(offset_matrix,
+                     np.matmul(transform_matrices, reset_matrix))
+
+  def random_transform_batch(self, x, seed=None):
+    """Randomly augments a batch of images at once.
+
+    This applies the same kinds of transformations as `random_transform`,
+    but samples the parameters of all the images together and resamples the
+    whole batch with a single vectorized operation.
+
+    Arguments:
+        x: 4D tensor, batch of images.
+        seed: random seed.
+
+    Returns:
+        A randomly transformed version of the input (same shape).
+    """
+    if seed is not None:
+      np.random.seed(seed)
+    batch_size = x.shape[0]
+    h, w = x.shape[self.row_axis], x.shape[self.col_axis]
+
+    transform_matrices = self._random_transform_matrices(batch_size, h, w)
+    if transform_matrices is not None:
+      x = _apply_transform_batch(
+          x,
+          transform_matrices,
+          self.channel_axis,
+          fill_mode=self.fill_mode,
+          cval=self.cval)
+    else:
+      x = np.copy(x)
+
+    if self.channel_shift_range != 0:
+      image_axes = (self.row_axis, self.col_axis, self.channel_axis)
+      shape = [batch_size, 1, 1, 1]
+      shape[self.channel_axis] = x.shape[self.channel_axis]
+      shifts = np.random.uniform(-self.channel_shift_range,
+                                 self.channel_shift_range, shape)
+      x = np.clip(x + shifts, np.min(x, axis=image_axes, keepdims=True),
+                  np.max(x, axis=image_axes, keepdims=True))
+
+    if self.horizontal_flip:
+      flip = np.random.random(batch_size) < 0.5
+      x[flip] = flip_axis(x[flip], self.col_axis)
+
+    if self.vertical_flip:
+      flip = np.random.random(batch_size) < 0.5
+      x[flip] = flip_axis(x[flip], self.row_axis)
+
+    return x
+
   def fit(self, x, augment=False, rounds=1, seed=None):
     """Fits internal statistics to some sample data.
 
@@ -733,6 +924,10 @@ class ImageDataGenerator(object):
       ax = np.zeros(
           tuple([rounds * x.shape[0]] + list(x.shape)[1:]), dtype=K.floatx())
       for r in range(rounds):
+        if self.batch_augmentation:
+          ax[r * x.shape[0]:(r + 1) * x.shape[0]] = (
+              self.random_transform_batch(x.astype(K.floatx())))
+          continue
         for i in range(x.shape[0]):
           ax[i + r * x.shape[0]] = self.random_transform(x[i])
       x = ax
@@ -762,6 +957,18 @@ class ImageDataGenerator(object):
           np.dot(u, np.diag(1. / np.sqrt(s + self.zca_epsilon))), u.T)
 
 
+def _augment_batch(image_data_generator, batch_x):
+  """Randomly augments and standardizes a batch of images in place."""
+  if getattr(image_data_generator, 'batch_augmentation', False):
+    batch_x[...] = image_data_generator.random_transform_batch(batch_x)
+    for i in range(len(batch_x)):
+      batch_x[i] = image_data_generator.standardize(batch_x[i])
+  else:
+    for i in range(len(batch_x)):
+      x = image_data_generator.random_transform(np.copy(batch_x[i]))
+      batch_x[i] = image_data_generator.standardize(x)
+
+
 class Iterator(object):
   """Abstract base class for image data iterators.
 
@@ -899,10 +1106,8 @@ class NumpyArrayIterator(Iterator):
     batch_x = np.zeros(
         tuple([current_batch_size] + list(self.x.shape)[1:]), dtype=K.floatx())
     for i, j in enumerate(index_array):
-      x = self.x[j]
-      x = self.image_data_generator.random_transform(x.astype(K.floatx()))
-      x = self.image_data_generator.standardize(x)
-      batch_x[i] = x
+      batch_x[i] = self.x[j]
+    _augment_batch(self.image_data_generator, batch_x)
     if self.save_to_dir:
       for i in range(current_batch_size):
         img = array_to_img(batch_x[i], self.data_format, scale=True)
@@ -918,40 +1123,99 @@ class NumpyArrayIterator(Iterator):
     return batch_x, batch_y
 
 
-def _count_valid_files_in_directory(directory, white_list_formats,
-                                    follow_links):
-  """Count files with extension in `white_list_formats` in a directory.
+_INDEX_CACHE_VERSION = 1
+
+# The coarsest modification time resolution of common filesystems (FAT has a
+# 2 second resolution, ext3, HFS+ and many NFS mounts 1 second). A directory
+# modified within this long of being listed may change again without
+# changing its modification time, so its listing is not reused.
+_MTIME_GRANULARITY_SECS = 2.0
+
+
+def _load_index_cache(path):
+  """Loads the directory listings saved by `_save_index_cache`.
 
   Arguments:
-      directory: absolute path to the directory containing files to be counted
-      white_list_formats: set of strings containing allowed extensions for
-          the files to be counted.
-      follow_links: boolean.
+      path: path of the index cache file.
 
   Returns:
-      the count of files with extension in `white_list_formats` contained in
-      the directory.
+      A dictionary mapping directory paths to `[mtime, subdirs, files]`, empty
+      if the cache does not exist or cannot be read.
   """
+  try:
+    with open(path) as f:
+      cache = json.load(f)
+  except (IOError, OSError, ValueError):
+    return {}
+  if not isinstance(cache, dict) or cache.get(
+      'version') != _INDEX_CACHE_VERSION:
+    return {}
+  return cache.get('directories', {})
+
+
+def _save_index_cache(path, index):
+  """Atomically saves the directory listings in `index` to `path`."""
+  temp_path = '%s.%d.tmp' % (path, os.getpid())
+  with open(temp_path, 'w') as f:
+    json.dump({'version': _INDEX_CACHE_VERSION, 'directories': index}, f)
+  if os.name == 'nt' and os.path.exists(path):
+    os.remove(path)
+  os.rename(temp_path, path)
+
+
+def _walk_directory(directory, follow_links, cached_index):
+  """Lists the files of a directory tree, reusing cached listings.
+
+  The listing of a directory is reused when its modification time has not
+  changed since it was cached, as adding, removing or renaming an entry
+  updates the modification time of its directory. This only requires a `stat`
+  of each directory, instead of listing all the files. Directories whose
+  modification time is within `_MTIME_GRANULARITY_SECS` of the time they are
+  listed are indexed with an `mtime` of `None`, so that they are listed again
+  on the next run.
 
-  def _recursive_list(subpath):
-    return sorted(
-        os.walk(subpath, followlinks=follow_links), key=lambda tpl: tpl[0])
+  Arguments:
+      directory: path to the root of the directory tree.
+      follow_links: boolean, whether to descend into symbolic links to
+          directories.
+      cached_index: dictionary mapping directory paths to
+          `[mtime, subdirs, files]`, as returned by `_load_index_cache`.
 
-  samples = 0
-  for _, _, files in _recursive_list(directory):
-    for fname in files:
-      is_valid = False
-      for extension in white_list_formats:
-        if fname.lower().endswith('.' + extension):
-          is_valid = True
-          break
-      if is_valid:
-        samples += 1
-  return samples
+  Returns:
+      listing: a list of `(root, files)` tuples for each directory of the tree,
+          sorted by `root`.
+      index: a dictionary mapping the path of each directory of the tree to
+          its `[mtime, subdirs, files]`.
+  """
+  listing = []
+  index = {}
+  pending = [directory]
+  while pending:
+    root = pending.pop()
+    # Read the modification time before listing the directory, so a change
+    # during the listing invalidates the cached entry on the next run.
+    mtime = os.stat(root).st_mtime
+    entry = cached_index.get(root)
+    if entry is None or entry[0] != mtime:
+      _, subdirs, files = next(os.walk(root), (root, [], []))
+      if time.time() - mtime < _MTIME_GRANULARITY_SECS:
+        # An entry added in the same clock tick after the listing would not
+        # change the modification time.
+        mtime = None
+      entry = [mtime, sorted(subdirs), files]
+    index[root] = entry
+    listing.append((root, entry[2]))
+    for subdir in entry[1]:
+      path = os.path.join(root, subdir)
+      if follow_links or not os.path.islink(path):
+        pending.append(path)
+  listing.sort(key=lambda tpl: tpl[0])
+  return listing, index
 
 
 def _list_valid_filenames_in_directory(directory, white_list_formats,
-                                       class_indices, follow_links):
+                                       class_indices, follow_links,
+                                       cached_index=None):
   """List paths of files in `subdir` with extensions in `white_list_formats`.
 
   Arguments:
@@ -962,23 +1226,24 @@ def _list_valid_filenames_in_directory(directory, white_list_formats,
           the files to be counted.
       class_indices: dictionary mapping a class name to its index.
       follow_links: boolean.
+      cached_index: optional dictionary of cached directory listings, see
+          `_walk_directory`.
 
   Returns:
       classes: a list of class indices
       filenames: the path of valid files in `directory`, relative from
           `directory`'s parent (e.g., if `directory` is "dataset/class1",
           the filenames will be ["class1/file1.jpg", "class1/file2.jpg", ...]).
+      index: the listings of the directories of `directory`, see
+          `_walk_directory`.
   """
-
-  def _recursive_list(subpath):
-    return sorted(
-        os.walk(subpath, followlinks=follow_links), key=lambda tpl: tpl[0])
+  listing, index = _walk_directory(directory, follow_links, cached_index or {})
 
   classes = []
   filenames = []
   subdir = os.path.basename(directory)
   basedir = os.path.dirname(directory)
-  for root, _, files in _recursive_list(directory):
+  for root, files in listing:
     for fname in files:
       is_valid = False
       for extension in white_list_formats:
@@ -990,7 +1255,13 @@ def _list_valid_filenames_in_directory(directory, white_list_formats,
         # add filename relative to directory
         absolute_path = os.path.join(root, fname)
         filenames.append(os.path.relpath(absolute_path, basedir))
-  return classes, filenames
+  return classes, filenames, index
+
+
+def _load_image_array(path, grayscale, target_size, data_format):
+  """Loads an image file as a Numpy array, for the decoding workers."""
+  img = load_img(path, grayscale=grayscale, target_size=target_size)
+  return img_to_array(img, data_format=data_format)
 
 
 class DirectoryIterator(Iterator):
@@ -1028,6 +1299,16 @@ class DirectoryIterator(Iterator):
           images (if `save_to_dir` is set).
       save_format: Format to use for saving sample images
           (if `save_to_dir` is set).
+      follow_links: whether to follow symlinks inside class subdirectories.
+      index_cache: Optional path of a file caching the listings of the
+          directories. The listing of a directory is reused while its
+          modification time is unchanged, so only the directories that changed
+          are listed again. The cache is created or updated as needed.
+      workers: Integer, number of workers decoding and resizing the images.
+      use_multiprocessing: whether the workers are processes rather than
+          threads.
+      max_queue_size: Integer, number of batches decoded in the background
+          ahead of the one being returned.
   """
 
   def __init__(self,
@@ -1044,7 +1325,11 @@ class DirectoryIterator(Iterator):
                save_to_dir=None,
                save_prefix='',
                save_format='png',
-               follow_links=False):
+               follow_links=False,
+               index_cache=None,
+               workers=1,
+               use_multiprocessing=False,
+               max_queue_size=0):
     if data_format is None:
       data_format = K.image_data_format()
     self.directory = directory
@@ -1075,6 +1360,14 @@ class DirectoryIterator(Iterator):
     self.save_to_dir = save_to_dir
     self.save_prefix = save_prefix
     self.save_format = save_format
+    self.workers = workers
+    self.use_multiprocessing = use_multiprocessing
+    self.max_queue_size = max_queue_size
+    self._pool = None
+    self._pool_pid = None
+    # Batches being decoded ahead, as `(index_array, current_index,
+    # current_batch_size, async_result)`.
+    self._pending = collections.deque()
 
     white_list_formats = {'png', 'jpg', 'jpeg', 'bmp', 'ppm'}
 
@@ -1089,63 +1382,112 @@ class DirectoryIterator(Iterator):
     self.num_class = len(classes)
     self.class_indices = dict(zip(classes, range(len(classes))))
 
+    cached_index = _load_index_cache(index_cache) if index_cache else {}
+
+    # second, build an index of the images in the different class subfolders
     pool = multiprocessing.pool.ThreadPool()
     function_partial = partial(
-        _count_valid_files_in_directory,
+        _list_valid_filenames_in_directory,
         white_list_formats=white_list_formats,
-        follow_links=follow_links)
-    self.samples = sum(
-        pool.map(function_partial, (os.path.join(directory, subdir)
-                                    for subdir in classes)))
+        class_indices=self.class_indices,
+        follow_links=follow_links,
+        cached_index=cached_index)
+    results = pool.map(function_partial, (os.path.join(directory, subdir)
+                                          for subdir in classes))
+    pool.close()
+    pool.join()
 
+    self.samples = sum(len(filenames) for _, filenames, _ in results)
     print('Found %d images belonging to %d classes.' % (self.samples,
                                                         self.num_class))
 
-    # second, build an index of the images in the different class subfolders
-    results = []
-
     self.filenames = []
     self.classes = np.zeros((self.samples,), dtype='int32')
     i = 0
-    for dirpath in (os.path.join(directory, subdir) for subdir in classes):
-      results.append(
-          pool.apply_async(_list_valid_filenames_in_directory, (
-              dirpath, white_list_formats, self.class_indices, follow_links)))
-    for res in results:
-      classes, filenames = res.get()
+    # Drop the cached listings of directories under the class directories
+    # that no longer exist; they are replaced by those that were walked.
+    walked_roots = tuple(os.path.join(directory, subdir) for subdir in classes)
+    updated_index = {
+        path: entry for path, entry in cached_index.items()
+        if not any(path == root or path.startswith(root + os.sep)
+                   for root in walked_roots)}
+    for classes, filenames, index in results:
       self.classes[i:i + len(classes)] = classes
       self.filenames += filenames
       i += len(classes)
-    pool.close()
-    pool.join()
+      updated_index.update(index)
+    if index_cache and updated_index != cached_index:
+      _save_index_cache(index_cache, updated_index)
     super(DirectoryIterator, self).__init__(self.samples, batch_size, shuffle,
                                             seed)
 
+  def reset(self):
+    super(DirectoryIterator, self).reset()
+    # The batches decoded ahead are from the previous pass over the data.
+    self._pending.clear()
+
+  def _uses_pool(self):
+    return self.workers > 1 or self.use_multiprocessing or self.max_queue_size
+
+  def _load_function(self):
+    return partial(
+        _load_image_array,
+        grayscale=self.color_mode == 'grayscale',
+        target_size=self.target_size,
+        data_format=self.data_format)
+
+  def _decode_async(self, index_array):
+    """Starts decoding the images of a batch on the worker pool."""
+    # Pools cannot be used across a fork, e.g. by a `GeneratorEnqueuer`.
+    if self._pool is None or self._pool_pid != os.getpid():
+      if self.use_multiprocessing:
+        self._pool = multiprocessing.Pool(self.workers)
+      else:
+        self._pool = multiprocessing.pool.ThreadPool(self.workers)
+      self._pool_pid = os.getpid()
+    return self._pool.map_async(
+        self._load_function(),
+        [os.path.join(self.directory, self.filenames[j]) for j in index_array])
+
+  def __del__(self):
+    pool = getattr(self, '_pool', None)
+    if pool is not None and self._pool_pid == os.getpid():
+      pool.terminate()
+
   def next(self):
     """For python 2.x.
 
     Returns:
         The next batch.
     """
+    decoded = None
     with self.lock:
-      index_array, current_index, current_batch_size = next(
-          self.index_generator)
+      if self._uses_pool():
+        # Keep up to `max_queue_size` batches decoding ahead of this one.
+        while len(self._pending) <= self.max_queue_size:
+          index_array, current_index, current_batch_size = next(
+              self.index_generator)
+          self._pending.append((index_array, current_index,
+                                current_batch_size,
+                                self._decode_async(index_array)))
+        (index_array, current_index, current_batch_size,
+         decoded) = self._pending.popleft()
+      else:
+        index_array, current_index, current_batch_size = next(
+            self.index_generator)
     # The transformation of images is not under thread lock
     # so it can be done in parallel
     batch_x = np.zeros(
         (current_batch_size,) + self.image_shape, dtype=K.floatx())
-    grayscale = self.color_mode == 'grayscale'
     # build batch of image data
-    for i, j in enumerate(index_array):
-      fname = self.filenames[j]
-      img = load_img(
-          os.path.join(self.directory, fname),
-          grayscale=grayscale,
-          target_size=self.target_size)
-      x = img_to_array(img, data_format=self.data_format)
-      x = self.image_data_generator.random_transform(x)
-      x = self.image_data_generator.standardize(x)
-      batch_x[i] = x
+    if decoded is not None:
+      for i, x in enumerate(decoded.get()):
+        batch_x[i] = x
+    else:
+      load = self._load_function()
+      for i, j in enumerate(index_array):
+        batch_x[i] = load(os.path.join(self.directory, self.filenames[j]))
+    _augment_batch(self.image_data_generator, batch_x)
     # optionally save augmented images to disk for debugging purposes
     if self.save_to_dir:
       for i in range(current_batch_size):
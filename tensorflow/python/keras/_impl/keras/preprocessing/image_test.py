@@ -18,8 +18,10 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import json
 import os
 import shutil
+import time
 
 import numpy as np
 
@@ -31,6 +33,15 @@ try:
 except ImportError:
   PIL = None
 
+try:
+  import scipy  # pylint:disable=g-import-not-at-top
+except ImportError:
+  scipy = None
+
+# pylint: disable=protected-access
+_apply_transform_batch = keras.preprocessing.image._apply_transform_batch
+# pylint: enable=protected-access
+
 
 def _generate_test_images():
   img_w = img_h = 20
@@ -203,6 +214,105 @@ class TestImage(test.TestCase):
     self.assertEqual(sorted(dir_iterator.filenames), sorted(filenames))
     _ = dir_iterator.next()
 
+  def _write_class_images(self, temp_dir, num_classes=2):
+    filenames = []
+    for cl in range(num_classes):
+      os.mkdir(os.path.join(temp_dir, 'class-{}'.format(cl)))
+    for count, im in enumerate(_generate_test_images()[0]):
+      filename = os.path.join('class-{}'.format(count % num_classes),
+                              'image-{}.png'.format(count))
+      im.save(os.path.join(temp_dir, filename))
+      filenames.append(filename)
+    return filenames
+
+  def test_directory_iterator_index_cache(self):
+    if PIL is None:
+      return  # Skip test if PIL is not available.
+
+    temp_dir = self.get_temp_dir()
+    self.addCleanup(shutil.rmtree, temp_dir)
+    image_dir = os.path.join(temp_dir, 'images')
+    os.mkdir(image_dir)
+    filenames = self._write_class_images(image_dir)
+    index_cache = os.path.join(temp_dir, 'index.json')
+
+    # Directories modified just before they are listed are not cached, since
+    # a later change in the same clock tick would not update their mtime.
+    generator = keras.preprocessing.image.ImageDataGenerator()
+    dir_iterator = generator.flow_from_directory(
+        image_dir, index_cache=index_cache)
+    self.assertEqual(sorted(dir_iterator.filenames), sorted(filenames))
+    with open(index_cache) as f:
+      cache = json.load(f)
+    self.assertTrue(cache['directories'])
+    self.assertTrue(all(entry[0] is None
+                        for entry in cache['directories'].values()))
+
+    old_mtime = time.time() - 10
+    for root, _, _ in os.walk(image_dir):
+      os.utime(root, (old_mtime, old_mtime))
+    dir_iterator = generator.flow_from_directory(
+        image_dir, index_cache=index_cache)
+    self.assertEqual(sorted(dir_iterator.filenames), sorted(filenames))
+
+    # The cached listing of an unchanged directory is used as is.
+    with open(index_cache) as f:
+      cache = json.load(f)
+    class_dir = os.path.join(image_dir, 'class-0')
+    cache['directories'][class_dir][2].append('missing.png')
+    with open(index_cache, 'w') as f:
+      json.dump(cache, f)
+    dir_iterator = generator.flow_from_directory(
+        image_dir, index_cache=index_cache)
+    self.assertIn(os.path.join('class-0', 'missing.png'),
+                  dir_iterator.filenames)
+
+    # Adding a file invalidates the listing of its directory.
+    _generate_test_images()[0][0].save(os.path.join(class_dir, 'new.png'))
+    dir_iterator = generator.flow_from_directory(
+        image_dir, index_cache=index_cache)
+    self.assertEqual(
+        sorted(dir_iterator.filenames),
+        sorted(filenames + [os.path.join('class-0', 'new.png')]))
+
+    # The listings of deleted directories are dropped from the cache.
+    removed_dir = os.path.join(class_dir, 'removed')
+    os.mkdir(removed_dir)
+    generator.flow_from_directory(image_dir, index_cache=index_cache)
+    with open(index_cache) as f:
+      self.assertIn(removed_dir, json.load(f)['directories'])
+    os.rmdir(removed_dir)
+    generator.flow_from_directory(image_dir, index_cache=index_cache)
+    with open(index_cache) as f:
+      self.assertNotIn(removed_dir, json.load(f)['directories'])
+
+  def test_directory_iterator_workers(self):
+    if PIL is None:
+      return  # Skip test if PIL is not available.
+
+    temp_dir = self.get_temp_dir()
+    self.addCleanup(shutil.rmtree, temp_dir)
+    self._write_class_images(temp_dir)
+
+    generator = keras.preprocessing.image.ImageDataGenerator()
+    expected = generator.flow_from_directory(
+        temp_dir, target_size=(10, 10), batch_size=3, shuffle=False)
+    for use_multiprocessing in [False, True]:
+      dir_iterator = generator.flow_from_directory(
+          temp_dir,
+          target_size=(10, 10),
+          batch_size=3,
+          shuffle=False,
+          workers=2,
+          use_multiprocessing=use_multiprocessing,
+          max_queue_size=2)
+      expected.reset()
+      for _ in range(5):
+        x, y = dir_iterator.next()
+        expected_x, expected_y = expected.next()
+        self.assertAllEqual(expected_x, x)
+        self.assertAllEqual(expected_y, y)
+
   def test_img_utils(self):
     if PIL is None:
       return  # Skip test if PIL is not available.
@@ -249,6 +359,121 @@ class TestImage(test.TestCase):
       keras.preprocessing.image.random_zoom(x, (0, 0, 0))
     _ = keras.preprocessing.image.random_channel_shift(x, 2.)
 
+  def test_apply_transform_batch(self):
+    if scipy is None:
+      return  # Skip test if scipy is not available.
+
+    images = np.random.random((4, 3, 20, 30)).astype(np.float32)
+    matrices = []
+    for _ in range(len(images)):
+      theta = np.random.uniform(-np.pi, np.pi)
+      matrix = np.array([[np.cos(theta), -np.sin(theta), 2.3],
+                         [np.sin(theta), np.cos(theta), -1.7],
+                         [0, 0, 1]])
+      matrices.append(
+          keras.preprocessing.image.transform_matrix_offset_center(
+              matrix, 20, 30))
+    matrices = np.stack(matrices)
+
+    expected = np.stack([
+        keras.preprocessing.image.apply_transform(x, m, 0)
+        for x, m in zip(images, matrices)
+    ])
+    # channels_first.
+    transformed = _apply_transform_batch(images, matrices, 1)
+    self.assertEqual(images.shape, transformed.shape)
+    # Points exactly between two pixels may round either way.
+    self.assertGreater(np.mean(np.isclose(expected, transformed)), 0.99)
+    # channels_last.
+    transformed = _apply_transform_batch(
+        np.transpose(images, (0, 2, 3, 1)), matrices, 3)
+    self.assertGreater(
+        np.mean(np.isclose(expected, np.transpose(transformed, (0, 3, 1, 2)))),
+        0.99)
+
+  def test_apply_transform_batch_fill_modes(self):
+    images = np.arange(2 * 4 * 5, dtype=np.float32).reshape((2, 4, 5, 1))
+    # Shift by a whole image: every output point falls outside the input.
+    shift = np.array([[1, 0, 4], [0, 1, 5], [0, 0, 1]], dtype=np.float32)
+    matrices = np.stack([shift, shift])
+    transformed = _apply_transform_batch(
+        images, matrices, 3, fill_mode='constant', cval=-1.)
+    self.assertTrue(np.all(transformed == -1.))
+    transformed = _apply_transform_batch(
+        images, matrices, 3, fill_mode='wrap')
+    self.assertAllEqual(images, transformed)
+    transformed = _apply_transform_batch(
+        images, matrices, 3, fill_mode='nearest')
+    self.assertAllEqual(np.broadcast_to(images[:, -1:, -1:], images.shape),
+                        transformed)
+
+  def test_random_transform_batch(self):
+    for data_format, shape in [('channels_last', (8, 10, 12, 3)),
+                               ('channels_first', (8, 3, 10, 12))]:
+      generator = keras.preprocessing.image.ImageDataGenerator(
+          rotation_range=90.,
+          width_shift_range=0.1,
+          height_shift_range=0.1,
+          shear_range=0.5,
+          zoom_range=0.2,
+          channel_shift_range=0.1,
+          horizontal_flip=True,
+          vertical_flip=True,
+          data_format=data_format,
+          batch_augmentation=True)
+      x = np.random.random(shape).astype(np.float32)
+      original = np.copy(x)
+      transformed = generator.random_transform_batch(x, seed=1)
+      self.assertEqual(shape, transformed.shape)
+      self.assertAllEqual(original, x)
+      self.assertAllEqual(
+          transformed, generator.random_transform_batch(x, seed=1))
+
+      # The iterators augment whole batches.
+      batch = generator.flow(x, batch_size=4, shuffle=False).next()
+      self.assertEqual((4,) + shape[1:], batch.shape)
+
+    # Without any augmentation, the batch is returned unchanged.
+    generator = keras.preprocessing.image.ImageDataGenerator(
+        batch_augmentation=True)
+    x = np.random.random((2, 5, 5, 3)).astype(np.float32)
+    self.assertAllEqual(x, generator.random_transform_batch(x))
+
+
+class ImageDataGeneratorBenchmark(test.Benchmark):
+  """Compares per-image and per-batch augmentation."""
+
+  def benchmarkRandomTransform(self):
+    if scipy is None:
+      return  # Skip benchmark if scipy is not available.
+
+    x = np.random.random((32, 128, 128, 3)).astype(np.float32)
+    kwargs = dict(rotation_range=30.,
+                  width_shift_range=0.1,
+                  height_shift_range=0.1,
+                  zoom_range=0.1,
+                  horizontal_flip=True)
+    generator = keras.preprocessing.image.ImageDataGenerator(**kwargs)
+    iters = 10
+
+    start = time.time()
+    for _ in range(iters):
+      for i in range(len(x)):
+        generator.random_transform(x[i])
+    per_image_time = time.time() - start
+
+    start = time.time()
+    for _ in range(iters):
+      generator.random_transform_batch(x)
+    per_batch_time = time.time() - start
+
+    for name, wall_time in [('random_transform', per_image_time),
+                            ('random_transform_batch', per_batch_time)]:
+      print('%s: %.0f images/s' % (name, iters * len(x) / wall_time))
+      self.report_benchmark(iters=iters,
+                            wall_time=wall_time / iters,
+                            name='benchmark_%s' % name)
+
 
 if __name__ == '__main__':
   test.main()
@@ -18,6 +18,7 @@ from __future__ import division
 from __future__ import print_function
 
 from abc import abstractmethod
+import collections
 import hashlib
 import multiprocessing
 from multiprocessing.pool import ThreadPool
@@ -388,6 +389,113 @@ def get_index(ds, i):
   return ds[i]
 
 
+# The alignment of arrays in the shared memory buffers of `OrderedEnqueuer`.
+_SHARED_MEMORY_ALIGNMENT = 64
+
+# The shared memory buffers of an `OrderedEnqueuer` worker process, set by
+# `_init_shared_memory_worker()`.
+_SHARED_BUFFERS = None
+
+
+class _SharedArray(
+    collections.namedtuple('_SharedArray', ['dtype', 'shape', 'offset'])):
+  """An array that a worker process has copied into a shared buffer."""
+  pass
+
+
+def _map_structure(fn, value):
+  """Applies `fn` to the leaves of nested lists, tuples and dicts."""
+  if type(value) in (list, tuple):  # pylint: disable=unidiomatic-typecheck
+    return type(value)(_map_structure(fn, v) for v in value)
+  if isinstance(value, dict):
+    return {k: _map_structure(fn, v) for k, v in value.items()}
+  return fn(value)
+
+
+def _is_shareable(value):
+  return isinstance(value, np.ndarray) and not value.dtype.hasobject
+
+
+def _shared_memory_offsets(value):
+  """Returns the offsets of the arrays of `value` and the total bytes used."""
+  offsets = []
+  end = [0]
+
+  def allocate(x):
+    if _is_shareable(x):
+      start = -(-end[0] // _SHARED_MEMORY_ALIGNMENT) * _SHARED_MEMORY_ALIGNMENT
+      offsets.append(start)
+      end[0] = start + x.nbytes
+
+  _map_structure(allocate, value)
+  return offsets, end[0]
+
+
+def _to_shared_memory(value, buf):
+  """Copies the arrays of `value` into the `uint8` array `buf`.
+
+  Arguments:
+      value: A batch, made of nested lists, tuples and dicts of arrays.
+      buf: The `uint8` array of a shared buffer.
+
+  Returns:
+      `value`, with each array replaced by a `_SharedArray`, or `None` if the
+      arrays do not fit in `buf`.
+  """
+  offsets, num_bytes = _shared_memory_offsets(value)
+  if num_bytes > buf.size:
+    return None
+  offsets = iter(offsets)
+
+  def share(x):
+    if not _is_shareable(x):
+      return x
+    start = next(offsets)
+    buf[start:start + x.nbytes].view(x.dtype).reshape(x.shape)[...] = x
+    return _SharedArray(x.dtype.str, x.shape, start)
+
+  return _map_structure(share, value)
+
+
+def _from_shared_memory(value, buf):
+  """Returns a copy of a batch written by `_to_shared_memory()`."""
+
+  def copy(x):
+    if not isinstance(x, _SharedArray):
+      return x
+    dtype = np.dtype(x.dtype)
+    num_bytes = dtype.itemsize * int(np.prod(x.shape))
+    return buf[x.offset:x.offset + num_bytes].view(dtype).reshape(
+        x.shape).copy()
+
+  return _map_structure(copy, value)
+
+
+def _init_shared_memory_worker(buffers):
+  global _SHARED_BUFFERS
+  _SHARED_BUFFERS = [np.ctypeslib.as_array(b) for b in buffers]
+
+
+def _get_index_into_shared_memory(ds, i, slot):
+  """Like `get_index()`, but copies the value into the shared buffer `slot`.
+
+  Arguments:
+      ds: a Holder or Sequence object.
+      i: index
+      slot: index of the shared buffer to use.
+
+  Returns:
+      A tuple `(shared, value)`. If `shared` is True, `value` is the value at
+      index `i` as returned by `_to_shared_memory()`; otherwise it did not fit
+      in the buffer and `value` is the value itself.
+  """
+  value = ds[i]
+  shared = _to_shared_memory(value, _SHARED_BUFFERS[slot])
+  if shared is None:
+    return False, value
+  return True, shared
+
+
 class SequenceEnqueuer(object):
   """Base class to enqueue inputs.
 
@@ -454,26 +562,41 @@ class OrderedEnqueuer(SequenceEnqueuer):
 
   Used in `fit_generator`, `evaluate_generator`, `predict_generator`.
 
+  With `use_shared_memory`, worker processes copy the arrays of each batch
+  into a ring of preallocated shared memory buffers, and only the position of
+  the arrays in the buffer is sent back to the parent process, instead of
+  pickling the whole batch through a pipe. The buffers are sized from the
+  first batch of the sequence, with some headroom; larger batches are
+  pickled as usual.
+
   Arguments:
       sequence: A `keras.utils.data_utils.Sequence` object.
       use_multiprocessing: use multiprocessing if True, otherwise threading
       scheduling: Sequential querying of datas if 'sequential', random
         otherwise.
       shuffle: Whether to shuffle the data at the beginning of each epoch.
+      use_shared_memory: Whether worker processes return the arrays of
+        batches through shared memory. Requires `use_multiprocessing`.
   """
 
   def __init__(self,
                sequence,
                use_multiprocessing=False,
-               shuffle=False):
+               shuffle=False,
+               use_shared_memory=False):
+    if use_shared_memory and not use_multiprocessing:
+      raise ValueError('use_shared_memory requires use_multiprocessing.')
     self.sequence = sequence
     self.use_multiprocessing = use_multiprocessing
     self.shuffle = shuffle
+    self.use_shared_memory = use_shared_memory
     self.workers = 0
     self.executor = None
     self.queue = None
     self.run_thread = None
     self.stop_signal = None
+    self.shared_buffers = None
+    self.free_buffers = None
 
   def is_running(self):
     return self.stop_signal is not None and not self.stop_signal.is_set()
@@ -486,7 +609,20 @@ class OrderedEnqueuer(SequenceEnqueuer):
         max_queue_size: queue size
             (when full, workers could block on `put()`)
     """
-    if self.use_multiprocessing:
+    buffer_bytes = self._shared_buffer_bytes()
+    if buffer_bytes:
+      # Each batch in the queue, and the one waiting to be queued, holds a
+      # buffer until it is read by `get()`.
+      raw_buffers = [multiprocessing.RawArray('B', buffer_bytes)
+                     for _ in range(max_queue_size + 1)]
+      self.shared_buffers = [np.ctypeslib.as_array(b) for b in raw_buffers]
+      self.free_buffers = queue.Queue()
+      for slot in range(len(raw_buffers)):
+        self.free_buffers.put(slot)
+      self.executor = multiprocessing.Pool(
+          workers, initializer=_init_shared_memory_worker,
+          initargs=(raw_buffers,))
+    elif self.use_multiprocessing:
       self.executor = multiprocessing.Pool(workers)
     else:
       self.executor = ThreadPool(workers)
@@ -496,6 +632,27 @@ class OrderedEnqueuer(SequenceEnqueuer):
     self.run_thread.daemon = True
     self.run_thread.start()
 
+  def _shared_buffer_bytes(self):
+    """Returns the size of the shared buffers, or 0 to not use them."""
+    if not self.use_shared_memory or len(self.sequence) == 0:
+      return 0
+    try:
+      first_batch = self.sequence[0]
+    except Exception:  # pylint: disable=broad-except
+      # The workers will raise the same error from `get()`.
+      return 0
+    _, num_bytes = _shared_memory_offsets(first_batch)
+    return num_bytes + num_bytes // 4 + _SHARED_MEMORY_ALIGNMENT
+
+  def _next_free_buffer(self):
+    """Returns a free shared buffer, or `None` if stopped while waiting."""
+    while not self.stop_signal.is_set():
+      try:
+        return self.free_buffers.get(timeout=0.1)
+      except queue.Empty:
+        pass
+    return None
+
   def _run(self):
     """Submits requests to the executor and queues the `Future` objects."""
     sequence = list(range(len(self.sequence)))
@@ -505,11 +662,33 @@ class OrderedEnqueuer(SequenceEnqueuer):
       for i in sequence:
         if self.stop_signal.is_set():
           return
+        if self.shared_buffers is None:
+          self.queue.put(
+              self.executor.apply_async(get_index, (self.sequence, i)),
+              block=True)
+          continue
+        slot = self._next_free_buffer()
+        if slot is None:
+          return
         self.queue.put(
-            self.executor.apply_async(get_index, (self.sequence, i)),
+            (self.executor.apply_async(_get_index_into_shared_memory,
+                                       (self.sequence, i, slot)), slot),
             block=True)
       self.sequence.on_epoch_end()
 
+  def _get_result(self, item):
+    """Returns the batch of an item of the queue."""
+    if self.shared_buffers is None:
+      return item.get()
+    future, slot = item
+    try:
+      shared, inputs = future.get()
+      if shared:
+        inputs = _from_shared_memory(inputs, self.shared_buffers[slot])
+      return inputs
+    finally:
+      self.free_buffers.put(slot)
+
   def get(self):
     """Creates a generator to extract data from the queue.
 
@@ -521,7 +700,7 @@ class OrderedEnqueuer(SequenceEnqueuer):
     """
     try:
       while self.is_running():
-        inputs = self.queue.get(block=True).get()
+        inputs = self._get_result(self.queue.get(block=True))
         if inputs is not None:
           yield inputs
     except Exception as e:
@@ -551,10 +730,17 @@ class GeneratorEnqueuer(SequenceEnqueuer):
 
   Used in `fit_generator`, `evaluate_generator`, `predict_generator`.
 
+  Workers put the outputs of the generator into a queue of at most
+  `max_queue_size` elements, blocking while it is full. Worker threads share
+  the generator and call `next()` on it under a lock; worker processes each
+  iterate over their own copy of it. `stats()` reports how long the workers
+  and the consumer have waited on each other.
+
   Arguments:
       generator: a generator function which endlessly yields data
       use_multiprocessing: use multiprocessing if True, otherwise threading
-      wait_time: time to sleep in-between calls to `put()`
+      wait_time: interval at which blocked workers and consumers check
+          whether the enqueuer was stopped
       random_seed: Initial seed for workers,
           will be incremented by one for each workers.
   """
@@ -566,11 +752,69 @@ class GeneratorEnqueuer(SequenceEnqueuer):
                random_seed=None):
     self.wait_time = wait_time
     self._generator = generator
+    self._generator_lock = threading.Lock()
     self._use_multiprocessing = use_multiprocessing
     self._threads = []
     self._stop_event = None
     self.queue = None
     self.random_seed = random_seed
+    self._max_queue_size = 0
+    # Updated by the workers, which may be other processes.
+    self._produced = None
+    self._producer_stall_time = None
+    self._generator_time = None
+    self._finished_workers = None
+    self._num_workers = 0
+    # Updated by the consumer in `get()`.
+    self._consumed = 0
+    self._consumer_stall_time = 0.0
+    self._queue_size_sum = 0
+
+  def _put(self, generator_output):
+    """Puts `generator_output` in the queue, unless the enqueuer stops.
+
+    Returns:
+        Whether `generator_output` was queued.
+    """
+    while not self._stop_event.is_set():
+      start = time.time()
+      try:
+        self.queue.put(generator_output, block=True, timeout=self.wait_time)
+        return True
+      except queue.Full:
+        pass
+      finally:
+        # Updated after each attempt, so `stats()` shows ongoing stalls.
+        with self._producer_stall_time.get_lock():
+          self._producer_stall_time.value += time.time() - start
+    return False
+
+  def _data_generator_task(self):
+    """Queues the outputs of the generator until it ends or fails."""
+    try:
+      while not self._stop_event.is_set():
+        start = time.time()
+        with self._generator_lock:
+          generator_output = next(self._generator)
+        with self._generator_time.get_lock():
+          self._generator_time.value += time.time() - start
+        if not self._put(generator_output):
+          break
+        with self._produced.get_lock():
+          self._produced.value += 1
+      if self._use_multiprocessing:
+        # Nothing reads the queue after a stop, so do not wait on exit for
+        # the queued elements to be flushed.
+        self.queue.cancel_join_thread()
+    except StopIteration:
+      # Stop once the last worker is done, after it queued its elements.
+      with self._finished_workers.get_lock():
+        self._finished_workers.value += 1
+        if self._finished_workers.value == self._num_workers:
+          self._stop_event.set()
+    except Exception:
+      self._stop_event.set()
+      raise
 
   def start(self, workers=1, max_queue_size=10):
     """Kicks off threads which add data from the generator into the queue.
@@ -580,25 +824,21 @@ class GeneratorEnqueuer(SequenceEnqueuer):
         max_queue_size: queue size
             (when full, threads could block on `put()`)
     """
-
-    def data_generator_task():
-      while not self._stop_event.is_set():
-        try:
-          if self._use_multiprocessing or self.queue.qsize() < max_queue_size:
-            generator_output = next(self._generator)
-            self.queue.put(generator_output)
-          else:
-            time.sleep(self.wait_time)
-        except Exception:
-          self._stop_event.set()
-          raise
-
+    self._max_queue_size = max_queue_size
+    self._num_workers = workers
+    self._finished_workers = multiprocessing.Value('l', 0)
+    self._produced = multiprocessing.Value('l', 0)
+    self._producer_stall_time = multiprocessing.Value('d', 0.0)
+    self._generator_time = multiprocessing.Value('d', 0.0)
+    self._consumed = 0
+    self._consumer_stall_time = 0.0
+    self._queue_size_sum = 0
     try:
       if self._use_multiprocessing:
         self.queue = multiprocessing.Queue(maxsize=max_queue_size)
         self._stop_event = multiprocessing.Event()
       else:
-        self.queue = queue.Queue()
+        self.queue = queue.Queue(maxsize=max_queue_size)
         self._stop_event = threading.Event()
 
       for _ in range(workers):
@@ -606,12 +846,13 @@ class GeneratorEnqueuer(SequenceEnqueuer):
           # Reset random seed else all children processes
           # share the same seed
           np.random.seed(self.random_seed)
-          thread = multiprocessing.Process(target=data_generator_task)
+          thread = multiprocessing.Process(target=self._data_generator_task)
           thread.daemon = True
           if self.random_seed is not None:
             self.random_seed += 1
         else:
-          thread = threading.Thread(target=data_generator_task)
+          thread = threading.Thread(target=self._data_generator_task)
+          thread.daemon = True
         self._threads.append(thread)
         thread.start()
     except:
@@ -632,12 +873,11 @@ class GeneratorEnqueuer(SequenceEnqueuer):
     if self.is_running():
       self._stop_event.set()
 
+    # Workers blocked on a full queue notice the stop within `wait_time`.
     for thread in self._threads:
-      if thread.is_alive():
-        if self._use_multiprocessing:
-          thread.terminate()
-        else:
-          thread.join(timeout)
+      thread.join(timeout)
+      if self._use_multiprocessing and thread.is_alive():
+        thread.terminate()
 
     if self._use_multiprocessing:
       if self.queue is not None:
@@ -647,18 +887,82 @@ class GeneratorEnqueuer(SequenceEnqueuer):
     self._stop_event = None
     self.queue = None
 
+  def _queue_size(self):
+    try:
+      return self.queue.qsize()
+    except NotImplementedError:
+      # `multiprocessing.Queue.qsize()` is not implemented on Mac OS X.
+      return None
+
+  def stats(self):
+    """Returns statistics of the enqueuer since it was started.
+
+    A large `consumer_stall_sec` means that the consumer, such as the training
+    loop, is waiting for data: it is input-bound. A large
+    `producer_stall_sec` means that the workers are waiting for the consumer.
+
+    Returns:
+        A dictionary with the keys:
+        `queue_size`: the number of elements in the queue, or `None` if it is
+            unknown.
+        `max_queue_size`: the capacity of the queue.
+        `mean_queue_size`: the mean number of elements in the queue when the
+            consumer asked for one, or `None` if it is unknown.
+        `produced`: the number of elements queued by the workers.
+        `consumed`: the number of elements read from the queue.
+        `generator_sec`: the total time workers spent getting elements from
+            the generator, including waiting for the generator lock.
+        `producer_stall_sec`: the total time workers were blocked on a full
+            queue.
+        `consumer_stall_sec`: the total time `get()` was blocked on an empty
+            queue.
+    """
+    if self._produced is None:
+      raise ValueError('The enqueuer was never started.')
+    queue_size = self._queue_size() if self.queue is not None else 0
+    mean_queue_size = None
+    if self._queue_size_sum is not None:
+      mean_queue_size = (float(self._queue_size_sum) / self._consumed
+                         if self._consumed else 0.0)
+    return {
+        'queue_size': queue_size,
+        'max_queue_size': self._max_queue_size,
+        'mean_queue_size': mean_queue_size,
+        'produced': self._produced.value,
+        'consumed': self._consumed,
+        'generator_sec': self._generator_time.value,
+        'producer_stall_sec': self._producer_stall_time.value,
+        'consumer_stall_sec': self._consumer_stall_time,
+    }
+
   def get(self):
     """Creates a generator to extract data from the queue.
 
-    Skip the data if it is `None`.
+    Skip the data if it is `None`. The generator ends when the enqueuer is
+    stopped, or the workers have stopped and the queue is empty.
 
     Yields:
         Data arrays.
     """
-    while self.is_running():
-      if not self.queue.empty():
-        inputs = self.queue.get()
-        if inputs is not None:
-          yield inputs
+    while self.queue is not None:
+      # Measured before reading, since the workers may refill the queue as
+      # soon as an element is taken.
+      queue_size = self._queue_size()
+      start = time.time()
+      try:
+        inputs = self.queue.get(block=True, timeout=self.wait_time)
+      except queue.Empty:
+        self._consumer_stall_time += time.time() - start
+        # Workers that exited have flushed their elements to the queue.
+        if not self.is_running() and not any(
+            thread.is_alive() for thread in self._threads):
+          return
+        continue
+      self._consumer_stall_time += time.time() - start
+      self._consumed += 1
+      if queue_size is None or self._queue_size_sum is None:
+        self._queue_size_sum = None
       else:
-        time.sleep(self.wait_time)
+        self._queue_size_sum += queue_size
+      if inputs is not None:
+        yield inputs
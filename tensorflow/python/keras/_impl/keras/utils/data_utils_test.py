@@ -22,6 +22,7 @@ from itertools import cycle
 import os
 import tarfile
 import threading
+import time
 import zipfile
 
 import numpy as np
@@ -125,6 +126,18 @@ class TestSequence(keras.utils.data_utils.Sequence):
     return 100
 
 
+class GrowingSequence(keras.utils.data_utils.Sequence):
+  """A sequence of `(inputs, targets)` batches with `item + 1` rows."""
+
+  def __getitem__(self, item):
+    return ({'x': np.full([item + 1, 3], item, dtype=np.float32),
+             'id': np.array(['row'] * (item + 1), dtype=object)},
+            np.arange(item + 1))
+
+  def __len__(self):
+    return 10
+
+
 class FaultSequence(keras.utils.data_utils.Sequence):
 
   def __getitem__(self, item):
@@ -190,6 +203,43 @@ class TestEnqueuers(test.TestCase):
     with self.assertRaises(StopIteration):
       next(gen_output)
 
+  def test_generator_enqueuer_bounded_queue(self):
+    # A plain generator is safe to share, since it is called under a lock.
+    enqueuer = keras.utils.data_utils.GeneratorEnqueuer(
+        (i for i in cycle(range(100))), use_multiprocessing=False,
+        wait_time=0.01)
+    enqueuer.start(3, 5)
+    deadline = time.time() + 10
+    while enqueuer.stats()['produced'] < 5 and time.time() < deadline:
+      time.sleep(0.01)
+    # The workers block on the full queue.
+    time.sleep(0.1)
+    stats = enqueuer.stats()
+    self.assertEqual(5, stats['queue_size'])
+    self.assertEqual(5, stats['produced'])
+    self.assertGreater(stats['producer_stall_sec'], 0.1)
+
+    gen_output = enqueuer.get()
+    acc = [next(gen_output) for _ in range(50)]
+    # Workers may queue the elements they took from the generator in any
+    # order, but no more than 50 + 5 + 3 elements were taken, so none repeat.
+    self.assertEqual(50, len(set(acc)))
+    self.assertTrue(set(acc) <= set(range(100)))
+    stats = enqueuer.stats()
+    self.assertEqual(50, stats['consumed'])
+    self.assertGreaterEqual(stats['produced'], 50)
+    self.assertLessEqual(stats['mean_queue_size'], 5)
+    enqueuer.stop()
+    self.assertFalse(enqueuer.is_running())
+
+  def test_generator_enqueuer_finite_generator(self):
+    enqueuer = keras.utils.data_utils.GeneratorEnqueuer(
+        (i for i in range(20)), use_multiprocessing=False, wait_time=0.01)
+    enqueuer.start(3, 5)
+    self.assertEqual(list(range(20)), sorted(enqueuer.get()))
+    self.assertEqual(20, enqueuer.stats()['consumed'])
+    enqueuer.stop()
+
   def test_ordered_enqueuer_threads(self):
     enqueuer = keras.utils.data_utils.OrderedEnqueuer(
         TestSequence([3, 200, 200, 3]), use_multiprocessing=False)
@@ -228,6 +278,73 @@ class TestEnqueuers(test.TestCase):
     with self.assertRaises(StopIteration):
       next(gen_output)
 
+  def test_ordered_enqueuer_shared_memory(self):
+    enqueuer = keras.utils.data_utils.OrderedEnqueuer(
+        TestSequence([3, 200, 200, 3]), use_multiprocessing=True,
+        use_shared_memory=True)
+    enqueuer.start(3, 10)
+    gen_output = enqueuer.get()
+    acc = []
+    for _ in range(100):
+      acc.append(next(gen_output)[0, 0, 0, 0])
+    self.assertEqual(acc, list(range(100)))
+    enqueuer.stop()
+
+  def test_ordered_enqueuer_shared_memory_nested_and_oversized(self):
+    # The buffers are sized from the first batch, so the later, larger
+    # batches are pickled instead.
+    enqueuer = keras.utils.data_utils.OrderedEnqueuer(
+        GrowingSequence(), use_multiprocessing=True, use_shared_memory=True)
+    enqueuer.start(2, 4)
+    gen_output = enqueuer.get()
+    for _ in range(2):
+      for i in range(10):
+        inputs, targets = next(gen_output)
+        self.assertAllEqual(np.full([i + 1, 3], i), inputs['x'])
+        self.assertEqual(['row'] * (i + 1), list(inputs['id']))
+        self.assertAllEqual(np.arange(i + 1), targets)
+    enqueuer.stop()
+
+  def test_ordered_enqueuer_shared_memory_requires_processes(self):
+    with self.assertRaisesRegexp(ValueError, 'use_multiprocessing'):
+      keras.utils.data_utils.OrderedEnqueuer(
+          TestSequence([3]), use_multiprocessing=False,
+          use_shared_memory=True)
+
+  def test_ordered_enqueuer_fail_shared_memory(self):
+    enqueuer = keras.utils.data_utils.OrderedEnqueuer(
+        FaultSequence(), use_multiprocessing=True, use_shared_memory=True)
+    enqueuer.start(3, 10)
+    gen_output = enqueuer.get()
+    with self.assertRaises(StopIteration):
+      next(gen_output)
+
+
+class OrderedEnqueuerBenchmark(test.Benchmark):
+  """Compares returning 100MB batches by pickling and by shared memory."""
+
+  def _benchmark(self, use_shared_memory, name):
+    enqueuer = keras.utils.data_utils.OrderedEnqueuer(
+        TestSequence([32, 1024, 1024, 3]), use_multiprocessing=True,
+        use_shared_memory=use_shared_memory)
+    enqueuer.start(4, 4)
+    gen_output = enqueuer.get()
+    next(gen_output)
+    num_batches = 20
+    start = time.time()
+    for _ in range(num_batches):
+      next(gen_output)
+    wall_time = (time.time() - start) / num_batches
+    enqueuer.stop()
+    print('%s: %.1f batches/s' % (name, 1 / wall_time))
+    self.report_benchmark(iters=num_batches, wall_time=wall_time, name=name)
+
+  def benchmark_ordered_enqueuer_pickle(self):
+    self._benchmark(False, 'benchmark_ordered_enqueuer_pickle')
+
+  def benchmark_ordered_enqueuer_shared_memory(self):
+    self._benchmark(True, 'benchmark_ordered_enqueuer_shared_memory')
+
 
 if __name__ == '__main__':
   test.main()
@@ -942,6 +942,77 @@ class TFRecordIteratorTest(test.TestCase):
       for _ in tf_record.tf_record_iterator(fn_truncated):
         pass
 
+  def testBadFileAfterGoodRecords(self):
+    """Verify that the records before a bad record are read first."""
+    fn = os.path.join(self.get_temp_dir(), "partly_bad_file")
+    with tf_record.TFRecordWriter(fn) as writer:
+      writer.write_many([b"123", b"456"])
+    with open(fn, "rb") as f:
+      data = f.read()
+    with open(fn, "wb") as f:
+      f.write(data[:-2])
+    reader = tf_record.tf_record_iterator(fn)
+    self.assertEqual(b"123", next(reader))
+    with self.assertRaises(errors_impl.DataLossError):
+      next(reader)
+
+  def testReadMany(self):
+    records = [self._Record(i) for i in range(self._num_records)]
+    for compression_type in [TFRecordCompressionType.NONE,
+                             TFRecordCompressionType.ZLIB,
+                             TFRecordCompressionType.GZIP]:
+      options = tf_record.TFRecordOptions(compression_type=compression_type)
+      fn = os.path.join(self.get_temp_dir(),
+                        "read_many.%d.tfrecord" % compression_type)
+      with tf_record.TFRecordWriter(fn, options=options) as writer:
+        writer.write_many(records)
+      for buffer_size in [None, 16]:
+        reader = tf_record.tf_record_iterator(fn, options,
+                                              buffer_size=buffer_size)
+        self.assertEqual(records[0], next(reader))
+        self.assertEqual(records[1:4], reader.read_many(3))
+        self.assertEqual(records[4:], reader.read_many(10))
+        self.assertEqual([], reader.read_many(10))
+        with self.assertRaises(StopIteration):
+          next(reader)
+
+  def _WriteFiles(self, num_files):
+    """Writes files whose records identify the file and the record."""
+    filenames = []
+    for i in range(num_files):
+      fn = os.path.join(self.get_temp_dir(), "parallel.%d.tfrecord" % i)
+      with tf_record.TFRecordWriter(fn) as writer:
+        writer.write_many([compat.as_bytes("File %d Record %d" % (i, j))
+                           for j in range(self._num_records * (i + 1))])
+      filenames.append(fn)
+    return filenames
+
+  def testParallelIteratorOrdered(self):
+    filenames = self._WriteFiles(5)
+    expected = [r for fn in filenames for r in tf_record.tf_record_iterator(fn)]
+    actual = list(tf_record.parallel_tf_record_iterator(
+        filenames, num_threads=2, batch_size=3, max_buffered_batches=2))
+    self.assertEqual(expected, actual)
+
+  def testParallelIteratorUnordered(self):
+    filenames = self._WriteFiles(5)
+    expected = [r for fn in filenames for r in tf_record.tf_record_iterator(fn)]
+    actual = list(tf_record.parallel_tf_record_iterator(
+        filenames, num_threads=3, ordered=False, batch_size=3))
+    self.assertEqual(sorted(expected), sorted(actual))
+    # The records of each file are still produced in order.
+    for i in range(5):
+      prefix = compat.as_bytes("File %d " % i)
+      self.assertEqual([r for r in expected if r.startswith(prefix)],
+                       [r for r in actual if r.startswith(prefix)])
+
+  def testParallelIteratorMissingFile(self):
+    filenames = self._WriteFiles(2)
+    filenames.insert(1, os.path.join(self.get_temp_dir(), "missing"))
+    for ordered in [True, False]:
+      with self.assertRaises(errors_impl.NotFoundError):
+        list(tf_record.parallel_tf_record_iterator(filenames, ordered=ordered))
+
 
 class AsyncReaderTest(test.TestCase):
 
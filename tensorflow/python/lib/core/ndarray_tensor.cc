@@ -363,8 +363,13 @@ Status PyArrayToTF_Tensor(PyObject* ndarray, Safe_TF_TensorPtr* out_tensor) {
   DCHECK(out_tensor != nullptr);
 
   // Make sure we dereference this array object in case of error, etc.
+  //
+  // The buffer of a C-contiguous, aligned array is borrowed rather than
+  // copied. It does not need to be writeable: the TF_Tensor created below
+  // does not own its memory, so the runtime never forwards it to an op
+  // output or modifies it in place.
   Safe_PyObjectPtr array_safe(make_safe(
-      PyArray_FromAny(ndarray, nullptr, 0, 0, NPY_ARRAY_CARRAY, nullptr)));
+      PyArray_FromAny(ndarray, nullptr, 0, 0, NPY_ARRAY_IN_ARRAY, nullptr)));
   if (!array_safe) return errors::InvalidArgument("Not a ndarray.");
   PyArrayObject* array = reinterpret_cast<PyArrayObject*>(array_safe.get());
 
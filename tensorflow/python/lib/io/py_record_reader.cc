@@ -16,6 +16,7 @@ limitations under the License.
 #include "tensorflow/python/lib/io/py_record_reader.h"
 
 #include "tensorflow/c/tf_status_helper.h"
+#include "tensorflow/core/lib/core/errors.h"
 #include "tensorflow/core/lib/core/stringpiece.h"
 #include "tensorflow/core/lib/io/record_reader.h"
 #include "tensorflow/core/lib/io/zlib_compression_options.h"
@@ -32,7 +33,13 @@ PyRecordReader::PyRecordReader() {}
 
 PyRecordReader* PyRecordReader::New(const string& filename, uint64 start_offset,
                                     const string& compression_type_string,
-                                    TF_Status* out_status) {
+                                    uint64 buffer_size, TF_Status* out_status) {
+  if (buffer_size > 0 && start_offset > 0) {
+    Set_TF_Status_from_Status(
+        out_status, errors::InvalidArgument(
+                        "A buffered reader must start at offset 0."));
+    return nullptr;
+  }
   std::unique_ptr<RandomAccessFile> file;
   Status s = Env::Default()->NewRandomAccessFile(filename, &file);
   if (!s.ok()) {
@@ -45,6 +52,7 @@ PyRecordReader* PyRecordReader::New(const string& filename, uint64 start_offset,
 
   RecordReaderOptions options =
       RecordReaderOptions::CreateRecordReaderOptions(compression_type_string);
+  options.buffer_size = buffer_size;
 
   reader->reader_ = new RecordReader(reader->file_, options);
   return reader;
@@ -65,6 +73,35 @@ void PyRecordReader::GetNext(TF_Status* status) {
   Set_TF_Status_from_Status(status, s);
 }
 
+std::vector<string> PyRecordReader::GetNextRecords(int max_records,
+                                                   TF_Status* status) {
+  std::vector<string> records;
+  if (reader_ == nullptr) {
+    Set_TF_Status_from_Status(status,
+                              errors::FailedPrecondition("Reader is closed."));
+    return records;
+  }
+  if (!pending_status_.ok()) {
+    Set_TF_Status_from_Status(status, pending_status_);
+    return records;
+  }
+  string record;
+  while (static_cast<int>(records.size()) < max_records) {
+    Status s = reader_->ReadRecord(&offset_, &record);
+    if (!s.ok()) {
+      if (records.empty()) {
+        Set_TF_Status_from_Status(status, s);
+      } else {
+        pending_status_ = s;
+      }
+      break;
+    }
+    records.push_back(std::move(record));
+    record.clear();
+  }
+  return records;
+}
+
 void PyRecordReader::Close() {
   delete reader_;
   delete file_;
@@ -16,7 +16,10 @@ limitations under the License.
 #ifndef TENSORFLOW_PYTHON_LIB_IO_PY_RECORD_READER_H_
 #define TENSORFLOW_PYTHON_LIB_IO_PY_RECORD_READER_H_
 
+#include <vector>
+
 #include "tensorflow/c/c_api.h"
+#include "tensorflow/core/lib/core/status.h"
 #include "tensorflow/core/lib/core/stringpiece.h"
 #include "tensorflow/core/platform/macros.h"
 #include "tensorflow/core/platform/types.h"
@@ -36,9 +39,12 @@ class PyRecordReader {
  public:
   // TODO(vrv): make this take a shared proto to configure
   // the compression options.
+  //
+  // If "buffer_size" is non-zero, the file is read ahead in chunks of
+  // "buffer_size" bytes, and "start_offset" must be 0.
   static PyRecordReader* New(const string& filename, uint64 start_offset,
                              const string& compression_type_string,
-                             TF_Status* out_status);
+                             uint64 buffer_size, TF_Status* out_status);
 
   ~PyRecordReader();
 
@@ -48,6 +54,13 @@ class PyRecordReader {
   // (e.g., filesystem errors).
   void GetNext(TF_Status* status);
 
+  // Reads up to "max_records" records, and returns them. Fewer records are
+  // returned at the end of the file. Populates status with OUT_OF_RANGE if
+  // there are no more records, or with another error if the first record
+  // cannot be read. An error after some records have been read is returned
+  // by the next call instead.
+  std::vector<string> GetNextRecords(int max_records, TF_Status* status);
+
   // Return the current record contents.  Only valid after the preceding call
   // to GetNext() returned true
   string record() const { return record_; }
@@ -64,6 +77,7 @@ class PyRecordReader {
   RandomAccessFile* file_;    // Owned
   io::RecordReader* reader_;  // Owned
   string record_;
+  Status pending_status_;
   TF_DISALLOW_COPY_AND_ASSIGN(PyRecordReader);
 };
 
@@ -16,6 +16,7 @@ limitations under the License.
 %nothread tensorflow::io::PyRecordReader::GetNext;
 
 %include "tensorflow/python/platform/base.i"
+%include "tensorflow/python/lib/core/strings.i"
 
 %feature("except") tensorflow::io::PyRecordReader::New {
   // Let other threads run while we read
@@ -33,6 +34,13 @@ limitations under the License.
   Py_END_ALLOW_THREADS
 }
 
+%feature("except") tensorflow::io::PyRecordReader::GetNextRecords {
+  // Let other threads run while we read
+  Py_BEGIN_ALLOW_THREADS
+  $action
+  Py_END_ALLOW_THREADS
+}
+
 %{
 #include "tensorflow/python/lib/io/py_record_reader.h"
 %}
@@ -44,6 +52,7 @@ limitations under the License.
 %unignore tensorflow::io::PyRecordReader;
 %unignore tensorflow::io::PyRecordReader::~PyRecordReader;
 %unignore tensorflow::io::PyRecordReader::GetNext;
+%unignore tensorflow::io::PyRecordReader::GetNextRecords;
 %unignore tensorflow::io::PyRecordReader::offset;
 %unignore tensorflow::io::PyRecordReader::record;
 %unignore tensorflow::io::PyRecordReader::Close;
@@ -16,6 +16,7 @@ limitations under the License.
 #include "tensorflow/python/lib/io/py_record_writer.h"
 
 #include "tensorflow/c/tf_status_helper.h"
+#include "tensorflow/core/lib/core/errors.h"
 #include "tensorflow/core/lib/core/stringpiece.h"
 #include "tensorflow/core/lib/io/record_writer.h"
 #include "tensorflow/core/lib/io/zlib_compression_options.h"
@@ -55,6 +56,22 @@ bool PyRecordWriter::WriteRecord(tensorflow::StringPiece record) {
   return s.ok();
 }
 
+void PyRecordWriter::WriteRecords(const std::vector<string>& records,
+                                  TF_Status* out_status) {
+  if (writer_ == nullptr) {
+    Set_TF_Status_from_Status(out_status,
+                              errors::FailedPrecondition("Writer is closed."));
+    return;
+  }
+  for (const string& record : records) {
+    Status s = writer_->WriteRecord(record);
+    if (!s.ok()) {
+      Set_TF_Status_from_Status(out_status, s);
+      return;
+    }
+  }
+}
+
 void PyRecordWriter::Flush(TF_Status* out_status) {
   Status s = writer_->Flush();
   if (!s.ok()) {
@@ -17,6 +17,7 @@ limitations under the License.
 #define TENSORFLOW_PYTHON_LIB_IO_PY_RECORD_WRITER_H_
 
 #include <memory>
+#include <vector>
 
 #include "tensorflow/c/c_api.h"
 #include "tensorflow/core/lib/core/stringpiece.h"
@@ -44,6 +45,9 @@ class PyRecordWriter {
   ~PyRecordWriter();
 
   bool WriteRecord(tensorflow::StringPiece record);
+  // Writes each of "records" in order, and populates "out_status" with the
+  // first error, if any.
+  void WriteRecords(const std::vector<string>& records, TF_Status* out_status);
   void Flush(TF_Status* out_status);
   void Close(TF_Status* out_status);
 
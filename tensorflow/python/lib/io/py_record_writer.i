@@ -14,6 +14,7 @@ limitations under the License.
 ==============================================================================*/
 
 %nothread tensorflow::io::PyRecordWriter::WriteRecord;
+%nothread tensorflow::io::PyRecordWriter::WriteRecords;
 
 %include "tensorflow/python/platform/base.i"
 %include "tensorflow/python/lib/core/strings.i"
@@ -34,6 +35,13 @@ limitations under the License.
   Py_END_ALLOW_THREADS
 }
 
+%feature("except") tensorflow::io::PyRecordWriter::WriteRecords {
+  // Let other threads run while we write
+  Py_BEGIN_ALLOW_THREADS
+  $action
+  Py_END_ALLOW_THREADS
+}
+
 %{
 #include "tensorflow/python/lib/io/py_record_writer.h"
 %}
@@ -45,6 +53,7 @@ limitations under the License.
 %unignore tensorflow::io::PyRecordWriter;
 %unignore tensorflow::io::PyRecordWriter::~PyRecordWriter;
 %unignore tensorflow::io::PyRecordWriter::WriteRecord;
+%unignore tensorflow::io::PyRecordWriter::WriteRecords;
 %unignore tensorflow::io::PyRecordWriter::Flush;
 %unignore tensorflow::io::PyRecordWriter::Close;
 %unignore tensorflow::io::PyRecordWriter::New;
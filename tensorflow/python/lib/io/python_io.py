@@ -19,6 +19,7 @@ See the @{$python/python_io} guide.
 
 @@TFRecordWriter
 @@tf_record_iterator
+@@parallel_tf_record_iterator
 @@TFRecordCompressionType
 @@TFRecordOptions
 """
@@ -19,6 +19,11 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
+import threading
+
+from six.moves import queue
+
 from tensorflow.python import pywrap_tensorflow
 from tensorflow.python.framework import errors
 from tensorflow.python.util import compat
@@ -51,34 +56,218 @@ class TFRecordOptions(object):
     return cls.compression_type_map[options.compression_type]
 
 
-def tf_record_iterator(path, options=None):
+# The number of records that `tf_record_iterator()` reads from the file at a
+# time.
+_ITERATOR_BATCH_SIZE = 256
+
+
+class _TFRecordIterator(object):
+  """An iterator over the records of a TFRecords file.
+
+  See `tf_record_iterator()`.
+  """
+
+  def __init__(self, path, options=None, buffer_size=None):
+    compression_type = TFRecordOptions.get_compression_type_string(options)
+    with errors.raise_exception_on_not_ok_status() as status:
+      self._reader = pywrap_tensorflow.PyRecordReader_New(
+          compat.as_bytes(path), 0, compat.as_bytes(compression_type),
+          buffer_size or 0, status)
+
+    if self._reader is None:
+      raise IOError("Could not open %s." % path)
+    self._records = collections.deque()
+
+  def __iter__(self):
+    return self
+
+  def __next__(self):
+    if not self._records:
+      self._records.extend(self._read(_ITERATOR_BATCH_SIZE))
+      if not self._records:
+        raise StopIteration
+    return self._records.popleft()
+
+  next = __next__  # For Python 2.
+
+  def _read(self, max_records):
+    if self._reader is None:
+      return []
+    try:
+      with errors.raise_exception_on_not_ok_status() as status:
+        return self._reader.GetNextRecords(max_records, status)
+    except errors.OutOfRangeError:
+      self.close()
+      return []
+
+  def read_many(self, max_records):
+    """Returns a list of the next (up to) `max_records` records.
+
+    Args:
+      max_records: The maximum number of records to read.
+
+    Returns:
+      A list of strings, which is shorter than `max_records` only at the end
+      of the file, and empty once all records have been read.
+    """
+    records = []
+    while self._records and len(records) < max_records:
+      records.append(self._records.popleft())
+    if len(records) < max_records:
+      records.extend(self._read(max_records - len(records)))
+    return records
+
+  def close(self):
+    """Closes the file."""
+    if self._reader is not None:
+      self._reader.Close()
+      self._reader = None
+
+
+def tf_record_iterator(path, options=None, buffer_size=None):
   """An iterator that read the records from a TFRecords file.
 
+  Records are read from the file in batches. To read many records at a time,
+  call `read_many(max_records)` on the returned iterator, which returns a list
+  of the next (up to) `max_records` records.
+
   Args:
     path: The path to the TFRecords file.
     options: (optional) A TFRecordOptions object.
+    buffer_size: (optional) The number of bytes to read ahead from the file.
+      By default, the file is not read ahead.
 
-  Yields:
-    Strings.
+  Returns:
+    An iterator of strings.
 
   Raises:
     IOError: If `path` cannot be opened for reading.
   """
-  compression_type = TFRecordOptions.get_compression_type_string(options)
-  with errors.raise_exception_on_not_ok_status() as status:
-    reader = pywrap_tensorflow.PyRecordReader_New(
-        compat.as_bytes(path), 0, compat.as_bytes(compression_type), status)
-
-  if reader is None:
-    raise IOError("Could not open %s." % path)
-  while True:
+  return _TFRecordIterator(path, options, buffer_size)
+
+
+def _read_tf_record_files(paths, options, buffer_size, batch_size, stop,
+                          put):
+  """Reads batches of records from each of `paths` in order.
+
+  Calls `put((index, records))` for each batch of records of `paths[index]`,
+  `put((index, None))` once all of its records have been read, and
+  `put((index, exception))` if it cannot be read.
+  """
+  for index, path in paths:
     try:
-      with errors.raise_exception_on_not_ok_status() as status:
-        reader.GetNext(status)
-    except errors.OutOfRangeError:
-      break
-    yield reader.record()
-  reader.Close()
+      iterator = _TFRecordIterator(path, options, buffer_size)
+      try:
+        while not stop.is_set():
+          records = iterator.read_many(batch_size)
+          if not records:
+            break
+          put((index, records))
+      finally:
+        iterator.close()
+      put((index, None))
+    except Exception as e:  # pylint: disable=broad-except
+      put((index, e))
+      return
+
+
+def parallel_tf_record_iterator(paths,
+                                options=None,
+                                buffer_size=None,
+                                num_threads=4,
+                                ordered=True,
+                                batch_size=_ITERATOR_BATCH_SIZE,
+                                max_buffered_batches=16):
+  """An iterator that reads the records of many TFRecords files in parallel.
+
+  `num_threads` files are read concurrently, each by a separate thread. Since
+  the reads do not hold the Python global interpreter lock, this is faster
+  than reading the files one at a time when reading or decompressing them is
+  the bottleneck.
+
+  Args:
+    paths: A list of paths to TFRecords files.
+    options: (optional) A TFRecordOptions object.
+    buffer_size: (optional) The number of bytes to read ahead from each file.
+    num_threads: (optional) The number of files that are read concurrently.
+    ordered: (optional) If `True`, the records are produced in the same order
+      as by reading each file in turn. Otherwise, they are produced in the
+      order in which they are read, which may keep fewer records buffered.
+    batch_size: (optional) The number of records that each thread reads at a
+      time.
+    max_buffered_batches: (optional) The maximum number of batches of records
+      that are buffered for each file (if `ordered`) or in total.
+
+  Yields:
+    Strings.
+
+  Raises:
+    IOError: If a file cannot be opened for reading.
+  """
+  paths = list(paths)
+  stop = threading.Event()
+
+  def make_put(q):
+    def put(item):
+      while not stop.is_set():
+        try:
+          q.put(item, timeout=0.1)
+          return
+        except queue.Full:
+          pass
+    return put
+
+  def start_thread(target, *args):
+    thread = threading.Thread(target=target, args=args)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+  try:
+    if ordered:
+      # Each file is read by its own thread into its own queue, and at most
+      # `num_threads` files are read ahead of the one being consumed.
+      queues = [queue.Queue(max_buffered_batches) for _ in paths]
+      for index in range(min(num_threads, len(paths))):
+        start_thread(_read_tf_record_files, [(index, paths[index])], options,
+                     buffer_size, batch_size, stop, make_put(queues[index]))
+      for index in range(len(paths)):
+        while True:
+          _, records = queues[index].get()
+          if records is None:
+            break
+          if isinstance(records, Exception):
+            raise records
+          for record in records:
+            yield record
+        queues[index] = None
+        next_index = index + num_threads
+        if next_index < len(paths):
+          start_thread(_read_tf_record_files,
+                       [(next_index, paths[next_index])], options,
+                       buffer_size, batch_size, stop,
+                       make_put(queues[next_index]))
+    else:
+      results = queue.Queue(max_buffered_batches)
+      put = make_put(results)
+      num_threads = min(num_threads, len(paths))
+      for i in range(num_threads):
+        start_thread(_read_tf_record_files,
+                     list(enumerate(paths))[i::num_threads], options,
+                     buffer_size, batch_size, stop, put)
+      num_remaining = len(paths)
+      while num_remaining:
+        _, records = results.get()
+        if records is None:
+          num_remaining -= 1
+        elif isinstance(records, Exception):
+          raise records
+        else:
+          for record in records:
+            yield record
+  finally:
+    # Stops the reader threads if the caller stops iterating early.
+    stop.set()
 
 
 class TFRecordWriter(object):
@@ -121,6 +310,17 @@ class TFRecordWriter(object):
     """
     self._writer.WriteRecord(record)
 
+  def write_many(self, records):
+    """Write a list of string records to the file.
+
+    This is faster than calling `write()` for each record.
+
+    Args:
+      records: A list of str.
+    """
+    with errors.raise_exception_on_not_ok_status() as status:
+      self._writer.WriteRecords([compat.as_bytes(r) for r in records], status)
+
   def flush(self):
     """Flush the file."""
     with errors.raise_exception_on_not_ok_status() as status:
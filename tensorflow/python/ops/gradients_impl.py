@@ -20,6 +20,7 @@ from __future__ import print_function
 
 import collections
 import contextlib
+import time
 import warnings
 
 import numpy as np
@@ -146,7 +147,48 @@ def _GatherInputs(to_ops, reached_ops):
   return inputs
 
 
-def _PendingCount(graph, to_ops, from_ops, colocate_gradients_with_ops):
+class _OpInputsIndex(object):
+  """Adjacency index of the forward subgraph between two lists of ops.
+
+  Building the backward pass visits the inputs of every op several times: to
+  find the ops between `to_ops` and `from_ops`, to count pending backprop
+  inputs, to find the stop ops and to propagate gradients. This reads the
+  inputs of each visited op once into plain lists, so later visits neither
+  rebuild `Operation.inputs` wrappers nor look up `Tensor.op` again.
+  """
+
+  __slots__ = ("_entries",)
+
+  def __init__(self):
+    # Maps op._id to a tuple (input tensors, input ops, input op ids).
+    self._entries = {}
+
+  def _entry(self, op):
+    # pylint: disable=protected-access
+    entry = self._entries.get(op._id)
+    if entry is None:
+      input_tensors = list(op.inputs)
+      input_ops = [t.op for t in input_tensors]
+      entry = (input_tensors, input_ops, [x._id for x in input_ops])
+      self._entries[op._id] = entry
+    # pylint: enable=protected-access
+    return entry
+
+  def input_tensors(self, op):
+    """Returns the list of data input `Tensor`s of `op`."""
+    return self._entry(op)[0]
+
+  def input_ops(self, op):
+    """Returns the ops producing the data inputs of `op`, one per input."""
+    return self._entry(op)[1]
+
+  def input_ids(self, op):
+    """Returns the ids of the ops returned by `input_ops(op)`."""
+    return self._entry(op)[2]
+
+
+def _PendingCount(graph, to_ops, from_ops, colocate_gradients_with_ops,
+                  op_inputs=None):
   """Initialize the pending count for ops between two lists of Operations.
 
   'pending_count[op._id]' indicates the number of backprop inputs
@@ -157,6 +199,8 @@ def _PendingCount(graph, to_ops, from_ops, colocate_gradients_with_ops):
     to_ops: list of Operations.
     from_ops: list of Operations.
     colocate_gradients_with_ops: Python bool.  See docstring of gradients().
+    op_inputs: Optional `_OpInputsIndex` to fill in with the inputs of the ops
+      between `to_ops` and `from_ops`.
 
   Returns:
     A tuple containing: (1) a list of integers indexed by operation id,
@@ -164,6 +208,9 @@ def _PendingCount(graph, to_ops, from_ops, colocate_gradients_with_ops):
     a ControlFlowState object which is not None if the ops between from_ops
     and to_ops contain control flow loops.
   """
+  if op_inputs is None:
+    op_inputs = _OpInputsIndex()
+
   # Mark reachable ops from from_ops.
   reached_ops = [False] * (graph._last_id + 1)
   for op in to_ops:
@@ -183,8 +230,7 @@ def _PendingCount(graph, to_ops, from_ops, colocate_gradients_with_ops):
       between_op_list.append(op)
       # Clear the boolean so we won't add the inputs again.
       reached_ops[op._id] = False
-      for inp in op.inputs:
-        queue.append(inp.op)
+      queue.extend(op_inputs.input_ops(op))
 
   # 'loop_state' is None if there are no while loops.
   loop_state = control_flow_ops.MaybeCreateControlFlowState(
@@ -193,9 +239,9 @@ def _PendingCount(graph, to_ops, from_ops, colocate_gradients_with_ops):
   # Initialize pending count for between ops.
   pending_count = [0] * (graph._last_id + 1)
   for op in between_op_list:
-    for x in op.inputs:
-      if between_ops[x.op._id]:
-        pending_count[x.op._id] += 1
+    for x_id in op_inputs.input_ids(op):
+      if between_ops[x_id]:
+        pending_count[x_id] += 1
 
   return pending_count, loop_state
 
@@ -278,7 +324,7 @@ def _VerifyGeneratedGradients(grads, op):
                      "inputs %d" % (len(grads), op.node_def, len(op.inputs)))
 
 
-def _StopOps(from_ops, stop_gradient_ops, pending_count):
+def _StopOps(from_ops, stop_gradient_ops, pending_count, op_inputs=None):
   """The set of ops that terminate the gradient computation.
 
   This computes the frontier of the forward graph *before* which backprop
@@ -294,15 +340,18 @@ def _StopOps(from_ops, stop_gradient_ops, pending_count):
     from_ops: list of Operations.
     stop_gradient_ops: list of Operations never to backprop through.
     pending_count: List of integers, indexed by operation id.
+    op_inputs: Optional `_OpInputsIndex` used to look up the inputs of ops.
 
   Returns:
     The set of operations.
   """
+  if op_inputs is None:
+    op_inputs = _OpInputsIndex()
   stop_ops = set()
   for op in from_ops:
     is_stop_op = True
-    for inp in op.inputs:
-      if pending_count[inp.op._id] > 0:
+    for inp_id in op_inputs.input_ids(op):
+      if pending_count[inp_id] > 0:
         is_stop_op = False
         break
     if is_stop_op:
@@ -372,6 +421,61 @@ def _MaybeCompile(scope, op, func, grad_fn):
     return grad_fn()
 
 
+# Called with the per-phase timings of every `gradients()` call, if not None.
+_timing_hook = None
+
+
+def set_gradients_timing_hook(hook):
+  """Sets a function to receive the time spent in each phase of `gradients()`.
+
+  After every call to `gradients()`, `hook` is called with a dict mapping
+  phase names to the wall time in seconds spent in that phase:
+
+  * `"setup"`: converting the arguments and creating the initial `grad_ys`.
+  * `"index"`: indexing the forward subgraph between `ys` and `xs`, counting
+    pending gradients and creating the control flow state.
+  * `"aggregate"`: summing the gradients received by each op.
+  * `"grad_fn"`: calling gradient functions, including creating zero
+    gradients for unused outputs.
+  * `"propagate"`: recording the gradients of op inputs and scheduling the
+    ops whose gradients are complete.
+  * `"post_processing"`: finishing the gradient while loops, if any.
+
+  The dict also holds the number of ops that were visited under `"num_ops"`.
+  Timing is only measured while a hook is set.
+
+  Args:
+    hook: A function taking a single dict argument, or None to remove the
+      current hook.
+
+  Returns:
+    The previously set hook, or None.
+  """
+  global _timing_hook
+  previous_hook = _timing_hook
+  _timing_hook = hook
+  return previous_hook
+
+
+class _PhaseTimer(object):
+  """Accumulates the wall time spent in each phase of `gradients()`."""
+
+  __slots__ = ("timings", "_last_time")
+
+  def __init__(self):
+    self.timings = collections.OrderedDict(
+        (phase, 0.0) for phase in ("setup", "index", "aggregate", "grad_fn",
+                                   "propagate", "post_processing"))
+    self.timings["num_ops"] = 0
+    self._last_time = time.time()
+
+  def mark(self, phase):
+    """Charges the time elapsed since the previous mark to `phase`."""
+    now = time.time()
+    self.timings[phase] += now - self._last_time
+    self._last_time = now
+
+
 def gradients(ys,
               xs,
               grad_ys=None,
@@ -452,6 +556,7 @@ def gradients(ys,
   if context.in_eager_mode():
     raise RuntimeError("tf.gradients not supported in EAGER mode. Use "
                        "functions in tf.contrib.eager.backprop instead.")
+  timer = _PhaseTimer() if _timing_hook is not None else None
   ys = _AsList(ys)
   xs = _AsList(xs)
   stop_gradients = [] if stop_gradients is None else _AsList(stop_gradients)
@@ -485,9 +590,13 @@ def gradients(ys,
     to_ops = [t.op for t in ys]
     from_ops = [t.op for t in xs]
     stop_gradient_ops = [t.op for t in stop_gradients]
-    pending_count, loop_state = _PendingCount(ops.get_default_graph(), to_ops,
-                                              from_ops,
-                                              colocate_gradients_with_ops)
+    graph = ops.get_default_graph()
+    if timer:
+      timer.mark("setup")
+    op_inputs = _OpInputsIndex()
+    pending_count, loop_state = _PendingCount(graph, to_ops, from_ops,
+                                              colocate_gradients_with_ops,
+                                              op_inputs=op_inputs)
 
     # Iterate over the collected ops.
     #
@@ -523,25 +632,32 @@ def gradients(ys,
           _SetGrad(grads, y, loop_state.ZerosLikeForExit(y))
           queue.append(y.op)
 
-    stop_ops = _StopOps(from_ops, stop_gradient_ops, pending_count)
+    stop_ops = _StopOps(from_ops, stop_gradient_ops, pending_count,
+                        op_inputs=op_inputs)
+    if timer:
+      timer.mark("index")
     while queue:
       # generate gradient subgraph for op.
       op = queue.popleft()
+      if timer:
+        timer.timings["num_ops"] += 1
       with _maybe_colocate_with(op, colocate_gradients_with_ops):
         if loop_state:
           loop_state.EnterGradWhileContext(op, before=True)
         out_grads = _AggregatedGrads(grads, op, loop_state, aggregation_method)
         if loop_state:
           loop_state.ExitGradWhileContext(op, before=True)
+        if timer:
+          timer.mark("aggregate")
 
         grad_fn = None
         # pylint: disable=protected-access
         func_call = None
-        is_func_call = ops.get_default_graph()._is_function(op.type)
+        is_func_call = graph._is_function(op.type)
         has_out_grads = any(isinstance(g, ops.Tensor) or g for g in out_grads)
         if has_out_grads and (op._id not in stop_ops):
           if is_func_call:
-            func_call = ops.get_default_graph()._get_function(op.type)
+            func_call = graph._get_function(op.type)
             grad_fn = func_call.python_grad_func
             # pylint: enable=protected-access
           else:
@@ -572,7 +688,7 @@ def gradients(ys,
                 out_grads[i] = control_flow_ops.ZerosLikeOutsideLoop(op, i)
           with ops.name_scope(op.name + "_grad"):
             # pylint: disable=protected-access
-            with ops.get_default_graph()._original_op(op):
+            with graph._original_op(op):
               # pylint: enable=protected-access
               if grad_fn:
                 # If grad_fn was found, do not use SymbolicGradient even for
@@ -593,8 +709,10 @@ def gradients(ys,
         else:
           # If no grad_fn is defined or none of out_grads is available,
           # just propagate a list of None backwards.
-          in_grads = [None] * len(op.inputs)
-        for t_in, in_grad in zip(op.inputs, in_grads):
+          in_grads = [None] * len(op_inputs.input_tensors(op))
+        if timer:
+          timer.mark("grad_fn")
+        for t_in, in_grad in zip(op_inputs.input_tensors(op), in_grads):
           if in_grad is not None:
             if (isinstance(in_grad, ops.Tensor) and
                 t_in.dtype != dtypes.resource):
@@ -604,11 +722,18 @@ def gradients(ys,
           loop_state.ExitGradWhileContext(op, before=False)
 
       # Update pending count for the inputs of op and enqueue ready ops.
-      _UpdatePendingAndEnqueueReady(grads, op, queue, pending_count, loop_state)
+      _UpdatePendingAndEnqueueReady(grads, op, queue, pending_count, loop_state,
+                                    op_inputs=op_inputs)
+      if timer:
+        timer.mark("propagate")
 
   if loop_state:
     loop_state.PostProcessing()
-  return [_GetGrad(grads, x) for x in xs]
+  result = [_GetGrad(grads, x) for x in xs]
+  if timer:
+    timer.mark("post_processing")
+    _timing_hook(timer.timings)
+  return result
 
 
 def _HasAnyNotNoneGrads(grads, op):
@@ -623,20 +748,23 @@ def _HasAnyNotNoneGrads(grads, op):
   return False
 
 
-def _UpdatePendingAndEnqueueReady(grads, op, queue, pending_count, loop_state):
+def _UpdatePendingAndEnqueueReady(grads, op, queue, pending_count, loop_state,
+                                  op_inputs=None):
   """Update pending count for the inputs of op and enqueue ready ops."""
-  for x in op.inputs:
-    # pylint: disable=protected-access
-    pending_count[x.op._id] -= 1
-    ready = (pending_count[x.op._id] == 0)
+  if op_inputs is None:
+    op_inputs = _OpInputsIndex()
+  for x, x_op, x_id in zip(op_inputs.input_tensors(op),
+                           op_inputs.input_ops(op),
+                           op_inputs.input_ids(op)):
+    pending_count[x_id] -= 1
+    ready = (pending_count[x_id] == 0)
     if loop_state and not ready:
-      ready = (pending_count[x.op._id] > 0 and
-               control_flow_ops.IsLoopSwitch(x.op))
-    # pylint: enable=protected-access
+      ready = (pending_count[x_id] > 0 and
+               control_flow_ops.IsLoopSwitch(x_op))
     if ready:
-      if control_flow_ops.IsLoopExit(x.op):
+      if control_flow_ops.IsLoopExit(x_op):
         # if x is an exit without real gradient, defer processing them.
-        grad_state = loop_state.GetGradState(x.op, before=False)
+        grad_state = loop_state.GetGradState(x_op, before=False)
         grad_state.deferred_exits.append(x)
         grad_state.pending_exits_count -= 1
         if grad_state.pending_exits_count == 0:
@@ -660,7 +788,7 @@ def _UpdatePendingAndEnqueueReady(grads, op, queue, pending_count, loop_state):
             for y in grad_state.unused_exits:
               queue.append(y.op)
       else:
-        queue.append(x.op)
+        queue.append(x_op)
 
 
 def _SetGrad(grads, t, grad):
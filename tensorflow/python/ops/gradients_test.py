@@ -313,6 +313,44 @@ class GradientsTest(test_util.TensorFlowTestCase):
       grad, = gradients.gradients(target, v)
       self.assertIsNone(grad)
 
+  def testPendingCountWithRepeatedInputs(self):
+    with ops.Graph().as_default() as g:
+      x = constant(1.0)
+      y = math_ops.multiply(x, x)
+      z = math_ops.add(y, y)
+      pending_count, loop_state = gradients_impl._PendingCount(
+          g, [z.op], [x.op], False)
+    self.assertIsNone(loop_state)
+    # Each input edge counts once, even between the same pair of ops.
+    self.assertEqual(2, pending_count[x.op._id])
+    self.assertEqual(2, pending_count[y.op._id])
+    self.assertEqual(0, pending_count[z.op._id])
+
+  def testTimingHook(self):
+    timings = []
+    previous_hook = gradients_impl.set_gradients_timing_hook(timings.append)
+    try:
+      with ops.Graph().as_default():
+        x = constant(1.0, shape=[2, 2])
+        y = math_ops.reduce_sum(math_ops.matmul(x, x))
+        grad, = gradients.gradients(y, x)
+    finally:
+      self.assertEqual(timings.append,
+                       gradients_impl.set_gradients_timing_hook(previous_hook))
+    self.assertIsNotNone(grad)
+    self.assertEqual(1, len(timings))
+    self.assertEqual(["setup", "index", "aggregate", "grad_fn", "propagate",
+                      "post_processing", "num_ops"], list(timings[0].keys()))
+    self.assertGreater(timings[0]["num_ops"], 0)
+    for phase, seconds in timings[0].items():
+      self.assertGreaterEqual(seconds, 0, phase)
+
+    # No timings are reported once the hook is removed.
+    with ops.Graph().as_default():
+      x = constant(1.0)
+      gradients.gradients(x * x, x)
+    self.assertEqual(1, len(timings))
+
   def testVariableReadValueGradient(self):
     with ops.Graph().as_default():
       init = constant_op.constant(100.0)
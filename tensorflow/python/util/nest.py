@@ -47,6 +47,70 @@ def _sorted(dict_):
     raise TypeError("nest only supports dicts with sortable keys.")
 
 
+# Node kinds returned by `_node_kind`. Every kind >= `_DICT` is a sequence.
+_LEAF = 0
+_SET = 1
+_DICT = 2
+_SEQUENCE = 3
+_NAMEDTUPLE = 4
+
+# Maps a Python type to the kind of node its instances are in a nested
+# structure. `flatten`, `pack_sequence_as` and friends classify every node
+# they visit, and the `isinstance` checks against the `collections` ABCs are
+# the dominant cost of doing so; the answer only depends on the type, so it is
+# computed once per type. The cache is cleared when it grows past
+# `_NODE_KIND_CACHE_SIZE` types, so programs that create many short-lived
+# namedtuple classes do not keep them alive indefinitely.
+_NODE_KIND_CACHE = {}
+_NODE_KIND_CACHE_SIZE = 4096
+
+
+def _is_namedtuple(instance):
+  """Returns True if `instance` is an instance of a `namedtuple` class."""
+  return (isinstance(instance, tuple) and
+          hasattr(instance, "_fields") and
+          isinstance(instance._fields, _collections.Sequence) and
+          all(isinstance(f, _six.string_types) for f in instance._fields))
+
+
+def _compute_node_kind(instance):
+  """Returns the kind of node `instance` is, without using the cache."""
+  if isinstance(instance, dict):
+    return _DICT
+  if isinstance(instance, set):
+    return _SET
+  if (not isinstance(instance, _collections.Sequence) or
+      isinstance(instance, _six.string_types)):
+    return _LEAF
+  if _is_namedtuple(instance):
+    return _NAMEDTUPLE
+  return _SEQUENCE
+
+
+def _node_kind(instance):
+  """Returns the kind of node `instance` is, caching the answer per type."""
+  instance_type = type(instance)
+  kind = _NODE_KIND_CACHE.get(instance_type)
+  if kind is None:
+    kind = _compute_node_kind(instance)
+    if len(_NODE_KIND_CACHE) >= _NODE_KIND_CACHE_SIZE:
+      _NODE_KIND_CACHE.clear()
+    _NODE_KIND_CACHE[instance_type] = kind
+  return kind
+
+
+def _node_values(instance, kind):
+  """Returns the children of the sequence `instance`, in flattening order."""
+  if kind == _DICT:
+    # Iterate through dictionaries in a deterministic order by sorting the
+    # keys. Notice this means that we ignore the original order of
+    # `OrderedDict` instances. This is intentional, to avoid potential bugs
+    # caused by mixing ordered and plain dicts (e.g., flattening a dict but
+    # using a corresponding `OrderedDict` to pack it back).
+    return [instance[key] for key in _sorted(instance)]
+  return instance
+
+
 def _sequence_like(instance, args):
   """Converts the sequence `args` to the same type as `instance`.
 
@@ -58,7 +122,8 @@ def _sequence_like(instance, args):
   Returns:
     `args` with the type of `instance`.
   """
-  if isinstance(instance, dict):
+  kind = _node_kind(instance)
+  if kind == _DICT:
     # Pack dictionaries in a deterministic order by sorting the keys.
     # Notice this means that we ignore the original order of `OrderedDict`
     # instances. This is intentional, to avoid potential bugs caused by mixing
@@ -66,10 +131,7 @@ def _sequence_like(instance, args):
     # corresponding `OrderedDict` to pack it back).
     result = dict(zip(_sorted(instance), args))
     return type(instance)((key, result[key]) for key in _six.iterkeys(instance))
-  elif (isinstance(instance, tuple) and
-        hasattr(instance, "_fields") and
-        isinstance(instance._fields, _collections.Sequence) and
-        all(isinstance(f, _six.string_types) for f in instance._fields)):
+  elif kind == _NAMEDTUPLE:
     # This is a namedtuple
     return type(instance)(*args)
   else:
@@ -91,15 +153,6 @@ def _yield_value(iterable):
       yield value
 
 
-def _yield_flat_nest(nest):
-  for n in _yield_value(nest):
-    if is_sequence(n):
-      for ni in _yield_flat_nest(n):
-        yield ni
-    else:
-      yield n
-
-
 # Used by `_warn_once` to remember which warning messages have been given.
 _ALREADY_WARNED = {}
 
@@ -111,6 +164,10 @@ def _warn_once(message):
     _tf_logging.warning(message)
 
 
+_SET_WARNING = ("Sets are not currently considered sequences, but this may "
+                "change in the future, so consider avoiding using them.")
+
+
 def is_sequence(seq):
   """Returns a true if its input is a collections.Sequence (except strings).
 
@@ -121,13 +178,10 @@ def is_sequence(seq):
     True if the sequence is a not a string and is a collections.Sequence or a
     dict.
   """
-  if isinstance(seq, dict):
-    return True
-  if isinstance(seq, set):
-    _warn_once("Sets are not currently considered sequences, but this may "
-               "change in the future, so consider avoiding using them.")
-  return (isinstance(seq, _collections.Sequence)
-          and not isinstance(seq, _six.string_types))
+  kind = _node_kind(seq)
+  if kind == _SET:
+    _warn_once(_SET_WARNING)
+  return kind >= _DICT
 
 
 def flatten(nest):
@@ -155,11 +209,34 @@ def flatten(nest):
   Raises:
     TypeError: The nest is or contains a dict with non-sortable keys.
   """
-  if is_sequence(nest):
-    return list(_yield_flat_nest(nest))
-  else:
+  kind = _node_kind(nest)
+  if kind < _DICT:
+    if kind == _SET:
+      _warn_once(_SET_WARNING)
     return [nest]
 
+  # Walk the structure with an explicit stack of iterators rather than nested
+  # generators, so that every leaf is visited exactly once without paying for
+  # a chain of generator frames at each level of nesting.
+  flat = []
+  append = flat.append
+  get_kind = _NODE_KIND_CACHE.get
+  stack = [iter(_node_values(nest, kind))]
+  while stack:
+    for value in stack[-1]:
+      kind = get_kind(type(value))
+      if kind is None:
+        kind = _node_kind(value)
+      if kind >= _DICT:
+        stack.append(iter(_node_values(value, kind)))
+        break
+      if kind == _SET:
+        _warn_once(_SET_WARNING)
+      append(value)
+    else:
+      stack.pop()
+  return flat
+
 
 def _recursive_assert_same_structure(nest1, nest2, check_types):
   """Helper function for `assert_same_structure`."""
@@ -190,8 +267,8 @@ def _recursive_assert_same_structure(nest1, nest2, check_types):
             "structure has keys {}, while second structure has keys {}."
             .format(keys1, keys2))
 
-  nest1_as_sequence = [n for n in _yield_value(nest1)]
-  nest2_as_sequence = [n for n in _yield_value(nest2)]
+  nest1_as_sequence = _node_values(nest1, _node_kind(nest1))
+  nest2_as_sequence = _node_values(nest2, _node_kind(nest2))
   for n1, n2 in zip(nest1_as_sequence, nest2_as_sequence):
     _recursive_assert_same_structure(n1, n2, check_types)
 
@@ -279,35 +356,46 @@ def flatten_dict_items(dictionary):
   return flat_dictionary
 
 
-def _packed_nest_with_indices(structure, flat, index):
+def _packed_nest_with_iterator(structure, kind, flat_iter):
   """Helper function for pack_sequence_as.
 
   Args:
     structure: Substructure (list / tuple / dict) to mimic.
-    flat: Flattened values to output substructure for.
-    index: Index at which to start reading from flat.
+    kind: The node kind of `structure`, as returned by `_node_kind`.
+    flat_iter: Iterator over the flattened values, positioned at the first
+      value that belongs to `structure`.
 
   Returns:
-    The tuple (new_index, child), where:
-      * new_index - the updated index into `flat` having processed `structure`.
-      * packed - the subset of `flat` corresponding to `structure`,
-                 having started at `index`, and packed into the same nested
-                 format.
+    The values consumed from `flat_iter`, packed into the same nested format
+    as `structure`.
 
   Raises:
-    ValueError: if `structure` contains more elements than `flat`
-      (assuming indexing starts from `index`).
+    StopIteration: if `structure` contains more elements than are left in
+      `flat_iter`.
   """
+  if kind == _DICT:
+    keys = _sorted(structure)
+    values = [structure[key] for key in keys]
+  else:
+    values = structure
   packed = []
-  for s in _yield_value(structure):
-    if is_sequence(s):
-      new_index, child = _packed_nest_with_indices(s, flat, index)
-      packed.append(_sequence_like(s, child))
-      index = new_index
+  for value in values:
+    value_kind = _node_kind(value)
+    if value_kind >= _DICT:
+      packed.append(_packed_nest_with_iterator(value, value_kind, flat_iter))
     else:
-      packed.append(flat[index])
-      index += 1
-  return index, packed
+      if value_kind == _SET:
+        _warn_once(_SET_WARNING)
+      packed.append(next(flat_iter))
+  if kind == _DICT:
+    # See `_sequence_like`; the keys have already been sorted above.
+    result = dict(zip(keys, packed))
+    return type(structure)(
+        (key, result[key]) for key in _six.iterkeys(structure))
+  elif kind == _NAMEDTUPLE:
+    return type(structure)(*packed)
+  else:
+    return type(structure)(packed)
 
 
 def pack_sequence_as(structure, flat_sequence):
@@ -349,15 +437,22 @@ def pack_sequence_as(structure, flat_sequence):
                        % len(flat_sequence))
     return flat_sequence[0]
 
-  flat_structure = flatten(structure)
-  if len(flat_structure) != len(flat_sequence):
+  # Pack in a single pass over `structure`; the element counts only need to
+  # be computed to report a mismatch.
+  flat_iter = iter(flat_sequence)
+  try:
+    packed = _packed_nest_with_iterator(
+        structure, _node_kind(structure), flat_iter)
+    exhausted = next(flat_iter, flat_iter) is flat_iter
+  except StopIteration:
+    exhausted = False
+  if not exhausted:
     raise ValueError(
         "Could not pack sequence. Structure had %d elements, but flat_sequence "
         "had %d elements.  Structure: %s, flat_sequence: %s."
-        % (len(flat_structure), len(flat_sequence), structure, flat_sequence))
-
-  _, packed = _packed_nest_with_indices(structure, flat_sequence, 0)
-  return _sequence_like(structure, packed)
+        % (len(flatten(structure)), len(flat_sequence), structure,
+           flat_sequence))
+  return packed
 
 
 def map_structure(func, *structure, **check_types_dict):
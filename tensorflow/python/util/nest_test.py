@@ -157,6 +157,32 @@ class NestTest(test.TestCase):
       nest.pack_sequence_as(["hello", "world"],
                             ["and", "goodbye", "again"])
 
+  def testPackSequenceAs_tooFewElementsError(self):
+    with self.assertRaisesRegexp(
+        ValueError,
+        "Structure had 3 elements, but flat_sequence had 2 elements."):
+      nest.pack_sequence_as(("a", ["b", {"c": "d"}]), [1, 2])
+
+  def testFlattenDeeplyNested(self):
+    # `flatten` does not recurse, so nesting depth is not limited by the
+    # Python recursion limit.
+    structure = 7
+    for _ in range(5000):
+      structure = [structure]
+    self.assertEqual([7], nest.flatten(structure))
+
+  def testNodeKindIsCachedPerType(self):
+    point = collections.namedtuple("Point", ["x", "y"])
+    structure = [point(1, 2), (3, {"a": point(4, 5)})]
+    self.assertEqual([1, 2, 3, 4, 5], nest.flatten(structure))
+    # Repeated calls hit the cache and must give the same results.
+    self.assertEqual([1, 2, 3, 4, 5], nest.flatten(structure))
+    self.assertEqual(structure,
+                     nest.pack_sequence_as(structure, [1, 2, 3, 4, 5]))
+    self.assertIn(point, nest._NODE_KIND_CACHE)
+    self.assertEqual(nest._NAMEDTUPLE, nest._NODE_KIND_CACHE[point])
+    self.assertEqual(nest._SEQUENCE, nest._NODE_KIND_CACHE[tuple])
+
   def testIsSequence(self):
     self.assertFalse(nest.is_sequence("1234"))
     self.assertTrue(nest.is_sequence([1, 3, [4, 5]]))